@@ -12,6 +12,7 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import gestionarbitros.routing
+import gestiontorneo.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AutoTenis.settings')
 
@@ -19,7 +20,8 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            gestionarbitros.routing.websocket_urlpatterns
+            gestionarbitros.routing.websocket_urlpatterns +
+            gestiontorneo.routing.websocket_urlpatterns
         )
     ),
 })
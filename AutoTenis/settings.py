@@ -166,9 +166,76 @@ LOGOUT_REDIRECT_URL = '/login/'
 # Django Channels Configuration
 ASGI_APPLICATION = 'AutoTenis.asgi.application'
 
-# Channel Layers (In-memory para desarrollo - no necesita Redis)
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Channel Layers
+# Un solo proceso: capa en memoria (no necesita Redis). Con varios procesos Daphne
+# los grupos deben compartirse: CANALES_HUB apunta al socket del hub local
+# (python manage.py hub_canales) y CANALES_REDIS a un servidor Redis (requiere channels_redis).
+# El marcador en vivo de cada partido pertenece a un solo proceso: el balanceador debe enviar
+# el WebSocket y las peticiones HTTP de un partido al mismo worker (los demás las rechazan)
+CANALES_HUB = os.environ.get('CANALES_HUB')
+# Permisos del socket del hub (octal); por defecto solo su usuario puede conectarse
+CANALES_HUB_MODO = int(os.environ.get('CANALES_HUB_MODO', '600'), 8)
+CANALES_REDIS = os.environ.get('CANALES_REDIS')
+
+if CANALES_HUB:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'gestionarbitros.capa_hub.CapaHub',
+            'CONFIG': {
+                'ruta': CANALES_HUB,
+                'modo': CANALES_HUB_MODO,
+                'capacity': 100,
+                'expiry': 60,
+                'group_expiry': 86400,
+            },
+        },
+    }
+elif CANALES_REDIS:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [CANALES_REDIS],
+                'capacity': 100,
+                'expiry': 60,
+                'group_expiry': 86400,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Importaciones masivas en segundo plano
+# Los archivos subidos se guardan en disco y un pool local de hilos los procesa por lotes
+IMPORTACIONES_DIR = os.path.join(BASE_DIR, 'media', 'importaciones')
+IMPORTACION_WORKERS = 2
+IMPORTACION_TAMANO_LOTE = 1000
+# Segundos sin avance tras los cuales un trabajo 'en_proceso' se considera detenido
+IMPORTACION_TIMEOUT_LATIDO = 120
+
+# Segundos que cada worker conserva la tabla de categorías antes de volver a leerla
+CATEGORIAS_VIGENCIA_CACHE = 30
+
+# Marcador en vivo: los puntos se aplican en memoria y se escriben en Resultado en segundo plano
+MARCADOR_INTERVALO_ESCRITURA = 1.0
+# Diario de puntos aún no escritos, para recuperar el marcador si el proceso se reinicia
+MARCADOR_DIARIO_DIR = os.path.join(BASE_DIR, 'media', 'marcadores')
+# Ventana (segundos) en que las actualizaciones de un mismo partido se agrupan en un solo cuadro
+MARCADOR_VENTANA_DIFUSION = 0.075
+# Comandos que acepta un lote de puntos enviado por el árbitro al recuperar la conexión
+MARCADOR_LOTE_MAXIMO = 500
+# Partidos distintos que pueden esperar en la cola de difusión; al llenarse se descarta el estado no final más antiguo
+DIFUSION_COLA_MAXIMA = 1000
+# Cuadros pendientes por espectador antes de pasar a enviarle solo el último estado
+ESPECTADOR_COLA_MAXIMA = 32
+# Latidos de los espectadores (segundos): cada cuánto se envían, atraso que activa
+# "solo último estado" y atraso que cierra la conexión
+ESPECTADOR_INTERVALO_LATIDO = 5
+ESPECTADOR_RETRASO_MAXIMO = 10
+ESPECTADOR_ESPERA_MAXIMA = 30
+# Segundos sin eventos tras los que los flujos Server-Sent Events envían un comentario de latido
+SSE_INTERVALO_LATIDO = 15
@@ -0,0 +1,410 @@
+"""
+Capa de canales para varios procesos Daphne a través de un hub local.
+
+``InMemoryChannelLayer`` solo reparte mensajes dentro de un proceso: con más
+de un worker, el ``group_send`` del árbitro no llega a los espectadores
+conectados a otro. ``HubCanales`` (``python manage.py hub_canales``) guarda
+las colas y los grupos de todos los procesos detrás de un socket Unix, y
+``CapaHub`` es la capa de canales con que los workers hablan con él. El
+socket se crea con los permisos ``modo`` (0600 por defecto: solo el usuario
+que corre el hub y los workers puede conectarse).
+
+Protocolo: cada trama es un largo de 4 bytes (big endian) seguido de un
+objeto JSON, así que los mensajes deben ser serializables en JSON. Las
+solicitudes llevan ``id`` y ``op`` y el hub responde con el mismo ``id``;
+``recibir`` queda pendiente hasta que llega un mensaje al canal.
+
+La semántica es la de la capa en memoria de Channels:
+
+- cada canal guarda a lo más ``capacity`` mensajes (o lo que indique
+  ``channel_capacity``): ``send`` a un canal lleno lanza ``ChannelFull`` y
+  ``group_send`` lo omite;
+- los mensajes sin leer expiran a los ``expiry`` segundos y su canal sale de
+  todos los grupos (el consumidor ya no existe);
+- la pertenencia a un grupo expira a los ``group_expiry`` segundos si no se
+  renueva, y de inmediato cuando se desconecta el proceso dueño del canal.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+import uuid
+from collections import deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+_LARGO = struct.Struct('>I')
+
+
+async def leer_trama(lector):
+    """
+    Lee una trama del socket.
+
+    Returns:
+        dict: Objeto recibido, o None si la conexión se cerró
+    """
+    try:
+        cabecera = await lector.readexactly(_LARGO.size)
+        datos = await lector.readexactly(_LARGO.unpack(cabecera)[0])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return json.loads(datos)
+
+
+def escribir_trama(escritor, objeto):
+    """Escribe una trama en el socket (sin esperar a que se vacíe el búfer)."""
+    datos = json.dumps(objeto, separators=(',', ':')).encode()
+    escritor.write(_LARGO.pack(len(datos)) + datos)
+
+
+class HubCanales:
+    """
+    Colas y grupos de canales compartidos por los workers.
+
+    Attributes:
+        ruta (str): Ruta del socket Unix donde escucha el hub
+        modo (int): Permisos del socket
+        group_expiry (int): Segundos tras los que expira la pertenencia a un grupo
+        limites (BaseChannelLayer): Expiración y capacidad por canal, con las reglas de Channels
+        colas (dict): Mensajes sin leer de cada canal, como (expira, mensaje)
+        esperas (dict): Solicitudes ``recibir`` pendientes de cada canal, como (escritor, id)
+        grupos (dict): Canales de cada grupo con su momento de ingreso
+        procesos (dict): Marca de los canales de cada conexión de worker
+        estadisticas (dict): Mensajes entregados, encolados y descartados por capacidad o expiración
+    """
+
+    def __init__(self, ruta, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None, modo=0o600,
+                 **kwargs):
+        self.ruta = ruta
+        self.modo = modo
+        self.group_expiry = group_expiry
+        self.limites = BaseChannelLayer(expiry=expiry, capacity=capacity)
+        self.limites.channel_capacity = self.limites.compile_capacities(channel_capacity or {})
+        self.colas = {}
+        self.esperas = {}
+        self.grupos = {}
+        self.procesos = {}
+        self.estadisticas = {'entregados': 0, 'encolados': 0, 'llenos': 0, 'expirados': 0}
+
+    async def servir(self):
+        """Atiende a los workers hasta que se cancele la tarea."""
+        if os.path.exists(self.ruta):
+            os.unlink(self.ruta)
+        # La máscara evita que el socket quede abierto a otros usuarios antes del chmod
+        mascara = os.umask(0o777 & ~self.modo)
+        try:
+            servidor = await asyncio.start_unix_server(self._atender, path=self.ruta)
+        finally:
+            os.umask(mascara)
+        os.chmod(self.ruta, self.modo)
+        limpieza = asyncio.get_running_loop().create_task(self._limpiar_periodicamente())
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            limpieza.cancel()
+            if os.path.exists(self.ruta):
+                os.unlink(self.ruta)
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                solicitud = await leer_trama(lector)
+                if solicitud is None:
+                    break
+                respuesta = self._procesar(solicitud, escritor)
+                if respuesta is not None:
+                    respuesta['id'] = solicitud['id']
+                    escribir_trama(escritor, respuesta)
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._desconectar(escritor)
+            escritor.close()
+
+    def _procesar(self, solicitud, escritor):
+        op = solicitud['op']
+        if op == 'recibir':
+            return self._recibir(solicitud['canal'], escritor, solicitud['id'])
+        if op == 'cancelar':
+            esperas = self.esperas.get(solicitud['canal'])
+            if esperas:
+                try:
+                    esperas.remove((escritor, solicitud['recibir']))
+                except ValueError:
+                    pass
+            return None
+        if op == 'enviar':
+            if not self._encolar(solicitud['canal'], solicitud['mensaje']):
+                return {'error': 'lleno'}
+            return {}
+        if op == 'difundir':
+            self._difundir(solicitud['grupo'], solicitud['mensaje'])
+            return {}
+        if op == 'agregar':
+            self.grupos.setdefault(solicitud['grupo'], {})[solicitud['canal']] = time.time()
+            return {}
+        if op == 'quitar':
+            canales = self.grupos.get(solicitud['grupo'])
+            if canales:
+                canales.pop(solicitud['canal'], None)
+                if not canales:
+                    del self.grupos[solicitud['grupo']]
+            return {}
+        if op == 'hola':
+            self.procesos[escritor] = solicitud['marca']
+            return {}
+        if op == 'vaciar':
+            self.colas.clear()
+            self.grupos.clear()
+            return {}
+        if op == 'estadisticas':
+            return dict(
+                self.estadisticas,
+                canales=len(self.colas), grupos=len(self.grupos), procesos=len(self.procesos),
+            )
+        return {'error': f'operación desconocida: {op}'}
+
+    def _recibir(self, canal, escritor, solicitud_id):
+        cola = self.colas.get(canal)
+        if cola:
+            _, mensaje = cola.popleft()
+            if not cola:
+                del self.colas[canal]
+            self.estadisticas['entregados'] += 1
+            return {'mensaje': mensaje}
+        self.esperas.setdefault(canal, deque()).append((escritor, solicitud_id))
+        return None
+
+    def _encolar(self, canal, mensaje):
+        """
+        Entrega un mensaje a quien espera en el canal o lo deja en su cola.
+
+        Returns:
+            bool: False si la cola del canal está llena
+        """
+        esperas = self.esperas.get(canal)
+        while esperas:
+            escritor, solicitud_id = esperas.popleft()
+            if not esperas:
+                del self.esperas[canal]
+            if escritor.is_closing():
+                continue
+            escribir_trama(escritor, {'id': solicitud_id, 'mensaje': mensaje})
+            self.estadisticas['entregados'] += 1
+            return True
+
+        cola = self.colas.setdefault(canal, deque())
+        if len(cola) >= self.limites.get_capacity(canal):
+            self.estadisticas['llenos'] += 1
+            return False
+        cola.append((time.time() + self.limites.expiry, mensaje))
+        self.estadisticas['encolados'] += 1
+        return True
+
+    def _difundir(self, grupo, mensaje):
+        canales = self.grupos.get(grupo)
+        if not canales:
+            return
+        vencimiento = time.time() - self.group_expiry
+        for canal, ingreso in list(canales.items()):
+            if ingreso < vencimiento:
+                del canales[canal]
+                continue
+            # Un canal lleno se omite, igual que en la capa en memoria de Channels
+            self._encolar(canal, mensaje)
+
+    def _quitar_de_grupos(self, canales_quitados):
+        for grupo, canales in list(self.grupos.items()):
+            for canal in canales_quitados:
+                canales.pop(canal, None)
+            if not canales:
+                del self.grupos[grupo]
+
+    def _desconectar(self, escritor):
+        """Olvida las esperas de una conexión y, si era un worker, sus canales."""
+        for canal, esperas in list(self.esperas.items()):
+            pendientes = deque(espera for espera in esperas if espera[0] is not escritor)
+            if pendientes:
+                self.esperas[canal] = pendientes
+            else:
+                del self.esperas[canal]
+
+        marca = self.procesos.pop(escritor, None)
+        if marca is not None:
+            # El proceso terminó: sus canales no volverán a leerse
+            propios = f'.{marca}!'
+            for canal in [canal for canal in self.colas if propios in canal]:
+                del self.colas[canal]
+            self._quitar_de_grupos([
+                canal for canales in self.grupos.values() for canal in canales if propios in canal
+            ])
+
+    async def _limpiar_periodicamente(self):
+        while True:
+            await asyncio.sleep(1)
+            ahora = time.time()
+            vencidos = []
+            for canal, cola in list(self.colas.items()):
+                while cola and cola[0][0] < ahora:
+                    cola.popleft()
+                    self.estadisticas['expirados'] += 1
+                    if not vencidos or vencidos[-1] != canal:
+                        vencidos.append(canal)
+                if not cola:
+                    del self.colas[canal]
+            if vencidos:
+                # Nadie lee esos canales: dejan de recibir mensajes de grupo
+                self._quitar_de_grupos(vencidos)
+
+
+class _Conexion:
+    """Conexión con el hub desde un bucle de eventos, con solicitudes multiplexadas por ``id``."""
+
+    def __init__(self, lector, escritor):
+        self.lector = lector
+        self.escritor = escritor
+        self.pendientes = {}
+        self.siguiente = 0
+        self.registrada = False
+        self.cerrada = False
+        self.tarea = asyncio.get_running_loop().create_task(self._leer())
+
+    async def _leer(self):
+        try:
+            while True:
+                respuesta = await leer_trama(self.lector)
+                if respuesta is None:
+                    break
+                futuro = self.pendientes.pop(respuesta['id'], None)
+                if futuro is not None and not futuro.done():
+                    futuro.set_result(respuesta)
+        finally:
+            self.cerrada = True
+            self.escritor.close()
+            for futuro in self.pendientes.values():
+                if not futuro.done():
+                    futuro.set_exception(ConnectionError("Se perdió la conexión con el hub de canales"))
+            self.pendientes.clear()
+
+    async def pedir(self, solicitud):
+        if self.cerrada:
+            raise ConnectionError("Se perdió la conexión con el hub de canales")
+        self.siguiente += 1
+        solicitud['id'] = self.siguiente
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendientes[solicitud['id']] = futuro
+        escribir_trama(self.escritor, solicitud)
+        try:
+            return await futuro
+        except asyncio.CancelledError:
+            self.pendientes.pop(solicitud['id'], None)
+            if solicitud['op'] == 'recibir' and not self.cerrada:
+                # El consumidor se fue: que el hub no le guarde mensajes
+                escribir_trama(self.escritor, {
+                    'id': 0, 'op': 'cancelar', 'canal': solicitud['canal'], 'recibir': solicitud['id'],
+                })
+            raise
+
+    def cerrar(self):
+        self.tarea.cancel()
+
+
+class CapaHub(BaseChannelLayer):
+    """
+    Capa de canales que reparte los mensajes entre procesos a través de ``HubCanales``.
+
+    Cada bucle de eventos usa su propia conexión con el hub. Los canales
+    propios del proceso llevan una marca única; solo la conexión que los lee
+    (la del bucle del servidor ASGI) se registra con ella, de modo que si el
+    proceso muere el hub los saca de todos los grupos.
+
+    Args:
+        ruta (str): Ruta del socket Unix del hub
+        expiry, group_expiry, capacity, channel_capacity: Igual que en las capas de
+            Channels; el hub aplica los valores con que se inició
+        modo (int): Permisos del socket; solo los usa el hub
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, ruta, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None, modo=0o600,
+                 **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.ruta = ruta
+        self.group_expiry = group_expiry
+        self.marca = uuid.uuid4().hex
+        self._conexiones = {}
+        self._candados = {}
+
+    async def _conexion(self):
+        bucle = asyncio.get_running_loop()
+        candado = self._candados.setdefault(bucle, asyncio.Lock())
+        async with candado:
+            conexion = self._conexiones.get(bucle)
+            if conexion is None or conexion.cerrada:
+                # async_to_sync fuera del servidor ASGI crea bucles de corta vida: olvidar los cerrados
+                for cerrado in [otro for otro in self._conexiones if otro.is_closed()]:
+                    del self._conexiones[cerrado]
+                    self._candados.pop(cerrado, None)
+                lector, escritor = await asyncio.open_unix_connection(self.ruta)
+                conexion = _Conexion(lector, escritor)
+                self._conexiones[bucle] = conexion
+            return conexion
+
+    async def _pedir(self, solicitud):
+        conexion = await self._conexion()
+        return await conexion.pedir(solicitud)
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        respuesta = await self._pedir({'op': 'enviar', 'canal': channel, 'mensaje': message})
+        if respuesta.get('error') == 'lleno':
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        conexion = await self._conexion()
+        if not conexion.registrada:
+            conexion.registrada = True
+            await conexion.pedir({'op': 'hola', 'marca': self.marca})
+        respuesta = await conexion.pedir({'op': 'recibir', 'canal': channel})
+        return respuesta['mensaje']
+
+    async def new_channel(self, prefix='specific'):
+        return f"{prefix.rstrip('.')}.{self.marca}!{uuid.uuid4().hex}"
+
+    async def flush(self):
+        await self._pedir({'op': 'vaciar'})
+
+    async def close(self):
+        conexion = self._conexiones.pop(asyncio.get_running_loop(), None)
+        if conexion is not None:
+            conexion.cerrar()
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._pedir({'op': 'agregar', 'grupo': group, 'canal': channel})
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        await self._pedir({'op': 'quitar', 'grupo': group, 'canal': channel})
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        await self._pedir({'op': 'difundir', 'grupo': group, 'mensaje': message})
+
+    async def estadisticas(self):
+        """Contadores del hub: mensajes entregados, encolados, descartados y tamaño."""
+        respuesta = await self._pedir({'op': 'estadisticas'})
+        respuesta.pop('id', None)
+        return respuesta
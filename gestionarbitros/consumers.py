@@ -1,120 +1,608 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from gestiontorneo.models import Partido
+from gestiontorneo.models import Partido, Torneo
+from .difusion import compactar, difundir, difusor
+from .salida import SalidaEspectador
+from .marcador import (
+    APLICADO, DUPLICADO, FUERA_DE_ORDEN, MarcadorEnOtroProceso, es_arbitro_asignado, firma_comando,
+    marcador_activo, marcador_para_lectura, obtener_marcador,
+)
+from .views import datos_partido, registrar_set, validar_puntos_set
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional: sin ella los cuadros van siempre en JSON
+    msgpack = None
+
+
+def estado_partido(partido_id, cargar_marcador=False):
+    """
+    Estado actual de un partido para los consumidores.
+
+    Args:
+        partido_id (int): ID del partido
+        cargar_marcador (bool): True para cargar el marcador en vivo si aún no
+            está en memoria (el árbitro necesita su secuencia vigente)
+
+    Returns:
+        dict: Estado del partido (formato de ``datos_partido``), o None si no existe
+    """
+    # Mientras se arbitra, el marcador en memoria va por delante de Resultado
+    marcador = marcador_para_lectura(partido_id)
+    if marcador is None and cargar_marcador:
+        try:
+            marcador = obtener_marcador(partido_id)
+        except MarcadorEnOtroProceso:
+            # Los comandos de esta conexión se rechazarán; el estado sale de Resultado
+            marcador = None
+    if marcador is not None:
+        return marcador.como_dict()
+
+    try:
+        partido = Partido.objects.select_related(
+            'resultado_detallado', 'jugador1', 'jugador2', 'ganador'
+        ).get(id=partido_id)
+    except Partido.DoesNotExist:
+        return None
+    return datos_partido(partido)
+
+
+# Partidos que puede seguir una sola conexión de pantalla
+MAX_PARTIDOS_PANTALLA = 64
+
+
+def estados_partidos(partido_ids=None, torneo_id=None):
+    """
+    Estado actual de varios partidos con una sola consulta.
+
+    Args:
+        partido_ids (list): IDs de los partidos, o None para usar ``torneo_id``
+        torneo_id (int): ID del torneo cuyos partidos no finalizados se cargan
+
+    Returns:
+        dict: ID de partido -> estado (formato de ``datos_partido``), a lo más
+            ``MAX_PARTIDOS_PANTALLA`` partidos, en el orden del bracket si es un torneo
+    """
+    partidos = Partido.objects.select_related('resultado_detallado', 'jugador1', 'jugador2', 'ganador')
+    if torneo_id is not None:
+        partidos = partidos.filter(torneo_id=torneo_id, finalizado=False).order_by(
+            'llave_torneo__ronda', 'llave_torneo__posicion'
+        )
+    else:
+        partidos = partidos.filter(id__in=partido_ids)
+
+    estados = {}
+    for partido in partidos[:MAX_PARTIDOS_PANTALLA]:
+        # Los partidos en juego se leen del marcador en memoria, que va por delante; los
+        # demás salen de la consulta (sin revisar diarios en disco ni cargar marcadores)
+        marcador = marcador_activo(partido.id)
+        estados[partido.id] = marcador.como_dict() if marcador is not None else datos_partido(partido)
+    return estados
+
 
 class PartidoConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.partido_id = self.scope['url_route']['kwargs']['partido_id']
         self.partido_group_name = f'partido_{self.partido_id}'
 
+        # ?formato=msgpack pide cuadros binarios MessagePack en lugar de JSON
+        parametros = parse_qs(self.scope.get('query_string', b'').decode())
+        self.usar_msgpack = msgpack is not None and parametros.get('formato') == ['msgpack']
+
         # Join partido group
         await self.channel_layer.group_add(
             self.partido_group_name,
             self.channel_name
         )
+        difusor.seguir(int(self.partido_id))
+
+        # Solo el árbitro asignado puede enviar comandos de puntaje por el socket
+        self.es_arbitro = await self.verificar_arbitro()
 
         await self.accept()
 
         # Enviar estado actual del partido al conectar
-        await self.send_partido_status()
+        mensaje = await self.send_partido_status()
+
+        # Los espectadores reciben los cuadros por una cola propia que no espera al cliente
+        self.salida = None
+        if not self.es_arbitro:
+            self.salida = SalidaEspectador(self.enviar, self.mensaje_estado, self.cerrar)
+            self.salida.registrar_estado(mensaje)
+            self.salida.iniciar()
 
     async def disconnect(self, close_code):
+        if getattr(self, 'salida', None) is not None:
+            self.salida.detener()
+
         # Leave partido group
         await self.channel_layer.group_discard(
             self.partido_group_name,
             self.channel_name
         )
+        difusor.dejar(int(self.partido_id))
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            if msgpack is None:
+                # Sin msgpack un cuadro binario no se puede leer: se ignora sin cortar la conexión
+                return
+            text_data_json = msgpack.unpackb(bytes_data)
+        else:
+            text_data_json = json.loads(text_data)
         message_type = text_data_json['type']
 
         if message_type == 'get_status':
-            await self.send_partido_status()
+            if self.salida is not None:
+                self.salida.pedir_estado()
+            else:
+                await self.send_partido_status()
+        elif message_type == 'pong':
+            if self.salida is not None:
+                self.salida.recibir_pong(text_data_json.get('n'))
+        elif message_type in ('point', 'undo', 'close_set'):
+            await self.procesar_comando(message_type, text_data_json)
+
+    async def procesar_comando(self, tipo, comando):
+        """
+        Aplica un comando de puntaje del árbitro y responde con un ack.
+
+        Los comandos llevan un número de secuencia ``seq`` consecutivo: el mismo
+        comando ya aplicado (reenvío tras reconectar) se confirma sin volver a
+        aplicarlo, y uno que se salta números o reutiliza el número de otro
+        comando (otra pestaña) se rechaza con estado FUERA_DE_ORDEN junto con la
+        secuencia vigente para que el cliente lo renumere.
+
+        Args:
+            tipo (str): 'point', 'undo' o 'close_set'
+            comando (dict): Mensaje con 'seq', 'cliente' (pestaña que lo numeró)
+                y, según el tipo, 'jugador'
+        """
+        secuencia = comando.get('seq')
+        # La asignación se comprueba en cada comando: el partido pudo reasignarse tras conectar
+        if not await self.verificar_arbitro():
+            await self.enviar_rechazo(secuencia, 'Solo el árbitro asignado puede marcar puntos')
+            return
+        if not isinstance(secuencia, int) or secuencia < 1:
+            await self.enviar_rechazo(secuencia, 'Secuencia inválida')
+            return
+
+        marcador = marcador_activo(int(self.partido_id))
+        if marcador is None:
+            try:
+                marcador = await database_sync_to_async(obtener_marcador)(int(self.partido_id))
+            except MarcadorEnOtroProceso as e:
+                await self.enviar_rechazo(secuencia, str(e))
+                return
+        if marcador is None:
+            await self.enviar_rechazo(secuencia, 'Partido no encontrado')
+            return
+
+        # La firma se toma del comando tal como llegó, antes de resolver el jugador de deshacer
+        firma = firma_comando(tipo, comando.get('jugador'), comando.get('cliente'))
+        estado = marcador.comprobar_secuencia(secuencia, firma)
+        if estado == DUPLICADO:
+            await self.enviar_ack(secuencia, DUPLICADO, compactar(marcador.como_dict()))
+            return
+        if estado != APLICADO:
+            await self.enviar_fuera_de_orden(secuencia, marcador)
+            return
+        if marcador.finalizado:
+            await self.enviar_rechazo(secuencia, 'El partido ya está finalizado', marcador.secuencia)
+            return
+
+        if tipo == 'close_set':
+            await self.cerrar_set(marcador, secuencia, firma)
+            return
+
+        jugador = comando.get('jugador')
+        if tipo == 'point':
+            if jugador not in (1, 2):
+                await self.enviar_rechazo(secuencia, 'Jugador inválido', marcador.secuencia)
+                return
+            delta = 1
+        else:
+            # Deshacer sin jugador quita el último punto marcado en el set
+            if jugador not in (1, 2):
+                jugador = marcador.ultimo_anotador()
+            delta = -1 if jugador else 0
+
+        estado, data = await self.ejecutar(marcador, secuencia, jugador, delta, firma)
+        if estado == FUERA_DE_ORDEN:
+            # Otro comando tomó este número mientras tanto
+            await self.enviar_fuera_de_orden(secuencia, marcador)
+            return
+        await self.enviar_ack(secuencia, estado, compactar(data))
+        if estado == APLICADO:
+            difundir(int(self.partido_id), data)
+
+    @database_sync_to_async
+    def ejecutar(self, marcador, secuencia, jugador=None, delta=0, firma=None):
+        """
+        Aplica el comando en un hilo: ``ejecutar`` escribe el diario en disco con
+        el lock del marcador tomado y no debe frenar el bucle de los espectadores.
+
+        Returns:
+            tuple: (APLICADO, DUPLICADO o FUERA_DE_ORDEN, estado del marcador)
+        """
+        estado = marcador.ejecutar(secuencia, jugador, delta, firma)
+        return estado, marcador.como_dict()
+
+    async def cerrar_set(self, marcador, secuencia, firma=None):
+        """Guarda el set en juego con los puntos del marcador en memoria."""
+        data = marcador.como_dict()
+        set_numero = data['set_actual']
+        puntos_j1 = data['jugador1']['puntos']
+        puntos_j2 = data['jugador2']['puntos']
+
+        # Un set que no puede cerrarse no consume la secuencia
+        error_validacion = validar_puntos_set(puntos_j1, puntos_j2)
+        if error_validacion:
+            await self.enviar_rechazo(secuencia, error_validacion, marcador.secuencia)
+            return
+
+        # Se consume la secuencia antes de guardar para que un reenvío no cierre dos sets
+        estado, _ = await self.ejecutar(marcador, secuencia, firma=firma)
+        if estado == DUPLICADO:
+            await self.enviar_ack(secuencia, DUPLICADO, compactar(marcador.como_dict()))
+            return
+        if estado != APLICADO:
+            # Otro comando tomó este número mientras tanto
+            await self.enviar_fuera_de_orden(secuencia, marcador)
+            return
+        try:
+            respuesta = await self.registrar_set(set_numero, puntos_j1, puntos_j2)
+        except Exception as e:
+            # La secuencia ya está consumida: un reenvío sería duplicado, así que el
+            # cliente debe volver a cerrar el set con un número nuevo
+            print(f"❌ Error guardando el set {set_numero} del partido {self.partido_id}: {e}")
+            await self.enviar_rechazo(secuencia, f'Error al guardar el set: {e}', marcador.secuencia)
+            return
+        if not respuesta['success']:
+            await self.enviar_rechazo(secuencia, respuesta['message'], marcador.secuencia)
+            return
+
+        # registrar_set ya encoló el nuevo estado para el grupo
+        data = await self.get_partido_data()
+        await self.enviar({
+            'type': 'ack',
+            'seq': secuencia,
+            'estado': APLICADO,
+            'resultado': respuesta,
+            'data': compactar(data) if data else None,
+        })
+
+    async def enviar_ack(self, secuencia, estado, data):
+        await self.enviar({
+            'type': 'ack',
+            'seq': secuencia,
+            'estado': estado,
+            'data': data,
+        })
+
+    async def enviar_rechazo(self, secuencia, mensaje, esperada=None, estado=None):
+        cuadro = {
+            'type': 'error',
+            'seq': secuencia,
+            'message': mensaje,
+            'secuencia': esperada,
+        }
+        if estado:
+            cuadro['estado'] = estado
+        await self.enviar(cuadro)
+
+    async def enviar_fuera_de_orden(self, secuencia, marcador):
+        """Rechaza un comando no aplicado para que el cliente lo renumere desde la secuencia vigente."""
+        await self.enviar_rechazo(secuencia, 'Comando fuera de orden', marcador.secuencia, FUERA_DE_ORDEN)
+
+    async def enviar(self, mensaje):
+        """Envía un cuadro al cliente en JSON o, si lo pidió, en MessagePack"""
+        if self.usar_msgpack:
+            await self.send(bytes_data=msgpack.packb(mensaje))
+        else:
+            await self.send(text_data=json.dumps(mensaje))
+
+    async def cerrar(self, codigo):
+        await self.close(code=codigo)
 
     # Receive message from partido group
     async def partido_update(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'partido_update',
-            'data': event['data']
-        }))
+        difusor.observar(event['partido_id'], event)
+        # Solo los campos que cambiaron desde la versión 'base'
+        cuadro = {
+            'type': 'partido_delta',
+            'v': event['v'],
+            'base': event['base'],
+            'cambios': event['cambios'],
+        }
+        if self.salida is not None:
+            self.salida.encolar(cuadro)
+        else:
+            await self.enviar(cuadro)
 
     async def send_partido_status(self):
-        """Envía el estado actual del partido"""
-        partido_data = await self.get_partido_data()
-        await self.send(text_data=json.dumps({
+        """
+        Envía el estado completo del partido con su versión.
+
+        Returns:
+            dict: Mensaje ``partido_status`` enviado
+        """
+        mensaje = await self.mensaje_estado()
+        await self.enviar(mensaje)
+        return mensaje
+
+    async def mensaje_estado(self):
+        """
+        Mensaje ``partido_status`` con el estado completo del partido y su versión.
+
+        Se usa el último cuadro difundido para que los cuadros siguientes
+        apliquen exactamente sobre esa versión. El estado sale de la memoria del
+        difusor: ante una ráfaga de conexiones solo la primera consulta la base
+        de datos.
+        """
+        partido_data = None
+        if self.es_arbitro:
+            partido_data = await self.get_partido_data()
+        version, estado = await difusor.estado_para_conexion(int(self.partido_id), self.get_partido_data)
+
+        mensaje = {
             'type': 'partido_status',
-            'data': partido_data
-        }))
+            'v': version,
+            'data': estado,
+        }
+        if self.es_arbitro and partido_data is not None:
+            # El árbitro numera sus comandos desde la secuencia vigente del marcador
+            mensaje['seq'] = partido_data['secuencia']
+        return mensaje
+
+    @database_sync_to_async
+    def verificar_arbitro(self):
+        """Indica si el usuario de la conexión es el árbitro asignado al partido"""
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            return False
+        return es_arbitro_asignado(int(self.partido_id), user.id)
+
+    @database_sync_to_async
+    def registrar_set(self, set_numero, puntos_j1, puntos_j2):
+        """Guarda el set con las mismas validaciones que la vista guardar_set"""
+        partido = Partido.objects.select_related('llave_torneo', 'jugador1', 'jugador2').get(id=self.partido_id)
+        return registrar_set(partido, set_numero, puntos_j1, puntos_j2)
 
     @database_sync_to_async
     def get_partido_data(self):
         """Obtiene los datos actuales del partido"""
-        try:
-            partido = Partido.objects.select_related('resultado_detallado', 'jugador1', 'jugador2').get(id=self.partido_id)
-            
-            # Obtener puntos actuales y sets
-            puntos_j1, puntos_j2 = 0, 0
-            sets_j1, sets_j2 = 0, 0
-            set_actual = 1
-            
-            if hasattr(partido, 'resultado_detallado'):
-                resultado = partido.resultado_detallado
-                sets_j1 = resultado.sets_ganados_jugador1
-                sets_j2 = resultado.sets_ganados_jugador2
-                
-                # Buscar el set actual en progreso
-                for i in range(1, 8):  # Máximo 7 sets
-                    puntos_set_j1 = getattr(resultado, f'set{i}_jugador1', 0)
-                    puntos_set_j2 = getattr(resultado, f'set{i}_jugador2', 0)
-                    
-                    # Si el set no tiene ganador, es el set actual
-                    if not self.tiene_ganador_set(puntos_set_j1, puntos_set_j2):
-                        puntos_j1 = puntos_set_j1
-                        puntos_j2 = puntos_set_j2
-                        set_actual = i
-                        break
-                    elif i > sets_j1 + sets_j2:  # Siguiente set después de los completados
-                        set_actual = i
-                        break
-
-            return {
-                'partido_id': partido.id,
-                'jugador1': {
-                    'nombre': f"{partido.jugador1.nombre} {partido.jugador1.apellido}" if partido.jugador1 else "BYE",
-                    'puntos': puntos_j1,
-                    'sets': sets_j1
-                },
-                'jugador2': {
-                    'nombre': f"{partido.jugador2.nombre} {partido.jugador2.apellido}" if partido.jugador2 else "BYE",
-                    'puntos': puntos_j2,
-                    'sets': sets_j2
-                },
-                'set_actual': set_actual,
-                'estado': partido.estado_partido,
-                'finalizado': partido.finalizado,
-                'ganador': f"{partido.ganador.nombre} {partido.ganador.apellido}" if partido.ganador else None
-            }
-        except Partido.DoesNotExist:
-            return None
-
-    def tiene_ganador_set(self, puntos_j1, puntos_j2):
-        """Verifica si un set tiene ganador según las reglas de tenis de mesa"""
-        if puntos_j1 == 0 and puntos_j2 == 0:
-            return False
-        
-        diferencia = abs(puntos_j1 - puntos_j2)
-        max_puntos = max(puntos_j1, puntos_j2)
-        
-        # Victoria normal (11 vs menos de 10)
-        if max_puntos == 11 and min(puntos_j1, puntos_j2) < 10:
-            return True
-        
-        # Victoria en deuce (ambos >= 10 y exactamente 2 de diferencia)
-        if puntos_j1 >= 10 and puntos_j2 >= 10 and diferencia == 2:
-            return True
-        
-        return False
+        return estado_partido(int(self.partido_id), cargar_marcador=self.es_arbitro)
+
+
+class ArbitroConsumer(AsyncWebsocketConsumer):
+    """Avisa al árbitro conectado cuando se le asigna, quita, envía a confirmación o cierra un partido"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or user.tipo_usuario != 'arbitro':
+            await self.close()
+            return
+
+        self.arbitro_group_name = f'arbitro_{user.id}'
+        await self.channel_layer.group_add(
+            self.arbitro_group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'arbitro_group_name'):
+            await self.channel_layer.group_discard(
+                self.arbitro_group_name,
+                self.channel_name
+            )
+
+    # Receive message from arbitro group
+    async def arbitro_partido(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'partido_arbitro',
+            'data': event['data'],
+        }))
+
+
+class PantallaConsumer(AsyncWebsocketConsumer):
+    """
+    Marcadores de muchos partidos por una sola conexión, para las pantallas de la sede.
+
+    ``ws/pantalla/torneo/<id>/`` sigue los partidos no finalizados del torneo,
+    incluidos los que se crean después; ``ws/pantalla/?partidos=1,2,3`` sigue
+    una lista fija. Cada conexión guarda solo los IDs que sigue (a lo más
+    ``MAX_PARTIDOS_PANTALLA``): el estado de cada marcador lo mantiene el
+    cliente aplicando los cuadros de cambios, igual que en ``PartidoConsumer``.
+
+    Todo lo que se envía tras conectar pasa por una ``SalidaEspectador``: si la
+    pantalla se atrasa, recibe un único ``pantalla_status`` que reemplaza la
+    lista completa de partidos.
+    """
+
+    async def connect(self):
+        self.torneo_id = self.scope['url_route']['kwargs'].get('torneo_id')
+        self.partido_ids = None
+        self.partidos_suscritos = set()
+        self.salida = None
+
+        if self.torneo_id is not None:
+            self.torneo_id = int(self.torneo_id)
+            # Unirse antes de leer los partidos para no perder los que se creen entre ambos pasos
+            await self.channel_layer.group_add(f'torneo_{self.torneo_id}', self.channel_name)
+            if not await self.existe_torneo():
+                await self.close()
+                return
+            partido_ids = None
+        else:
+            parametros = parse_qs(self.scope.get('query_string', b'').decode())
+            try:
+                partido_ids = list(dict.fromkeys(
+                    int(valor) for valor in parametros.get('partidos', [''])[0].split(',') if valor
+                ))
+            except ValueError:
+                partido_ids = []
+            if not partido_ids or len(partido_ids) > MAX_PARTIDOS_PANTALLA:
+                await self.close()
+                return
+            self.partido_ids = partido_ids
+
+        estados = await self.cargar_estados(partido_ids)
+        for partido_id in estados:
+            await self.suscribir(partido_id)
+
+        await self.accept()
+        mensaje = self.mensaje_pantalla(estados)
+        await self.enviar(mensaje)
+
+        self.salida = SalidaEspectador(self.enviar, self.mensaje_estado, self.cerrar)
+        self.salida.registrar_estado(mensaje)
+        self.salida.iniciar()
+
+    async def disconnect(self, close_code):
+        if self.salida is not None:
+            self.salida.detener()
+        if self.torneo_id is not None:
+            await self.channel_layer.group_discard(f'torneo_{self.torneo_id}', self.channel_name)
+        for partido_id in list(self.partidos_suscritos):
+            await self.desuscribir(partido_id)
+
+    async def suscribir(self, partido_id):
+        if partido_id not in self.partidos_suscritos:
+            self.partidos_suscritos.add(partido_id)
+            await self.channel_layer.group_add(f'partido_{partido_id}', self.channel_name)
+            difusor.seguir(partido_id)
+
+    async def desuscribir(self, partido_id):
+        if partido_id in self.partidos_suscritos:
+            self.partidos_suscritos.discard(partido_id)
+            await self.channel_layer.group_discard(f'partido_{partido_id}', self.channel_name)
+            difusor.dejar(partido_id)
+
+    async def cargar_estados(self, partido_ids=None):
+        """
+        Estado versionado de los partidos, consultando la base de datos una sola vez.
+
+        Los partidos que el difusor ya tiene en memoria no se consultan; los
+        demás se cargan juntos y quedan guardados en el difusor, de modo que
+        los cuadros siguientes apliquen sobre la versión enviada.
+
+        Args:
+            partido_ids (list): IDs de los partidos, o None para los del torneo
+
+        Returns:
+            dict: ID de partido -> (versión, estado compacto)
+        """
+        estados = {}
+        if partido_ids is not None:
+            for partido_id in partido_ids:
+                version, estado = difusor.ultimo_estado(partido_id)
+                if estado is not None:
+                    estados[partido_id] = (version, estado)
+            faltantes = [partido_id for partido_id in partido_ids if partido_id not in estados]
+            if not faltantes:
+                return estados
+            datos = await database_sync_to_async(estados_partidos)(partido_ids=faltantes)
+            # Conservar el orden pedido por la pantalla
+            for partido_id in faltantes:
+                if partido_id in datos:
+                    estados[partido_id] = difusor.sembrar(partido_id, datos[partido_id])
+            return {partido_id: estados[partido_id] for partido_id in partido_ids if partido_id in estados}
+
+        datos = await database_sync_to_async(estados_partidos)(torneo_id=self.torneo_id)
+        for partido_id, data in datos.items():
+            estados[partido_id] = difusor.sembrar(partido_id, data)
+        return estados
+
+    # Receive message from WebSocket
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            # La pantalla solo envía JSON: los cuadros binarios se ignoran
+            return
+        text_data_json = json.loads(text_data)
+        message_type = text_data_json.get('type')
+
+        if message_type == 'get_status':
+            self.salida.pedir_estado()
+        elif message_type == 'pong':
+            self.salida.recibir_pong(text_data_json.get('n'))
+        elif message_type == 'get_partido':
+            # El cliente perdió la versión de un marcador: se le envía completo
+            partido_id = text_data_json.get('partido_id')
+            if partido_id in self.partidos_suscritos:
+                await self.encolar_partido_status(partido_id)
+
+    # Receive message from torneo group
+    async def torneo_partido(self, event):
+        data = event['data']
+        partido_id = data['partido_id']
+        if data['finalizado']:
+            if partido_id in self.partidos_suscritos:
+                await self.desuscribir(partido_id)
+                self.salida.encolar({'type': 'partido_fin', 'partido_id': partido_id})
+        elif partido_id not in self.partidos_suscritos and len(self.partidos_suscritos) < MAX_PARTIDOS_PANTALLA:
+            # Partido nuevo del torneo: se agrega a la pantalla con su estado actual
+            await self.suscribir(partido_id)
+            await self.encolar_partido_status(partido_id)
+
+    async def torneo_avance(self, event):
+        # Los avances en el bracket no cambian ningún marcador
+        pass
+
+    # Receive message from partido groups
+    async def partido_update(self, event):
+        difusor.observar(event['partido_id'], event)
+        self.salida.encolar({
+            'type': 'partido_delta',
+            'partido_id': event['partido_id'],
+            'v': event['v'],
+            'base': event['base'],
+            'cambios': event['cambios'],
+        })
+
+    def mensaje_pantalla(self, estados):
+        """Mensaje ``pantalla_status`` con el estado de todos los partidos de la pantalla"""
+        return {
+            'type': 'pantalla_status',
+            'partidos': [
+                {'partido_id': partido_id, 'v': version, 'data': estado}
+                for partido_id, (version, estado) in estados.items()
+            ],
+        }
+
+    async def mensaje_estado(self):
+        """Estado vigente de la pantalla, para la ``SalidaEspectador`` de la conexión"""
+        estados = await self.cargar_estados(self.partido_ids)
+        if self.torneo_id is not None:
+            # La lista del torneo reemplaza a la anterior: seguir exactamente sus partidos
+            for partido_id in self.partidos_suscritos - set(estados):
+                await self.desuscribir(partido_id)
+            for partido_id in estados:
+                await self.suscribir(partido_id)
+        return self.mensaje_pantalla(estados)
+
+    async def encolar_partido_status(self, partido_id):
+        """Encola el estado completo de un partido de la pantalla"""
+        version, estado = await difusor.estado_para_conexion(
+            partido_id, lambda: database_sync_to_async(estado_partido)(partido_id)
+        )
+        self.salida.encolar({
+            'type': 'partido_status',
+            'partido_id': partido_id,
+            'v': version,
+            'data': estado,
+        })
+
+    async def enviar(self, mensaje):
+        await self.send(text_data=json.dumps(mensaje))
+
+    async def cerrar(self, codigo):
+        await self.close(code=codigo)
+
+    @database_sync_to_async
+    def existe_torneo(self):
+        return Torneo.objects.filter(id=self.torneo_id).exists()
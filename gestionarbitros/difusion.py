@@ -0,0 +1,543 @@
+"""
+Difusión agrupada de los puntajes en vivo a los espectadores.
+
+Cada punto genera una actualización del partido, pero no hace falta enviarle
+a cada espectador todos los cuadros de una ráfaga de puntos. ``publicar``
+envía de inmediato la primera actualización y, durante la ventana
+``MARCADOR_VENTANA_DIFUSION`` siguiente, solo conserva la más reciente de
+cada partido; al cerrar la ventana se envía ese último estado. Las
+actualizaciones finales (set guardado, partido cerrado) se envían siempre y
+de inmediato, descartando el estado pendiente que reemplazan.
+
+El planificador vive en el hilo ``difusion-despachador``, con bucle de
+eventos propio. Las vistas síncronas y los consumidores publican mediante
+``difundir``, que solo deja el estado en una cola acotada y vuelve de
+inmediato: el toque del árbitro no espera a la capa de canales. La cola
+guarda un estado por partido; si el partido ya tenía uno sin despachar, el
+nuevo lo reemplaza, y si la cola se llena se descarta el estado no final más
+antiguo (``metricas_despacho`` cuenta ambos casos). Los estados finales nunca
+se descartan: si la cola solo tiene finales, uno nuevo la excede.
+
+Protocolo versionado: el estado se aplana con ``compactar`` y cada cuadro
+lleva solo los campos que cambiaron desde el cuadro anterior (``cambios``),
+la versión nueva (``v``) y la versión sobre la que se aplica (``base``). Un
+cliente cuya versión no coincide con ``base`` pide el estado completo
+(``get_status``). ``base`` nulo indica que ``cambios`` trae el estado completo.
+
+El último estado enviado de cada partido es también la caché de estados para
+las conexiones nuevas: quien difunde la mantiene al día y, si falta, la
+primera conexión la carga una sola vez mientras las demás esperan esa misma
+carga (``estado_para_conexion``). Al finalizar el partido se libera.
+
+Con varios procesos (capa de canales compartida) cada proceso guarda el
+último cuadro que otro proceso envió al grupo (``observar``); los propios,
+marcados con ``origen``, ya quedaron guardados al enviarlos y el hilo
+despachador puede ir por una versión posterior. Solo ve los cuadros ajenos
+mientras tenga conexiones siguiendo el partido:
+cuando se va la última, el estado guardado se libera (``dejar``) porque
+podría quedar atrasado.
+
+El hilo despachador y el bucle de los consumidores leen y escriben esos
+estados a la vez: ``DifusorPartidos.lock`` los protege.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+
+
+CAMPOS_COMPACTOS = ('n1', 'n2', 'p1', 'p2', 's1', 's2', 'set', 'estado', 'fin', 'ganador', 'seq')
+
+
+def compactar(data):
+    """
+    Aplana el estado de un partido con claves cortas para el protocolo de cuadros.
+
+    Args:
+        data (dict): Estado con el formato de ``enviar_actualizacion_partido``
+
+    Returns:
+        dict: Estado plano (n1/n2 nombres, p1/p2 puntos, s1/s2 sets, set, estado,
+            fin, ganador y seq, la secuencia del marcador si se conoce)
+    """
+    return {
+        'n1': data['jugador1']['nombre'],
+        'n2': data['jugador2']['nombre'],
+        'p1': data['jugador1']['puntos'],
+        'p2': data['jugador2']['puntos'],
+        's1': data['jugador1']['sets'],
+        's2': data['jugador2']['sets'],
+        'set': data['set_actual'],
+        'estado': data['estado'],
+        'fin': data['finalizado'],
+        'ganador': data['ganador'],
+        'seq': data.get('secuencia'),
+    }
+
+
+def diferencias(anterior, nuevo):
+    """
+    Campos del estado compacto que cambiaron.
+
+    Args:
+        anterior (dict): Estado compacto enviado antes (None si no hay)
+        nuevo (dict): Estado compacto actual
+
+    Returns:
+        dict: Campos de ``nuevo`` distintos de ``anterior`` (todos si no hay anterior)
+    """
+    if anterior is None:
+        return dict(nuevo)
+    return {campo: valor for campo, valor in nuevo.items() if anterior.get(campo) != valor}
+
+
+class EstadisticasDifusion:
+    """
+    Contadores de difusión de un partido.
+
+    Attributes:
+        recibidas (int): Actualizaciones publicadas
+        enviadas (int): Cuadros enviados al grupo
+        agrupadas (int): Actualizaciones reemplazadas por una más reciente sin enviarse
+    """
+
+    def __init__(self):
+        self.recibidas = 0
+        self.enviadas = 0
+        self.agrupadas = 0
+
+    def como_dict(self):
+        return {'recibidas': self.recibidas, 'enviadas': self.enviadas, 'agrupadas': self.agrupadas}
+
+
+class DifusorPartidos:
+    """
+    Envía al grupo ``partido_<id>`` a lo más un cuadro por ventana y partido.
+
+    Attributes:
+        ventana (float): Segundos mínimos entre dos cuadros no finales del mismo partido
+        pendientes (dict): Último estado sin enviar de cada partido
+        temporizadores (dict): Tarea que cierra la ventana abierta de cada partido
+        ultimo_envio (dict): Momento (monotónico) del último cuadro enviado de cada partido
+        estadisticas (dict): ``EstadisticasDifusion`` de cada partido
+        bucle (AbstractEventLoop): Bucle del proceso ASGI donde corren los temporizadores
+        versiones (dict): Versión del último cuadro enviado de cada partido
+        enviados (dict): Estado compacto del último cuadro enviado de cada partido
+        cargas (dict): Carga en curso (``asyncio.Future``) del estado de cada partido
+        suscriptores (dict): Conexiones de este proceso que siguen cada partido
+        bucle_consumidores (AbstractEventLoop): Bucle donde corren los consumidores del proceso
+        lock (Lock): Protege versiones, enviados, último envío y estadísticas, que usan
+            tanto el hilo despachador como el bucle de los consumidores
+        marca (str): Identifica los cuadros enviados por este proceso (``origen``)
+    """
+
+    def __init__(self, ventana=None):
+        self.ventana = ventana
+        self.pendientes = {}
+        self.temporizadores = {}
+        self.ultimo_envio = {}
+        self.estadisticas = {}
+        self.bucle = None
+        self.versiones = {}
+        self.enviados = {}
+        self.cargas = {}
+        self.suscriptores = {}
+        self.bucle_consumidores = None
+        self.lock = threading.Lock()
+        self.marca = uuid.uuid4().hex
+
+    def _ventana(self):
+        if self.ventana is None:
+            return getattr(settings, 'MARCADOR_VENTANA_DIFUSION', 0.075)
+        return self.ventana
+
+    async def publicar(self, partido_id, data, final=False):
+        """
+        Publica el estado de un partido.
+
+        Args:
+            partido_id (int): ID del partido
+            data (dict): Estado completo del partido
+            final (bool): True para cuadros que no pueden agruparse (cierre de set o partido)
+        """
+        with self.lock:
+            estadisticas = self.estadisticas.setdefault(partido_id, EstadisticasDifusion())
+            estadisticas.recibidas += 1
+        bucle = asyncio.get_running_loop()
+        if self.bucle is None:
+            self.bucle = bucle
+
+        if partido_id in self.pendientes:
+            # El estado pendiente queda obsoleto: solo se envía el más reciente
+            estadisticas.agrupadas += 1
+            del self.pendientes[partido_id]
+
+        # Fuera del bucle principal (hilo con bucle propio) no hay temporizador que sobreviva
+        if final or bucle is not self.bucle:
+            await self._enviar(partido_id, data)
+            if final:
+                print(f"📡 Partido {partido_id}: {estadisticas.recibidas} actualizaciones, "
+                      f"{estadisticas.enviadas} enviadas, {estadisticas.agrupadas} agrupadas")
+            return
+
+        if partido_id in self.temporizadores:
+            self.pendientes[partido_id] = data
+            return
+
+        with self.lock:
+            ultimo_envio = self.ultimo_envio.get(partido_id, 0)
+        espera = self._ventana() - (time.monotonic() - ultimo_envio)
+        if espera <= 0:
+            await self._enviar(partido_id, data)
+            espera = self._ventana()
+        else:
+            self.pendientes[partido_id] = data
+        self.temporizadores[partido_id] = bucle.create_task(self._cerrar_ventana(partido_id, espera))
+
+    async def _cerrar_ventana(self, partido_id, espera):
+        await asyncio.sleep(espera)
+        data = self.pendientes.pop(partido_id, None)
+        if data is None:
+            del self.temporizadores[partido_id]
+            return
+        # La ventana sigue abierta mientras se envía: lo que llegue queda pendiente para la siguiente
+        await self._enviar(partido_id, data)
+        # Abrir otra ventana por si la ráfaga continúa
+        self.temporizadores[partido_id] = asyncio.get_running_loop().create_task(
+            self._cerrar_ventana(partido_id, self._ventana())
+        )
+
+    def ultimo_estado(self, partido_id):
+        """
+        Versión y estado compacto del último cuadro enviado de un partido.
+
+        Los espectadores que se conectan reciben este estado para que los
+        cuadros siguientes apliquen exactamente sobre su versión.
+
+        Returns:
+            tuple: (versión, estado compacto), o (None, None) si aún no se envió nada
+        """
+        with self.lock:
+            return self.versiones.get(partido_id), self.enviados.get(partido_id)
+
+    async def estado_para_conexion(self, partido_id, cargar):
+        """
+        Estado versionado para una conexión nueva, cargándolo una sola vez si falta.
+
+        Args:
+            partido_id (int): ID del partido
+            cargar (callable): Función asíncrona sin argumentos que devuelve el
+                estado del partido (formato de ``enviar_actualizacion_partido``) o None
+
+        Returns:
+            tuple: (versión, estado compacto), o (None, None) si el partido no existe
+        """
+        version, estado = self.ultimo_estado(partido_id)
+        if estado is not None:
+            return version, estado
+
+        futuro = self.cargas.get(partido_id)
+        if futuro is not None:
+            # Otra conexión ya está consultando la base de datos: esperar su resultado
+            await futuro
+            return self.ultimo_estado(partido_id)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self.cargas[partido_id] = futuro
+        try:
+            data = await cargar()
+            if data is not None:
+                self.sembrar(partido_id, data)
+        finally:
+            del self.cargas[partido_id]
+            futuro.set_result(None)
+        return self.ultimo_estado(partido_id)
+
+    def sembrar(self, partido_id, data):
+        """
+        Guarda el estado leído de la base de datos si el partido aún no tiene uno.
+
+        Un cuadro difundido mientras se leía es más reciente: no se reemplaza.
+
+        Args:
+            partido_id (int): ID del partido
+            data (dict): Estado del partido (formato de ``enviar_actualizacion_partido``)
+
+        Returns:
+            tuple: (versión, estado compacto) vigentes del partido
+        """
+        with self.lock:
+            if partido_id not in self.enviados:
+                self.versiones[partido_id] = int(time.time() * 1000)
+                self.enviados[partido_id] = compactar(data)
+            return self.versiones[partido_id], self.enviados[partido_id]
+
+    def seguir(self, partido_id):
+        """Registra una conexión de este proceso que se unió al grupo del partido."""
+        self.bucle_consumidores = asyncio.get_running_loop()
+        self.suscriptores[partido_id] = self.suscriptores.get(partido_id, 0) + 1
+
+    def dejar(self, partido_id):
+        """Registra una conexión que dejó el grupo del partido; con la última se libera su estado."""
+        restantes = self.suscriptores.get(partido_id, 0) - 1
+        if restantes > 0:
+            self.suscriptores[partido_id] = restantes
+            return
+        self.suscriptores.pop(partido_id, None)
+        # Sin conexiones en el grupo este proceso deja de ver los cuadros de otros procesos
+        self.olvidar(partido_id)
+
+    def observar(self, partido_id, event):
+        """
+        Adopta como último estado enviado un cuadro recibido del grupo del partido.
+
+        En el proceso que lo envió no cambia nada (su estado puede ir ya por
+        una versión posterior); en los demás mantiene al día el estado que se
+        entrega a las conexiones nuevas.
+
+        Args:
+            partido_id (int): ID del partido
+            event (dict): Mensaje ``partido_update`` del grupo
+        """
+        if event.get('origen') == self.marca:
+            return
+        compacto = compactar(event['data'])
+        if compacto['fin']:
+            self.olvidar(partido_id)
+            return
+        with self.lock:
+            self.versiones[partido_id] = event['v']
+            self.enviados[partido_id] = compacto
+
+    def olvidar(self, partido_id):
+        """Libera el estado guardado de un partido (se recarga en la próxima conexión)."""
+        with self.lock:
+            self.versiones.pop(partido_id, None)
+            self.enviados.pop(partido_id, None)
+            self.ultimo_envio.pop(partido_id, None)
+
+    async def _enviar(self, partido_id, data):
+        compacto = compactar(data)
+        with self.lock:
+            anterior = self.enviados.get(partido_id)
+            cambios = diferencias(anterior, compacto)
+            if not cambios:
+                return
+
+            base = self.versiones.get(partido_id) if anterior is not None else None
+            # La primera versión del proceso parte del reloj para no repetir versiones tras un reinicio
+            version = base + 1 if base is not None else int(time.time() * 1000)
+            self.versiones[partido_id] = version
+            self.enviados[partido_id] = compacto
+
+            self.ultimo_envio[partido_id] = time.monotonic()
+            self.estadisticas.setdefault(partido_id, EstadisticasDifusion()).enviadas += 1
+        try:
+            channel_layer = get_channel_layer()
+            envio = channel_layer.group_send(
+                f'partido_{partido_id}',
+                {
+                    'type': 'partido_update',
+                    'partido_id': partido_id,
+                    'data': data,
+                    'v': version,
+                    'base': base,
+                    'cambios': cambios,
+                    'origen': self.marca,
+                }
+            )
+            bucle = self.bucle_consumidores
+            if (isinstance(channel_layer, InMemoryChannelLayer) and bucle is not None
+                    and bucle is not asyncio.get_running_loop() and not bucle.is_closed()):
+                # Las colas de la capa en memoria no admiten otro hilo: enviar desde el bucle de los consumidores
+                envio = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(envio, bucle))
+            await envio
+        except Exception as e:
+            print(f"Error enviando actualización WebSocket: {e}")
+
+        if compacto['fin']:
+            # Partido terminado: no mantener su estado en memoria indefinidamente
+            self.olvidar(partido_id)
+
+
+difusor = DifusorPartidos()
+
+
+class DespachadorDifusion:
+    """
+    Cola acotada de estados por publicar, despachada por un hilo con bucle de eventos propio.
+
+    Attributes:
+        capacidad (int): Partidos distintos que puede haber en la cola
+        cola (OrderedDict): partido_id -> (estado, final, momento monotónico en que se encoló)
+        lock (Lock): Protege la cola y los contadores
+        bucle (AbstractEventLoop): Bucle del hilo despachador
+        hilo (Thread): Hilo despachador, iniciado con el primer estado encolado
+        despertar (asyncio.Event): Avisa al hilo que hay estados en la cola
+        en_curso (dict): Tarea que está publicando cada partido; su próximo estado espera en la cola
+        encolados (int): Estados recibidos por ``encolar``
+        despachados (int): Estados entregados al difusor
+        reemplazados (int): Estados reemplazados en la cola por uno más reciente del mismo partido
+        descartados (int): Estados descartados por cola llena
+        profundidad_maxima (int): Mayor cantidad de partidos que hubo en la cola
+        latencias (deque): Segundos entre encolar y terminar de publicar de los últimos estados
+    """
+
+    def __init__(self, capacidad=None):
+        self.capacidad = capacidad
+        self.cola = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.bucle = None
+        self.hilo = None
+        self.despertar = asyncio.Event()
+        self.en_curso = {}
+        self.encolados = 0
+        self.despachados = 0
+        self.reemplazados = 0
+        self.descartados = 0
+        self.profundidad_maxima = 0
+        self.latencias = collections.deque(maxlen=1000)
+
+    def _capacidad(self):
+        if self.capacidad is None:
+            return getattr(settings, 'DIFUSION_COLA_MAXIMA', 1000)
+        return self.capacidad
+
+    def encolar(self, partido_id, data, final=False):
+        """
+        Deja el estado de un partido en la cola sin esperar su envío.
+
+        Args:
+            partido_id (int): ID del partido
+            data (dict): Estado completo del partido
+            final (bool): True para cuadros que no pueden agruparse
+        """
+        with self.lock:
+            self.encolados += 1
+            anterior = self.cola.get(partido_id)
+            if anterior is not None:
+                # Solo interesa el estado más reciente; si el reemplazado era final, este también lo es
+                self.reemplazados += 1
+                self.cola[partido_id] = (data, final or anterior[1], anterior[2])
+                return
+
+            if len(self.cola) >= self._capacidad():
+                # Cola llena: se pierde el estado no final más antiguo (el siguiente punto lo corrige)
+                victima = next((pid for pid, entrada in self.cola.items() if not entrada[1]), None)
+                if victima is not None:
+                    del self.cola[victima]
+                    self.descartados += 1
+                elif not final:
+                    self.descartados += 1
+                    return
+                # Un cierre de set o de partido no se pierde nunca: si todo es final, la cola se excede
+
+            self.cola[partido_id] = (data, final, time.monotonic())
+            self.profundidad_maxima = max(self.profundidad_maxima, len(self.cola))
+            if self.hilo is None:
+                self._iniciar()
+        self.bucle.call_soon_threadsafe(self.despertar.set)
+
+    def _iniciar(self):
+        self.bucle = asyncio.new_event_loop()
+        self.hilo = threading.Thread(target=self._ejecutar, name='difusion-despachador', daemon=True)
+        self.hilo.start()
+
+    def _ejecutar(self):
+        asyncio.set_event_loop(self.bucle)
+        self.bucle.run_until_complete(self._despachar())
+
+    async def _despachar(self):
+        while True:
+            await self.despertar.wait()
+            self.despertar.clear()
+            # Los partidos se publican en paralelo, pero cada uno con un solo envío a la vez
+            with self.lock:
+                listos = [(pid, self.cola.pop(pid)) for pid in list(self.cola) if pid not in self.en_curso]
+                for partido_id, entrada in listos:
+                    self.en_curso[partido_id] = self.bucle.create_task(self._publicar(partido_id, *entrada))
+
+    async def _publicar(self, partido_id, data, final, encolado):
+        try:
+            await difusor.publicar(partido_id, data, final)
+        except Exception as e:
+            print(f"Error enviando actualización WebSocket: {e}")
+        with self.lock:
+            del self.en_curso[partido_id]
+            self.despachados += 1
+            self.latencias.append(time.monotonic() - encolado)
+            pendiente = partido_id in self.cola
+        if pendiente:
+            self.despertar.set()
+
+    def metricas(self):
+        """
+        Contadores de la cola y latencia de despacho.
+
+        Returns:
+            dict: Profundidad actual y máxima, estados encolados, despachados,
+                reemplazados y descartados, y latencia (ms) p50/p95/máxima de
+                los últimos estados despachados
+        """
+        with self.lock:
+            latencias = sorted(self.latencias)
+            metricas = {
+                'profundidad': len(self.cola),
+                'profundidad_maxima': self.profundidad_maxima,
+                'encolados': self.encolados,
+                'despachados': self.despachados,
+                'reemplazados': self.reemplazados,
+                'descartados': self.descartados,
+            }
+        for nombre, p in (('p50', 0.50), ('p95', 0.95)):
+            metricas[f'latencia_{nombre}_ms'] = (
+                latencias[min(int(len(latencias) * p), len(latencias) - 1)] * 1000 if latencias else None
+            )
+        metricas['latencia_maxima_ms'] = latencias[-1] * 1000 if latencias else None
+        return metricas
+
+
+despachador = DespachadorDifusion()
+
+
+def difundir(partido_id, data, final=False):
+    """
+    Encola el estado de un partido para difundirlo; vuelve sin esperar el envío.
+
+    Args:
+        partido_id (int): ID del partido
+        data (dict): Estado completo del partido
+        final (bool): True para cuadros que no pueden agruparse
+    """
+    despachador.encolar(partido_id, data, final)
+
+
+def metricas_despacho():
+    """Contadores de la cola de difusión del proceso (ver ``DespachadorDifusion.metricas``)."""
+    return despachador.metricas()
+
+
+def estadisticas_difusion(partido_id=None):
+    """
+    Contadores de difusión de un partido o de todos.
+
+    Args:
+        partido_id (int): ID del partido, o None para sumar todos
+
+    Returns:
+        dict: Actualizaciones recibidas, cuadros enviados y actualizaciones agrupadas
+    """
+    with difusor.lock:
+        if partido_id is not None:
+            return difusor.estadisticas.get(partido_id, EstadisticasDifusion()).como_dict()
+        total = EstadisticasDifusion()
+        for estadisticas in difusor.estadisticas.values():
+            total.recibidas += estadisticas.recibidas
+            total.enviadas += estadisticas.enviadas
+            total.agrupadas += estadisticas.agrupadas
+        return total.como_dict()
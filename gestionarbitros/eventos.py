@@ -0,0 +1,220 @@
+"""
+Registro punto a punto de los partidos arbitrados.
+
+El marcador en vivo acumula un evento por cada punto (o punto deshecho) y los
+inserta en ``EventoPunto`` por lotes, en la misma transacción en que escribe el
+puntaje y ``secuencia_puntos`` en ``Resultado``. La tabla solo recibe
+inserciones: deshacer agrega un evento con ``delta`` -1.
+
+Cuando el partido queda finalizado, ``compactar_partido`` empaqueta sus
+eventos en un único ``LineaTiempoPartido`` (10 bytes por evento) y los borra de
+``EventoPunto``, que así solo contiene los partidos en juego.
+"""
+
+import struct
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from gestiontorneo.models import EventoPunto, LineaTiempoPartido, Partido
+
+VERSION_PAQUETE = 1
+
+# Cabecera: versión y momento del primer evento (microsegundos desde 1970, UTC)
+_CABECERA = struct.Struct('<Bq')
+# Evento: secuencia, milisegundos desde el primer evento, set, jugador con el signo del delta
+_EVENTO = struct.Struct('<IIBb')
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def empaquetar(eventos):
+    """
+    Convierte una lista de eventos en el formato binario de ``LineaTiempoPartido``.
+
+    Args:
+        eventos (list): Tuplas (secuencia, momento, set_numero, jugador, delta)
+            ordenadas por secuencia
+
+    Returns:
+        bytes: Eventos empaquetados (vacío si no hay eventos)
+    """
+    if not eventos:
+        return b''
+    base = eventos[0][1]
+    partes = [_CABECERA.pack(VERSION_PAQUETE, (base - _EPOCA) // timedelta(microseconds=1))]
+    for secuencia, momento, set_numero, jugador, delta in eventos:
+        milisegundos = max((momento - base) // timedelta(milliseconds=1), 0)
+        partes.append(_EVENTO.pack(secuencia, milisegundos, set_numero, jugador * delta))
+    return b''.join(partes)
+
+
+def desempaquetar(datos):
+    """
+    Lee los eventos empaquetados por ``empaquetar``.
+
+    Args:
+        datos (bytes): Contenido de ``LineaTiempoPartido.eventos``
+
+    Returns:
+        list: Tuplas (secuencia, momento, set_numero, jugador, delta)
+    """
+    datos = bytes(datos or b'')
+    if not datos:
+        return []
+    version, base_us = _CABECERA.unpack_from(datos, 0)
+    if version != VERSION_PAQUETE:
+        raise ValueError(f"Versión de línea de tiempo desconocida: {version}")
+    base = _EPOCA + timedelta(microseconds=base_us)
+
+    eventos = []
+    for secuencia, milisegundos, set_numero, jugador in _EVENTO.iter_unpack(datos[_CABECERA.size:]):
+        eventos.append((
+            secuencia, base + timedelta(milliseconds=milisegundos), set_numero, abs(jugador),
+            1 if jugador > 0 else -1,
+        ))
+    return eventos
+
+
+def eventos_partido(partido_id):
+    """
+    Eventos de un partido en orden, desde el paquete compactado y la tabla de eventos.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        list: Tuplas (secuencia, momento, set_numero, jugador, delta)
+    """
+    paquete = LineaTiempoPartido.objects.filter(partido_id=partido_id).values_list('eventos', flat=True).first()
+    eventos = desempaquetar(paquete)
+    ultima = eventos[-1][0] if eventos else 0
+    eventos.extend(
+        EventoPunto.objects.filter(partido_id=partido_id, secuencia__gt=ultima)
+        .order_by('secuencia')
+        .values_list('secuencia', 'momento', 'set_numero', 'jugador', 'delta')
+    )
+    return eventos
+
+
+def puntos_vigentes(eventos, set_numero):
+    """
+    Pila de los puntos de un set que siguen vigentes tras aplicar los deshacer.
+
+    Args:
+        eventos (list): Tuplas (secuencia, momento, set_numero, jugador, delta)
+        set_numero (int): Set a reconstruir
+
+    Returns:
+        list: Jugador (1 o 2) de cada punto vigente, del más antiguo al último
+    """
+    pila = []
+    for _, _, set_evento, jugador, delta in eventos:
+        if set_evento != set_numero:
+            continue
+        if delta > 0:
+            pila.append(jugador)
+        else:
+            quitar_ultimo(pila, jugador)
+    return pila
+
+
+def quitar_ultimo(pila, elemento):
+    """
+    Quita la última aparición de un elemento de una lista.
+
+    Returns:
+        bool: True si el elemento estaba en la lista
+    """
+    for indice in range(len(pila) - 1, -1, -1):
+        if pila[indice] == elemento:
+            del pila[indice]
+            return True
+    return False
+
+
+def linea_tiempo(partido_id):
+    """
+    Reproduce el partido punto a punto.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        list: Diccionarios con secuencia, momento, set, jugador, tipo ('punto'
+            o 'deshacer') y el marcador del set después del evento
+    """
+    marcadores = {}
+    linea = []
+    for secuencia, momento, set_numero, jugador, delta in eventos_partido(partido_id):
+        marcador = marcadores.setdefault(set_numero, [0, 0])
+        marcador[jugador - 1] = max(marcador[jugador - 1] + delta, 0)
+        linea.append({
+            'secuencia': secuencia,
+            'momento': momento.isoformat(),
+            'set': set_numero,
+            'jugador': jugador,
+            'tipo': 'punto' if delta > 0 else 'deshacer',
+            'puntos_jugador1': marcador[0],
+            'puntos_jugador2': marcador[1],
+        })
+    return linea
+
+
+def compactar_partido(partido_id):
+    """
+    Empaqueta los eventos de un partido finalizado y los borra de ``EventoPunto``.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        int: Cantidad de eventos compactados (0 si el partido no está finalizado)
+    """
+    with transaction.atomic():
+        if not Partido.objects.select_for_update().filter(id=partido_id, finalizado=True).exists():
+            return 0
+        nuevos = list(
+            EventoPunto.objects.filter(partido_id=partido_id)
+            .order_by('secuencia')
+            .values_list('secuencia', 'momento', 'set_numero', 'jugador', 'delta')
+        )
+        if not nuevos:
+            return 0
+
+        linea = LineaTiempoPartido.objects.filter(partido_id=partido_id).first()
+        eventos = desempaquetar(linea.eventos) if linea else []
+        ultima = eventos[-1][0] if eventos else 0
+        eventos.extend(evento for evento in nuevos if evento[0] > ultima)
+
+        LineaTiempoPartido.objects.update_or_create(
+            partido_id=partido_id,
+            defaults={'eventos': empaquetar(eventos), 'cantidad': len(eventos)},
+        )
+        EventoPunto.objects.filter(partido_id=partido_id, secuencia__lte=nuevos[-1][0]).delete()
+    return len(nuevos)
+
+
+def _compactar_en_segundo_plano(partido_id):
+    try:
+        cantidad = compactar_partido(partido_id)
+        if cantidad:
+            print(f"🗜️ Partido {partido_id}: {cantidad} eventos de punto compactados")
+    except Exception as e:
+        print(f"❌ Error compactando eventos del partido {partido_id}: {e}")
+    finally:
+        connection.close()
+
+
+def programar_compactacion(partido_id):
+    """
+    Compacta los eventos del partido en un hilo aparte una vez confirmada la transacción.
+
+    Args:
+        partido_id (int): ID del partido recién finalizado
+    """
+    transaction.on_commit(lambda: threading.Thread(
+        target=_compactar_en_segundo_plano, args=(partido_id,),
+        name=f'compactar-partido-{partido_id}', daemon=True,
+    ).start())
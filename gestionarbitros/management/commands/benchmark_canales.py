@@ -0,0 +1,151 @@
+from django.core.management.base import BaseCommand, CommandError
+from gestionarbitros.capa_hub import CapaHub, HubCanales
+import asyncio
+import multiprocessing
+import os
+import queue
+import statistics
+import tempfile
+import time
+
+GRUPO = 'benchmark_canales'
+
+
+def ejecutar_hub(ruta):
+    """Proceso del hub de canales."""
+    asyncio.run(HubCanales(ruta).servir())
+
+
+def ejecutar_trabajador(ruta, canales, mensajes, listos, resultados):
+    """
+    Proceso worker: ``canales`` consumidores del grupo, cada uno espera ``mensajes`` mensajes.
+
+    Envía por ``resultados`` la latencia (segundos) de cada entrega recibida.
+    """
+    resultados.put(asyncio.run(_trabajador(ruta, canales, mensajes, listos)))
+
+
+async def _trabajador(ruta, canales, mensajes, listos):
+    capa = CapaHub(ruta)
+    nombres = [await capa.new_channel() for _ in range(canales)]
+    for nombre in nombres:
+        await capa.group_add(GRUPO, nombre)
+    listos.put(os.getpid())
+
+    latencias = []
+
+    async def consumir(nombre):
+        for _ in range(mensajes):
+            mensaje = await capa.receive(nombre)
+            latencias.append(time.time() - mensaje['enviado'])
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(consumir(nombre) for nombre in nombres)), timeout=60)
+    except asyncio.TimeoutError:
+        pass
+    await capa.close()
+    return latencias
+
+
+def percentil(valores, p):
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de difusión de un grupo repartido entre varios procesos a través del hub de canales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=4,
+            help='Procesos worker con consumidores del grupo (por defecto: 4)'
+        )
+        parser.add_argument(
+            '--espectadores', type=int, default=200,
+            help='Consumidores del grupo por proceso (por defecto: 200)'
+        )
+        parser.add_argument(
+            '--mensajes', type=int, default=200,
+            help='Mensajes a difundir al grupo (por defecto: 200)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=0.01,
+            help='Segundos entre dos mensajes (por defecto: 0.01)'
+        )
+
+    def handle(self, *args, **options):
+        procesos = options['procesos']
+        espectadores = options['espectadores']
+        mensajes = options['mensajes']
+        contexto = multiprocessing.get_context('spawn')
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'hub.sock')
+            hub = contexto.Process(target=ejecutar_hub, args=(ruta,), daemon=True)
+            hub.start()
+            limite = time.monotonic() + 10
+            while not os.path.exists(ruta):
+                if time.monotonic() > limite:
+                    raise CommandError("El hub de canales no se inició")
+                time.sleep(0.05)
+
+            listos = contexto.Queue()
+            resultados = contexto.Queue()
+            trabajadores = [
+                contexto.Process(
+                    target=ejecutar_trabajador, args=(ruta, espectadores, mensajes, listos, resultados), daemon=True,
+                )
+                for _ in range(procesos)
+            ]
+            try:
+                for trabajador in trabajadores:
+                    trabajador.start()
+                for _ in trabajadores:
+                    listos.get(timeout=60)
+
+                inicio = time.perf_counter()
+                estadisticas = asyncio.run(self.publicar(ruta, mensajes, options['intervalo']))
+                latencias = []
+                for _ in trabajadores:
+                    latencias.extend(resultados.get(timeout=120))
+                duracion = time.perf_counter() - inicio
+            except queue.Empty:
+                raise CommandError("Un proceso worker no respondió a tiempo")
+            finally:
+                for trabajador in trabajadores:
+                    trabajador.join(timeout=5)
+                hub.terminate()
+                hub.join()
+
+        esperadas = procesos * espectadores * mensajes
+        if not latencias:
+            raise CommandError("Ningún consumidor recibió mensajes")
+        latencias.sort()
+        self.stdout.write(
+            f"{procesos} procesos x {espectadores} consumidores, {mensajes} mensajes: "
+            f"{len(latencias):,} de {esperadas:,} entregas en {duracion:.2f}s "
+            f"({len(latencias) / duracion:,.0f} entregas/s)"
+        )
+        self.stdout.write(
+            "Latencia de difusión (ms): "
+            f"p50 {percentil(latencias, 0.50) * 1000:.2f}, p95 {percentil(latencias, 0.95) * 1000:.2f}, "
+            f"p99 {percentil(latencias, 0.99) * 1000:.2f}, máx {latencias[-1] * 1000:.2f}, "
+            f"media {statistics.fmean(latencias) * 1000:.2f}"
+        )
+        self.stdout.write(
+            f"Hub: {estadisticas['entregados']:,} entregados, {estadisticas['encolados']:,} encolados, "
+            f"{estadisticas['llenos']:,} descartados por capacidad"
+        )
+        if len(latencias) != esperadas:
+            raise CommandError(f"Se perdieron {esperadas - len(latencias):,} entregas")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de canales completado."))
+
+    async def publicar(self, ruta, mensajes, intervalo):
+        """Difunde los mensajes al grupo desde este proceso y devuelve los contadores del hub."""
+        capa = CapaHub(ruta)
+        for numero in range(mensajes):
+            await capa.group_send(GRUPO, {'type': 'partido_update', 'numero': numero, 'enviado': time.time()})
+            await asyncio.sleep(intervalo)
+        estadisticas = await capa.estadisticas()
+        await capa.close()
+        return estadisticas
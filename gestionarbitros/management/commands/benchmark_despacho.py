@@ -0,0 +1,107 @@
+from asgiref.sync import async_to_sync
+from channels import DEFAULT_CHANNEL_LAYER
+from channels.layers import InMemoryChannelLayer, channel_layers
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from gestionarbitros.difusion import DespachadorDifusion, DifusorPartidos
+from gestionarbitros.management.commands.benchmark_difusion import estado_simulado
+import asyncio
+import gestionarbitros.difusion as difusion
+import time
+
+
+class CapaLenta(InMemoryChannelLayer):
+    """Capa en memoria que tarda ``retardo`` segundos en cada ``group_send``, como una capa saturada."""
+
+    def __init__(self, retardo, **kwargs):
+        super().__init__(**kwargs)
+        self.retardo = retardo
+
+    async def group_send(self, group, message):
+        await asyncio.sleep(self.retardo)
+        await super().group_send(group, message)
+
+
+def percentil(valores, p):
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Mide cuánto espera una vista al difundir un punto con la capa de canales lenta, con y sin cola de despacho'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partidos', type=int, default=20,
+            help='Partidos arbitrados en paralelo, uno por hilo (por defecto: 20)'
+        )
+        parser.add_argument(
+            '--puntos', type=int, default=50,
+            help='Puntos por partido (por defecto: 50)'
+        )
+        parser.add_argument(
+            '--retardo', type=float, default=0.02,
+            help='Segundos que tarda la capa de canales en cada envío (por defecto: 0.02)'
+        )
+        parser.add_argument(
+            '--capacidad', type=int, default=None,
+            help='Partidos distintos en la cola de despacho (por defecto: DIFUSION_COLA_MAXIMA)'
+        )
+
+    def handle(self, *args, **options):
+        partidos = options['partidos']
+        puntos = options['puntos']
+        anterior_capa = channel_layers.set(DEFAULT_CHANNEL_LAYER, CapaLenta(options['retardo']))
+        anterior_difusor = difusion.difusor
+        anterior_despachador = difusion.despachador
+        try:
+            # Sin ventana de agrupación: cada punto llega a la capa de canales
+            difusion.difusor = DifusorPartidos(0)
+            directas = self.medir(partidos, puntos, lambda pid, data: async_to_sync(difusion.difusor.publicar)(pid, data))
+
+            difusion.difusor = DifusorPartidos(0)
+            despachador = DespachadorDifusion(options['capacidad'])
+            inicio = time.perf_counter()
+            encoladas = self.medir(partidos, puntos, despachador.encolar)
+            # Cada punto termina despachado, reemplazado por uno posterior o descartado
+            while despachador.despachados + despachador.reemplazados + despachador.descartados < partidos * puntos:
+                if time.perf_counter() - inicio > 120:
+                    raise CommandError("La cola de despacho no se vació a tiempo")
+                time.sleep(0.01)
+            metricas = despachador.metricas()
+        finally:
+            channel_layers.set(DEFAULT_CHANNEL_LAYER, anterior_capa)
+            difusion.difusor = anterior_difusor
+            difusion.despachador = anterior_despachador
+
+        self.stdout.write(f"{partidos} partidos x {puntos} puntos, capa de canales con {options['retardo'] * 1000:.0f} ms por envío")
+        self.stdout.write(f"{'Modo':>10} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+        for nombre, esperas in (('directo', directas), ('cola', encoladas)):
+            self.stdout.write(
+                f"{nombre:>10} {percentil(esperas, 0.50) * 1000:>8.3f} "
+                f"{percentil(esperas, 0.99) * 1000:>8.3f} {esperas[-1] * 1000:>8.3f}"
+            )
+        self.stdout.write(
+            f"Cola: {metricas['despachados']} despachados, {metricas['reemplazados']} reemplazados, "
+            f"{metricas['descartados']} descartados, profundidad máxima {metricas['profundidad_maxima']}, "
+            f"latencia de despacho p50 {metricas['latencia_p50_ms']:.1f} ms, p95 {metricas['latencia_p95_ms']:.1f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS("Benchmark de despacho completado."))
+
+    def medir(self, partidos, puntos, publicar):
+        """
+        Publica los puntos de cada partido desde su propio hilo, como lo harían las vistas.
+
+        Returns:
+            list: Segundos que esperó cada llamada a ``publicar``, ordenados
+        """
+        def arbitrar(partido_id):
+            esperas = []
+            for punto in range(1, puntos + 1):
+                inicio = time.perf_counter()
+                publicar(partido_id, estado_simulado(partido_id, punto))
+                esperas.append(time.perf_counter() - inicio)
+            return esperas
+
+        with ThreadPoolExecutor(max_workers=partidos) as ejecutor:
+            esperas = [espera for lista in ejecutor.map(arbitrar, range(1, partidos + 1)) for espera in lista]
+        return sorted(esperas)
@@ -0,0 +1,155 @@
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from gestionarbitros.difusion import DifusorPartidos, compactar, diferencias
+from gestionarbitros.management.commands.benchmark_puntos import borrar_partido_prueba, crear_partido_prueba
+from gestionarbitros.routing import websocket_urlpatterns
+import asyncio
+import json
+import time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def estado_simulado(partido_id, punto):
+    """Estado del partido tras ``punto`` puntos del jugador 1, con el formato de los consumidores."""
+    return {
+        'partido_id': partido_id,
+        'jugador1': {'nombre': 'Jugador 0', 'puntos': punto, 'sets': 0},
+        'jugador2': {'nombre': 'Jugador 1', 'puntos': 0, 'sets': 0},
+        'set_actual': 1,
+        'estado': 'en_curso',
+        'finalizado': False,
+        'ganador': None,
+        'secuencia': punto,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Conecta cientos de espectadores a un partido y mide los cuadros enviados con y sin agrupación'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--espectadores', type=int, default=500,
+            help='WebSockets de espectadores conectados al partido (por defecto: 500)'
+        )
+        parser.add_argument(
+            '--puntos', type=int, default=200,
+            help='Actualizaciones de puntaje a publicar (por defecto: 200)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=0.01,
+            help='Segundos entre dos puntos consecutivos (por defecto: 0.01)'
+        )
+        parser.add_argument(
+            '--ventana', type=float, default=None,
+            help='Ventana de agrupación en segundos (por defecto: MARCADOR_VENTANA_DIFUSION)'
+        )
+
+    def handle(self, *args, **options):
+        ventana = options['ventana']
+        if ventana is None:
+            ventana = getattr(settings, 'MARCADOR_VENTANA_DIFUSION', 0.075)
+
+        partido = crear_partido_prueba('benchmark_difusion', base_rut=92_000_000)
+        try:
+            self.stdout.write(
+                f"{'Ventana':>8} {'Publicadas':>11} {'Enviadas':>9} {'Agrupadas':>10} "
+                f"{'Cuadros/socket':>15} {'KB recibidos':>13} {'Segundos':>9}"
+            )
+            for ventana_prueba in (0, ventana):
+                resultado = async_to_sync(self.medir)(
+                    partido.id, options['espectadores'], options['puntos'], options['intervalo'], ventana_prueba,
+                )
+                self.stdout.write(
+                    f"{ventana_prueba:>8.3f} {resultado['recibidas']:>11} {resultado['enviadas']:>9} "
+                    f"{resultado['agrupadas']:>10} {resultado['cuadros_por_socket']:>15.1f} "
+                    f"{resultado['bytes'] / 1024:>13.1f} {resultado['segundos']:>9.3f}"
+                )
+        finally:
+            borrar_partido_prueba(partido)
+
+        self.medir_bytes_por_punto(options['puntos'])
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de difusión completado."))
+
+    async def medir(self, partido_id, espectadores, puntos, intervalo, ventana):
+        """
+        Publica una ráfaga de puntos y cuenta lo que recibe cada espectador.
+
+        Returns:
+            dict: Estadísticas del difusor, cuadros por socket, bytes recibidos y duración
+        """
+        aplicacion = URLRouter(websocket_urlpatterns)
+        comunicadores = [
+            WebsocketCommunicator(aplicacion, f'/ws/partido/{partido_id}/') for _ in range(espectadores)
+        ]
+        for comunicador in comunicadores:
+            conectado, _ = await comunicador.connect()
+            if not conectado:
+                raise CommandError("No se pudo conectar un espectador")
+            await comunicador.receive_from()  # partido_status inicial
+
+        difusor = DifusorPartidos(ventana)
+        inicio = time.perf_counter()
+        for punto in range(1, puntos + 1):
+            data = estado_simulado(partido_id, punto)
+            await difusor.publicar(partido_id, data, final=punto == puntos)
+            await asyncio.sleep(intervalo)
+
+        # Dar tiempo a que los consumidores reenvíen el último cuadro
+        await asyncio.sleep(max(ventana * 2, 0.2))
+
+        cuadros = 0
+        total_bytes = 0
+        for comunicador in comunicadores:
+            estado = {}
+            while not await comunicador.receive_nothing(timeout=0.01):
+                mensaje = await comunicador.receive_from()
+                cuadro = json.loads(mensaje)
+                if cuadro['type'] == 'ping':
+                    # Latido de la conexión, no es un cuadro del partido
+                    continue
+                cuadros += 1
+                total_bytes += len(mensaje.encode())
+                estado.update(cuadro['cambios'])
+            # El cuadro final nunca se agrupa: todos deben terminar con el último punto
+            if estado.get('p1') != puntos:
+                raise CommandError("Un espectador no recibió el último estado del partido")
+        duracion = time.perf_counter() - inicio
+
+        for comunicador in comunicadores:
+            await comunicador.disconnect()
+
+        estadisticas = difusor.estadisticas[partido_id].como_dict()
+        estadisticas.update({
+            'cuadros_por_socket': cuadros / espectadores,
+            'bytes': total_bytes,
+            'segundos': duracion,
+        })
+        return estadisticas
+
+    def medir_bytes_por_punto(self, puntos):
+        """Compara el tamaño de un cuadro por punto con el estado completo y con cambios."""
+        completo = delta = delta_msgpack = 0
+        anterior = None
+        for punto in range(1, puntos + 1):
+            data = estado_simulado(1, punto)
+            completo += len(json.dumps({'type': 'partido_update', 'data': data}).encode())
+
+            compacto = compactar(data)
+            cuadro = {'type': 'partido_delta', 'v': punto + 1, 'base': punto, 'cambios': diferencias(anterior, compacto)}
+            anterior = compacto
+            delta += len(json.dumps(cuadro).encode())
+            if msgpack is not None:
+                delta_msgpack += len(msgpack.packb(cuadro))
+
+        linea = f"Bytes por punto: estado completo {completo / puntos:.1f}, solo cambios {delta / puntos:.1f}"
+        if msgpack is not None:
+            linea += f", solo cambios MessagePack {delta_msgpack / puntos:.1f}"
+        self.stdout.write(linea)
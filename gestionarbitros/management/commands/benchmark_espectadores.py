@@ -0,0 +1,195 @@
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from gestionarbitros.difusion import difusor
+from gestionarbitros.management.commands.benchmark_difusion import estado_simulado
+from gestionarbitros.management.commands.benchmark_puntos import borrar_partido_prueba, crear_partido_prueba
+from gestionarbitros.routing import websocket_urlpatterns
+from gestionarbitros.salida import CODIGO_CLIENTE_LENTO, estadisticas
+from urllib.parse import parse_qs
+import asyncio
+import json
+import time
+
+
+class AplicacionLenta:
+    """
+    Aplicación ASGI que hace esperar ``?retardo=`` segundos cada ``websocket.send``.
+
+    Simula un servidor con control de flujo frente a un cliente que lee lento.
+    """
+
+    def __init__(self, aplicacion):
+        self.aplicacion = aplicacion
+
+    async def __call__(self, scope, receive, send):
+        retardo = float(parse_qs(scope['query_string'].decode()).get('retardo', ['0'])[0])
+        if not retardo:
+            return await self.aplicacion(scope, receive, send)
+
+        async def enviar_lento(mensaje):
+            if mensaje['type'] == 'websocket.send':
+                await asyncio.sleep(retardo)
+            await send(mensaje)
+
+        return await self.aplicacion(scope, receive, enviar_lento)
+
+
+def percentil(valores, p):
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Conecta espectadores rápidos, lentos y detenidos a un partido y mide la protección ante clientes lentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rapidos', type=int, default=50,
+            help='Espectadores que leen y responden los latidos al instante (por defecto: 50)'
+        )
+        parser.add_argument(
+            '--lentos', type=int, default=20,
+            help='Espectadores cuyo socket tarda --retardo segundos en cada cuadro (por defecto: 20)'
+        )
+        parser.add_argument(
+            '--detenidos', type=int, default=20,
+            help='Espectadores que dejan de leer tras sus primeros mensajes (por defecto: 20)'
+        )
+        parser.add_argument(
+            '--puntos', type=int, default=300,
+            help='Actualizaciones de puntaje a publicar (por defecto: 300)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=0.01,
+            help='Segundos entre dos puntos consecutivos (por defecto: 0.01)'
+        )
+        parser.add_argument(
+            '--retardo', type=float, default=0.05,
+            help='Segundos que tarda cada cuadro en salir hacia un espectador lento (por defecto: 0.05)'
+        )
+
+    def handle(self, *args, **options):
+        partido = crear_partido_prueba('benchmark_espectadores', base_rut=95_000_000)
+        # Latidos cortos para que la prueba dure segundos
+        ajustes = override_settings(
+            ESPECTADOR_COLA_MAXIMA=8,
+            ESPECTADOR_INTERVALO_LATIDO=0.2,
+            ESPECTADOR_RETRASO_MAXIMO=1.0,
+            ESPECTADOR_ESPERA_MAXIMA=2.0,
+        )
+        ventana = difusor.ventana
+        try:
+            with ajustes:
+                # Sin ventana de agrupación: cada punto es un cuadro para cada espectador
+                difusor.ventana = 0
+                resultado = async_to_sync(self.medir)(partido.id, options)
+        finally:
+            difusor.ventana = ventana
+            borrar_partido_prueba(partido)
+
+        puntos = options['puntos']
+        self.stdout.write(f"{'Espectadores':>13} {'Cantidad':>9} {'Mensajes/socket':>16} {'Con último punto':>17} {'Cerrados 4008':>14}")
+        for nombre in ('rapidos', 'lentos', 'detenidos'):
+            clientes = resultado[nombre]
+            if not clientes:
+                continue
+            self.stdout.write(
+                f"{nombre:>13} {len(clientes):>9} "
+                f"{sum(c['mensajes'] for c in clientes) / len(clientes):>16.1f} "
+                f"{sum(c['estado'].get('p1') == puntos for c in clientes):>17} "
+                f"{sum(c['cerrado'] for c in clientes):>14}"
+            )
+        latencias = sorted(c['ultimo_punto'] for c in resultado['rapidos'] if c['ultimo_punto'] is not None)
+        if latencias:
+            self.stdout.write(
+                f"Rápidos, último punto tras publicarlo (ms): p50 {percentil(latencias, 0.50) * 1000:.1f}, "
+                f"p99 {percentil(latencias, 0.99) * 1000:.1f}"
+            )
+        self.stdout.write(f"Salida: {resultado['estadisticas']}")
+
+        if any(c['estado'].get('p1') != puntos for c in resultado['rapidos'] + resultado['lentos']):
+            raise CommandError("Un espectador rápido o lento no terminó con el último estado del partido")
+        if not all(c['cerrado'] for c in resultado['detenidos']):
+            raise CommandError("Un espectador detenido no fue desconectado")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de espectadores completado."))
+
+    async def medir(self, partido_id, options):
+        aplicacion = AplicacionLenta(URLRouter(websocket_urlpatterns))
+        antes = estadisticas.como_dict()
+
+        clientes = {'rapidos': [], 'lentos': [], 'detenidos': []}
+        for nombre, consulta in (('rapidos', ''), ('lentos', f"?retardo={options['retardo']}"), ('detenidos', '')):
+            for _ in range(options[nombre]):
+                comunicador = WebsocketCommunicator(aplicacion, f'/ws/partido/{partido_id}/{consulta}')
+                conectado, _ = await comunicador.connect()
+                if not conectado:
+                    raise CommandError("No se pudo conectar un espectador")
+                clientes[nombre].append({
+                    'comunicador': comunicador, 'estado': {}, 'version': None,
+                    'mensajes': 0, 'cerrado': False, 'ultimo_punto': None,
+                })
+
+        fin_publicacion = {}
+        lectores = [
+            asyncio.create_task(self.leer(cliente, options['puntos'], fin_publicacion, limite=4 if nombre == 'detenidos' else None))
+            for nombre, lista in clientes.items() for cliente in lista
+        ]
+
+        for punto in range(1, options['puntos'] + 1):
+            final = punto == options['puntos']
+            if final:
+                fin_publicacion['momento'] = time.monotonic()
+            await difusor.publicar(partido_id, estado_simulado(partido_id, punto), final=final)
+            await asyncio.sleep(options['intervalo'])
+
+        # Dar tiempo a que los lentos se pongan al día y a que los detenidos se cierren
+        await asyncio.sleep(4)
+        for lector in lectores:
+            lector.cancel()
+        await asyncio.gather(*lectores, return_exceptions=True)
+
+        for cliente in clientes['detenidos']:
+            # Lo que no leyó quedó en su buffer: buscar el cierre por cliente lento
+            while not await cliente['comunicador'].receive_nothing(timeout=0.01):
+                salida = await cliente['comunicador'].receive_output()
+                if salida['type'] == 'websocket.close' and salida.get('code') == CODIGO_CLIENTE_LENTO:
+                    cliente['cerrado'] = True
+                    break
+        for lista in clientes.values():
+            for cliente in lista:
+                await cliente['comunicador'].disconnect()
+
+        despues = estadisticas.como_dict()
+        clientes['estadisticas'] = {
+            clave: valor - antes[clave] for clave, valor in despues.items() if clave != 'conexiones'
+        }
+        return clientes
+
+    async def leer(self, cliente, puntos, fin_publicacion, limite=None):
+        """Lee los mensajes de un espectador como lo hace la página; con ``limite`` deja de leer tras esa cantidad."""
+        comunicador = cliente['comunicador']
+        while limite is None or cliente['mensajes'] < limite:
+            salida = await comunicador.receive_output(timeout=10)
+            if salida['type'] == 'websocket.close':
+                cliente['cerrado'] = salida.get('code') == CODIGO_CLIENTE_LENTO
+                return
+            mensaje = json.loads(salida['text'])
+            cliente['mensajes'] += 1
+            if mensaje['type'] == 'ping':
+                await comunicador.send_to(text_data=json.dumps({'type': 'pong', 'n': mensaje['n']}))
+                continue
+            if mensaje['type'] == 'partido_status':
+                cliente['estado'] = dict(mensaje['data'])
+                cliente['version'] = mensaje['v']
+            elif mensaje['base'] == cliente['version']:
+                cliente['estado'].update(mensaje['cambios'])
+                cliente['version'] = mensaje['v']
+            else:
+                # Se perdió un cuadro: pedir el estado completo
+                await comunicador.send_to(text_data=json.dumps({'type': 'get_status'}))
+                continue
+            if cliente['estado'].get('p1') == puntos and cliente['ultimo_punto'] is None and 'momento' in fin_publicacion:
+                cliente['ultimo_punto'] = time.monotonic() - fin_publicacion['momento']
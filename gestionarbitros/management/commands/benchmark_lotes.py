@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from gestionarbitros.management.commands.benchmark_puntos import borrar_partido_prueba, crear_partido_prueba
+from gestionarbitros.marcador import descartar_marcador
+from gestiontorneo.models import Resultado, UsuarioPersonalizado
+import json
+import time
+
+
+def percentil(valores, p):
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Compara un request HTTP por punto con el envío por lotes del árbitro sin conexión'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mesas', type=int, default=8,
+            help='Partidos arbitrados en paralelo, uno por hilo (por defecto: 8)'
+        )
+        parser.add_argument(
+            '--puntos', type=int, default=200,
+            help='Puntos marcados en cada mesa (por defecto: 200)'
+        )
+        parser.add_argument(
+            '--por-lote', type=int, default=10,
+            help='Puntos que se acumulan entre dos envíos del lote (por defecto: 10)'
+        )
+
+    def handle(self, *args, **options):
+        mesas = options['mesas']
+        puntos = options['puntos']
+        por_lote = options['por_lote']
+
+        partidos = [crear_partido_prueba(f'benchmark_lotes{i}', base_rut=98_000_000 + i * 10) for i in range(mesas)]
+        arbitro = UsuarioPersonalizado.objects.create(
+            username='benchmark_lotes', email='benchmark_lotes@ejemplo.cl', tipo_usuario='arbitro',
+        )
+        try:
+            for partido in partidos:
+                partido.arbitro = arbitro
+                partido.save(update_fields=['arbitro'])
+
+            filas = []
+            for nombre, marcar in (('toque', self.por_toque), ('lote', self.por_lote)):
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=mesas) as ejecutor:
+                    resultados = list(ejecutor.map(
+                        lambda partido: self.arbitrar(marcar, arbitro, partido.id, puntos, por_lote), partidos
+                    ))
+                duracion = time.perf_counter() - inicio
+
+                for partido in partidos:
+                    descartar_marcador(partido.id)
+                    resultado = Resultado.objects.get(partido_id=partido.id)
+                    if resultado.set1_jugador1 + resultado.set1_jugador2 != puntos:
+                        raise CommandError(
+                            f"{nombre}: se esperaban {puntos} puntos en el partido {partido.id} y hay "
+                            f"{resultado.set1_jugador1 + resultado.set1_jugador2}"
+                        )
+                    Resultado.objects.filter(id=resultado.id).update(set1_jugador1=0, set1_jugador2=0)
+
+                esperas = sorted(espera for _, lista in resultados for espera in lista)
+                peticiones = sum(cantidad for cantidad, _ in resultados)
+                filas.append((nombre, peticiones, duracion, esperas))
+        finally:
+            for partido in partidos:
+                descartar_marcador(partido.id)
+                borrar_partido_prueba(partido)
+            arbitro.delete()
+
+        self.stdout.write(f"{mesas} mesas x {puntos} puntos, lotes de {por_lote} puntos con un reenvío duplicado cada uno")
+        self.stdout.write(f"{'Modo':>6} {'Requests':>9} {'Req/mesa':>9} {'p50 ms':>8} {'p99 ms':>8} {'Total s':>8}")
+        for nombre, peticiones, duracion, esperas in filas:
+            self.stdout.write(
+                f"{nombre:>6} {peticiones:>9} {peticiones / mesas:>9.1f} "
+                f"{percentil(esperas, 0.50) * 1000:>8.2f} {percentil(esperas, 0.99) * 1000:>8.2f} {duracion:>8.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark de lotes completado: no se perdieron ni duplicaron puntos."))
+
+    def arbitrar(self, marcar, arbitro, partido_id, puntos, por_lote):
+        """
+        Marca los puntos de una mesa con un cliente HTTP propio.
+
+        Returns:
+            tuple: (requests enviados, segundos que tardó cada uno)
+        """
+        cliente = Client()
+        cliente.force_login(arbitro)
+        try:
+            return marcar(cliente, partido_id, puntos, por_lote)
+        finally:
+            connection.close()
+
+    def por_toque(self, cliente, partido_id, puntos, por_lote):
+        """Un request por punto, como el respaldo HTTP anterior."""
+        esperas = []
+        for punto in range(puntos):
+            esperas.append(self.enviar(
+                cliente, f'/arbitros/partido/{partido_id}/actualizar-puntos/',
+                {'accion': 'sumar', 'jugador': 1 + punto % 2},
+            ))
+        return len(esperas), esperas
+
+    def por_lote(self, cliente, partido_id, puntos, por_lote):
+        """Los puntos se numeran y se envían por lotes; cada lote se reenvía una vez, como tras una respuesta perdida."""
+        # El marcador se escribió al terminar el modo anterior: seguir desde su secuencia
+        secuencia = Resultado.objects.get(partido_id=partido_id).secuencia_puntos
+        esperas = []
+        comandos = [
+            {'type': 'point', 'jugador': 1 + punto % 2, 'seq': secuencia + punto + 1} for punto in range(puntos)
+        ]
+        for inicio in range(0, puntos, por_lote):
+            lote = comandos[inicio:inicio + por_lote]
+            for _ in range(2):
+                esperas.append(self.enviar(cliente, f'/arbitros/partido/{partido_id}/puntos-lote/', {'comandos': lote}))
+        return len(esperas), esperas
+
+    def enviar(self, cliente, url, datos):
+        inicio = time.perf_counter()
+        respuesta = cliente.post(url, json.dumps(datos), content_type='application/json')
+        espera = time.perf_counter() - inicio
+        if not respuesta.json().get('success'):
+            raise CommandError(f"{url} respondió {respuesta.json()}")
+        return espera
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from gestionarbitros.marcador import (
+    APLICADO, DUPLICADO, FUERA_DE_ORDEN, MarcadorEnVivo,
+    descartar_marcador, obtener_marcador, persistir_marcador,
+)
+from gestiontorneo.management.commands.benchmark_importacion import digito_verificador
+from gestiontorneo.models import Jugador, LlaveTorneo, Partido, Resultado, Torneo, UsuarioPersonalizado
+from datetime import date
+import time
+
+
+def crear_partido_prueba(nombre, base_rut=91_000_000):
+    """
+    Crea un partido en curso con su torneo, jugadores, árbitro y resultado.
+
+    Args:
+        nombre (str): Identificador del benchmark (se usa en el email del árbitro)
+        base_rut (int): Primer RUT de los jugadores, distinto para cada benchmark
+
+    Returns:
+        Partido: Partido creado, con ``arbitro`` y ``jugador1``/``jugador2``
+    """
+    organizador = UsuarioPersonalizado.objects.create(
+        username='benchmark', email=f'{nombre}@ejemplo.cl', tipo_usuario='organizador',
+    )
+    torneo = Torneo.objects.create(
+        nombre=f'Benchmark {nombre}', fecha=date.today(), ubicacion='Benchmark', organizador=organizador,
+    )
+    jugadores = [
+        Jugador.objects.create(
+            rut=f"{base_rut + i}-{digito_verificador(base_rut + i)}",
+            nombre='Jugador', apellido=str(i), fecha_nacimiento=date(1990, 1, 1), genero='M',
+        )
+        for i in range(2)
+    ]
+    llave = LlaveTorneo.objects.create(
+        torneo=torneo, ronda=1, posicion=1, jugador1=jugadores[0], jugador2=jugadores[1],
+    )
+    partido = Partido.objects.create(
+        torneo=torneo, llave_torneo=llave, jugador1=jugadores[0], jugador2=jugadores[1],
+        arbitro=organizador, organizador=organizador, estado_partido='en_curso',
+    )
+    Resultado.objects.create(partido=partido)
+    return partido
+
+
+def borrar_partido_prueba(partido):
+    """Elimina el partido de prueba junto con sus jugadores, torneo y árbitro."""
+    Jugador.objects.filter(id__in=[partido.jugador1_id, partido.jugador2_id]).delete()
+    UsuarioPersonalizado.objects.filter(id=partido.organizador_id).delete()
+
+
+class Command(BaseCommand):
+    help = 'Dispara puntos en paralelo sobre un partido y verifica que no se pierda ninguno'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--puntos', type=int, default=1000,
+            help='Cantidad de puntos a disparar en cada prueba (por defecto: 1000)'
+        )
+        parser.add_argument(
+            '--hilos', type=int, default=32,
+            help='Hilos que envían puntos a la vez (por defecto: 32)'
+        )
+
+    def handle(self, *args, **options):
+        puntos = options['puntos']
+        hilos = options['hilos']
+
+        # Los hilos usan sus propias conexiones: los datos se confirman y se borran al final
+        partido = crear_partido_prueba('benchmark_puntos')
+        try:
+            self.probar_sin_secuencia(partido.id, puntos, hilos)
+            self.probar_con_secuencia(partido.id, puntos, hilos)
+            self.probar_escritor_concurrente(partido.id, puntos)
+        finally:
+            descartar_marcador(partido.id)
+            borrar_partido_prueba(partido)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de puntos completado: no se perdieron puntos."))
+
+    def ejecutar_en_paralelo(self, tarea, argumentos, hilos):
+        def envolver(argumento):
+            try:
+                return tarea(argumento)
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = list(pool.map(envolver, argumentos))
+        return resultados, time.perf_counter() - inicio
+
+    def verificar(self, partido_id, esperado_j1, esperado_j2, esperada_secuencia):
+        descartar_marcador(partido_id)
+        resultado = Resultado.objects.get(partido_id=partido_id)
+        obtenido = (resultado.set1_jugador1, resultado.set1_jugador2, resultado.secuencia_puntos)
+        esperado = (esperado_j1, esperado_j2, esperada_secuencia)
+        if obtenido != esperado:
+            raise CommandError(f"Puntos perdidos: se esperaba {esperado} y la base de datos tiene {obtenido}")
+
+    def probar_sin_secuencia(self, partido_id, puntos, hilos):
+        """Puntos sin numerar desde muchos hilos mientras se escribe en la base de datos."""
+        def sumar(i):
+            obtener_marcador(partido_id).ejecutar(None, 1, 1)
+            if i % 50 == 0:
+                persistir_marcador(partido_id)
+
+        _, duracion = self.ejecutar_en_paralelo(sumar, range(puntos), hilos)
+        self.verificar(partido_id, puntos, 0, puntos)
+        self.stdout.write(f"Sin secuencia: {puntos} puntos en {duracion:.3f}s ({puntos / duracion:,.0f} puntos/s)")
+
+    def probar_con_secuencia(self, partido_id, puntos, hilos):
+        """Cada punto numerado se envía dos veces: el reintento debe ignorarse."""
+        secuencia_inicial = obtener_marcador(partido_id).secuencia
+        envios = [secuencia_inicial + 1 + i // 2 for i in range(puntos * 2)]
+
+        def sumar(secuencia):
+            rechazos = 0
+            while True:
+                estado = obtener_marcador(partido_id).ejecutar(secuencia, 2, 1)
+                if estado != FUERA_DE_ORDEN:
+                    return estado, rechazos
+                # El número anterior aún no llega: el cliente reintenta
+                rechazos += 1
+                time.sleep(0)
+
+        resultados, duracion = self.ejecutar_en_paralelo(sumar, envios, hilos)
+        aplicados = sum(1 for estado, _ in resultados if estado == APLICADO)
+        duplicados = sum(1 for estado, _ in resultados if estado == DUPLICADO)
+        rechazos = sum(r for _, r in resultados)
+        if aplicados != puntos or duplicados != puntos:
+            raise CommandError(f"Se esperaban {puntos} aplicados y {puntos} duplicados; hubo {aplicados} y {duplicados}")
+
+        self.verificar(partido_id, puntos, puntos, secuencia_inicial + puntos)
+        self.stdout.write(
+            f"Con secuencia: {puntos * 2} envíos ({puntos} duplicados ignorados, "
+            f"{rechazos} rechazos fuera de orden) en {duracion:.3f}s"
+        )
+
+    def probar_escritor_concurrente(self, partido_id, puntos):
+        """Dos marcadores sobre el mismo Resultado: el segundo no debe pisar ni perder puntos."""
+        partido = Partido.objects.select_related('llave_torneo__torneo', 'jugador1', 'jugador2').get(id=partido_id)
+        primero = MarcadorEnVivo(partido, partido.resultado_detallado)
+        segundo = MarcadorEnVivo(partido, Resultado.objects.get(partido_id=partido_id))
+
+        primero.ejecutar(None, 1, 1)
+        segundo.ejecutar(None, 1, 1)
+        primero.guardar()
+        # La escritura del segundo choca con la del primero: se reaplica sobre ella
+        segundo.guardar()
+        primero.cerrar()
+        segundo.cerrar()
+
+        self.verificar(partido_id, puntos + 2, puntos, segundo.secuencia)
+        self.stdout.write("Escritor concurrente: la escritura obsoleta se reaplicó sin pisar ni perder puntos")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from gestionarbitros.eventos import compactar_partido
+from gestiontorneo.models import Partido
+
+
+class Command(BaseCommand):
+    help = 'Empaqueta el registro punto a punto de los partidos finalizados que aún tienen eventos sueltos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'partidos', nargs='*', type=int,
+            help='IDs de los partidos a compactar (por defecto: todos los finalizados con eventos)'
+        )
+
+    def handle(self, *args, **options):
+        partidos = Partido.objects.filter(finalizado=True, eventos_punto__isnull=False).distinct()
+        if options['partidos']:
+            partidos = partidos.filter(id__in=options['partidos'])
+
+        total = 0
+        for partido_id in partidos.values_list('id', flat=True):
+            try:
+                cantidad = compactar_partido(partido_id)
+                total += cantidad
+                self.stdout.write(f"Partido {partido_id}: {cantidad} eventos compactados")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error compactando el partido {partido_id}: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Compactación completada: {total} eventos."))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from gestionarbitros.capa_hub import HubCanales
+import asyncio
+
+
+class Command(BaseCommand):
+    help = 'Inicia el hub de canales que comparten los procesos Daphne (CANALES_HUB)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ruta', default=None,
+            help='Socket Unix del hub (por defecto: la ruta configurada en CHANNEL_LAYERS)'
+        )
+
+    def handle(self, *args, **options):
+        capa = settings.CHANNEL_LAYERS.get('default', {})
+        config = dict(capa.get('CONFIG', {})) if capa.get('BACKEND', '').endswith('.CapaHub') else {}
+        if options['ruta']:
+            config['ruta'] = options['ruta']
+        if not config.get('ruta'):
+            raise CommandError("Indique --ruta o defina CANALES_HUB para usar la capa del hub")
+
+        hub = HubCanales(**config)
+        self.stdout.write(f"🔌 Hub de canales escuchando en {hub.ruta}")
+        try:
+            asyncio.run(hub.servir())
+        except KeyboardInterrupt:
+            self.stdout.write("Hub de canales detenido.")
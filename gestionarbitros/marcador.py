@@ -0,0 +1,656 @@
+"""
+Marcador en vivo en memoria para los partidos que se están arbitrando.
+
+Cada punto marcado por el árbitro se aplica sobre un ``MarcadorEnVivo`` que
+vive en un solo proceso (con ``InMemoryChannelLayer`` hay un único proceso).
+El proceso que carga el marcador toma un bloqueo de archivo sobre
+``partido_<id>.lock`` junto al diario y lo suelta al descartarlo; mientras
+tanto, otro proceso que reciba un comando del partido lo rechaza
+(``MarcadorEnOtroProceso``) en lugar de armar un segundo marcador. Con varios
+workers, el balanceador debe enviar el WebSocket y las peticiones HTTP de un
+mismo partido al mismo proceso (por ejemplo, afinidad por la ruta). Si el
+proceso dueño muere, el sistema operativo libera el bloqueo y el siguiente
+proceso recupera los puntos del diario. El punto se anota primero en un
+diario de solo anexado en disco, se difunde de inmediato al grupo y el puntaje
+del set se escribe en ``Resultado`` en segundo plano cada
+``MARCADOR_INTERVALO_ESCRITURA`` segundos, y siempre al guardar un set o
+cerrar el partido.
+
+Cada punto también queda como evento en ``EventoPunto`` (ver
+``gestionarbitros.eventos``); los eventos se insertan por lotes junto con la
+escritura en ``Resultado`` y deshacer quita el último punto vigente del
+registro en lugar de restar a ciegas en una columna.
+
+Cada número aplicado guarda también la firma del comando (pestaña que lo
+numeró, tipo y jugador, ver ``firma_comando``): un comando con un número ya
+usado solo es un reenvío si su firma coincide. Si no coincide (dos pestañas
+del árbitro numeraron a la vez), el comando no se aplicó y se responde
+FUERA_DE_ORDEN con la secuencia vigente para que el cliente lo renumere. Los
+números cuya firma se desconoce (escritos antes de un reinicio) se siguen
+tratando como reenvíos.
+
+``Resultado.secuencia_puntos`` registra el último punto escrito: si el proceso
+se reinicia, el marcador se reconstruye desde ``Resultado`` y se le aplican
+las líneas del diario con una secuencia mayor.
+
+La escritura no sobrescribe el puntaje: suma en SQL (``F()``) la diferencia
+acumulada desde la última escritura y solo si ``secuencia_puntos`` sigue
+siendo la que este marcador escribió por última vez. Si otro escritor avanzó
+la secuencia, el marcador se rehace sobre el ``Resultado`` vigente, vuelve a
+aplicar encima los puntos que no alcanzó a escribir y reintenta: ni pisa
+puntos ajenos ni pierde los propios.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from gestiontorneo.models import EventoPunto, Partido, Resultado
+
+from .difusion import difundir
+from .eventos import eventos_partido, puntos_vigentes, quitar_ultimo
+
+try:
+    import fcntl
+except ImportError:  # Sin bloqueos de archivo (Windows) no se verifica el proceso dueño
+    fcntl = None
+
+APLICADO = 'aplicado'
+DUPLICADO = 'duplicado'
+FUERA_DE_ORDEN = 'fuera_de_orden'
+
+# Escrituras en conflicto seguidas antes de desistir (los puntos siguen en el diario)
+MAX_REINTENTOS_ESCRITURA = 3
+
+
+class MarcadorEnConflicto(Exception):
+    """Otro escritor siguió avanzando ``Resultado`` en cada reintento de escritura."""
+
+
+class MarcadorEnOtroProceso(Exception):
+    """El marcador del partido está cargado en otro proceso, dueño de su diario."""
+
+_marcadores = {}
+_lock = threading.Lock()
+_escritor = None
+# Archivo de bloqueo abierto de cada partido cuyo marcador pertenece a este proceso
+_bloqueos = {}
+
+
+def _ruta_diario(partido_id, extension='log'):
+    directorio = getattr(settings, 'MARCADOR_DIARIO_DIR', os.path.join(settings.BASE_DIR, 'media', 'marcadores'))
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, f'partido_{partido_id}.{extension}')
+
+
+def _tomar_partido(partido_id):
+    """
+    Reserva el marcador del partido para este proceso (llamar con ``_lock`` tomado).
+
+    Raises:
+        MarcadorEnOtroProceso: Si otro proceso tiene el bloqueo del partido
+    """
+    if fcntl is None or partido_id in _bloqueos:
+        return
+    # El archivo no se borra al soltarlo: otro proceso podría estar bloqueando ese mismo inodo
+    archivo = open(_ruta_diario(partido_id, 'lock'), 'a')
+    try:
+        fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        archivo.close()
+        raise MarcadorEnOtroProceso(f"El partido {partido_id} se está arbitrando desde otro proceso")
+    _bloqueos[partido_id] = archivo
+
+
+def _soltar_partido(partido_id):
+    """Libera la reserva del partido si su marcador ya no está en memoria."""
+    with _lock:
+        if partido_id in _marcadores:
+            return
+        archivo = _bloqueos.pop(partido_id, None)
+    if archivo is not None:
+        archivo.close()
+
+
+def firma_comando(tipo, jugador=None, cliente=None):
+    """
+    Contenido de un comando numerado, para distinguir un reenvío de otro comando
+    que usó el mismo número.
+
+    Args:
+        tipo (str): 'point', 'undo' o 'close_set'
+        jugador (int): Jugador indicado por el cliente (None si no lo indicó)
+        cliente (str): Identificador de la pestaña que numeró el comando
+
+    Returns:
+        tuple: (cliente, tipo, jugador) con '' y 0 para lo no indicado
+    """
+    return (str(cliente or ''), tipo, jugador if jugador in (1, 2) else 0)
+
+
+def nombre_jugador(jugador):
+    """Nombre completo del jugador o "BYE" como en el resto del panel."""
+    return f"{jugador.nombre} {jugador.apellido}" if jugador else "BYE"
+
+
+class MarcadorEnVivo:
+    """
+    Estado en memoria del puntaje de un partido.
+
+    Attributes:
+        partido_id (int): ID del partido
+        mejor_de_sets (int): Sets a los que se juega el partido
+        puntos (list): Puntos [jugador1, jugador2] de cada set (índice 0 = set 1)
+        sets (list): Sets ganados [jugador1, jugador2] según ``Resultado``
+        secuencia (int): Último comando aplicado (puntos, deshacer, cierre de set)
+        secuencia_guardada (int): Último comando escrito en ``Resultado``
+        historial (list): Jugador de cada punto vigente del set actual, para deshacer
+        deltas (dict): Puntos {set: [jugador1, jugador2]} sumados desde la última escritura
+        eventos (list): Eventos de punto aún no insertados en ``EventoPunto``
+        firmas (dict): Firma (``firma_comando``) del comando aplicado con cada secuencia
+    """
+
+    def __init__(self, partido, resultado):
+        _, self.mejor_de_sets, _ = partido.llave_torneo.modalidad_sets()
+        self.partido_id = partido.id
+        self.resultado_id = resultado.id
+        self.nombres = [nombre_jugador(partido.jugador1), nombre_jugador(partido.jugador2)]
+        self.estado = partido.estado_partido
+        self.finalizado = partido.finalizado
+        self.ganador = nombre_jugador(partido.ganador) if partido.ganador else None
+        self.puntos = [
+            [getattr(resultado, f'set{i}_jugador1'), getattr(resultado, f'set{i}_jugador2')]
+            for i in range(1, 10)
+        ]
+        self.sets = [resultado.sets_ganados_jugador1, resultado.sets_ganados_jugador2]
+        self.secuencia = resultado.secuencia_puntos
+        self.secuencia_guardada = resultado.secuencia_puntos
+        self.historial = []
+        self.deltas = {}
+        self.eventos = []
+        self.firmas = {}
+        self.lock = threading.Lock()
+        self.lock_escritura = threading.Lock()
+        self.diario = None
+
+    @property
+    def set_actual(self):
+        """Set en juego: el siguiente a los ya guardados con ``guardar_set``."""
+        return min(self.sets[0] + self.sets[1] + 1, 9)
+
+    @property
+    def pendiente(self):
+        """Indica si hay puntos aplicados que aún no se escriben en ``Resultado``."""
+        return self.secuencia != self.secuencia_guardada
+
+    def _aplicar(self, secuencia, set_numero, jugador, delta, momento):
+        # Deshacer solo quita un punto vigente del registro de ese jugador
+        if delta < 0 and not quitar_ultimo(self.historial, jugador):
+            return False
+        if delta > 0:
+            self.historial.append(jugador)
+        puntos = self.puntos[set_numero - 1]
+        puntos[jugador - 1] = max(puntos[jugador - 1] + delta, 0)
+        pendientes = self.deltas.setdefault(set_numero, [0, 0])
+        pendientes[jugador - 1] += delta
+        self.eventos.append((secuencia, momento, set_numero, jugador, delta))
+        return True
+
+    def cargar_historial(self):
+        """Reconstruye desde el registro de eventos los puntos vigentes del set actual."""
+        self.historial = puntos_vigentes(eventos_partido(self.partido_id), self.set_actual)
+
+    def recuperar_diario(self):
+        """Aplica los puntos del diario posteriores a la última escritura."""
+        ruta = _ruta_diario(self.partido_id)
+        if not os.path.exists(ruta):
+            return
+        with open(ruta) as diario:
+            for linea in diario:
+                try:
+                    datos = json.loads(linea)
+                    secuencia, set_numero, jugador, delta, momento = datos[:5]
+                except ValueError:
+                    continue  # Línea incompleta por una caída a mitad de escritura
+                if secuencia > self.secuencia:
+                    if jugador and delta:
+                        momento = datetime.fromtimestamp(momento, tz=dt_timezone.utc)
+                        self._aplicar(secuencia, set_numero, jugador, delta, momento)
+                    if len(datos) > 5:
+                        self.firmas[secuencia] = tuple(datos[5])
+                    self.secuencia = secuencia
+
+    def _clasificar(self, secuencia, firma=None):
+        if secuencia <= self.secuencia:
+            anterior = self.firmas.get(secuencia)
+            if firma is not None and anterior is not None and anterior != firma:
+                # Otro cliente usó este número: el comando no se aplicó
+                return FUERA_DE_ORDEN
+            return DUPLICADO
+        if secuencia > self.secuencia + 1:
+            return FUERA_DE_ORDEN
+        return APLICADO
+
+    def comprobar_secuencia(self, secuencia, firma=None):
+        """
+        Indica qué pasaría con un comando sin aplicarlo.
+
+        Args:
+            secuencia (int): Número del comando enviado por el cliente
+            firma (tuple): Contenido del comando (``firma_comando``)
+
+        Returns:
+            str: APLICADO si es el siguiente esperado, DUPLICADO o FUERA_DE_ORDEN
+        """
+        with self.lock:
+            return self._clasificar(secuencia, firma)
+
+    def ejecutar(self, secuencia, jugador=None, delta=0, firma=None):
+        """
+        Aplica un comando numerado del árbitro sobre el set actual.
+
+        Cada comando aceptado consume el siguiente número de secuencia y queda en
+        el diario, aunque no cambie el marcador (por ejemplo, deshacer sin puntos
+        del jugador en el set).
+
+        Args:
+            secuencia (int): Número del comando enviado por el cliente, o None
+                para asignar el siguiente (peticiones HTTP sin numerar)
+            jugador (int): 1 o 2 (None si el comando no toca puntos)
+            delta (int): +1 para sumar, -1 para deshacer el último punto del jugador,
+                0 sin cambio de puntos
+            firma (tuple): Contenido del comando tal como lo envió el cliente
+                (``firma_comando``), para reconocer sus reenvíos
+
+        Returns:
+            str: APLICADO, DUPLICADO (el mismo comando ya se aplicó, se ignora) o
+                FUERA_DE_ORDEN (salta números, o el número ya lo usó otro comando)
+        """
+        with self.lock:
+            if secuencia is not None:
+                estado = self._clasificar(secuencia, firma)
+                if estado != APLICADO:
+                    return estado
+
+            set_numero = self.set_actual
+            momento = timezone.now()
+            self.secuencia += 1
+            if jugador and delta and not self._aplicar(self.secuencia, set_numero, jugador, delta, momento):
+                delta = 0
+
+            if self.diario is None:
+                self.diario = open(_ruta_diario(self.partido_id), 'a')
+            linea = [self.secuencia, set_numero, jugador or 0, delta, momento.timestamp()]
+            if firma is not None:
+                self.firmas[self.secuencia] = firma
+                linea.append(list(firma))
+            self.diario.write(json.dumps(linea) + '\n')
+            self.diario.flush()
+            return APLICADO
+
+    def anotar(self, jugador, accion):
+        """
+        Suma un punto o deshace el último del jugador (sin número de secuencia).
+
+        Args:
+            jugador (int): 1 o 2
+            accion (str): 'sumar' o 'restar'
+        """
+        self.ejecutar(None, jugador, 1 if accion == 'sumar' else -1)
+
+    def ultimo_anotador(self):
+        """
+        Jugador que marcó el último punto del set actual que sigue vigente.
+
+        Returns:
+            int: 1 o 2, o None si no hay puntos para deshacer
+        """
+        with self.lock:
+            return self.historial[-1] if self.historial else None
+
+    def como_dict(self):
+        """
+        Datos del partido con el formato de ``enviar_actualizacion_partido``.
+
+        Returns:
+            dict: Nombres, puntos del set actual, sets, estado y ganador
+        """
+        with self.lock:
+            set_actual = self.set_actual
+            puntos = self.puntos[set_actual - 1]
+            return {
+                'partido_id': self.partido_id,
+                'jugador1': {'nombre': self.nombres[0], 'puntos': puntos[0], 'sets': self.sets[0]},
+                'jugador2': {'nombre': self.nombres[1], 'puntos': puntos[1], 'sets': self.sets[1]},
+                'set_actual': set_actual,
+                'estado': self.estado,
+                'finalizado': self.finalizado,
+                'ganador': self.ganador,
+                'secuencia': self.secuencia,
+            }
+
+    def guardar(self):
+        """
+        Escribe en ``Resultado`` los puntos acumulados desde la última escritura.
+
+        Cada columna de set se incrementa de forma atómica en la base de datos y
+        la fila solo se actualiza si ``secuencia_puntos`` no cambió desde la
+        escritura anterior. Si cambió, el marcador se rehace sobre el resultado
+        vigente con los puntos pendientes encima y se vuelve a intentar. Después,
+        si no llegaron puntos nuevos, el diario se vacía.
+
+        Returns:
+            bool: True (todo lo aplicado quedó escrito)
+
+        Raises:
+            MarcadorEnConflicto: Si la secuencia cambió en todos los reintentos; los
+                puntos siguen en memoria y en el diario para la próxima escritura
+        """
+        with self.lock_escritura:
+            for _ in range(MAX_REINTENTOS_ESCRITURA):
+                if self._escribir():
+                    return True
+                print(f"⚠️ Resultado del partido {self.partido_id} modificado por otro escritor "
+                      f"(secuencia esperada {self.secuencia_guardada}); se reaplican los puntos pendientes")
+                self._reanclar()
+            raise MarcadorEnConflicto(f"El resultado del partido {self.partido_id} cambia en cada escritura")
+
+    def _escribir(self):
+        """Intenta escribir lo pendiente; devuelve False si otro escritor avanzó la secuencia."""
+        with self.lock:
+            if not self.pendiente:
+                return True
+            deltas, self.deltas = self.deltas, {}
+            eventos, self.eventos = self.eventos, []
+            secuencia = self.secuencia
+            guardada = self.secuencia_guardada
+
+        cambios = {'secuencia_puntos': secuencia}
+        for set_numero, pendientes in deltas.items():
+            for jugador, delta in enumerate(pendientes, start=1):
+                if delta:
+                    columna = f'set{set_numero}_jugador{jugador}'
+                    cambios[columna] = F(columna) + delta
+
+        filas = 0
+        try:
+            with transaction.atomic():
+                filas = Resultado.objects.filter(
+                    id=self.resultado_id, secuencia_puntos=guardada
+                ).update(**cambios)
+                if filas:
+                    # Los eventos entran en la misma transacción que la secuencia
+                    EventoPunto.objects.bulk_create([
+                        EventoPunto(
+                            partido_id=self.partido_id, secuencia=secuencia_evento,
+                            set_numero=set_numero, jugador=jugador, delta=delta, momento=momento,
+                        )
+                        for secuencia_evento, momento, set_numero, jugador, delta in eventos
+                    ], batch_size=500)
+        finally:
+            if not filas:
+                # Devolver los puntos a la cola para el próximo intento
+                with self.lock:
+                    self.eventos[:0] = eventos
+                    for set_numero, (delta_j1, delta_j2) in deltas.items():
+                        pendientes = self.deltas.setdefault(set_numero, [0, 0])
+                        pendientes[0] += delta_j1
+                        pendientes[1] += delta_j2
+        if not filas:
+            return False
+
+        with self.lock:
+            self.secuencia_guardada = secuencia
+            if self.secuencia == secuencia:
+                if self.diario is not None:
+                    self.diario.seek(0)
+                    self.diario.truncate()
+                else:
+                    # Diario heredado de un proceso anterior, ya aplicado y escrito
+                    try:
+                        os.remove(_ruta_diario(self.partido_id))
+                    except OSError:
+                        pass
+        return True
+
+    def _reanclar(self):
+        """
+        Rehace el marcador sobre el ``Resultado`` vigente y le aplica los puntos pendientes.
+
+        Los eventos aún no escritos se numeran a continuación de la secuencia de
+        la base de datos y el diario se reescribe con ellos, de modo que un
+        reinicio tampoco los pierde. El cliente que numeraba desde la secuencia
+        anterior recibe FUERA_DE_ORDEN en su próximo comando junto con la nueva.
+        """
+        resultado = Resultado.objects.get(id=self.resultado_id)
+        sets = [resultado.sets_ganados_jugador1, resultado.sets_ganados_jugador2]
+        historial = puntos_vigentes(eventos_partido(self.partido_id), min(sets[0] + sets[1] + 1, 9))
+
+        with self.lock:
+            pendientes, self.eventos, self.deltas = self.eventos, [], {}
+            self.puntos = [
+                [getattr(resultado, f'set{i}_jugador1'), getattr(resultado, f'set{i}_jugador2')]
+                for i in range(1, 10)
+            ]
+            self.sets = sets
+            self.historial = historial
+            self.secuencia = self.secuencia_guardada = resultado.secuencia_puntos
+            # Los números anteriores ya no identifican comandos: sus reenvíos son duplicados
+            self.firmas = {}
+            for _, momento, set_numero, jugador, delta in pendientes:
+                self.secuencia += 1
+                self._aplicar(self.secuencia, set_numero, jugador, delta, momento)
+
+            if self.diario is None:
+                self.diario = open(_ruta_diario(self.partido_id), 'a')
+            self.diario.seek(0)
+            self.diario.truncate()
+            for secuencia, momento, set_numero, jugador, delta in self.eventos:
+                linea = [secuencia, set_numero, jugador, delta, momento.timestamp()]
+                self.diario.write(json.dumps(linea) + '\n')
+            self.diario.flush()
+
+    def cerrar(self):
+        """Libera el diario abierto del marcador."""
+        with self.lock:
+            if self.diario is not None:
+                self.diario.close()
+                self.diario = None
+
+
+def obtener_marcador(partido_id):
+    """
+    Devuelve el marcador en memoria del partido, cargándolo la primera vez.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        MarcadorEnVivo: Marcador del partido, o None si el partido no existe
+
+    Raises:
+        MarcadorEnOtroProceso: Si el marcador del partido pertenece a otro proceso
+    """
+    with _lock:
+        marcador = _marcadores.get(partido_id)
+    if marcador is not None:
+        return marcador
+
+    try:
+        partido = Partido.objects.select_related(
+            'llave_torneo', 'jugador1', 'jugador2', 'ganador'
+        ).get(id=partido_id)
+    except Partido.DoesNotExist:
+        return None
+
+    # La reserva va antes de leer Resultado: el dueño anterior ya escribió lo suyo al soltarla
+    with _lock:
+        _tomar_partido(partido_id)
+    try:
+        resultado, _ = Resultado.objects.get_or_create(partido=partido)
+        nuevo = MarcadorEnVivo(partido, resultado)
+        nuevo.cargar_historial()
+        nuevo.recuperar_diario()
+    except Exception:
+        _soltar_partido(partido_id)
+        raise
+    with _lock:
+        # Otro hilo pudo cargarlo mientras tanto: conservar el primero
+        marcador = _marcadores.setdefault(partido_id, nuevo)
+    _iniciar_escritor()
+    return marcador
+
+
+def marcador_activo(partido_id):
+    """
+    Devuelve el marcador del partido solo si ya está cargado en memoria.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        MarcadorEnVivo: Marcador cargado o None
+    """
+    with _lock:
+        return _marcadores.get(partido_id)
+
+
+def marcador_para_lectura(partido_id):
+    """
+    Devuelve el marcador en memoria si existe o si quedó un diario sin escribir.
+
+    Tras un reinicio, el primer lector reconstruye el marcador desde el diario
+    en lugar de mostrar el último puntaje escrito en ``Resultado``.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        MarcadorEnVivo: Marcador del partido o None si no hay puntos en vivo
+    """
+    marcador = marcador_activo(partido_id)
+    if marcador is None and os.path.exists(_ruta_diario(partido_id)):
+        try:
+            marcador = obtener_marcador(partido_id)
+        except MarcadorEnOtroProceso:
+            # El dueño difunde sus puntos; aquí basta con lo escrito en Resultado
+            return None
+    return marcador
+
+
+def persistir_marcador(partido_id):
+    """
+    Escribe de inmediato el puntaje pendiente de un partido.
+
+    Debe llamarse antes de leer o modificar ``Resultado`` fuera del marcador
+    (guardar un set, cerrar el partido, mostrar el panel del árbitro).
+
+    Args:
+        partido_id (int): ID del partido
+    """
+    marcador = marcador_activo(partido_id)
+    if marcador is not None:
+        marcador.guardar()
+
+
+def descartar_marcador(partido_id):
+    """
+    Escribe lo pendiente y quita el marcador de memoria.
+
+    Se usa cuando ``Resultado`` cambia por otra vía (set guardado, partido
+    cerrado): el próximo punto recarga el estado desde la base de datos.
+
+    Args:
+        partido_id (int): ID del partido
+
+    Returns:
+        MarcadorEnVivo: Marcador descartado, o None si no estaba en memoria
+    """
+    with _lock:
+        marcador = _marcadores.pop(partido_id, None)
+    if marcador is not None:
+        marcador.guardar()
+        marcador.cerrar()
+        try:
+            os.remove(_ruta_diario(partido_id))
+        except OSError:
+            pass
+        _soltar_partido(partido_id)
+    return marcador
+
+
+def es_arbitro_asignado(partido_id, usuario_id):
+    """
+    Indica si el usuario es hoy el árbitro asignado al partido.
+
+    Se consulta ``Partido`` en cada comando en lugar de confiar en el marcador:
+    el organizador puede reasignar el partido desde otro proceso mientras el
+    marcador sigue en memoria.
+
+    Args:
+        partido_id (int): ID del partido
+        usuario_id (int): ID del usuario que envía el comando
+
+    Returns:
+        bool: True si el partido está asignado a ese usuario
+    """
+    return Partido.objects.filter(id=partido_id, arbitro_id=usuario_id).exists()
+
+
+def difundir_marcador(marcador):
+    """
+    Publica el estado en memoria del partido sin consultar la base de datos.
+
+    Las ráfagas de puntos se agrupan en ``gestionarbitros.difusion``.
+
+    Args:
+        marcador (MarcadorEnVivo): Marcador actualizado
+    """
+    difundir(marcador.partido_id, marcador.como_dict())
+
+
+def guardar_pendientes():
+    """
+    Escribe en la base de datos todos los marcadores con puntos pendientes.
+
+    Returns:
+        int: Cantidad de marcadores escritos
+    """
+    with _lock:
+        marcadores = list(_marcadores.values())
+    escritos = 0
+    for marcador in marcadores:
+        if marcador.pendiente:
+            try:
+                marcador.guardar()
+                escritos += 1
+            except Exception as e:
+                print(f"❌ Error guardando marcador del partido {marcador.partido_id}: {e}")
+    return escritos
+
+
+def _bucle_escritor():
+    intervalo = getattr(settings, 'MARCADOR_INTERVALO_ESCRITURA', 1.0)
+    while True:
+        time.sleep(intervalo)
+        try:
+            guardar_pendientes()
+        finally:
+            # El hilo vive mientras el proceso: no dejar conexiones colgadas
+            connection.close()
+
+
+def _iniciar_escritor():
+    """Inicia el hilo de escritura en segundo plano la primera vez que se necesita."""
+    global _escritor
+    with _lock:
+        if _escritor is None:
+            _escritor = threading.Thread(target=_bucle_escritor, name='marcador-escritor', daemon=True)
+            _escritor.start()
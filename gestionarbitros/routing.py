@@ -3,4 +3,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'^ws/partido/(?P<partido_id>\d+)/$', consumers.PartidoConsumer.as_asgi()),
+    re_path(r'^ws/arbitro/$', consumers.ArbitroConsumer.as_asgi()),
+    re_path(r'^ws/pantalla/torneo/(?P<torneo_id>\d+)/$', consumers.PantallaConsumer.as_asgi()),
+    re_path(r'^ws/pantalla/$', consumers.PantallaConsumer.as_asgi()),
 ]
@@ -0,0 +1,236 @@
+"""
+Salida de cuadros hacia cada espectador, con protección ante clientes lentos.
+
+``PartidoConsumer`` y ``PantallaConsumer`` no esperan el envío: dejan el
+cuadro en la cola de la conexión y una tarea propia la vacía, así el canal del
+consumidor sigue leyendo los grupos aunque el cliente no alcance a recibir. Si
+la cola llega a ``ESPECTADOR_COLA_MAXIMA`` mensajes, la conexión pasa a "solo
+último estado": se descartan los mensajes pendientes y los que sigan llegando,
+y cuando el cliente se pone al día recibe un único estado completo con el
+estado vigente (``partido_status``, o ``pantalla_status`` con todos los
+partidos de una pantalla).
+
+Daphne no frena ``send`` cuando el socket del cliente se llena (los bytes se
+acumulan en su buffer), así que el atraso también se mide con latidos: la
+conexión envía un ``ping`` numerado cada ``ESPECTADOR_INTERVALO_LATIDO``
+segundos por la misma cola y el cliente responde ``pong``. Un ping sin
+respuesta por más de ``ESPECTADOR_RETRASO_MAXIMO`` segundos pasa la conexión
+a solo último estado, y por más de ``ESPECTADOR_ESPERA_MAXIMA`` la cierra con
+el código 4008. La vigilancia por latidos empieza con el primer ``pong``: un
+cliente que no conoce los latidos nunca se desconecta por esta vía.
+"""
+
+import asyncio
+import collections
+import time
+
+from django.conf import settings
+
+
+CODIGO_CLIENTE_LENTO = 4008
+
+
+class EstadisticasSalida:
+    """
+    Contadores de salida de los espectadores del proceso.
+
+    Attributes:
+        conexiones (int): Conexiones de espectadores abiertas
+        encolados (int): Cuadros del grupo recibidos para algún espectador
+        enviados (int): Cuadros y estados enviados a los clientes
+        omitidos (int): Cuadros descartados por estar la conexión en solo último estado
+        solo_ultimo (int): Veces que una conexión pasó a solo último estado
+        desconectadas (int): Conexiones cerradas por no responder los latidos
+    """
+
+    def __init__(self):
+        self.conexiones = 0
+        self.encolados = 0
+        self.enviados = 0
+        self.omitidos = 0
+        self.solo_ultimo = 0
+        self.desconectadas = 0
+
+    def como_dict(self):
+        return {
+            'conexiones': self.conexiones,
+            'encolados': self.encolados,
+            'enviados': self.enviados,
+            'omitidos': self.omitidos,
+            'solo_ultimo': self.solo_ultimo,
+            'desconectadas': self.desconectadas,
+        }
+
+
+estadisticas = EstadisticasSalida()
+
+
+class SalidaEspectador:
+    """
+    Cola de salida de una conexión de espectador.
+
+    Attributes:
+        enviar (callable): Función asíncrona que envía un mensaje al cliente
+        estado_vigente (callable): Función asíncrona que devuelve el estado completo actual
+            (``partido_status`` o ``pantalla_status``)
+        cerrar (callable): Función asíncrona que cierra la conexión con un código
+        cola (deque): Mensajes por enviar, en orden
+        solo_ultimo (bool): True mientras la conexión solo recibirá el estado vigente
+        estado_pedido (bool): True si el cliente pidió el estado completo y aún no se le envía
+        versiones_minimas (dict): Versión del último estado completo enviado de cada
+            partido (clave None en una conexión de un solo partido); los cuadros
+            anteriores ya están incluidos en él
+        latido_pendiente (tuple): (número, momento monotónico) del ping sin respuesta
+        con_latidos (bool): True desde que el cliente respondió su primer ping
+        hay_mensajes (asyncio.Event): Despierta a la tarea que vacía la cola
+        tareas (list): Tareas de escritura y de latidos
+    """
+
+    def __init__(self, enviar, estado_vigente, cerrar):
+        self.enviar = enviar
+        self.estado_vigente = estado_vigente
+        self.cerrar = cerrar
+        self.cola = collections.deque()
+        self.solo_ultimo = False
+        self.estado_pedido = False
+        self.versiones_minimas = {}
+        self.latido_pendiente = None
+        self.numero_latido = 0
+        self.con_latidos = False
+        self.hay_mensajes = asyncio.Event()
+        self.tareas = []
+
+    def iniciar(self):
+        """Inicia las tareas de la conexión (llamar después de ``accept``)."""
+        bucle = asyncio.get_running_loop()
+        self.tareas = [bucle.create_task(self._escribir()), bucle.create_task(self._latir())]
+        estadisticas.conexiones += 1
+
+    def detener(self):
+        """Cancela las tareas de la conexión y descarta lo pendiente."""
+        if not self.tareas:
+            return
+        for tarea in self.tareas:
+            tarea.cancel()
+        self.tareas = []
+        self.cola.clear()
+        estadisticas.conexiones -= 1
+
+    def encolar(self, mensaje):
+        """
+        Deja un mensaje para enviarlo sin esperar al cliente.
+
+        Args:
+            mensaje (dict): Cuadro ``partido_delta`` o mensaje del consumidor
+                (``partido_status``, ``partido_fin``)
+        """
+        estadisticas.encolados += 1
+        if self.solo_ultimo:
+            estadisticas.omitidos += 1
+        elif len(self.cola) >= getattr(settings, 'ESPECTADOR_COLA_MAXIMA', 32):
+            estadisticas.omitidos += 1
+            self.pasar_a_solo_ultimo()
+        else:
+            self.cola.append(mensaje)
+        self.hay_mensajes.set()
+
+    def pasar_a_solo_ultimo(self):
+        """Descarta los cuadros pendientes: el cliente recibirá solo el estado vigente."""
+        if not self.solo_ultimo:
+            self.solo_ultimo = True
+            estadisticas.solo_ultimo += 1
+        estadisticas.omitidos += self._descartar_cuadros()
+
+    def pedir_estado(self):
+        """El cliente pidió el estado completo: reemplaza a los cuadros pendientes."""
+        self._descartar_cuadros()
+        self.estado_pedido = True
+        self.hay_mensajes.set()
+
+    def registrar_estado(self, mensaje):
+        """
+        Anota las versiones de un estado completo enviado al cliente.
+
+        Args:
+            mensaje (dict): ``partido_status`` o ``pantalla_status``
+        """
+        if mensaje['type'] == 'pantalla_status':
+            for partido in mensaje['partidos']:
+                self.versiones_minimas[partido['partido_id']] = partido['v']
+        elif mensaje['type'] == 'partido_status':
+            self.versiones_minimas[mensaje.get('partido_id')] = mensaje['v']
+
+    def _descartar_cuadros(self):
+        # Los latidos se conservan: su respuesta es la que indica que el cliente se puso al día
+        latidos = [mensaje for mensaje in self.cola if mensaje['type'] == 'ping']
+        descartados = len(self.cola) - len(latidos)
+        self.cola = collections.deque(latidos)
+        return descartados
+
+    def recibir_pong(self, numero):
+        """
+        Registra la respuesta del cliente a un latido.
+
+        Args:
+            numero (int): Número del ping respondido
+        """
+        if self.latido_pendiente is not None and numero == self.latido_pendiente[0]:
+            self.latido_pendiente = None
+            self.con_latidos = True
+            if self.solo_ultimo:
+                self.hay_mensajes.set()
+
+    def atrasado(self):
+        """Indica si el cliente lleva más de ``ESPECTADOR_RETRASO_MAXIMO`` segundos sin responder un latido."""
+        if not self.con_latidos or self.latido_pendiente is None:
+            return False
+        espera = time.monotonic() - self.latido_pendiente[1]
+        return espera > getattr(settings, 'ESPECTADOR_RETRASO_MAXIMO', 10)
+
+    async def _escribir(self):
+        while True:
+            await self.hay_mensajes.wait()
+            self.hay_mensajes.clear()
+            while True:
+                if self.estado_pedido or (self.solo_ultimo and not self.atrasado()):
+                    # Un solo estado completo reemplaza a todo lo descartado
+                    self.solo_ultimo = self.estado_pedido = False
+                    mensaje = await self.estado_vigente()
+                elif self.cola:
+                    mensaje = self.cola.popleft()
+                    # Un cuadro ya incluido en el último estado completo no aporta nada
+                    version_minima = self.versiones_minimas.get(mensaje.get('partido_id'))
+                    if (mensaje['type'] == 'partido_delta' and version_minima is not None
+                            and mensaje['v'] <= version_minima):
+                        continue
+                else:
+                    break
+                self.registrar_estado(mensaje)
+                await self.enviar(mensaje)
+                estadisticas.enviados += 1
+
+    async def _latir(self):
+        intervalo = getattr(settings, 'ESPECTADOR_INTERVALO_LATIDO', 5)
+        while True:
+            if self.latido_pendiente is None:
+                self.numero_latido += 1
+                self.latido_pendiente = (self.numero_latido, time.monotonic())
+                self.cola.append({'type': 'ping', 'n': self.numero_latido})
+                self.hay_mensajes.set()
+            await asyncio.sleep(intervalo)
+
+            if not self.con_latidos or self.latido_pendiente is None:
+                continue
+            espera = time.monotonic() - self.latido_pendiente[1]
+            if espera > getattr(settings, 'ESPECTADOR_ESPERA_MAXIMA', 30):
+                estadisticas.desconectadas += 1
+                print(f"🐢 Espectador sin responder hace {espera:.0f}s: se cierra la conexión")
+                await self.cerrar(CODIGO_CLIENTE_LENTO)
+                return
+            if self.atrasado():
+                self.pasar_a_solo_ultimo()
+
+
+def estadisticas_espectadores():
+    """Contadores de salida de los espectadores del proceso (ver ``EstadisticasSalida``)."""
+    return estadisticas.como_dict()
@@ -1,3 +1,822 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from gestiontorneo.models import EventoPunto, LineaTiempoPartido, Partido, Resultado, UsuarioPersonalizado
+from .management.commands.benchmark_puntos import borrar_partido_prueba, crear_partido_prueba
+from . import marcador as modulo_marcador
+from .capa_hub import CapaHub, HubCanales
+from .consumers import estados_partidos
+from .difusion import DespachadorDifusion, DifusorPartidos, compactar, diferencias
+from .eventos import compactar_partido, desempaquetar, empaquetar, eventos_partido, linea_tiempo, puntos_vigentes
+from .marcador import (
+    APLICADO, DUPLICADO, FUERA_DE_ORDEN,
+    MarcadorEnConflicto, MarcadorEnVivo, _ruta_diario, descartar_marcador, marcador_activo, marcador_para_lectura, obtener_marcador,
+    persistir_marcador,
+)
+from .routing import websocket_urlpatterns
+from .salida import SalidaEspectador
+
+
+class PartidoEnJuegoMixin:
+    """
+    Partido en curso con un árbitro, y diario del marcador en un directorio temporal.
+
+    Se usa con ``TransactionTestCase``: el hilo escritor del marcador y los hilos
+    de las pruebas usan sus propias conexiones y deben ver los datos confirmados.
+    """
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(MARCADOR_DIARIO_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.partido = crear_partido_prueba('pruebas')
+        self.arbitro = self.crear_arbitro('arbitro')
+        self.partido.arbitro = self.arbitro
+        self.partido.save()
+        self.addCleanup(borrar_partido_prueba, self.partido)
+        self.addCleanup(descartar_marcador, self.partido.id)
+
+    def crear_arbitro(self, nombre):
+        return UsuarioPersonalizado.objects.create(
+            username=nombre, email=f'{nombre}@ejemplo.cl', tipo_usuario='arbitro',
+        )
+
+    def cliente(self, usuario):
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente
+
+    def post(self, cliente, url, datos):
+        return cliente.post(url, json.dumps(datos), content_type='application/json')
+
+    async def conectar(self, usuario):
+        """Conecta un socket del partido con el usuario ya autenticado y descarta el estado inicial."""
+        comunicador = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/partido/{self.partido.id}/')
+        comunicador.scope['user'] = usuario
+        conectado, _ = await comunicador.connect()
+        self.assertTrue(conectado)
+        self.assertEqual((await comunicador.receive_json_from())['type'], 'partido_status')
+        return comunicador
+
+    async def recibir_tipo(self, comunicador, tipo):
+        """Primer mensaje del tipo pedido, omitiendo los cuadros difundidos al grupo."""
+        while True:
+            mensaje = await comunicador.receive_json_from(timeout=2)
+            if mensaje['type'] == tipo:
+                return mensaje
+
+
+class ActualizarPuntosTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Vista HTTP de puntos del árbitro."""
+
+    def url(self):
+        return f'/arbitros/partido/{self.partido.id}/actualizar-puntos/'
+
+    def test_reasignar_arbitro_cambia_quien_puede_marcar(self):
+        anterior = self.cliente(self.arbitro)
+        self.assertEqual(self.post(anterior, self.url(), {'accion': 'sumar', 'jugador': 1}).status_code, 200)
+
+        # El marcador ya está en memoria cuando el organizador reasigna el partido
+        nuevo_arbitro = self.crear_arbitro('reemplazo')
+        self.partido.arbitro = nuevo_arbitro
+        self.partido.save()
+
+        respuesta = self.post(anterior, self.url(), {'accion': 'sumar', 'jugador': 1})
+        self.assertEqual(respuesta.status_code, 404)
+        respuesta = self.post(self.cliente(nuevo_arbitro), self.url(), {'accion': 'sumar', 'jugador': 2})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.json()['puntos_j1'], respuesta.json()['puntos_j2']), (1, 1))
+
+    def test_dos_pestanas_con_el_mismo_numero(self):
+        cliente = self.cliente(self.arbitro)
+        punto_a = {'accion': 'sumar', 'jugador': 1, 'seq': 1, 'cliente': 'pestana-a'}
+        punto_b = {'accion': 'sumar', 'jugador': 2, 'seq': 1, 'cliente': 'pestana-b'}
+        self.assertEqual(self.post(cliente, self.url(), punto_a).status_code, 200)
+
+        # La otra pestaña numeró su punto igual: no se aplica ni se confirma
+        respuesta = self.post(cliente, self.url(), punto_b)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['secuencia'], 1)
+
+        # El reintento de la primera pestaña sigue siendo un duplicado
+        self.assertTrue(self.post(cliente, self.url(), punto_a).json()['duplicado'])
+
+        # Renumerado desde la secuencia del servidor, el punto de la otra pestaña entra
+        datos = self.post(cliente, self.url(), dict(punto_b, seq=2)).json()
+        self.assertEqual((datos['duplicado'], datos['puntos_j1'], datos['puntos_j2'], datos['secuencia']), (False, 1, 1, 2))
+
+
+@unittest.skipIf(modulo_marcador.fcntl is None, 'Sin bloqueos de archivo no se verifica el proceso dueño')
+class PropiedadMarcadorTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Un solo proceso arbitra cada partido."""
+
+    def bloquear_desde_otro_proceso(self):
+        # flock distingue descriptores: otro archivo abierto se comporta como otro proceso
+        archivo = open(_ruta_diario(self.partido.id, 'lock'), 'a')
+        modulo_marcador.fcntl.flock(archivo, modulo_marcador.fcntl.LOCK_EX | modulo_marcador.fcntl.LOCK_NB)
+        self.addCleanup(archivo.close)
+        return archivo
+
+    def test_comandos_se_rechazan_si_otro_proceso_tiene_el_partido(self):
+        archivo = self.bloquear_desde_otro_proceso()
+        url = f'/arbitros/partido/{self.partido.id}/actualizar-puntos/'
+        cliente = self.cliente(self.arbitro)
+
+        respuesta = self.post(cliente, url, {'accion': 'sumar', 'jugador': 1})
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertIn('otro proceso', respuesta.json()['message'])
+        self.assertIsNone(marcador_activo(self.partido.id))
+
+        # Los lectores usan Resultado en lugar de quitarle el diario al dueño
+        open(_ruta_diario(self.partido.id), 'wb').close()
+        self.assertIsNone(marcador_para_lectura(self.partido.id))
+
+        # Al terminar el otro proceso, este pasa a ser el dueño
+        archivo.close()
+        self.assertEqual(self.post(cliente, url, {'accion': 'sumar', 'jugador': 1}).status_code, 200)
+
+    def test_descartar_suelta_el_partido(self):
+        obtener_marcador(self.partido.id)
+        with self.assertRaises(BlockingIOError):
+            self.bloquear_desde_otro_proceso()
+        descartar_marcador(self.partido.id)
+        self.bloquear_desde_otro_proceso()
+        with self.assertRaises(modulo_marcador.MarcadorEnOtroProceso):
+            obtener_marcador(self.partido.id)
+
+
+class PuntosLoteTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Lotes de puntos enviados por el árbitro al volver la red."""
+
+    def url(self):
+        return f'/arbitros/partido/{self.partido.id}/puntos-lote/'
+
+    def lote(self, cliente, *secuencias):
+        comandos = [{'type': 'point', 'jugador': 1 + secuencia % 2, 'seq': secuencia} for secuencia in secuencias]
+        return self.post(cliente, self.url(), {'comandos': comandos})
+
+    def test_reenvio_omite_los_comandos_aplicados(self):
+        cliente = self.cliente(self.arbitro)
+        self.assertEqual(self.lote(cliente, 1, 2).json()['aplicados'], 2)
+
+        datos = self.lote(cliente, 1, 2, 3).json()
+        self.assertEqual((datos['success'], datos['aplicados'], datos['duplicados']), (True, 1, 2))
+        self.assertEqual((datos['puntos_j1'], datos['puntos_j2'], datos['secuencia']), (1, 2, 3))
+        self.assertEqual(Resultado.objects.get(partido=self.partido).secuencia_puntos, 3)
+
+    def test_lote_con_hueco_indica_desde_donde_renumerar(self):
+        cliente = self.cliente(self.arbitro)
+        self.lote(cliente, 1)
+
+        respuesta = self.lote(cliente, 3, 4)
+        self.assertEqual(respuesta.status_code, 409)
+        datos = respuesta.json()
+        self.assertEqual((datos['success'], datos['aplicados'], datos['secuencia']), (False, 0, 1))
+
+        # Renumerados a partir de la secuencia del servidor, se aplican
+        self.assertEqual(self.lote(cliente, 2, 3).json()['aplicados'], 2)
+
+    def test_reasignar_arbitro_cambia_quien_puede_enviar_lotes(self):
+        anterior = self.cliente(self.arbitro)
+        self.assertEqual(self.lote(anterior, 1).status_code, 200)
+
+        nuevo_arbitro = self.crear_arbitro('reemplazo')
+        self.partido.arbitro = nuevo_arbitro
+        self.partido.save()
+
+        self.assertEqual(self.lote(anterior, 2).status_code, 404)
+        datos = self.lote(self.cliente(nuevo_arbitro), 2).json()
+        self.assertEqual((datos['aplicados'], datos['secuencia']), (1, 2))
+
+    def test_conflicto_de_escritura_pide_reenviar_el_lote(self):
+        cliente = self.cliente(self.arbitro)
+        with mock.patch.object(MarcadorEnVivo, 'guardar', side_effect=MarcadorEnConflicto):
+            respuesta = self.lote(cliente, 1, 2)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertNotIn('secuencia', respuesta.json())
+
+        # Los puntos ya quedaron en el marcador: el reenvío no los suma dos veces
+        datos = self.lote(cliente, 1, 2).json()
+        self.assertEqual((datos['success'], datos['aplicados'], datos['duplicados']), (True, 0, 2))
+        self.assertEqual((datos['puntos_j1'], datos['puntos_j2']), (1, 1))
+
+    def test_lote_de_otra_pestana_con_numeros_usados(self):
+        cliente = self.cliente(self.arbitro)
+        comandos = [{'type': 'point', 'jugador': 1, 'seq': 1, 'cliente': 'pestana-a'}]
+        self.post(cliente, self.url(), {'comandos': comandos})
+
+        comandos = [
+            {'type': 'point', 'jugador': 2, 'seq': 1, 'cliente': 'pestana-b'},
+            {'type': 'point', 'jugador': 2, 'seq': 2, 'cliente': 'pestana-b'},
+        ]
+        respuesta = self.post(cliente, self.url(), {'comandos': comandos})
+        self.assertEqual(respuesta.status_code, 409)
+        datos = respuesta.json()
+        self.assertEqual((datos['aplicados'], datos['duplicados'], datos['confirmados']), (0, 0, []))
+        self.assertEqual((datos['puntos_j2'], datos['secuencia']), (0, 1))
+
+
+class PartidoConsumerTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Comandos de puntaje por el WebSocket del partido."""
+
+    def test_arbitro_reasignado_no_puede_marcar(self):
+        reemplazo = self.crear_arbitro('reemplazo')
+
+        async def probar():
+            comunicador = await self.conectar(self.arbitro)
+            await comunicador.send_json_to({'type': 'point', 'jugador': 1, 'seq': 1})
+            self.assertEqual((await self.recibir_tipo(comunicador, 'ack'))['seq'], 1)
+
+            # Reasignado con el socket abierto: los comandos siguientes se rechazan
+            self.partido.arbitro = reemplazo
+            await database_sync_to_async(self.partido.save)()
+            await comunicador.send_json_to({'type': 'point', 'jugador': 1, 'seq': 2})
+            self.assertEqual((await self.recibir_tipo(comunicador, 'error'))['seq'], 2)
+            await comunicador.disconnect()
+
+        async_to_sync(probar)()
+
+    def test_cerrar_set_invalido_no_consume_la_secuencia(self):
+        async def probar():
+            comunicador = await self.conectar(self.arbitro)
+            await comunicador.send_json_to({'type': 'point', 'jugador': 1, 'seq': 1})
+            await self.recibir_tipo(comunicador, 'ack')
+
+            # 1-0 no tiene ganador: se rechaza e indica la última secuencia aplicada
+            await comunicador.send_json_to({'type': 'close_set', 'seq': 2})
+            rechazo = await self.recibir_tipo(comunicador, 'error')
+            self.assertEqual((rechazo['seq'], rechazo['secuencia']), (2, 1))
+
+            # El número 2 sigue libre para el próximo punto
+            await comunicador.send_json_to({'type': 'point', 'jugador': 2, 'seq': 2})
+            ack = await self.recibir_tipo(comunicador, 'ack')
+            self.assertEqual((ack['estado'], ack['data']['p2'], ack['data']['seq']), ('aplicado', 1, 2))
+            await comunicador.disconnect()
+
+        async_to_sync(probar)()
+
+    def test_cuadro_binario_sin_msgpack_se_ignora(self):
+        async def probar():
+            comunicador = await self.conectar(self.arbitro)
+            with mock.patch('gestionarbitros.consumers.msgpack', None):
+                await comunicador.send_to(bytes_data=b'\x81\xa4type\xa5point')
+                # La conexión sigue abierta y atiende el siguiente comando en JSON
+                await comunicador.send_json_to({'type': 'point', 'jugador': 1, 'seq': 1})
+                self.assertEqual((await self.recibir_tipo(comunicador, 'ack'))['seq'], 1)
+            await comunicador.disconnect()
+
+        async_to_sync(probar)()
+
+    def test_dos_pestanas_con_el_mismo_numero(self):
+        async def probar():
+            pestana_a = await self.conectar(self.arbitro)
+            pestana_b = await self.conectar(self.arbitro)
+            await pestana_a.send_json_to({'type': 'point', 'jugador': 1, 'seq': 1, 'cliente': 'a'})
+            self.assertEqual((await self.recibir_tipo(pestana_a, 'ack'))['estado'], 'aplicado')
+
+            # Mismo número desde la otra pestaña: se rechaza para que lo renumere
+            await pestana_b.send_json_to({'type': 'point', 'jugador': 2, 'seq': 1, 'cliente': 'b'})
+            rechazo = await self.recibir_tipo(pestana_b, 'error')
+            self.assertEqual((rechazo['estado'], rechazo['secuencia']), ('fuera_de_orden', 1))
+
+            await pestana_a.send_json_to({'type': 'point', 'jugador': 1, 'seq': 1, 'cliente': 'a'})
+            self.assertEqual((await self.recibir_tipo(pestana_a, 'ack'))['estado'], 'duplicado')
+
+            await pestana_b.send_json_to({'type': 'point', 'jugador': 2, 'seq': 2, 'cliente': 'b'})
+            ack = await self.recibir_tipo(pestana_b, 'ack')
+            self.assertEqual((ack['estado'], ack['data']['p1'], ack['data']['p2']), ('aplicado', 1, 1))
+            await pestana_a.disconnect()
+            await pestana_b.disconnect()
+
+        async_to_sync(probar)()
+
+
+class PantallaConsumerTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Pantallas de la sede con varios marcadores por conexión."""
+
+    def test_estados_partidos_no_carga_marcadores(self):
+        # Un diario sin escribir no hace que la pantalla cargue el marcador del partido
+        open(_ruta_diario(self.partido.id), 'wb').close()
+        estados = estados_partidos(partido_ids=[self.partido.id])
+        self.assertIsNone(marcador_activo(self.partido.id))
+        self.assertEqual(estados[self.partido.id]['partido_id'], self.partido.id)
+
+    def test_cuadros_pasan_por_la_salida_de_la_conexion(self):
+        async def probar():
+            comunicador = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), f'/ws/pantalla/?partidos={self.partido.id}'
+            )
+            conectado, _ = await comunicador.connect()
+            self.assertTrue(conectado)
+            inicial = await comunicador.receive_json_from()
+            self.assertEqual(inicial['type'], 'pantalla_status')
+            version = inicial['partidos'][0]['v']
+
+            capa = get_channel_layer()
+            for v, puntos in ((version, 9), (version + 1, 1)):
+                # El primer cuadro ya está incluido en el estado inicial: no se reenvía
+                await capa.group_send(f'partido_{self.partido.id}', {
+                    'type': 'partido_update', 'partido_id': self.partido.id, 'v': v, 'base': v - 1,
+                    'cambios': {'p1': puntos}, 'data': estado_partido(puntos, 0),
+                })
+            cuadro = await self.recibir_tipo(comunicador, 'partido_delta')
+            self.assertEqual((cuadro['partido_id'], cuadro['v'], cuadro['cambios']), (self.partido.id, version + 1, {'p1': 1}))
+
+            await comunicador.send_json_to({'type': 'get_status'})
+            estado = await self.recibir_tipo(comunicador, 'pantalla_status')
+            self.assertEqual(estado['partidos'][0]['v'], version + 1)
+            await comunicador.disconnect()
+
+        async_to_sync(probar)()
+
+    def test_cuadro_binario_se_ignora(self):
+        async def probar():
+            comunicador = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), f'/ws/pantalla/?partidos={self.partido.id}'
+            )
+            conectado, _ = await comunicador.connect()
+            self.assertTrue(conectado)
+            await self.recibir_tipo(comunicador, 'pantalla_status')
+
+            await comunicador.send_to(bytes_data=b'\x81\xa4type\xaaget_status')
+            await comunicador.send_json_to({'type': 'get_status'})
+            estado = await self.recibir_tipo(comunicador, 'pantalla_status')
+            self.assertEqual(estado['partidos'][0]['partido_id'], self.partido.id)
+            await comunicador.disconnect()
+
+        async_to_sync(probar)()
+
+
+class CerrarSetConsumerTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Cierre de set por el WebSocket del árbitro."""
+
+    def setUp(self):
+        super().setUp()
+        marcador = obtener_marcador(self.partido.id)
+        for secuencia in range(1, 12):
+            marcador.ejecutar(secuencia, 1, 1)
+
+    def cerrar(self, secuencia):
+        async def probar():
+            comunicador = await self.conectar(self.arbitro)
+            await comunicador.send_json_to({'type': 'close_set', 'seq': secuencia})
+            while True:
+                mensaje = await comunicador.receive_json_from(timeout=2)
+                if mensaje['type'] in ('ack', 'error'):
+                    break
+            await comunicador.disconnect()
+            return mensaje
+        return async_to_sync(probar)()
+
+    def test_error_al_guardar_responde_con_la_secuencia_vigente(self):
+        with mock.patch('gestionarbitros.consumers.registrar_set', side_effect=RuntimeError('base caída')):
+            rechazo = self.cerrar(12)
+        self.assertEqual((rechazo['type'], rechazo['seq'], rechazo['secuencia']), ('error', 12, 12))
+        self.assertIn('base caída', rechazo['message'])
+
+        # El cliente vuelve a cerrar el set con el número siguiente
+        ack = self.cerrar(13)
+        self.assertEqual((ack['type'], ack['estado'], ack['resultado']['success']), ('ack', 'aplicado', True))
+        self.assertEqual(Resultado.objects.get(partido=self.partido).sets_ganados_jugador1, 1)
+
+    def test_set_no_guardado_no_se_confirma(self):
+        respuesta = {'success': False, 'message': 'Este set ya fue guardado'}
+        with mock.patch('gestionarbitros.consumers.registrar_set', return_value=respuesta):
+            rechazo = self.cerrar(12)
+        self.assertEqual((rechazo['type'], rechazo['message'], rechazo['secuencia']), ('error', respuesta['message'], 12))
+
+
+class SecuenciaMarcadorTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Comandos numerados del árbitro sobre el marcador en vivo."""
+
+    def test_comando_repetido_no_se_aplica_dos_veces(self):
+        marcador = obtener_marcador(self.partido.id)
+        self.assertEqual(marcador.ejecutar(1, 1, 1), APLICADO)
+        self.assertEqual(marcador.ejecutar(1, 1, 1), DUPLICADO)
+        self.assertEqual(marcador.como_dict()['jugador1']['puntos'], 1)
+        self.assertEqual(marcador.secuencia, 1)
+
+    def test_comando_que_salta_numeros_se_rechaza(self):
+        marcador = obtener_marcador(self.partido.id)
+        self.assertEqual(marcador.ejecutar(1, 1, 1), APLICADO)
+        self.assertEqual(marcador.comprobar_secuencia(3), FUERA_DE_ORDEN)
+        self.assertEqual(marcador.ejecutar(3, 2, 1), FUERA_DE_ORDEN)
+        self.assertEqual(marcador.como_dict()['jugador2']['puntos'], 0)
+        self.assertEqual(marcador.ejecutar(2, 2, 1), APLICADO)
+        self.assertEqual(marcador.ejecutar(3, 2, 1), APLICADO)
+        self.assertEqual(marcador.como_dict()['jugador2']['puntos'], 2)
+
+    def test_deshacer_quita_el_ultimo_punto_del_jugador(self):
+        marcador = obtener_marcador(self.partido.id)
+        for secuencia, jugador in enumerate([1, 2, 1], start=1):
+            marcador.ejecutar(secuencia, jugador, 1)
+        self.assertEqual(marcador.ejecutar(4, 2, -1), APLICADO)
+        # Sin puntos vigentes de ese jugador, deshacer consume el número sin cambiar el marcador
+        self.assertEqual(marcador.ejecutar(5, 2, -1), APLICADO)
+        datos = marcador.como_dict()
+        self.assertEqual((datos['jugador1']['puntos'], datos['jugador2']['puntos'], datos['secuencia']), (2, 0, 5))
+        self.assertEqual(marcador.ultimo_anotador(), 1)
+
+    def test_reinicio_recupera_los_puntos_del_diario(self):
+        marcador = obtener_marcador(self.partido.id)
+        marcador.ejecutar(1, 1, 1)
+        marcador.ejecutar(2, 1, 1)
+        # Un proceso nuevo: el diario tiene puntos que Resultado aún no tiene
+        partido = Partido.objects.select_related('llave_torneo', 'jugador1', 'jugador2').get(id=self.partido.id)
+        recuperado = MarcadorEnVivo(partido, Resultado.objects.get(partido=partido))
+        recuperado.recuperar_diario()
+        self.assertEqual((recuperado.secuencia, recuperado.como_dict()['jugador1']['puntos']), (2, 2))
+        self.assertEqual(recuperado.ejecutar(2, 1, 1), DUPLICADO)
+
+
+class EscrituraMarcadorTests(PartidoEnJuegoMixin, TransactionTestCase):
+    """Escritura del marcador en vivo en ``Resultado`` sin perder puntos."""
+
+    def test_mil_incrementos_en_paralelo(self):
+        partido_id = self.partido.id
+
+        def sumar(i):
+            try:
+                obtener_marcador(partido_id).ejecutar(None, 1 + i % 2, 1)
+                if i % 50 == 0:
+                    # Escrituras intercaladas con los puntos que siguen llegando
+                    persistir_marcador(partido_id)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            list(pool.map(sumar, range(1000)))
+        descartar_marcador(partido_id)
+
+        resultado = Resultado.objects.get(partido_id=partido_id)
+        self.assertEqual((resultado.set1_jugador1, resultado.set1_jugador2), (500, 500))
+        self.assertEqual(resultado.secuencia_puntos, 1000)
+        self.assertEqual(EventoPunto.objects.filter(partido_id=partido_id).count(), 1000)
+
+    def test_escritura_en_conflicto_reaplica_los_puntos(self):
+        partido = Partido.objects.select_related('llave_torneo', 'jugador1', 'jugador2').get(id=self.partido.id)
+        primero = MarcadorEnVivo(partido, Resultado.objects.get(partido=partido))
+        segundo = MarcadorEnVivo(partido, Resultado.objects.get(partido=partido))
+        self.addCleanup(primero.cerrar)
+        self.addCleanup(segundo.cerrar)
+
+        primero.ejecutar(None, 1, 1)
+        segundo.ejecutar(None, 2, 1)
+        segundo.ejecutar(None, 2, 1)
+        self.assertTrue(primero.guardar())
+        # El segundo choca con la secuencia que escribió el primero
+        self.assertTrue(segundo.guardar())
+
+        resultado = Resultado.objects.get(partido=partido)
+        self.assertEqual((resultado.set1_jugador1, resultado.set1_jugador2), (1, 2))
+        self.assertEqual(resultado.secuencia_puntos, 3)
+        self.assertEqual(
+            list(EventoPunto.objects.filter(partido=partido).order_by('secuencia').values_list('secuencia', 'jugador')),
+            [(1, 1), (2, 2), (3, 2)],
+        )
+        self.assertEqual(segundo.como_dict()['jugador2']['puntos'], 2)
+
+
+class RegistroEventosTests(SimpleTestCase):
+    """Formato del registro punto a punto."""
+
+    def eventos(self):
+        inicio = datetime(2026, 10, 18, 15, 0, tzinfo=dt_timezone.utc)
+        return [
+            (1, inicio, 1, 1, 1),
+            (2, inicio + timedelta(seconds=12, milliseconds=250), 1, 2, 1),
+            (3, inicio + timedelta(seconds=30), 1, 1, -1),
+            (5, inicio + timedelta(minutes=9), 2, 2, 1),
+        ]
+
+    def test_empaquetar_y_desempaquetar(self):
+        paquete = empaquetar(self.eventos())
+        self.assertEqual(len(paquete), 9 + 10 * 4)
+        self.assertEqual(desempaquetar(paquete), self.eventos())
+        self.assertEqual(desempaquetar(b''), [])
+
+    def test_puntos_vigentes_aplica_los_deshacer(self):
+        self.assertEqual(puntos_vigentes(self.eventos(), 1), [2])
+        self.assertEqual(puntos_vigentes(self.eventos(), 2), [2])
+
+
+class CompactacionEventosTests(TestCase):
+    """Compactación de los eventos de un partido finalizado."""
+
+    def setUp(self):
+        self.partido = crear_partido_prueba('compactacion')
+        inicio = datetime(2026, 10, 18, 15, 0, tzinfo=dt_timezone.utc)
+        EventoPunto.objects.bulk_create([
+            EventoPunto(partido=self.partido, secuencia=secuencia, set_numero=1, jugador=jugador, delta=delta,
+                        momento=inicio + timedelta(seconds=secuencia))
+            for secuencia, jugador, delta in [(1, 1, 1), (2, 1, 1), (3, 2, 1), (4, 1, -1)]
+        ])
+
+    def test_solo_compacta_partidos_finalizados(self):
+        self.assertEqual(compactar_partido(self.partido.id), 0)
+        self.assertEqual(EventoPunto.objects.filter(partido=self.partido).count(), 4)
+
+    def test_compactar_conserva_la_linea_de_tiempo(self):
+        antes = linea_tiempo(self.partido.id)
+        Partido.objects.filter(id=self.partido.id).update(finalizado=True)
+
+        self.assertEqual(compactar_partido(self.partido.id), 4)
+        self.assertFalse(EventoPunto.objects.filter(partido=self.partido).exists())
+        self.assertEqual(LineaTiempoPartido.objects.get(partido=self.partido).cantidad, 4)
+        self.assertEqual(linea_tiempo(self.partido.id), antes)
+        self.assertEqual(
+            [(evento['tipo'], evento['puntos_jugador1'], evento['puntos_jugador2']) for evento in antes],
+            [('punto', 1, 0), ('punto', 2, 0), ('punto', 2, 1), ('deshacer', 1, 1)],
+        )
+
+    def test_eventos_nuevos_se_leen_tras_el_paquete(self):
+        Partido.objects.filter(id=self.partido.id).update(finalizado=True)
+        compactar_partido(self.partido.id)
+        EventoPunto.objects.create(
+            partido=self.partido, secuencia=5, set_numero=2, jugador=2, delta=1,
+            momento=datetime(2026, 10, 18, 15, 10, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual([evento[0] for evento in eventos_partido(self.partido.id)], [1, 2, 3, 4, 5])
+
+
+def estado_partido(puntos1, puntos2, finalizado=False, secuencia=None):
+    """Estado de un partido con el formato de ``enviar_actualizacion_partido``."""
+    return {
+        'jugador1': {'nombre': 'Ana', 'puntos': puntos1, 'sets': 0},
+        'jugador2': {'nombre': 'Eva', 'puntos': puntos2, 'sets': 0},
+        'set_actual': 1,
+        'estado': 'finalizado' if finalizado else 'en_juego',
+        'finalizado': finalizado,
+        'ganador': 'Ana' if finalizado else None,
+        'secuencia': secuencia,
+    }
+
+
+class DifusionVersionadaTests(SimpleTestCase):
+    """Cuadros versionados con solo los campos que cambiaron."""
+
+    def setUp(self):
+        self.difusor = DifusorPartidos(ventana=0)
+        self.capa = get_channel_layer()
+
+    def publicar(self, partido_id, *estados):
+        """Publica los estados como cuadros finales (sin agrupar) y devuelve los mensajes del grupo."""
+        async def publicar():
+            canal = await self.capa.new_channel()
+            await self.capa.group_add(f'partido_{partido_id}', canal)
+            cuadros = []
+            for data in estados:
+                await self.difusor.publicar(partido_id, data, final=True)
+                cuadros.append(await self.capa.receive(canal))
+            await self.capa.group_discard(f'partido_{partido_id}', canal)
+            return cuadros
+        return async_to_sync(publicar)()
+
+    def test_diferencias_solo_los_campos_cambiados(self):
+        anterior = compactar(estado_partido(3, 2, secuencia=5))
+        nuevo = compactar(estado_partido(4, 2, secuencia=6))
+        self.assertEqual(anterior['n1'], 'Ana')
+        self.assertEqual(anterior['p1'], 3)
+        self.assertEqual(diferencias(anterior, nuevo), {'p1': 4, 'seq': 6})
+        self.assertEqual(diferencias(nuevo, nuevo), {})
+        self.assertEqual(diferencias(None, nuevo), nuevo)
+
+    def test_cada_cuadro_se_aplica_sobre_el_anterior(self):
+        primero, segundo = self.publicar(1, estado_partido(1, 0, secuencia=1), estado_partido(1, 1, secuencia=2))
+
+        # El primer cuadro trae el estado completo
+        self.assertIsNone(primero['base'])
+        self.assertEqual(primero['cambios'], compactar(estado_partido(1, 0, secuencia=1)))
+        self.assertEqual(segundo['base'], primero['v'])
+        self.assertEqual(segundo['v'], primero['v'] + 1)
+        self.assertEqual(segundo['cambios'], {'p2': 1, 'seq': 2})
+        self.assertEqual(self.difusor.ultimo_estado(1), (segundo['v'], compactar(estado_partido(1, 1, secuencia=2))))
+
+    def test_estado_sin_cambios_no_genera_cuadro(self):
+        self.publicar(2, estado_partido(1, 0, secuencia=1))
+        version = self.difusor.versiones[2]
+
+        async def repetir():
+            await self.difusor.publicar(2, estado_partido(1, 0, secuencia=1), final=True)
+        async_to_sync(repetir)()
+
+        self.assertEqual(self.difusor.versiones[2], version)
+        self.assertEqual(self.difusor.estadisticas[2].enviadas, 1)
+
+    def test_partido_finalizado_libera_su_estado(self):
+        self.publicar(3, estado_partido(1, 0), estado_partido(6, 0, finalizado=True))
+        self.assertEqual(self.difusor.ultimo_estado(3), (None, None))
+
+    def test_cuadro_propio_atrasado_no_retrocede_el_estado(self):
+        # El consumidor lee el cuadro 1 cuando el despachador ya envió el 2
+        primero, segundo = self.publicar(5, estado_partido(1, 0), estado_partido(2, 0))
+        self.difusor.observar(5, primero)
+        self.assertEqual(self.difusor.ultimo_estado(5), (segundo['v'], compactar(estado_partido(2, 0))))
+
+    def test_cuadro_de_otro_proceso_se_adopta(self):
+        self.difusor.sembrar(4, estado_partido(0, 0))
+        self.difusor.observar(4, {'v': 42, 'data': estado_partido(0, 1)})
+        self.assertEqual(self.difusor.ultimo_estado(4), (42, compactar(estado_partido(0, 1))))
+
+
+class CapaHubTests(SimpleTestCase):
+    """Capa de canales de varios procesos a través del hub local."""
+
+    def test_ida_y_vuelta_por_el_hub(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ruta = os.path.join(directorio, 'hub.sock')
+
+        async def probar():
+            hub = HubCanales(ruta, modo=0o600)
+            servidor = asyncio.get_running_loop().create_task(hub.servir())
+            while not os.path.exists(ruta):
+                await asyncio.sleep(0.01)
+            self.assertEqual(os.stat(ruta).st_mode & 0o777, 0o600)
+
+            capa = CapaHub(ruta)
+            try:
+                canal = await capa.new_channel()
+                await capa.group_add('partido_1', canal)
+                await capa.group_send('partido_1', {'type': 'partido_update', 'v': 1})
+                self.assertEqual(await capa.receive(canal), {'type': 'partido_update', 'v': 1})
+
+                await capa.send(canal, {'type': 'directo'})
+                self.assertEqual(await capa.receive(canal), {'type': 'directo'})
+
+                # Fuera del grupo ya no recibe lo que se difunde
+                await capa.group_discard('partido_1', canal)
+                await capa.group_send('partido_1', {'type': 'partido_update', 'v': 2})
+                estadisticas = await capa.estadisticas()
+                self.assertEqual((estadisticas['entregados'], estadisticas['canales']), (2, 0))
+            finally:
+                await capa.close()
+                servidor.cancel()
+                await asyncio.gather(servidor, return_exceptions=True)
+            self.assertFalse(os.path.exists(ruta))
+
+        async_to_sync(probar)()
+
+
+class DespachadorSinHilo(DespachadorDifusion):
+    """Despachador cuya cola se revisa sin despacharla."""
+
+    def _iniciar(self):
+        self.bucle = asyncio.new_event_loop()
+        self.hilo = threading.current_thread()
+
+
+class ColaDespachoTests(SimpleTestCase):
+    """Cola acotada de estados por difundir."""
+
+    def setUp(self):
+        self.despachador = DespachadorSinHilo(capacidad=2)
+        self.addCleanup(lambda: self.despachador.bucle and self.despachador.bucle.close())
+
+    def test_cola_llena_descarta_el_no_final_mas_antiguo(self):
+        self.despachador.encolar(1, estado_partido(1, 0))
+        self.despachador.encolar(2, estado_partido(6, 0, finalizado=True), final=True)
+        self.despachador.encolar(3, estado_partido(0, 1))
+        self.assertEqual(list(self.despachador.cola), [2, 3])
+        self.assertEqual(self.despachador.descartados, 1)
+
+    def test_estados_finales_nunca_se_descartan(self):
+        self.despachador.encolar(1, estado_partido(6, 0, finalizado=True), final=True)
+        self.despachador.encolar(2, estado_partido(6, 1, finalizado=True), final=True)
+        # Un estado no final no cabe; uno final excede la capacidad
+        self.despachador.encolar(3, estado_partido(1, 0))
+        self.despachador.encolar(4, estado_partido(6, 2, finalizado=True), final=True)
+        self.assertEqual(list(self.despachador.cola), [1, 2, 4])
+        self.assertEqual(self.despachador.descartados, 1)
+
+    def test_reemplazo_conserva_el_final(self):
+        self.despachador.encolar(1, estado_partido(6, 0, finalizado=True), final=True)
+        self.despachador.encolar(1, estado_partido(6, 0, finalizado=True))
+        self.assertTrue(self.despachador.cola[1][1])
+        self.assertEqual(self.despachador.reemplazados, 1)
+
+
+def cuadro(version):
+    return {'type': 'partido_delta', 'v': version, 'base': version - 1, 'cambios': {'p1': version}}
+
+
+@override_settings(ESPECTADOR_COLA_MAXIMA=3, ESPECTADOR_INTERVALO_LATIDO=60, ESPECTADOR_RETRASO_MAXIMO=10)
+class SalidaEspectadorTests(SimpleTestCase):
+    """Cola de salida de un espectador lento."""
+
+    def probar(self, prueba):
+        """Ejecuta ``prueba(salida, enviados)`` con una salida cuyo estado vigente es la versión 10."""
+        async def ejecutar():
+            enviados = []
+
+            async def enviar(mensaje):
+                enviados.append(mensaje)
+
+            async def estado_vigente():
+                return {'type': 'partido_status', 'v': 10, 'data': {}}
+
+            async def cerrar(codigo):
+                pass
+
+            salida = SalidaEspectador(enviar, estado_vigente, cerrar)
+            try:
+                await prueba(salida, enviados)
+            finally:
+                salida.detener()
+        async_to_sync(ejecutar)()
+
+    async def vaciar(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    def tipos(self, enviados):
+        return [(mensaje['type'], mensaje.get('v')) for mensaje in enviados if mensaje['type'] != 'ping']
+
+    def test_cola_llena_pasa_a_solo_ultimo(self):
+        async def prueba(salida, enviados):
+            for version in (1, 2, 3):
+                salida.encolar(cuadro(version))
+            self.assertFalse(salida.solo_ultimo)
+            # El cuarto cuadro supera la marca: se descartan todos y llegará un solo estado
+            salida.encolar(cuadro(4))
+            self.assertTrue(salida.solo_ultimo)
+            self.assertEqual(len(salida.cola), 0)
+            salida.encolar(cuadro(5))
+            self.assertEqual(len(salida.cola), 0)
+
+            salida.iniciar()
+            await self.vaciar()
+            self.assertEqual(self.tipos(enviados), [('partido_status', 10)])
+            self.assertFalse(salida.solo_ultimo)
+
+            # Los cuadros ya incluidos en ese estado no se reenvían
+            salida.encolar(cuadro(10))
+            salida.encolar(cuadro(11))
+            await self.vaciar()
+            self.assertEqual(self.tipos(enviados), [('partido_status', 10), ('partido_delta', 11)])
+
+        self.probar(prueba)
+
+    def test_pedir_estado_reemplaza_los_cuadros_pendientes(self):
+        async def prueba(salida, enviados):
+            salida.encolar(cuadro(1))
+            salida.encolar(cuadro(2))
+            salida.pedir_estado()
+            salida.iniciar()
+            await self.vaciar()
+            self.assertEqual(self.tipos(enviados), [('partido_status', 10)])
+
+        self.probar(prueba)
+
+    def test_cliente_atrasado_espera_su_pong_para_recibir_el_estado(self):
+        async def prueba(salida, enviados):
+            salida.iniciar()
+            await self.vaciar()
+            numero = enviados[-1]['n']
+            salida.recibir_pong(numero)
+
+            # Un ping sin respuesta hace más de ESPECTADOR_RETRASO_MAXIMO segundos
+            salida.latido_pendiente = (numero + 1, time.monotonic() - 11)
+            self.assertTrue(salida.atrasado())
+            salida.pasar_a_solo_ultimo()
+            salida.encolar(cuadro(1))
+            await self.vaciar()
+            self.assertEqual(self.tipos(enviados), [])
+
+            salida.recibir_pong(numero + 1)
+            await self.vaciar()
+            self.assertEqual(self.tipos(enviados), [('partido_status', 10)])
+
+        self.probar(prueba)
+
+    def test_pantalla_descarta_por_partido(self):
+        async def prueba(salida, enviados):
+            salida.registrar_estado({'type': 'pantalla_status', 'partidos': [
+                {'partido_id': 1, 'v': 10, 'data': {}}, {'partido_id': 2, 'v': 50, 'data': {}},
+            ]})
+            salida.encolar(dict(cuadro(11), partido_id=1))
+            salida.encolar(dict(cuadro(12), partido_id=2))
+            salida.iniciar()
+            await self.vaciar()
+            self.assertEqual([mensaje['partido_id'] for mensaje in enviados if mensaje['type'] != 'ping'], [1])
+
+        self.probar(prueba)
@@ -12,4 +12,6 @@ urlpatterns = [
     path('partido/<int:partido_id>/guardar-set/', views.guardar_set, name='guardar_set'),
     path('partido/<int:partido_id>/cerrar-partido/', views.cerrar_partido, name='cerrar_partido'),
     path('partido/<int:partido_id>/actualizar-puntos/', views.actualizar_puntos, name='actualizar_puntos'),
+    path('partido/<int:partido_id>/puntos-lote/', views.puntos_lote, name='puntos_lote'),
+    path('difusion/estado/', views.estado_difusion, name='estado_difusion'),
 ]
@@ -7,17 +7,25 @@ arbitraje en tiempo real y historial de arbitrajes.
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db import models
+from django.views.decorators.http import condition
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import json
+import os
 from gestiontorneo.models import Partido, Torneo, UsuarioPersonalizado, Resultado
-from gestiontorneo.decorators import require_arbitro
+from gestiontorneo.decorators import require_arbitro, require_organizador
+from .difusion import difundir, estadisticas_difusion, metricas_despacho
+from .eventos import programar_compactacion
+from .marcador import (
+    APLICADO, DUPLICADO, FUERA_DE_ORDEN, firma_comando,
+    MarcadorEnConflicto, MarcadorEnOtroProceso, descartar_marcador, difundir_marcador, es_arbitro_asignado, obtener_marcador,
+    persistir_marcador,
+)
+from .salida import estadisticas_espectadores
 
 @require_arbitro
 def panel_arbitro(request):
@@ -124,14 +132,14 @@ def arbitrar_partido(request, partido_id):
     """    
     partido = get_object_or_404(Partido, id=partido_id, arbitro=request.user)
     
+    # Escribir los puntos que el marcador en vivo aún tiene en memoria
+    persistir_marcador(partido.id)
+    
     # Obtener o crear resultado
     resultado, created = Resultado.objects.get_or_create(partido=partido)
     
     # Determinar modalidad (final vs normal)
-    total_rondas = partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-    es_partido_final = partido.llave_torneo.ronda == total_rondas
-    mejor_de_sets = partido.torneo.mejor_de_sets_final if es_partido_final else partido.torneo.mejor_de_sets
-    sets_para_ganar = (mejor_de_sets // 2) + 1
+    es_partido_final, mejor_de_sets, sets_para_ganar = partido.llave_torneo.modalidad_sets()
     
     # Calcular set actual y puntos actuales
     set_actual = calcular_set_actual(resultado, mejor_de_sets)
@@ -238,6 +246,119 @@ def obtener_puntos_set_actual(resultado, set_actual):
     puntos_j2 = getattr(resultado, f'set{set_actual}_jugador2', 0)
     return [puntos_j1, puntos_j2]
 
+def validar_puntos_set(puntos_j1, puntos_j2):
+    """
+    Valida el puntaje final de un set sin tocar la base de datos.
+
+    Args:
+        puntos_j1 (int): Puntos del jugador 1
+        puntos_j2 (int): Puntos del jugador 2
+
+    Returns:
+        str: Mensaje de error, o None si el set puede cerrarse con ese puntaje
+    """
+    # Validar puntos según reglas de tenis de mesa
+    error_validacion = validar_set_tenis_mesa(puntos_j1, puntos_j2)
+    if error_validacion:
+        return error_validacion
+    
+    # Verificar que hay un ganador válido
+    if not tiene_ganador_set(puntos_j1, puntos_j2):
+        return 'El set no tiene un ganador válido'
+    return None
+
+def registrar_set(partido, set_numero, puntos_j1, puntos_j2):
+    """
+    Valida y guarda el puntaje final de un set, cerrando el partido si corresponde.
+
+    Lo usan la vista ``guardar_set`` y el comando ``close_set`` del WebSocket
+    del árbitro, para que ambos caminos apliquen las mismas reglas.
+
+    Args:
+        partido (Partido): Partido que se está arbitrando
+        set_numero (int): Número del set a guardar
+        puntos_j1 (int): Puntos del jugador 1
+        puntos_j2 (int): Puntos del jugador 2
+
+    Returns:
+        dict: Respuesta con 'success', 'message' y, si se guardó, 'partido_terminado'
+    """
+    error_validacion = validar_puntos_set(puntos_j1, puntos_j2)
+    if error_validacion:
+        return {'success': False, 'message': error_validacion}
+    
+    # El set cambia Resultado por fuera del marcador en vivo: escribirlo y soltarlo
+    descartar_marcador(partido.id)
+    
+    # Obtener resultado
+    resultado, created = Resultado.objects.get_or_create(partido=partido)
+    # Que la actualización del WebSocket use este resultado sin volver a leerlo
+    partido.resultado_detallado = resultado
+    
+    # Verificar que este set específico puede ser guardado
+    # Un set puede ser guardado si:
+    # 1. Los puntos enviados constituyen un ganador válido
+    # 2. Los sets_ganados oficiales no reflejan aún este resultado
+    
+    puntos_actuales_j1 = getattr(resultado, f'set{set_numero}_jugador1', 0)
+    puntos_actuales_j2 = getattr(resultado, f'set{set_numero}_jugador2', 0)
+    
+    # Verificar si este set ya fue oficialmente procesado
+    # Contamos cuántos sets con ganador hay hasta este set número
+    sets_con_ganador_j1 = 0
+    sets_con_ganador_j2 = 0
+    
+    for i in range(1, set_numero + 1):
+        p_j1 = getattr(resultado, f'set{i}_jugador1', 0)
+        p_j2 = getattr(resultado, f'set{i}_jugador2', 0)
+        
+        # Si es el set actual, usar los puntos enviados
+        if i == set_numero:
+            if puntos_j1 > puntos_j2:
+                sets_con_ganador_j1 += 1
+            elif puntos_j2 > puntos_j1:
+                sets_con_ganador_j2 += 1
+        # Para otros sets, usar los puntos guardados
+        elif tiene_ganador_set(p_j1, p_j2):
+            if p_j1 > p_j2:
+                sets_con_ganador_j1 += 1
+            elif p_j2 > p_j1:
+                sets_con_ganador_j2 += 1
+    
+    # Si los sets ganados oficiales ya reflejan este resultado, el set ya está guardado
+    if (resultado.sets_ganados_jugador1 >= sets_con_ganador_j1 and 
+        resultado.sets_ganados_jugador2 >= sets_con_ganador_j2):
+        return {'success': False, 'message': f'El set {set_numero} ya está guardado'}
+    
+    # Guardar puntos del set
+    setattr(resultado, f'set{set_numero}_jugador1', puntos_j1)
+    setattr(resultado, f'set{set_numero}_jugador2', puntos_j2)
+    resultado.save()
+    
+    # **NUEVO**: Enviar actualización via WebSocket
+    enviar_actualizacion_partido(partido)
+    
+    # Determinar modalidad y verificar si el partido terminó
+    es_partido_final, mejor_de_sets, sets_para_ganar = partido.llave_torneo.modalidad_sets()
+    
+    # Verificar si el partido terminó
+    cerrado, mensaje = partido.verificar_y_cerrar_partido()
+    if cerrado:
+        ganador_nombre = partido.jugador1_nombre if resultado.sets_ganados_jugador1 > resultado.sets_ganados_jugador2 else partido.jugador2_nombre
+        
+        return {
+            'success': True, 
+            'message': f'Set {set_numero} guardado exitosamente',
+            'partido_terminado': True,
+            'ganador_partido': ganador_nombre
+        }
+    
+    return {
+        'success': True, 
+        'message': f'Set {set_numero} guardado exitosamente',
+        'partido_terminado': False
+    }
+
 @require_arbitro
 @csrf_exempt
 def guardar_set(request, partido_id):
@@ -246,7 +367,9 @@ def guardar_set(request, partido_id):
         return JsonResponse({'success': False, 'message': 'Método no permitido'})
     
     try:
-        partido = get_object_or_404(Partido, id=partido_id, arbitro=request.user)
+        partido = get_object_or_404(
+            Partido.objects.select_related('llave_torneo', 'jugador1', 'jugador2'), id=partido_id, arbitro=request.user
+        )
         data = json.loads(request.body)
         
         set_numero = data.get('set_numero')
@@ -258,84 +381,7 @@ def guardar_set(request, partido_id):
         if not all([set_numero, puntos_j1 is not None, puntos_j2 is not None, ganador_set]):
             return JsonResponse({'success': False, 'message': 'Datos incompletos'})
         
-        # Validar puntos según reglas de tenis de mesa
-        error_validacion = validar_set_tenis_mesa(puntos_j1, puntos_j2)
-        if error_validacion:
-            return JsonResponse({'success': False, 'message': error_validacion})
-        
-        # Verificar que hay un ganador válido
-        if not tiene_ganador_set(puntos_j1, puntos_j2):
-            return JsonResponse({'success': False, 'message': 'El set no tiene un ganador válido'})
-        
-        # Obtener resultado
-        resultado, created = Resultado.objects.get_or_create(partido=partido)
-        
-        # Verificar que este set específico puede ser guardado
-        # Un set puede ser guardado si:
-        # 1. Los puntos enviados constituyen un ganador válido
-        # 2. Los sets_ganados oficiales no reflejan aún este resultado
-        
-        puntos_actuales_j1 = getattr(resultado, f'set{set_numero}_jugador1', 0)
-        puntos_actuales_j2 = getattr(resultado, f'set{set_numero}_jugador2', 0)
-        
-        # Verificar si este set ya fue oficialmente procesado
-        # Contamos cuántos sets con ganador hay hasta este set número
-        sets_con_ganador_j1 = 0
-        sets_con_ganador_j2 = 0
-        
-        for i in range(1, set_numero + 1):
-            p_j1 = getattr(resultado, f'set{i}_jugador1', 0)
-            p_j2 = getattr(resultado, f'set{i}_jugador2', 0)
-            
-            # Si es el set actual, usar los puntos enviados
-            if i == set_numero:
-                if puntos_j1 > puntos_j2:
-                    sets_con_ganador_j1 += 1
-                elif puntos_j2 > puntos_j1:
-                    sets_con_ganador_j2 += 1
-            # Para otros sets, usar los puntos guardados
-            elif tiene_ganador_set(p_j1, p_j2):
-                if p_j1 > p_j2:
-                    sets_con_ganador_j1 += 1
-                elif p_j2 > p_j1:
-                    sets_con_ganador_j2 += 1
-        
-        # Si los sets ganados oficiales ya reflejan este resultado, el set ya está guardado
-        if (resultado.sets_ganados_jugador1 >= sets_con_ganador_j1 and 
-            resultado.sets_ganados_jugador2 >= sets_con_ganador_j2):
-            return JsonResponse({'success': False, 'message': f'El set {set_numero} ya está guardado'})
-        
-        # Guardar puntos del set
-        setattr(resultado, f'set{set_numero}_jugador1', puntos_j1)
-        setattr(resultado, f'set{set_numero}_jugador2', puntos_j2)
-        resultado.save()
-        
-        # **NUEVO**: Enviar actualización via WebSocket
-        enviar_actualizacion_partido(partido.id)
-        
-        # Determinar modalidad y verificar si el partido terminó
-        total_rondas = partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = partido.llave_torneo.ronda == total_rondas
-        mejor_de_sets = partido.torneo.mejor_de_sets_final if es_partido_final else partido.torneo.mejor_de_sets
-        sets_para_ganar = (mejor_de_sets // 2) + 1
-        
-        # Verificar si el partido terminó
-        cerrado, mensaje = partido.verificar_y_cerrar_partido()
-        if cerrado:
-            ganador_nombre = partido.jugador1_nombre if resultado.sets_ganados_jugador1 > resultado.sets_ganados_jugador2 else partido.jugador2_nombre
-            
-            return JsonResponse({
-                'success': True, 
-                'message': f'Set {set_numero} guardado exitosamente',
-                'partido_terminado': True,
-                'ganador_partido': ganador_nombre
-            })
-        
-        return JsonResponse({
-            'success': True, 
-            'message': f'Set {set_numero} guardado exitosamente',
-            'partido_terminado': False
-        })
+        return JsonResponse(registrar_set(partido, set_numero, puntos_j1, puntos_j2))
         
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
@@ -348,17 +394,17 @@ def cerrar_partido(request, partido_id):
         return JsonResponse({'success': False, 'message': 'Método no permitido'})
     
     try:
-        partido = get_object_or_404(Partido, id=partido_id, arbitro=request.user)
+        partido = get_object_or_404(
+            Partido.objects.select_related('llave_torneo', 'jugador1', 'jugador2', 'resultado_detallado'),
+            id=partido_id, arbitro=request.user
+        )
         data = json.loads(request.body)
         
         sets_j1 = data.get('sets_jugador1')
         sets_j2 = data.get('sets_jugador2')
         
         # Determinar modalidad
-        total_rondas = partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = partido.llave_torneo.ronda == total_rondas
-        mejor_de_sets = partido.torneo.mejor_de_sets_final if es_partido_final else partido.torneo.mejor_de_sets
-        sets_para_ganar = (mejor_de_sets // 2) + 1
+        es_partido_final, mejor_de_sets, sets_para_ganar = partido.llave_torneo.modalidad_sets()
         
         # Validaciones
         if sets_j1 < sets_para_ganar and sets_j2 < sets_para_ganar:
@@ -378,12 +424,16 @@ def cerrar_partido(request, partido_id):
             ganador = partido.jugador2
             ganador_nombre = partido.jugador2_nombre
         
+        # Escribir los últimos puntos y liberar el marcador en vivo
+        marcador = descartar_marcador(partido.id)
+        
         # Cerrar partido y asignar ganador
         partido.finalizado = True
         partido.estado_partido = 'jugado'
         partido.ganador = ganador
         partido.fecha_fin = timezone.now()
         partido.save()
+        programar_compactacion(partido.id)
         
         # **CRUCIAL**: Actualizar también el ganador en la LlaveTorneo
         if partido.llave_torneo:
@@ -391,14 +441,11 @@ def cerrar_partido(request, partido_id):
             partido.llave_torneo.estado_partido = 'jugado'
             partido.llave_torneo.save()
             
-            # Avanzar automáticamente a la siguiente ronda
+            # Avanzar automáticamente a la siguiente ronda (y al tercer lugar)
             partido.avanzar_ganador_automaticamente()
-            
-            # Verificar si se completaron las semifinales para crear tercer lugar
-            partido.verificar_y_crear_tercer_lugar()
         
         # **NUEVO**: Enviar actualización via WebSocket
-        enviar_actualizacion_partido(partido.id)
+        enviar_actualizacion_partido(partido, marcador)
         
         return JsonResponse({
             'success': True,
@@ -417,59 +464,174 @@ def actualizar_puntos(request, partido_id):
         return JsonResponse({'success': False, 'message': 'Método no permitido'})
     
     try:
-        partido = get_object_or_404(Partido, id=partido_id, arbitro=request.user)
         data = json.loads(request.body)
         
-        accion = data.get('accion')  # 'sumar' o 'restar'
-        jugador = data.get('jugador')  # 1 o 2
+        accion = data.get('accion')  # 'sumar', 'restar' o 'deshacer'
+        jugador = data.get('jugador')  # 1 o 2 (opcional para 'deshacer')
+        secuencia = data.get('seq')  # Número consecutivo del toque (opcional)
+        cliente = data.get('cliente')  # Pestaña que numeró el toque (opcional)
         
-        if accion not in ['sumar', 'restar'] or jugador not in [1, 2]:
+        if accion not in ['sumar', 'restar', 'deshacer']:
             return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+        if jugador not in [1, 2] and accion != 'deshacer':
+            return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+        if secuencia is not None and (not isinstance(secuencia, int) or secuencia < 1):
+            return JsonResponse({'success': False, 'message': 'Secuencia inválida'})
+        
+        # El marcador en memoria aplica el punto; Resultado se escribe en segundo plano
+        if not es_arbitro_asignado(partido_id, request.user.id):
+            return JsonResponse({'success': False, 'message': 'Partido no encontrado'}, status=404)
+        marcador = obtener_marcador(partido_id)
+        if marcador is None:
+            return JsonResponse({'success': False, 'message': 'Partido no encontrado'}, status=404)
+        if marcador.finalizado:
+            return JsonResponse({'success': False, 'message': 'El partido ya está terminado'})
+        
+        # Restar y deshacer quitan el último punto vigente del registro de eventos
+        firma = firma_comando('point' if accion == 'sumar' else 'undo', jugador, cliente)
+        if accion == 'deshacer' and jugador not in [1, 2]:
+            jugador = marcador.ultimo_anotador()
+        delta = 1 if accion == 'sumar' else (-1 if jugador else 0)
+        
+        # Un reintento del mismo toque se confirma sin volver a aplicarlo; otro toque
+        # con el mismo número (otra pestaña) se rechaza para que el cliente lo renumere
+        estado = marcador.ejecutar(secuencia, jugador, delta, firma)
+        if estado == FUERA_DE_ORDEN:
+            return JsonResponse({
+                'success': False,
+                'message': 'Punto fuera de orden',
+                'secuencia': marcador.secuencia
+            }, status=409)
         
-        # Obtener o crear resultado
-        resultado, created = Resultado.objects.get_or_create(partido=partido)
-        
-        # Determinar el set actual
-        sets_j1 = resultado.sets_ganados_jugador1
-        sets_j2 = resultado.sets_ganados_jugador2
-        set_actual = sets_j1 + sets_j2 + 1
-        
-        # Obtener puntos actuales del set en progreso
-        puntos_j1 = getattr(resultado, f'set{set_actual}_jugador1', 0)
-        puntos_j2 = getattr(resultado, f'set{set_actual}_jugador2', 0)
-        
-        # Aplicar la acción
-        if jugador == 1:
-            if accion == 'sumar':
-                puntos_j1 += 1
-            elif accion == 'restar' and puntos_j1 > 0:
-                puntos_j1 -= 1
-        else:  # jugador == 2
-            if accion == 'sumar':
-                puntos_j2 += 1
-            elif accion == 'restar' and puntos_j2 > 0:
-                puntos_j2 -= 1
-        
-        # Guardar los puntos actualizados SIN disparar lógica automática de cierre
-        # Usamos update() en lugar de save() para evitar el método save() que tiene verificar_y_cerrar_partido()
-        Resultado.objects.filter(id=resultado.id).update(**{
-            f'set{set_actual}_jugador1': puntos_j1,
-            f'set{set_actual}_jugador2': puntos_j2
-        })
-        
-        # Refrescar el objeto desde la base de datos
-        resultado.refresh_from_db()
-        
-        # Enviar actualización via WebSocket
-        enviar_actualizacion_partido(partido.id)
+        # Enviar actualización via WebSocket desde la memoria
+        if estado == APLICADO:
+            difundir_marcador(marcador)
         
+        datos = marcador.como_dict()
         return JsonResponse({
             'success': True,
-            'puntos_j1': puntos_j1,
-            'puntos_j2': puntos_j2,
-            'set_actual': set_actual
+            'duplicado': estado == DUPLICADO,
+            'puntos_j1': datos['jugador1']['puntos'],
+            'puntos_j2': datos['jugador2']['puntos'],
+            'set_actual': datos['set_actual'],
+            'secuencia': datos['secuencia']
         })
         
+    except MarcadorEnOtroProceso as e:
+        # Otro worker arbitra el partido: el balanceador no mantuvo la afinidad por partido
+        return JsonResponse({'success': False, 'message': str(e)}, status=409)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
+
+@require_arbitro
+@csrf_exempt
+def puntos_lote(request, partido_id):
+    """
+    Vista AJAX que aplica un lote de comandos de puntaje del árbitro.
+
+    Sin conexión, la página del árbitro guarda cada toque numerado igual que
+    los comandos del WebSocket (``type`` 'point' o 'undo', ``jugador`` y
+    ``seq``, más ``cliente`` para reconocer sus reenvíos) y los envía juntos al
+    volver la red. Se aplican en orden de ``seq``: los ya aplicados se omiten y
+    el lote se detiene en el primero que se salta números o cuyo número ya usó
+    otro comando. Lo aplicado se escribe en ``Resultado`` en una sola
+    transacción y se difunde una vez.
+
+    Args:
+        request (HttpRequest): Petición con ``{"comandos": [...]}`` en el cuerpo
+        partido_id (int): ID del partido
+
+    Returns:
+        JsonResponse: Puntaje vigente, última secuencia aplicada y los ``seq``
+            confirmados (aplicados o ya aplicados); 409 si el lote se detuvo por
+            un comando fuera de orden y 409 sin secuencia si el cliente debe
+            reenviar el mismo lote
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'})
+    
+    try:
+        comandos = json.loads(request.body).get('comandos')
+        
+        if not isinstance(comandos, list) or not comandos:
+            return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+        if len(comandos) > getattr(settings, 'MARCADOR_LOTE_MAXIMO', 500):
+            return JsonResponse({'success': False, 'message': 'Demasiados comandos en el lote'})
+        for comando in comandos:
+            secuencia = comando.get('seq') if isinstance(comando, dict) else None
+            if not isinstance(secuencia, int) or secuencia < 1:
+                return JsonResponse({'success': False, 'message': 'Secuencia inválida'})
+            if comando.get('type') not in ['point', 'undo']:
+                return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+            if comando['type'] == 'point' and comando.get('jugador') not in [1, 2]:
+                return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+        
+        # La asignación se consulta en la base de datos: el partido pudo reasignarse en otro proceso
+        if not es_arbitro_asignado(partido_id, request.user.id):
+            return JsonResponse({'success': False, 'message': 'Partido no encontrado'}, status=404)
+        marcador = obtener_marcador(partido_id)
+        if marcador is None:
+            return JsonResponse({'success': False, 'message': 'Partido no encontrado'}, status=404)
+        if marcador.finalizado:
+            return JsonResponse({'success': False, 'message': 'El partido ya está terminado'})
+        
+        aplicados = duplicados = 0
+        confirmados = []
+        fuera_de_orden = False
+        for comando in sorted(comandos, key=lambda comando: comando['seq']):
+            jugador = comando.get('jugador')
+            firma = firma_comando(comando['type'], jugador, comando.get('cliente'))
+            if comando['type'] == 'point':
+                delta = 1
+            else:
+                # Deshacer sin jugador quita el último punto marcado en el set
+                if jugador not in [1, 2]:
+                    jugador = marcador.ultimo_anotador()
+                delta = -1 if jugador else 0
+            
+            estado = marcador.ejecutar(comando['seq'], jugador, delta, firma)
+            if estado == FUERA_DE_ORDEN:
+                fuera_de_orden = True
+                break
+            confirmados.append(comando['seq'])
+            if estado == APLICADO:
+                aplicados += 1
+            else:
+                duplicados += 1
+        
+        if aplicados:
+            # Todo el lote entra en Resultado en una transacción y sale en un solo cuadro
+            try:
+                marcador.guardar()
+            except MarcadorEnConflicto:
+                # Los puntos siguen en el diario y el escritor los reintenta; el reenvío
+                # del lote los confirma como duplicados sin aplicarlos otra vez
+                difundir_marcador(marcador)
+                return JsonResponse({
+                    'success': False,
+                    'message': 'El marcador fue modificado por otro proceso; reenvíe el lote'
+                }, status=409)
+            difundir_marcador(marcador)
+        
+        datos = marcador.como_dict()
+        respuesta = {
+            'success': not fuera_de_orden,
+            'aplicados': aplicados,
+            'duplicados': duplicados,
+            'confirmados': confirmados,
+            'puntos_j1': datos['jugador1']['puntos'],
+            'puntos_j2': datos['jugador2']['puntos'],
+            'set_actual': datos['set_actual'],
+            'secuencia': datos['secuencia']
+        }
+        if fuera_de_orden:
+            respuesta['message'] = 'Comando fuera de orden'
+            return JsonResponse(respuesta, status=409)
+        return JsonResponse(respuesta)
+        
+    except MarcadorEnOtroProceso as e:
+        # Otro worker arbitra el partido: el balanceador no mantuvo la afinidad por partido
+        return JsonResponse({'success': False, 'message': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
 
@@ -512,71 +674,109 @@ def validar_set_tenis_mesa(puntos_j1, puntos_j2):
     
     return "Puntuación inválida para terminar el set"
 
-def enviar_actualizacion_partido(partido_id):
-    """Envía actualización del partido via WebSocket"""
-    try:
-        channel_layer = get_channel_layer()
-        partido_group_name = f'partido_{partido_id}'
-        
-        # Obtener datos actualizados del partido
-        partido = Partido.objects.select_related('resultado_detallado', 'jugador1', 'jugador2', 'ganador').get(id=partido_id)
-        
-        # Calcular puntos y sets actuales
-        puntos_j1, puntos_j2 = 0, 0
-        sets_j1, sets_j2 = 0, 0
-        set_actual = 1
-        
-        if hasattr(partido, 'resultado_detallado'):
-            resultado = partido.resultado_detallado
-            sets_j1 = resultado.sets_ganados_jugador1
-            sets_j2 = resultado.sets_ganados_jugador2
-            
-            # Buscar el set actual en progreso
-            for i in range(1, 8):  # Máximo 7 sets
-                puntos_set_j1 = getattr(resultado, f'set{i}_jugador1', 0)
-                puntos_set_j2 = getattr(resultado, f'set{i}_jugador2', 0)
-                
-                # Si el set no tiene ganador, es el set actual
-                if not tiene_ganador_set(puntos_set_j1, puntos_set_j2):
-                    puntos_j1 = puntos_set_j1
-                    puntos_j2 = puntos_set_j2
-                    set_actual = i
-                    break
-                elif i > sets_j1 + sets_j2:  # Siguiente set después de los completados
-                    set_actual = i
-                    break
+def datos_partido(partido, con_resultado=True):
+    """
+    Estado de un partido según lo guardado en la base de datos.
 
-        data = {
-            'partido_id': partido.id,
-            'jugador1': {
-                'nombre': f"{partido.jugador1.nombre} {partido.jugador1.apellido}" if partido.jugador1 else "BYE",
-                'puntos': puntos_j1,
-                'sets': sets_j1
-            },
-            'jugador2': {
-                'nombre': f"{partido.jugador2.nombre} {partido.jugador2.apellido}" if partido.jugador2 else "BYE",
-                'puntos': puntos_j2,
-                'sets': sets_j2
-            },
-            'set_actual': set_actual,
+    Args:
+        partido (Partido): Partido con ``resultado_detallado``, jugadores y ganador cargados
+        con_resultado (bool): False para devolver solo estado, finalizado y ganador,
+            sin leer ``resultado_detallado`` ni los jugadores
+
+    Returns:
+        dict: Jugadores con puntos del set actual y sets ganados, set actual,
+            estado, ganador y secuencia de puntos
+    """
+    if not con_resultado:
+        return {
             'estado': partido.estado_partido,
             'finalizado': partido.finalizado,
-            'ganador': f"{partido.ganador.nombre} {partido.ganador.apellido}" if partido.ganador else None
+            'ganador': f"{partido.ganador.nombre} {partido.ganador.apellido}" if partido.ganador else None,
         }
-        
-        async_to_sync(channel_layer.group_send)(
-            partido_group_name,
-            {
-                'type': 'partido_update',
-                'data': data
-            }
-        )
+
+    # Calcular puntos y sets actuales
+    puntos_j1, puntos_j2 = 0, 0
+    sets_j1, sets_j2 = 0, 0
+    set_actual = 1
+    secuencia = 0
+
+    if hasattr(partido, 'resultado_detallado'):
+        resultado = partido.resultado_detallado
+        sets_j1 = resultado.sets_ganados_jugador1
+        sets_j2 = resultado.sets_ganados_jugador2
+        secuencia = resultado.secuencia_puntos
+
+        # Buscar el set actual en progreso
+        for i in range(1, 8):  # Máximo 7 sets
+            puntos_set_j1 = getattr(resultado, f'set{i}_jugador1', 0)
+            puntos_set_j2 = getattr(resultado, f'set{i}_jugador2', 0)
+
+            # Si el set no tiene ganador, es el set actual
+            if not tiene_ganador_set(puntos_set_j1, puntos_set_j2):
+                puntos_j1 = puntos_set_j1
+                puntos_j2 = puntos_set_j2
+                set_actual = i
+                break
+            elif i > sets_j1 + sets_j2:  # Siguiente set después de los completados
+                set_actual = i
+                break
+
+    return {
+        'partido_id': partido.id,
+        'jugador1': {
+            'nombre': f"{partido.jugador1.nombre} {partido.jugador1.apellido}" if partido.jugador1 else "BYE",
+            'puntos': puntos_j1,
+            'sets': sets_j1
+        },
+        'jugador2': {
+            'nombre': f"{partido.jugador2.nombre} {partido.jugador2.apellido}" if partido.jugador2 else "BYE",
+            'puntos': puntos_j2,
+            'sets': sets_j2
+        },
+        'set_actual': set_actual,
+        'estado': partido.estado_partido,
+        'finalizado': partido.finalizado,
+        'ganador': f"{partido.ganador.nombre} {partido.ganador.apellido}" if partido.ganador else None,
+        'secuencia': secuencia
+    }
+
+def enviar_actualizacion_partido(partido, marcador=None):
+    """
+    Encola la actualización del partido para el WebSocket sin esperar su envío.
+
+    El estado se arma con lo que la vista ya cargó, sin consultar de nuevo la base de datos.
+
+    Args:
+        partido (Partido): Partido con jugadores, ganador y ``resultado_detallado`` al día
+        marcador (MarcadorEnVivo): Marcador en vivo recién descartado, si lo había; sus
+            puntos son más recientes que los de ``resultado_detallado``
+    """
+    try:
+        if marcador is not None:
+            data = marcador.como_dict()
+            data.update(datos_partido(partido, con_resultado=False))
+        else:
+            data = datos_partido(partido)
+
+        # Set guardado o partido cerrado: se envía aunque haya una ventana abierta
+        difundir(partido.id, data, final=True)
     except Exception as e:
         print(f"Error enviando actualización WebSocket: {e}")
 
+def version_partidos_arbitro(request):
+    """ETag de la lista de partidos del árbitro: cambia con cada asignación, confirmación o cierre"""
+    return f"{request.user.id}-{request.user.version_partidos_arbitro}"
+
 @require_arbitro
+@condition(etag_func=version_partidos_arbitro)
 def verificar_partidos_ajax(request):
-    """Vista AJAX para verificar partidos asignados al árbitro en tiempo real"""
+    """
+    Vista AJAX para verificar partidos asignados al árbitro.
+
+    Respaldo del WebSocket ``ws/arbitro/``: si el cliente envía el ETag de la
+    última respuesta en If-None-Match y nada cambió, responde 304 sin consultar
+    los partidos.
+    """
     try:
         # Obtener partidos actuales del árbitro
         partidos_actuales = Partido.objects.filter(
@@ -595,6 +795,7 @@ def verificar_partidos_ajax(request):
             'total_partidos': total_partidos,
             'partidos_ids': partidos_ids,
             'partidos_pendientes_confirmacion': partidos_pendientes,
+            'version': request.user.version_partidos_arbitro,
             'timestamp': timezone.now().isoformat(),
         }
         
@@ -602,3 +803,13 @@ def verificar_partidos_ajax(request):
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+@require_organizador
+def estado_difusion(request):
+    """Contadores de difusión en vivo de este proceso, para monitoreo"""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'difusion': estadisticas_difusion(),
+        'despacho': metricas_despacho(),
+        'espectadores': estadisticas_espectadores(),
+    })
@@ -0,0 +1,108 @@
+"""
+Avisos en tiempo real de los cambios en los partidos de un torneo.
+
+Cada guardado de ``Partido`` (creación, inicio, resultado enviado a
+confirmación, cierre, cambio de árbitro) y cada avance de un jugador a una
+llave posterior se envía al grupo ``torneo_<id>`` una vez confirmada la
+transacción. ``TorneoConsumer`` los reenvía a la página de enfrentamientos,
+que así no necesita consultar el estado de cada partido.
+
+Los árbitros reciben en el grupo ``arbitro_<id>`` los cambios de los partidos
+que se les asignan o quitan, y de su estado de confirmación.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def estado_partido_torneo(partido):
+    """
+    Estado de un partido tal como lo ve el bracket.
+
+    Solo usa columnas del propio partido: no genera consultas adicionales.
+
+    Args:
+        partido (Partido): Partido del torneo
+
+    Returns:
+        dict: IDs del partido, llave, jugadores, ganador y árbitro, estado,
+            pendiente_confirmacion y finalizado
+    """
+    return {
+        'partido_id': partido.id,
+        'llave_id': partido.llave_torneo_id,
+        'estado': partido.estado_partido,
+        'pendiente_confirmacion': partido.pendiente_confirmacion,
+        'finalizado': partido.finalizado,
+        'jugador1_id': partido.jugador1_id,
+        'jugador2_id': partido.jugador2_id,
+        'ganador_id': partido.ganador_id,
+        'arbitro_id': partido.arbitro_id,
+    }
+
+
+def _enviar(grupo, mensaje):
+    try:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(grupo, mensaje)
+    except Exception as e:
+        print(f"Error enviando aviso a {grupo}: {e}")
+
+
+def avisar_partido(partido, evento):
+    """
+    Avisa al bracket en vivo que un partido cambió.
+
+    Args:
+        partido (Partido): Partido recién guardado
+        evento (str): 'creado' o 'actualizado'
+    """
+    mensaje = {
+        'type': 'torneo_partido',
+        'evento': evento,
+        'data': estado_partido_torneo(partido),
+    }
+    transaction.on_commit(lambda: _enviar(f'torneo_{partido.torneo_id}', mensaje))
+
+
+def avisar_avance(torneo_id, llave_id, lado, jugador):
+    """
+    Avisa al bracket en vivo que un jugador avanzó a una llave posterior.
+
+    Args:
+        torneo_id (int): ID del torneo
+        llave_id (int): ID de la llave destino
+        lado (int): 1 para jugador1, 2 para jugador2
+        jugador (Jugador): Jugador que avanza
+    """
+    mensaje = {
+        'type': 'torneo_avance',
+        'data': {
+            'llave_id': llave_id,
+            'lado': lado,
+            'jugador_id': jugador.id,
+            'jugador': f"{jugador.nombre} {jugador.apellido}",
+        },
+    }
+    transaction.on_commit(lambda: _enviar(f'torneo_{torneo_id}', mensaje))
+
+
+def avisar_arbitros(arbitro_ids, partido):
+    """
+    Avisa a los árbitros que cambió un partido de su lista.
+
+    Args:
+        arbitro_ids (set): IDs del árbitro actual y del anterior si el partido se reasignó
+        partido (Partido): Partido recién guardado
+    """
+    mensaje = {
+        'type': 'arbitro_partido',
+        'data': estado_partido_torneo(partido),
+    }
+
+    def enviar():
+        for arbitro_id in arbitro_ids:
+            _enviar(f'arbitro_{arbitro_id}', mensaje)
+
+    transaction.on_commit(enviar)
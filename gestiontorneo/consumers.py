@@ -0,0 +1,215 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from gestionarbitros.consumers import estado_partido
+from gestionarbitros.difusion import difusor
+from .avisos import estado_partido_torneo
+from .models import Partido, Torneo, TrabajoImportacion
+
+
+def partidos_torneo(torneo_id):
+    """
+    Estado de los partidos de un torneo tal como lo ve el bracket.
+
+    Args:
+        torneo_id (int): ID del torneo
+
+    Returns:
+        list: Estados de ``estado_partido_torneo``, o None si el torneo no existe
+    """
+    if not Torneo.objects.filter(id=torneo_id).exists():
+        return None
+    return [
+        estado_partido_torneo(partido)
+        for partido in Partido.objects.filter(torneo_id=torneo_id)
+    ]
+
+
+class ImportacionConsumer(AsyncWebsocketConsumer):
+    """Envía en tiempo real el avance de un trabajo de importación a su organizador"""
+
+    async def connect(self):
+        self.trabajo_id = self.scope['url_route']['kwargs']['trabajo_id']
+        self.trabajo_group_name = f'importacion_{self.trabajo_id}'
+
+        trabajo_data = await self.get_trabajo_data()
+        if trabajo_data is None:
+            await self.close()
+            return
+
+        # Join importacion group
+        await self.channel_layer.group_add(
+            self.trabajo_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+        # Enviar estado actual del trabajo al conectar
+        await self.send(text_data=json.dumps({
+            'type': 'importacion_status',
+            'data': trabajo_data
+        }))
+
+    async def disconnect(self, close_code):
+        # Leave importacion group
+        await self.channel_layer.group_discard(
+            self.trabajo_group_name,
+            self.channel_name
+        )
+
+    # Receive message from WebSocket
+    async def receive(self, text_data):
+        text_data_json = json.loads(text_data)
+        message_type = text_data_json.get('type')
+
+        if message_type == 'get_status':
+            await self.send(text_data=json.dumps({
+                'type': 'importacion_status',
+                'data': await self.get_trabajo_data()
+            }))
+
+    # Receive message from importacion group
+    async def importacion_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'importacion_update',
+            'data': event['data']
+        }))
+
+    @database_sync_to_async
+    def get_trabajo_data(self):
+        """Obtiene el estado del trabajo si pertenece al usuario conectado"""
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            return None
+        try:
+            trabajo = TrabajoImportacion.objects.get(id=self.trabajo_id, organizador=user)
+        except TrabajoImportacion.DoesNotExist:
+            return None
+        return trabajo.como_dict()
+
+
+class TorneoConsumer(AsyncWebsocketConsumer):
+    """
+    Bracket en vivo de un torneo por un solo WebSocket.
+
+    Reenvía los cambios de estado de los partidos del torneo (grupo
+    ``torneo_<id>``) y, multiplexados, los cuadros de puntaje de cada partido
+    no finalizado (grupos ``partido_<id>``), identificados por ``partido_id``.
+    """
+
+    async def connect(self):
+        self.torneo_id = int(self.scope['url_route']['kwargs']['torneo_id'])
+        self.torneo_group_name = f'torneo_{self.torneo_id}'
+        self.partidos_suscritos = set()
+
+        # Unirse antes de leer los partidos para no perder cambios entre ambos pasos
+        await self.channel_layer.group_add(
+            self.torneo_group_name,
+            self.channel_name
+        )
+
+        partidos = await self.get_partidos_torneo()
+        if partidos is None:
+            await self.close()
+            return
+
+        for partido in partidos:
+            if not partido['finalizado']:
+                await self.suscribir(partido['partido_id'])
+
+        await self.accept()
+        await self.send_torneo_status(partidos)
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(
+            self.torneo_group_name,
+            self.channel_name
+        )
+        for partido_id in list(self.partidos_suscritos):
+            await self.desuscribir(partido_id)
+
+    async def suscribir(self, partido_id):
+        if partido_id not in self.partidos_suscritos:
+            self.partidos_suscritos.add(partido_id)
+            await self.channel_layer.group_add(f'partido_{partido_id}', self.channel_name)
+            difusor.seguir(partido_id)
+
+    async def desuscribir(self, partido_id):
+        if partido_id in self.partidos_suscritos:
+            self.partidos_suscritos.discard(partido_id)
+            await self.channel_layer.group_discard(f'partido_{partido_id}', self.channel_name)
+            difusor.dejar(partido_id)
+
+    # Receive message from WebSocket
+    async def receive(self, text_data):
+        text_data_json = json.loads(text_data)
+        message_type = text_data_json.get('type')
+
+        if message_type == 'get_status':
+            await self.send_torneo_status(await self.get_partidos_torneo())
+        elif message_type == 'get_partido':
+            # El cliente perdió la versión de un marcador: se le envía completo
+            partido_id = text_data_json.get('partido_id')
+            if partido_id not in self.partidos_suscritos:
+                return
+            version, estado = await difusor.estado_para_conexion(
+                partido_id, lambda: database_sync_to_async(estado_partido)(partido_id)
+            )
+            await self.send(text_data=json.dumps({
+                'type': 'partido_status',
+                'partido_id': partido_id,
+                'v': version,
+                'data': estado,
+            }))
+
+    # Receive message from torneo group
+    async def torneo_partido(self, event):
+        data = event['data']
+        # Los partidos nuevos se siguen en vivo; los finalizados ya no envían puntos
+        if data['finalizado']:
+            await self.desuscribir(data['partido_id'])
+        else:
+            await self.suscribir(data['partido_id'])
+
+        await self.send(text_data=json.dumps({
+            'type': 'partido_estado',
+            'evento': event['evento'],
+            'data': data,
+        }))
+
+    async def torneo_avance(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'avance',
+            'data': event['data'],
+        }))
+
+    # Receive message from partido groups
+    async def partido_update(self, event):
+        difusor.observar(event['partido_id'], event)
+        await self.send(text_data=json.dumps({
+            'type': 'partido_delta',
+            'partido_id': event['partido_id'],
+            'v': event['v'],
+            'base': event['base'],
+            'cambios': event['cambios'],
+        }))
+
+    async def send_torneo_status(self, partidos):
+        """Envía el estado de todos los partidos y los marcadores que ya están en memoria"""
+        marcadores = {}
+        for partido_id in self.partidos_suscritos:
+            version, estado = difusor.ultimo_estado(partido_id)
+            if estado is not None:
+                marcadores[partido_id] = {'v': version, 'data': estado}
+
+        await self.send(text_data=json.dumps({
+            'type': 'torneo_status',
+            'partidos': partidos,
+            'marcadores': marcadores,
+        }))
+
+    @database_sync_to_async
+    def get_partidos_torneo(self):
+        """Obtiene el estado de los partidos del torneo, o None si el torneo no existe"""
+        return partidos_torneo(self.torneo_id)
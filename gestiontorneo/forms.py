@@ -2,19 +2,29 @@ from django import forms
 from gestiontorneo.models import *
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
 import re
 import unicodedata
 import pandas as pd
 from django.utils import timezone
 from datetime import date
 
+EXTENSIONES_IMPORTACION = ['xlsx', 'xls', 'csv']
+
 class ImportarJugadoresForm(forms.Form):
-    archivo = forms.FileField(label="Archivo Excel (.xlsx)")
+    archivo = forms.FileField(
+        label="Archivo Excel (.xlsx) o CSV (.csv)",
+        help_text="El formato CSV se procesa mucho más rápido en archivos grandes. Se aceptan separadores ',' y ';'.",
+        validators=[FileExtensionValidator(EXTENSIONES_IMPORTACION, "El archivo debe ser Excel (.xlsx) o CSV (.csv).")],
+        widget=forms.ClearableFileInput(attrs={'accept': '.xlsx,.xls,.csv'})
+    )
 
 class ImportarParticipantesForm(forms.Form):
     archivo_participantes = forms.FileField(
-        label="Archivo Excel con RUTs (.xlsx)",
-        help_text="Sube un archivo Excel con una columna 'RUT' que contenga los RUTs de los jugadores a agregar al torneo."
+        label="Archivo Excel o CSV con RUTs (.xlsx, .csv)",
+        help_text="Sube un archivo Excel o CSV con una columna 'RUT' que contenga los RUTs de los jugadores a agregar al torneo.",
+        validators=[FileExtensionValidator(EXTENSIONES_IMPORTACION, "El archivo debe ser Excel (.xlsx) o CSV (.csv).")],
+        widget=forms.ClearableFileInput(attrs={'accept': '.xlsx,.xls,.csv'})
     )
 
 class RegistroPersonalizadoForm(UserCreationForm):
@@ -0,0 +1,394 @@
+"""
+Motor de importación masiva de jugadores y participantes.
+
+Este módulo reemplaza el recorrido fila a fila de ``importar_jugadores`` por un
+procesamiento por columnas: el DataFrame completo se limpia y valida con
+operaciones vectorizadas de pandas, los RUTs, correos y clubes existentes se
+cargan una sola vez en memoria y los registros nuevos se insertan con
+``bulk_create`` dentro de una única transacción.
+"""
+
+import re
+from datetime import datetime
+
+import pandas as pd
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import Club, Jugador, Participacion
+
+# Columnas esperadas en la plantilla oficial de jugadores
+COLUMNAS_JUGADORES = ['rut', 'nombre', 'apellido', 'fecha de nacimiento', 'genero', 'club', 'correo']
+
+FORMATOS_FECHA = ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"]
+
+RUT_REGEX = r'^\d{7,8}-[\dkK]$'
+
+# Tamaño de lote para las inserciones masivas
+TAMANO_LOTE = 1000
+
+
+def limpiar_texto_serie(serie):
+    """
+    Versión vectorizada de ``limpiar_texto_estricto`` para una columna completa.
+
+    Args:
+        serie (Series): Columna con textos sin procesar
+
+    Returns:
+        Series: Textos limpios ('' para valores vacíos o nulos)
+    """
+    texto = serie.where(serie.notna(), '').astype(str).str.strip()
+    texto = texto.str.replace(r'[\r\n\t]', ' ', regex=True)
+    for basura in ('_x000D_', '_x000A_', 'x000D', 'x000A'):
+        texto = texto.str.replace(basura, ' ', regex=False)
+    texto = texto.str.normalize('NFC')
+    texto = texto.str.replace(r"[^a-zA-ZáéíóúÁÉÍÓÚñÑ0-9 .\-]", "", regex=True)
+    texto = texto.str.replace(r"\s+", " ", regex=True)
+    texto = texto.str.replace(r"-+", "-", regex=True)
+    texto = texto.str.replace(r"\.+", ".", regex=True)
+    return texto.str.strip()
+
+
+def limpiar_email_serie(serie):
+    """
+    Versión vectorizada de ``limpiar_email_estricto`` para una columna completa.
+
+    Los valores nulos, vacíos o 'nan' se convierten en cadena vacía.
+
+    Args:
+        serie (Series): Columna con correos sin procesar
+
+    Returns:
+        Series: Correos limpios en minúsculas
+    """
+    email = serie.where(serie.notna(), '').astype(str).str.strip().str.lower()
+    email = email.where(email != 'nan', '')
+    email = email.str.replace(r'[\r\n\t]', '', regex=True)
+    for basura in ('_x000d_', '_x000a_', 'x000d', 'x000a'):
+        email = email.str.replace(basura, '', regex=False)
+    email = email.str.normalize('NFC')
+    email = email.str.replace(r"[^a-z0-9@.\-_]", "", regex=True)
+    return email.str.strip()
+
+
+def normalizar_rut_serie(serie):
+    """
+    Versión vectorizada de ``normalizar_rut``.
+
+    Args:
+        serie (Series): Columna de RUTs
+
+    Returns:
+        Series: RUTs sin puntos ni espacios y en mayúsculas ('' para valores nulos)
+    """
+    return (
+        serie.where(serie.notna(), '').astype(str)
+        .str.replace('.', '', regex=False)
+        .str.replace(' ', '', regex=False)
+        .str.upper()
+    )
+
+
+def parsear_fechas_serie(serie):
+    """
+    Convierte una columna de fechas de nacimiento en objetos ``date``.
+
+    Acepta valores ``datetime`` (como los entrega openpyxl) y textos en los
+    formatos admitidos por la importación. Las fechas no reconocidas quedan
+    como ``None``.
+
+    Args:
+        serie (Series): Columna de fechas sin procesar
+
+    Returns:
+        Series: Fechas (``date``) o ``None`` si no son válidas
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        fechas = serie
+    else:
+        es_datetime = serie.map(lambda valor: isinstance(valor, datetime) and not pd.isna(valor))
+        fechas = pd.to_datetime(serie.where(es_datetime), errors='coerce')
+        como_texto = serie.astype(str)
+        for fmt in FORMATOS_FECHA:
+            pendientes = fechas.isna()
+            if not pendientes.any():
+                break
+            fechas = fechas.where(
+                ~pendientes,
+                pd.to_datetime(como_texto.where(pendientes), format=fmt, errors='coerce')
+            )
+    return fechas.dt.date.where(fechas.notna(), None)
+
+
+def _correo_valido(correo):
+    try:
+        validate_email(correo)
+        return True
+    except DjangoValidationError:
+        return False
+
+
+class ImportadorJugadores:
+    """
+    Importador de jugadores basado en conjuntos.
+
+    Al crearse carga en memoria los RUTs, correos y clubes existentes (una
+    consulta cada uno). Cada llamada a ``procesar`` valida un DataFrame completo
+    con operaciones por columna y persiste los jugadores válidos con
+    ``bulk_create``. El estado de RUTs y correos vistos se conserva entre
+    llamadas, por lo que un archivo puede procesarse en varios lotes.
+
+    Attributes:
+        ruts_existentes (set): RUTs presentes en la base de datos al iniciar
+        emails_existentes (set): Correos presentes en la base de datos al iniciar
+        clubes (dict): Nombre de club -> id
+        creados (int): Jugadores insertados por este importador
+    """
+
+    def __init__(self):
+        self.ruts_existentes = set(Jugador.objects.values_list('rut', flat=True).iterator())
+        self.emails_existentes = set(
+            Jugador.objects.exclude(email__isnull=True).values_list('email', flat=True).iterator()
+        )
+        self.clubes = dict(Club.objects.values_list('nombre', 'id'))
+        self.ruts_en_archivo = set()
+        self.emails_en_archivo = set()
+        self.creados = 0
+
+    def preparar(self, df):
+        """
+        Normaliza encabezados y limpia todas las columnas del DataFrame.
+
+        Args:
+            df (DataFrame): Datos tal como se leyeron del archivo
+
+        Returns:
+            DataFrame: Columnas limpias (rut, nombre, apellido, fecha, fecha_raw,
+            genero, club, correo) con el mismo índice que ``df``
+        """
+        df = df.copy()
+        df.columns = [str(col).strip().lower() for col in df.columns]
+        df = df.reindex(columns=COLUMNAS_JUGADORES, fill_value='')
+
+        datos = pd.DataFrame(index=df.index)
+        datos['rut'] = normalizar_rut_serie(df['rut'])
+        datos['nombre'] = limpiar_texto_serie(df['nombre'])
+        datos['apellido'] = limpiar_texto_serie(df['apellido'])
+        fecha = df['fecha de nacimiento']
+        datos['fecha_raw'] = fecha.where(fecha.notna(), '').astype(str)
+        datos['fecha'] = parsear_fechas_serie(df['fecha de nacimiento'])
+        datos['genero'] = limpiar_texto_serie(df['genero']).str.upper()
+        club = limpiar_texto_serie(df['club'])
+        datos['club'] = club.where(club.str.lower() != 'nan', '')
+        datos['correo'] = limpiar_email_serie(df['correo'])
+        return datos
+
+    def validar(self, datos):
+        """
+        Valida todas las filas y determina el primer error de cada una.
+
+        Las reglas y su orden son los mismos que aplicaba la importación fila a
+        fila, de modo que el reporte de errores no cambia.
+
+        Args:
+            datos (DataFrame): Resultado de ``preparar``
+
+        Returns:
+            tuple: (Series de mensajes de error por fila o None, máscara de filas válidas)
+        """
+        fila = (datos.index.to_series() + 2).astype(str)
+        prefijo = "Fila " + fila + ": "
+        errores = pd.Series(None, index=datos.index, dtype=object)
+
+        def marcar(mascara, mensajes):
+            mascara = mascara & errores.isna()
+            errores.loc[mascara] = mensajes[mascara]
+            return mascara
+
+        marcar(datos['nombre'] == '', prefijo + "Nombre vacío o inválido")
+        marcar(datos['apellido'] == '', prefijo + "Apellido vacío o inválido")
+        marcar(~datos['rut'].str.match(RUT_REGEX), prefijo + "RUT inválido (" + datos['rut'] + ")")
+
+        # Un RUT se reserva al pasar la verificación contra la base de datos,
+        # así que solo las filas candidatas cuentan como duplicados
+        en_bd = datos['rut'].isin(self.ruts_existentes)
+        visto = datos['rut'].isin(self.ruts_en_archivo)
+        candidatas = errores.isna() & ~en_bd
+        duplicado = visto | (candidatas & datos['rut'].where(candidatas).duplicated(keep='first'))
+        marcar(duplicado & ~en_bd, prefijo + "RUT duplicado en el archivo (" + datos['rut'] + ")")
+        marcar(en_bd, prefijo + "RUT ya existe en la base de datos (" + datos['rut'] + ")")
+        self.ruts_en_archivo.update(datos.loc[errores.isna(), 'rut'])
+
+        marcar(datos['fecha'].isna(), prefijo + "Fecha de nacimiento inválida (" + datos['fecha_raw'] + ")")
+        marcar(
+            ~datos['genero'].isin(['M', 'F']),
+            prefijo + "Género inválido (" + datos['genero'] + "). Debe ser 'M' o 'F'."
+        )
+
+        correo = datos['correo']
+        con_correo = correo != ''
+        correos_unicos = correo[con_correo & errores.isna()].unique()
+        validos = {c for c in correos_unicos if _correo_valido(c)}
+        marcar(con_correo & ~correo.isin(validos), prefijo + "Correo inválido (" + correo + ")")
+
+        correo_en_bd = correo.isin(self.emails_existentes)
+        candidatas = con_correo & errores.isna() & ~correo_en_bd
+        duplicado = correo.isin(self.emails_en_archivo) | (
+            candidatas & correo.where(candidatas).duplicated(keep='first')
+        )
+        marcar(con_correo & duplicado & ~correo_en_bd, prefijo + "Correo duplicado en el archivo (" + correo + ")")
+        marcar(con_correo & correo_en_bd, prefijo + "Correo ya existe in la base de datos (" + correo + ")")
+
+        return errores, errores.isna()
+
+    def _crear_clubes_faltantes(self, nombres):
+        """Crea en una sola inserción los clubes que aún no existen."""
+        faltantes = sorted(set(nombres) - set(self.clubes) - {''})
+        if not faltantes:
+            return
+        Club.objects.bulk_create([Club(nombre=nombre) for nombre in faltantes], ignore_conflicts=True)
+        # ignore_conflicts no devuelve ids en MySQL: se releen solo los recién creados
+        self.clubes.update(Club.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+
+    def procesar(self, df):
+        """
+        Valida e inserta un DataFrame de jugadores.
+
+        Args:
+            df (DataFrame): Filas del archivo; el índice determina el número de fila
+                reportado en los errores (índice + 2)
+
+        Returns:
+            tuple: (int jugadores creados, list mensajes de error en orden de fila)
+        """
+        datos = self.preparar(df)
+        errores, validas = self.validar(datos)
+        nuevos = datos[validas]
+
+        with transaction.atomic():
+            self._crear_clubes_faltantes(nuevos['club'])
+            jugadores = []
+            for rut, nombre, apellido, fecha, genero, club, correo in zip(
+                nuevos['rut'], nuevos['nombre'], nuevos['apellido'], nuevos['fecha'],
+                nuevos['genero'], nuevos['club'], nuevos['correo'],
+            ):
+                jugador = Jugador(
+                    rut=rut,
+                    nombre=nombre,
+                    apellido=apellido,
+                    fecha_nacimiento=fecha,
+                    genero=genero,
+                    club_id=self.clubes.get(club) if club else None,
+                    email=correo or None,
+                )
+                # bulk_create no llama a save(): las columnas de búsqueda se calculan aquí
+                jugador.actualizar_campos_busqueda(nombre_club=club)
+                jugadores.append(jugador)
+            Jugador.objects.bulk_create(jugadores, batch_size=TAMANO_LOTE)
+
+        self.emails_en_archivo.update(c for c in nuevos['correo'] if c)
+        self.creados += len(jugadores)
+
+        return len(jugadores), errores.dropna().tolist()
+
+
+def importar_jugadores_df(df):
+    """
+    Importa un DataFrame completo de jugadores en una sola pasada.
+
+    Args:
+        df (DataFrame): Datos leídos de la plantilla de jugadores
+
+    Returns:
+        tuple: (int jugadores creados, list mensajes de error por fila)
+    """
+    return ImportadorJugadores().procesar(df)
+
+
+class ImportadorParticipantes:
+    """
+    Importador de participantes de un torneo a partir de una lista de RUTs.
+
+    Los participantes confirmados del torneo se cargan una vez al crearse y
+    cada llamada a ``procesar`` resuelve los jugadores del lote con una sola
+    consulta ``rut__in``. Como ``ImportadorJugadores``, conserva el estado
+    entre llamadas para poder procesar el archivo por lotes.
+
+    Attributes:
+        torneo (Torneo): Torneo al que se agregan los participantes
+        ruts_confirmados (set): RUTs ya inscritos en el torneo
+        ruts_seleccionados (set): RUTs ya seleccionados para agregar
+        aceptados (list): RUTs aceptados en orden de aparición
+        ids_por_rut (dict): RUT aceptado -> id del jugador
+    """
+
+    def __init__(self, torneo, ruts_seleccionados=()):
+        self.torneo = torneo
+        self.ruts_confirmados = set(
+            Participacion.objects.filter(torneo=torneo).values_list('jugador__rut', flat=True)
+        )
+        self.ruts_seleccionados = set(ruts_seleccionados)
+        self.ruts_en_archivo = set()
+        self.aceptados = []
+        self.ids_por_rut = {}
+
+    def procesar(self, df):
+        """
+        Valida un DataFrame de RUTs y acumula los participantes aceptados.
+
+        Args:
+            df (DataFrame): Filas del archivo; el índice determina el número de fila
+                reportado en los errores (índice + 2)
+
+        Returns:
+            tuple: (list RUTs aceptados en este lote, list mensajes de error)
+        """
+        df = df.copy()
+        df.columns = [str(col).strip().lower() for col in df.columns]
+        ruts = normalizar_rut_serie(df['rut'] if 'rut' in df.columns else pd.Series('', index=df.index))
+
+        candidatos = set(ruts[ruts.str.match(RUT_REGEX)])
+        jugadores = {j.rut: j for j in Jugador.objects.filter(rut__in=candidatos)}
+        categoria = None
+        if not self.torneo.todo_competidor and self.torneo.categoria:
+            categoria = self.torneo.categoria.nombre
+
+        errores = []
+        aceptados = []
+        for indice, rut in ruts.items():
+            fila = indice + 2
+            if not rut:
+                errores.append(f"Fila {fila}: RUT vacío")
+                continue
+            if not re.match(RUT_REGEX, rut):
+                errores.append(f"Fila {fila}: RUT inválido ({rut})")
+                continue
+            if rut in self.ruts_en_archivo:
+                errores.append(f"Fila {fila}: RUT duplicado en el archivo ({rut})")
+                continue
+            jugador = jugadores.get(rut)
+            if jugador is None:
+                errores.append(f"Fila {fila}: Jugador con RUT {rut} no existe en la base de datos")
+                continue
+            if rut in self.ruts_confirmados:
+                errores.append(f"Fila {fila}: Jugador con RUT {rut} ya está confirmado en el torneo")
+                continue
+            if rut in self.ruts_seleccionados:
+                errores.append(f"Fila {fila}: Jugador con RUT {rut} ya está seleccionado para agregar")
+                continue
+            if categoria and jugador.calcular_categoria() != categoria:
+                errores.append(
+                    f"Fila {fila}: Jugador {jugador.nombre} {jugador.apellido} (RUT: {rut}) "
+                    f"no pertenece a la categoría {categoria}"
+                )
+                continue
+
+            self.ruts_seleccionados.add(rut)
+            self.ruts_en_archivo.add(rut)
+            self.ids_por_rut[rut] = jugador.id
+            aceptados.append(rut)
+
+        self.aceptados.extend(aceptados)
+        return aceptados, errores
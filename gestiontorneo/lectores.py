@@ -0,0 +1,154 @@
+"""
+Lectores en streaming para los archivos de importación.
+
+En lugar de cargar el libro completo con ``pd.read_excel``, los archivos se
+recorren fila a fila (openpyxl en modo ``read_only`` para .xlsx y el módulo
+``csv`` para .csv) y se entregan a los importadores en lotes de tamaño fijo,
+de modo que la memoria usada depende del tamaño del lote y no del archivo.
+"""
+
+import csv
+import os
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+EXTENSIONES_ADMITIDAS = ['.xlsx', '.xls', '.csv']
+
+
+def normalizar_encabezado(valor):
+    """
+    Normaliza el nombre de una columna como lo hacían las vistas originales.
+
+    Args:
+        valor: Contenido de la celda de encabezado
+
+    Returns:
+        str: Encabezado sin espacios extremos y en minúsculas
+    """
+    return str(valor).strip().lower() if valor is not None else ''
+
+
+def _detectar_delimitador(muestra):
+    """Distingue entre ',' y ';' (Excel en español exporta CSV con ';')."""
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=',;\t').delimiter
+    except csv.Error:
+        return ','
+
+
+def _filas_csv(ruta):
+    """Recorre un CSV entregando (número de fila, lista de valores) por cada línea de datos."""
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        delimitador = _detectar_delimitador(archivo.read(4096))
+        archivo.seek(0)
+        for numero, valores in enumerate(csv.reader(archivo, delimiter=delimitador), start=1):
+            yield numero, valores
+
+
+def _filas_xlsx(ruta):
+    """Recorre la primera hoja de un .xlsx en modo de solo lectura."""
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        for numero, valores in enumerate(hoja.iter_rows(values_only=True), start=1):
+            yield numero, list(valores)
+    finally:
+        libro.close()
+
+
+def _filas_xls(ruta):
+    """Formato .xls antiguo: openpyxl no lo soporta, se usa pandas sin streaming."""
+    df = pd.read_excel(ruta, header=None, dtype=object)
+    for numero, valores in enumerate(df.itertuples(index=False), start=1):
+        yield numero, [None if pd.isna(valor) else valor for valor in valores]
+
+
+def _filas_crudas(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.csv':
+        return _filas_csv(ruta)
+    if extension == '.xls':
+        return _filas_xls(ruta)
+    return _filas_xlsx(ruta)
+
+
+def leer_filas(ruta):
+    """
+    Entrega las filas de datos de un archivo como diccionarios.
+
+    La primera fila se toma como encabezado. Las filas completamente vacías se
+    omiten, pero la numeración conserva la posición real en la planilla para
+    que los mensajes de error apunten a la fila correcta.
+
+    Args:
+        ruta (str): Ruta del archivo (.xlsx, .xls o .csv)
+
+    Yields:
+        tuple: (índice de la fila, dict encabezado -> valor). El índice sigue la
+        convención de pandas: fila de la planilla menos 2.
+    """
+    encabezados = None
+    for numero, valores in _filas_crudas(ruta):
+        if encabezados is None:
+            encabezados = [normalizar_encabezado(valor) for valor in valores]
+            continue
+        if all(valor is None or str(valor).strip() == '' for valor in valores):
+            continue
+        # Una línea de CSV más corta que el encabezado deja vacías las columnas que le faltan
+        valores = list(valores) + [''] * (len(encabezados) - len(valores))
+        fila = {
+            encabezado: ('' if valor is None else valor)
+            for encabezado, valor in zip(encabezados, valores)
+            if encabezado
+        }
+        yield numero - 2, fila
+
+
+def leer_lotes(ruta, tamano_lote, desde_lote=0):
+    """
+    Agrupa las filas de un archivo en DataFrames de tamaño acotado.
+
+    Args:
+        ruta (str): Ruta del archivo
+        tamano_lote (int): Filas por lote
+        desde_lote (int): Lotes iniciales a omitir (para reanudar un trabajo)
+
+    Yields:
+        tuple: (número de lote, DataFrame con índice = fila de la planilla - 2)
+    """
+    filas = leer_filas(ruta)
+    numero = 0
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            return
+        if numero >= desde_lote:
+            indices, registros = zip(*lote)
+            yield numero, pd.DataFrame(list(registros), index=list(indices), dtype=object)
+        numero += 1
+
+
+def contar_filas(ruta):
+    """
+    Estima la cantidad de filas de datos de un archivo para mostrar el avance.
+
+    En .xlsx se usan las dimensiones declaradas de la hoja (sin recorrerla);
+    en los demás formatos se cuentan las filas sin construir DataFrames.
+
+    Args:
+        ruta (str): Ruta del archivo
+
+    Returns:
+        int: Cantidad (estimada) de filas de datos
+    """
+    if os.path.splitext(ruta)[1].lower() == '.xlsx':
+        libro = load_workbook(ruta, read_only=True)
+        try:
+            max_fila = libro.worksheets[0].max_row
+        finally:
+            libro.close()
+        if max_fila:
+            return max(max_fila - 1, 0)
+    return sum(1 for _ in leer_filas(ruta))
@@ -0,0 +1,239 @@
+"""
+Construcción en memoria de brackets de eliminación directa.
+
+El cuadro completo (posiciones de la primera ronda, BYEs y llaves vacías de las
+rondas siguientes) se calcula primero en memoria y luego se persiste con
+``bulk_create`` dentro de una única transacción, en lugar de insertar cada
+``JugadorBye`` y cada ``LlaveTorneo`` por separado.
+"""
+
+import math
+import random
+
+from django.db import transaction
+
+from .models import JugadorBye, LlaveTorneo
+
+
+def tamano_bracket(num_participantes):
+    """
+    Calcula el tamaño del cuadro (potencia de 2) y la cantidad de rondas.
+
+    Args:
+        num_participantes (int): Jugadores inscritos
+
+    Returns:
+        tuple: (int potencia de 2 siguiente, int total de rondas)
+    """
+    potencia_2_siguiente = 2 ** math.ceil(math.log2(max(num_participantes, 2)))
+    total_rondas = math.ceil(math.log2(potencia_2_siguiente))
+    return potencia_2_siguiente, total_rondas
+
+
+def enfrentamiento_vacio(posicion):
+    """
+    Crea la estructura en memoria de un enfrentamiento de primera ronda.
+
+    ``bye1``/``bye2`` son booleanos: los ``JugadorBye`` se crean al persistir.
+
+    Args:
+        posicion (int): Posición del enfrentamiento en la primera ronda
+
+    Returns:
+        dict: Enfrentamiento sin jugadores ni BYEs
+    """
+    return {'posicion': posicion, 'jugador1': None, 'jugador2': None, 'bye1': False, 'bye2': False}
+
+
+def construir_primera_ronda(jugadores, potencia_2_siguiente, byes_necesarias, aleatorio=random):
+    """
+    Distribuye jugadores y BYEs al azar en la primera ronda sin BYE contra BYE.
+
+    Args:
+        jugadores (list): Jugadores a ubicar
+        potencia_2_siguiente (int): Tamaño del cuadro
+        byes_necesarias (int): BYEs a ubicar
+        aleatorio (Random): Generador aleatorio (permite resultados reproducibles)
+
+    Returns:
+        list: Enfrentamientos de la primera ronda (ver ``enfrentamiento_vacio``)
+    """
+    jugadores_mezclados = list(jugadores)
+    aleatorio.shuffle(jugadores_mezclados)
+
+    num_enfrentamientos = potencia_2_siguiente // 2
+    enfrentamientos = [enfrentamiento_vacio(i + 1) for i in range(num_enfrentamientos)]
+
+    # Como máximo un BYE por enfrentamiento, en un lado elegido al azar
+    for indice in aleatorio.sample(range(num_enfrentamientos), min(byes_necesarias, num_enfrentamientos)):
+        lado = aleatorio.choice(('bye1', 'bye2'))
+        enfrentamientos[indice][lado] = True
+
+    restantes = iter(jugadores_mezclados)
+    for enfrentamiento in enfrentamientos:
+        if not enfrentamiento['bye1']:
+            enfrentamiento['jugador1'] = next(restantes, None)
+        if not enfrentamiento['bye2']:
+            enfrentamiento['jugador2'] = next(restantes, None)
+
+    return enfrentamientos
+
+
+@transaction.atomic
+def materializar_bracket(torneo, primera_ronda, potencia_2_siguiente):
+    """
+    Persiste el cuadro completo del torneo en una sola transacción.
+
+    Elimina las llaves y BYEs anteriores, crea todos los BYEs con un
+    ``bulk_create``, relee sus ids con una consulta (MySQL no los devuelve en
+    inserciones masivas) y crea todas las llaves de todas las rondas, más la de
+    tercer lugar cuando hay semifinales, con otro ``bulk_create``. Finalmente
+    enlaza cada llave con su destino (ver ``enlazar_llaves``) y guarda en el
+    torneo la cantidad de rondas y la llave final. Cada llave lleva su
+    ``mejor_de_sets`` para que los marcadores no consulten la estructura.
+
+    Args:
+        torneo (Torneo): Torneo al que pertenece el cuadro
+        primera_ronda (list): Enfrentamientos de la primera ronda
+        potencia_2_siguiente (int): Tamaño del cuadro
+
+    Returns:
+        int: Total de rondas creadas
+    """
+    total_rondas = math.ceil(math.log2(potencia_2_siguiente))
+
+    torneo.llaves.all().delete()
+    torneo.byes.all().delete()
+
+    # Numerar los BYEs en el orden en que aparecen en el cuadro
+    numeros_bye = {}
+    for enfrentamiento in primera_ronda:
+        for lado in ('bye1', 'bye2'):
+            if enfrentamiento[lado]:
+                numeros_bye[(enfrentamiento['posicion'], lado)] = len(numeros_bye) + 1
+
+    if numeros_bye:
+        JugadorBye.objects.bulk_create([
+            JugadorBye(nombre="BYE", posicion_bye=numero, torneo=torneo)
+            for numero in numeros_bye.values()
+        ])
+    bye_ids = dict(torneo.byes.values_list('posicion_bye', 'id')) if numeros_bye else {}
+
+    llaves = []
+    for enfrentamiento in primera_ronda:
+        posicion = enfrentamiento['posicion']
+        llaves.append(LlaveTorneo(
+            torneo=torneo,
+            ronda=1,
+            posicion=posicion,
+            jugador1=enfrentamiento['jugador1'],
+            jugador2=enfrentamiento['jugador2'],
+            bye1_id=bye_ids.get(numeros_bye.get((posicion, 'bye1'))),
+            bye2_id=bye_ids.get(numeros_bye.get((posicion, 'bye2'))),
+            estado_partido='pendiente',
+            mejor_de_sets=mejor_de_sets_ronda(torneo, 1, total_rondas),
+        ))
+
+    # Rondas siguientes vacías: se llenan a medida que avanzan los ganadores
+    for ronda in range(2, total_rondas + 1):
+        for posicion in range(1, potencia_2_siguiente // (2 ** ronda) + 1):
+            llaves.append(LlaveTorneo(
+                torneo=torneo,
+                ronda=ronda,
+                posicion=posicion,
+                mejor_de_sets=mejor_de_sets_ronda(torneo, ronda, total_rondas),
+            ))
+
+    ronda_semifinales = total_rondas - 1
+    if total_rondas >= 3:
+        llaves.append(LlaveTorneo(
+            torneo=torneo,
+            ronda=ronda_semifinales,
+            posicion=LlaveTorneo.POSICION_TERCER_LUGAR,
+            tipo_llave='tercer_lugar',
+            mejor_de_sets=torneo.mejor_de_sets,
+        ))
+
+    LlaveTorneo.objects.bulk_create(llaves)
+    ids = enlazar_llaves(torneo, total_rondas)
+
+    torneo.total_rondas = total_rondas
+    torneo.llave_final_id = ids.get((total_rondas, 1))
+    torneo.save(update_fields=['total_rondas', 'llave_final'])
+    return total_rondas
+
+
+def mejor_de_sets_ronda(torneo, ronda, total_rondas):
+    """
+    Indica a cuántos sets se juegan los partidos de una ronda.
+
+    Args:
+        torneo (Torneo): Torneo con la configuración de sets
+        ronda (int): Ronda de la llave
+        total_rondas (int): Rondas del cuadro
+
+    Returns:
+        int: ``mejor_de_sets_final`` para la final, ``mejor_de_sets`` para el resto
+    """
+    return torneo.mejor_de_sets_final if ronda == total_rondas else torneo.mejor_de_sets
+
+
+def destinos_llave(ronda, posicion, total_rondas):
+    """
+    Calcula a qué llave y lado avanzan el ganador y el perdedor de una llave normal.
+
+    Args:
+        ronda (int): Ronda de la llave
+        posicion (int): Posición dentro de la ronda
+        total_rondas (int): Rondas del cuadro
+
+    Returns:
+        tuple: ((ronda, posición, lado) del ganador o None,
+        (ronda, posición, lado) del perdedor o None)
+    """
+    lado = 1 if posicion % 2 == 1 else 2
+    ganador = (ronda + 1, (posicion + 1) // 2, lado) if ronda < total_rondas else None
+    perdedor = None
+    if total_rondas >= 3 and ronda == total_rondas - 1:
+        perdedor = (ronda, LlaveTorneo.POSICION_TERCER_LUGAR, lado)
+    return ganador, perdedor
+
+
+def enlazar_llaves(torneo, total_rondas):
+    """
+    Guarda en cada llave normal los punteros a su llave siguiente y de tercer lugar.
+
+    Como MySQL no devuelve ids en ``bulk_create``, se releen con una consulta y
+    los punteros se escriben con un único ``bulk_update``.
+
+    Args:
+        torneo (Torneo): Torneo cuyo cuadro ya fue creado
+        total_rondas (int): Rondas del cuadro
+
+    Returns:
+        dict: (ronda, posición) -> id de cada llave creada
+    """
+    ids = {
+        (ronda, posicion): llave_id
+        for llave_id, ronda, posicion in torneo.llaves.values_list('id', 'ronda', 'posicion')
+    }
+
+    enlazadas = []
+    for (ronda, posicion), llave_id in ids.items():
+        if posicion == LlaveTorneo.POSICION_TERCER_LUGAR:
+            continue
+        ganador, perdedor = destinos_llave(ronda, posicion, total_rondas)
+        llave = LlaveTorneo(id=llave_id)
+        llave.llave_siguiente_id = ids.get(ganador[:2]) if ganador else None
+        llave.lado_siguiente = ganador[2] if ganador else None
+        llave.llave_perdedor_id = ids.get(perdedor[:2]) if perdedor else None
+        llave.lado_perdedor = perdedor[2] if perdedor else None
+        if llave.llave_siguiente_id or llave.llave_perdedor_id:
+            enlazadas.append(llave)
+
+    LlaveTorneo.objects.bulk_update(
+        enlazadas,
+        ['llave_siguiente', 'lado_siguiente', 'llave_perdedor', 'lado_perdedor'],
+        batch_size=500,
+    )
+    return ids
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from gestiontorneo.importacion import importar_jugadores_df
+from datetime import date, timedelta
+import random
+import time
+import pandas as pd
+
+
+def digito_verificador(numero):
+    """Calcula el dígito verificador de un RUT chileno."""
+    suma = 0
+    multiplicador = 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * multiplicador
+        multiplicador = 2 if multiplicador == 7 else multiplicador + 1
+    resto = 11 - (suma % 11)
+    if resto == 11:
+        return '0'
+    if resto == 10:
+        return 'K'
+    return str(resto)
+
+
+def generar_roster(filas, semilla=0):
+    """
+    Genera un DataFrame sintético con el formato de la plantilla de jugadores.
+
+    Args:
+        filas (int): Cantidad de filas a generar
+        semilla (int): Semilla para obtener datos reproducibles
+
+    Returns:
+        DataFrame: Roster con columnas RUT, Nombre, Apellido, Fecha de nacimiento,
+        Genero, Club y Correo
+    """
+    aleatorio = random.Random(semilla)
+    nombres = ['Ana', 'José', 'María', 'Pedro', 'Sofía', 'Tomás', 'Valentina', 'Matías']
+    apellidos = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva']
+    clubes = [f'Club Deportivo {i}' for i in range(1, 51)] + ['']
+    base = 10_000_000 + semilla * 1_000_000
+    inicio = date(1960, 1, 1)
+
+    registros = []
+    for i in range(filas):
+        numero = base + i
+        registros.append({
+            'RUT': f"{numero}-{digito_verificador(numero)}",
+            'Nombre': aleatorio.choice(nombres),
+            'Apellido': aleatorio.choice(apellidos),
+            'Fecha de nacimiento': (inicio + timedelta(days=aleatorio.randint(0, 20000))).strftime('%d/%m/%Y'),
+            'Genero': aleatorio.choice(['M', 'F']),
+            'Club': aleatorio.choice(clubes),
+            'Correo': f"jugador{numero}@ejemplo.cl" if aleatorio.random() < 0.7 else '',
+        })
+    return pd.DataFrame(registros)
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de la importación masiva de jugadores con rosters sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas', type=int, nargs='+', default=[1000, 10000, 50000],
+            help='Tamaños de roster a importar (por defecto: 1000 10000 50000)'
+        )
+        parser.add_argument(
+            '--conservar', action='store_true',
+            help='Conserva los jugadores importados en lugar de revertir la transacción'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Filas':>8} {'Creados':>8} {'Errores':>8} {'Segundos':>10} {'Filas/s':>10} {'Consultas':>10}")
+
+        for semilla, filas in enumerate(options['filas'], start=1):
+            df = generar_roster(filas, semilla=semilla)
+
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    creados, errores = importar_jugadores_df(df)
+                    duracion = time.perf_counter() - inicio
+
+                if not options['conservar']:
+                    transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{filas:>8} {creados:>8} {len(errores):>8} {duracion:>10.2f} "
+                f"{filas / duracion:>10.0f} {len(consultas.captured_queries):>10}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de importación completado."))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from gestiontorneo.lectores import leer_lotes
+from gestiontorneo.management.commands.benchmark_importacion import generar_roster
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+
+def medir(funcion):
+    """
+    Ejecuta una función midiendo tiempo y memoria máxima asignada.
+
+    Args:
+        funcion (callable): Función sin argumentos que devuelve la cantidad de filas leídas
+
+    Returns:
+        tuple: (filas leídas, segundos, pico de memoria en MB)
+    """
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = funcion()
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return filas, duracion, pico / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = 'Compara memoria y velocidad de pd.read_excel contra los lectores en streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas', type=int, default=50000,
+            help='Filas del roster sintético (por defecto: 50000)'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help='Tamaño de lote para los lectores en streaming (por defecto: 1000)'
+        )
+        parser.add_argument(
+            '--archivo', type=str, default=None,
+            help='Usa un archivo .xlsx o .csv existente en lugar de generar uno'
+        )
+
+    def handle(self, *args, **options):
+        directorio = tempfile.mkdtemp(prefix='benchmark_lectura_')
+
+        if options['archivo']:
+            archivos = [options['archivo']]
+        else:
+            self.stdout.write(f"Generando roster sintético de {options['filas']} filas...")
+            df = generar_roster(options['filas'])
+            ruta_xlsx = os.path.join(directorio, 'roster.xlsx')
+            ruta_csv = os.path.join(directorio, 'roster.csv')
+            df.to_excel(ruta_xlsx, index=False)
+            df.to_csv(ruta_csv, index=False)
+            del df
+            archivos = [ruta_xlsx, ruta_csv]
+
+        def lector_streaming(ruta):
+            # Solo se mantiene un lote en memoria a la vez
+            return lambda: sum(len(lote) for _, lote in leer_lotes(ruta, options['lote']))
+
+        def lector_pandas(ruta):
+            if ruta.lower().endswith('.csv'):
+                return lambda: len(pd.read_csv(ruta))
+            return lambda: len(pd.read_excel(ruta))
+
+        self.stdout.write(
+            f"{'Archivo':<14} {'Lector':<12} {'MB archivo':>10} {'Filas':>8} {'Segundos':>10} {'Filas/s':>10} {'Pico MB':>10}"
+        )
+        try:
+            for ruta in archivos:
+                tamano = os.path.getsize(ruta) / (1024 * 1024)
+                for nombre, lector in (('pandas', lector_pandas(ruta)), ('streaming', lector_streaming(ruta))):
+                    filas, duracion, pico = medir(lector)
+                    self.stdout.write(
+                        f"{os.path.basename(ruta):<14} {nombre:<12} {tamano:>10.1f} {filas:>8} "
+                        f"{duracion:>10.2f} {filas / duracion:>10.0f} {pico:>10.1f}"
+                    )
+        finally:
+            if not options['archivo']:
+                for nombre in os.listdir(directorio):
+                    os.remove(os.path.join(directorio, nombre))
+                os.rmdir(directorio)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de lectura completado."))
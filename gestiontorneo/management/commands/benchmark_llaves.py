@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from gestiontorneo.llaves import construir_primera_ronda, materializar_bracket, tamano_bracket
+from gestiontorneo.management.commands.benchmark_importacion import digito_verificador
+from gestiontorneo.models import Jugador, Torneo, UsuarioPersonalizado
+from datetime import date
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo y las consultas necesarias para materializar brackets de distintos tamaños'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jugadores', type=int, nargs='+', default=[8, 16, 32, 64, 128, 256, 512, 1024],
+            help='Tamaños de cuadro a generar (por defecto: 8 16 32 ... 1024)'
+        )
+        parser.add_argument(
+            '--impar', action='store_true',
+            help='Usa un jugador menos por cuadro para forzar la creación de BYEs'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Jugadores':>10} {'Cuadro':>8} {'Rondas':>7} {'Llaves':>7} {'Segundos':>10} {'Consultas':>10}")
+
+        for cantidad in options['jugadores']:
+            if options['impar']:
+                cantidad -= 1
+            potencia_2_siguiente, _ = tamano_bracket(cantidad)
+
+            # Todo se revierte al terminar: no quedan datos del benchmark en la base
+            with transaction.atomic():
+                organizador = UsuarioPersonalizado.objects.create(
+                    username='benchmark', email=f'benchmark_llaves_{cantidad}@ejemplo.cl',
+                    tipo_usuario='organizador',
+                )
+                torneo = Torneo.objects.create(
+                    nombre=f'Benchmark {cantidad}', fecha=date.today(),
+                    ubicacion='Benchmark', organizador=organizador,
+                )
+                base = 90_000_000
+                Jugador.objects.bulk_create([
+                    Jugador(
+                        rut=f"{base + i}-{digito_verificador(base + i)}",
+                        nombre='Jugador', apellido=str(i),
+                        fecha_nacimiento=date(1990, 1, 1), genero='M',
+                    )
+                    for i in range(cantidad)
+                ])
+                jugadores = list(Jugador.objects.filter(rut__in=[
+                    f"{base + i}-{digito_verificador(base + i)}" for i in range(cantidad)
+                ]))
+
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    primera_ronda = construir_primera_ronda(
+                        jugadores, potencia_2_siguiente, potencia_2_siguiente - cantidad,
+                        aleatorio=random.Random(cantidad),
+                    )
+                    total_rondas = materializar_bracket(torneo, primera_ronda, potencia_2_siguiente)
+                    duracion = time.perf_counter() - inicio
+
+                total_llaves = torneo.llaves.count()
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{cantidad:>10} {potencia_2_siguiente:>8} {total_rondas:>7} {total_llaves:>7} "
+                f"{duracion:>10.3f} {len(consultas.captured_queries):>10}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark de llaves completado."))
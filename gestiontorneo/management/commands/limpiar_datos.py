@@ -46,7 +46,7 @@ def limpiar_email_estricto(email):
 
 
 class Command(BaseCommand):
-    help = 'Limpia todos los datos existentes de jugadores y clubes, removiendo caracteres especiales'
+    help = 'Limpia todos los datos existentes de jugadores y clubes, removiendo caracteres especiales, y recalcula las columnas de búsqueda'
 
     def handle(self, *args, **options):
         self.stdout.write("Iniciando limpieza de datos existentes...")
@@ -101,10 +101,26 @@ class Command(BaseCommand):
                         self.style.ERROR(f"Error actualizando club {club.id}: {e}")
                     )
         
+        # Recalcular columnas de búsqueda (nombres plegados, RUT y club)
+        busqueda_actualizados = 0
+        lote = []
+        campos_busqueda = ['rut_busqueda', 'nombre_busqueda', 'apellido_busqueda', 'club_busqueda']
+        for jugador in Jugador.objects.select_related('club').iterator(chunk_size=2000):
+            if jugador.actualizar_campos_busqueda():
+                lote.append(jugador)
+            if len(lote) >= 1000:
+                Jugador.objects.bulk_update(lote, campos_busqueda)
+                busqueda_actualizados += len(lote)
+                lote = []
+        if lote:
+            Jugador.objects.bulk_update(lote, campos_busqueda)
+            busqueda_actualizados += len(lote)
+        
         self.stdout.write(
             self.style.SUCCESS(
                 f"Limpieza completada. "
                 f"Jugadores actualizados: {jugadores_actualizados}, "
-                f"Clubes actualizados: {clubes_actualizados}"
+                f"Clubes actualizados: {clubes_actualizados}, "
+                f"Índices de búsqueda actualizados: {busqueda_actualizados}"
             )
         )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from gestiontorneo.models import TrabajoImportacion
+from gestiontorneo.trabajos import procesar_trabajo, reclamar_trabajo, trabajos_detenidos
+
+
+class Command(BaseCommand):
+    help = 'Reanuda las importaciones detenidas (sin avance reciente) desde el último lote confirmado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'trabajos', nargs='*', type=int,
+            help='IDs de los trabajos a reanudar (por defecto: todos los detenidos)'
+        )
+
+    def handle(self, *args, **options):
+        # Los trabajos con avance reciente los está procesando un worker del servidor
+        trabajos = trabajos_detenidos()
+        if options['trabajos']:
+            trabajos = trabajos.filter(id__in=options['trabajos'])
+
+        for trabajo in trabajos:
+            if not reclamar_trabajo(trabajo.id):
+                self.stdout.write(f"Importación #{trabajo.id} ya fue tomada por otro proceso; se omite.")
+                continue
+            self.stdout.write(
+                f"Reanudando importación #{trabajo.id} ({trabajo.tipo}) desde el lote {trabajo.lotes_completados + 1}..."
+            )
+            try:
+                procesar_trabajo(trabajo.id)
+                trabajo.refresh_from_db()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Importación #{trabajo.id} completada: {trabajo.creados} registros, {len(trabajo.errores)} errores."
+                ))
+            except Exception as e:
+                TrabajoImportacion.objects.filter(id=trabajo.id).update(
+                    estado='error', mensaje=f"Error al procesar el archivo: {e}"
+                )
+                self.stdout.write(self.style.ERROR(f"Error en importación #{trabajo.id}: {e}"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0015_trabajoimportacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jugador',
+            name='fecha_nacimiento',
+            field=models.DateField(db_index=True),
+        ),
+    ]
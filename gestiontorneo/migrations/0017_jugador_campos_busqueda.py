@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:00
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def plegar_texto(texto):
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+
+def poblar_campos_busqueda(apps, schema_editor):
+    Jugador = apps.get_model('gestiontorneo', 'Jugador')
+    lote = []
+    for jugador in Jugador.objects.select_related('club').iterator(chunk_size=2000):
+        jugador.rut_busqueda = re.sub(r'[^0-9k]', '', (jugador.rut or '').lower())
+        jugador.nombre_busqueda = plegar_texto(jugador.nombre)[:100]
+        jugador.apellido_busqueda = plegar_texto(jugador.apellido)[:100]
+        jugador.club_busqueda = plegar_texto(jugador.club.nombre if jugador.club_id else '')[:100]
+        lote.append(jugador)
+        if len(lote) >= 2000:
+            Jugador.objects.bulk_update(lote, ['rut_busqueda', 'nombre_busqueda', 'apellido_busqueda', 'club_busqueda'])
+            lote = []
+    if lote:
+        Jugador.objects.bulk_update(lote, ['rut_busqueda', 'nombre_busqueda', 'apellido_busqueda', 'club_busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0016_jugador_fecha_nacimiento_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jugador',
+            name='rut_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='jugador',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='jugador',
+            name='apellido_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='jugador',
+            name='club_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='jugador',
+            index=models.Index(fields=['apellido_busqueda', 'nombre_busqueda', 'id'], name='jugador_orden_busqueda_idx'),
+        ),
+        migrations.RunPython(poblar_campos_busqueda, migrations.RunPython.noop),
+    ]
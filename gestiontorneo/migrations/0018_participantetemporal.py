@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0017_jugador_campos_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipanteTemporal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_agregado', models.DateTimeField(auto_now_add=True)),
+                ('jugador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selecciones_temporales', to='gestiontorneo.jugador')),
+                ('organizador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participantes_temporales', to=settings.AUTH_USER_MODEL)),
+                ('torneo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participantes_temporales', to='gestiontorneo.torneo')),
+            ],
+            options={
+                'verbose_name': 'Participante Temporal',
+                'verbose_name_plural': 'Participantes Temporales',
+                'ordering': ['fecha_agregado', 'id'],
+                'unique_together': {('torneo', 'organizador', 'jugador')},
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSICION_TERCER_LUGAR = 999
+
+
+def enlazar_llaves_existentes(apps, schema_editor):
+    LlaveTorneo = apps.get_model('gestiontorneo', 'LlaveTorneo')
+    torneo_ids = LlaveTorneo.objects.values_list('torneo_id', flat=True).distinct()
+
+    for torneo_id in torneo_ids:
+        llaves = list(LlaveTorneo.objects.filter(torneo_id=torneo_id))
+        normales = {(l.ronda, l.posicion): l for l in llaves if l.tipo_llave == 'normal'}
+        if not normales:
+            continue
+        total_rondas = max(ronda for ronda, _ in normales)
+
+        tercer_lugar = next((l for l in llaves if l.tipo_llave == 'tercer_lugar'), None)
+        if tercer_lugar is None and total_rondas >= 3:
+            tercer_lugar = LlaveTorneo.objects.create(
+                torneo_id=torneo_id,
+                ronda=total_rondas - 1,
+                posicion=POSICION_TERCER_LUGAR,
+                tipo_llave='tercer_lugar',
+            )
+
+        for (ronda, posicion), llave in normales.items():
+            lado = 1 if posicion % 2 == 1 else 2
+            siguiente = normales.get((ronda + 1, (posicion + 1) // 2))
+            llave.llave_siguiente_id = siguiente.id if siguiente else None
+            llave.lado_siguiente = lado if siguiente else None
+            if tercer_lugar and ronda == total_rondas - 1:
+                llave.llave_perdedor_id = tercer_lugar.id
+                llave.lado_perdedor = lado
+
+        LlaveTorneo.objects.bulk_update(
+            list(normales.values()),
+            ['llave_siguiente', 'lado_siguiente', 'llave_perdedor', 'lado_perdedor'],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0018_participantetemporal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llavetorneo',
+            name='llave_siguiente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llaves_previas', to='gestiontorneo.llavetorneo'),
+        ),
+        migrations.AddField(
+            model_name='llavetorneo',
+            name='lado_siguiente',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='llavetorneo',
+            name='llave_perdedor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestiontorneo.llavetorneo'),
+        ),
+        migrations.AddField(
+            model_name='llavetorneo',
+            name='lado_perdedor',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(enlazar_llaves_existentes, migrations.RunPython.noop),
+    ]
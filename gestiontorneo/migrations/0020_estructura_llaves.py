@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_estructura(apps, schema_editor):
+    Torneo = apps.get_model('gestiontorneo', 'Torneo')
+    LlaveTorneo = apps.get_model('gestiontorneo', 'LlaveTorneo')
+
+    for torneo in Torneo.objects.filter(llaves__isnull=False).distinct():
+        llaves = list(LlaveTorneo.objects.filter(torneo=torneo))
+        total_rondas = max((l.ronda for l in llaves if l.tipo_llave == 'normal'), default=0)
+        final = next(
+            (l for l in llaves if l.tipo_llave == 'normal' and l.ronda == total_rondas and l.posicion == 1),
+            None,
+        )
+
+        for llave in llaves:
+            llave.mejor_de_sets = torneo.mejor_de_sets_final if llave is final else torneo.mejor_de_sets
+        LlaveTorneo.objects.bulk_update(llaves, ['mejor_de_sets'], batch_size=500)
+
+        torneo.total_rondas = total_rondas
+        torneo.llave_final = final
+        torneo.save(update_fields=['total_rondas', 'llave_final'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0019_llavetorneo_destinos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llavetorneo',
+            name='mejor_de_sets',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='torneo',
+            name='total_rondas',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='torneo',
+            name='llave_final',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestiontorneo.llavetorneo'),
+        ),
+        migrations.RunPython(poblar_estructura, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0020_estructura_llaves'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultado',
+            name='secuencia_puntos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
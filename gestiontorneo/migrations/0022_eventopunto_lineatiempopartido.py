@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0021_resultado_secuencia_puntos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('secuencia', models.PositiveIntegerField()),
+                ('set_numero', models.PositiveSmallIntegerField()),
+                ('jugador', models.PositiveSmallIntegerField()),
+                ('delta', models.SmallIntegerField(default=1)),
+                ('momento', models.DateTimeField()),
+                ('partido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_punto', to='gestiontorneo.partido')),
+            ],
+            options={
+                'ordering': ['partido', 'secuencia'],
+                'unique_together': {('partido', 'secuencia')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaTiempoPartido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eventos', models.BinaryField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('fecha_compactacion', models.DateTimeField(auto_now_add=True)),
+                ('partido', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='linea_tiempo', to='gestiontorneo.partido')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestiontorneo', '0022_eventopunto_lineatiempopartido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuariopersonalizado',
+            name='version_partidos_arbitro',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
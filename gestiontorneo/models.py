@@ -1,8 +1,47 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from datetime import date
 from django.conf import settings
+import re
+import threading
+import time
+import unicodedata
+
+from .avisos import avisar_arbitros, avisar_avance, avisar_partido
+
+
+def plegar_texto(texto):
+    """
+    Normaliza un texto para búsqueda: minúsculas, sin tildes y solo letras,
+    números y espacios simples.
+    
+    Args:
+        texto (str): Texto original
+        
+    Returns:
+        str: Texto plegado ('' si está vacío)
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^a-z0-9]+', ' ', texto)
+    return texto.strip()
+
+def plegar_rut(rut):
+    """
+    Deja solo los dígitos y el dígito verificador de un RUT.
+    
+    Args:
+        rut (str): RUT con o sin puntos y guion
+        
+    Returns:
+        str: RUT plegado, por ejemplo '123456789' o '12345678k'
+    """
+    return re.sub(r'[^0-9k]', '', str(rut or '').lower())
 
 class UsuarioPersonalizado(AbstractUser):
     """
@@ -15,6 +54,8 @@ class UsuarioPersonalizado(AbstractUser):
         username (CharField): Nombre de usuario con longitud máxima de 20 caracteres
         tipo_usuario (CharField): Tipo de usuario ('organizador', 'arbitro', 'jugador')
         activo (BooleanField): Estado activo del usuario
+        version_partidos_arbitro (PositiveIntegerField): Aumenta cada vez que cambian
+            los partidos asignados al árbitro o su estado de confirmación
     """
     username = models.CharField(
         max_length=20,
@@ -29,6 +70,7 @@ class UsuarioPersonalizado(AbstractUser):
     ]
     tipo_usuario = models.CharField(max_length=20, choices=TIPO_USUARIO, null=False, blank=False)
     activo = models.BooleanField(default=True)
+    version_partidos_arbitro = models.PositiveIntegerField(default=0)
 
     # Usar email como campo principal de autenticación
     USERNAME_FIELD = 'email'
@@ -67,6 +109,13 @@ class Club(models.Model):
         """
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        """
+        Guarda el club y actualiza la columna de búsqueda de sus jugadores.
+        """
+        super().save(*args, **kwargs)
+        Jugador.objects.filter(club=self).update(club_busqueda=plegar_texto(self.nombre))
+
 class Categoria(models.Model):
     """
     Modelo que representa una categoría por edad en los torneos.
@@ -126,6 +175,114 @@ class Categoria(models.Model):
         else:
             return "Sin restricción"
 
+    @classmethod
+    def tabla(cls):
+        """
+        Obtiene la tabla de categorías cacheada en el proceso.
+        
+        La tabla se carga con una sola consulta y se invalida cuando se confirma
+        el guardado o la eliminación de una categoría en este proceso. Los demás
+        workers no reciben esa señal, así que la tabla además se vuelve a leer
+        cuando tiene más de ``CATEGORIAS_VIGENCIA_CACHE`` segundos.
+        
+        Returns:
+            tuple: Tuplas (nombre, edad_minima, edad_maxima) en orden de id
+        """
+        global _tabla_categorias
+        vigencia = getattr(settings, 'CATEGORIAS_VIGENCIA_CACHE', 30)
+        cargada = _tabla_categorias
+        if cargada is None or time.monotonic() - cargada[1] > vigencia:
+            with _tabla_categorias_lock:
+                cargada = _tabla_categorias
+                if cargada is None or time.monotonic() - cargada[1] > vigencia:
+                    cargada = (
+                        tuple(cls.objects.order_by('pk').values_list('nombre', 'edad_minima', 'edad_maxima')),
+                        time.monotonic(),
+                    )
+                    _tabla_categorias = cargada
+        return cargada[0]
+
+    @classmethod
+    def invalidar_tabla(cls):
+        """Descarta la tabla de categorías cacheada."""
+        global _tabla_categorias
+        with _tabla_categorias_lock:
+            _tabla_categorias = None
+
+    @classmethod
+    def nombre_para_edad(cls, edad):
+        """
+        Resuelve la categoría de una edad usando la tabla cacheada.
+        
+        Aplica las mismas prioridades que las consultas originales: primero las
+        categorías con ambos límites, luego las que solo tienen edad mínima y por
+        último las que solo tienen edad máxima (a igualdad, la de menor id).
+        
+        Args:
+            edad (int): Edad del jugador
+            
+        Returns:
+            str: Nombre de la categoría o "Sin categoría" si no encuentra una
+        """
+        tabla = cls.tabla()
+        for nombre, minima, maxima in tabla:
+            if minima is not None and maxima is not None and minima <= edad <= maxima:
+                return nombre
+        for nombre, minima, maxima in tabla:
+            if minima is not None and maxima is None and minima <= edad:
+                return nombre
+        for nombre, minima, maxima in tabla:
+            if maxima is not None and minima is None and edad <= maxima:
+                return nombre
+        return "Sin categoría"
+
+    @classmethod
+    def filtro_fecha_nacimiento(cls, nombre, hoy=None):
+        """
+        Construye un filtro de base de datos para los jugadores de una categoría.
+        
+        La edad se calcula por año de nacimiento, así que las edades que resuelven
+        a la categoría se agrupan en intervalos y cada intervalo se convierte en
+        un rango de ``fecha_nacimiento`` (usable por el índice de la columna).
+        
+        Args:
+            nombre (str): Nombre de la categoría
+            hoy (date): Fecha de referencia (por defecto, hoy)
+            
+        Returns:
+            Q: Condición equivalente a ``calcular_categoria() == nombre``
+        """
+        hoy = hoy or date.today()
+        limites = [edad for fila in cls.tabla() for edad in fila[1:] if edad is not None]
+        # Sobre el mayor límite definido todas las edades resuelven igual
+        edad_tope = max(limites, default=0) + 1
+
+        filtro = models.Q(pk__in=[])
+        inicio = None
+        for edad in range(0, edad_tope + 1):
+            coincide = cls.nombre_para_edad(edad) == nombre
+            if coincide and inicio is None:
+                inicio = edad
+            if inicio is not None and (not coincide or edad == edad_tope):
+                fin = edad if coincide else edad - 1
+                rango = models.Q(fecha_nacimiento__lte=date(hoy.year - inicio, 12, 31))
+                if not (coincide and edad == edad_tope):
+                    rango &= models.Q(fecha_nacimiento__gte=date(hoy.year - fin, 1, 1))
+                filtro |= rango
+                inicio = None
+        return filtro
+
+# Tabla de categorías cacheada por proceso y momento en que se leyó (ver Categoria.tabla)
+_tabla_categorias = None
+_tabla_categorias_lock = threading.Lock()
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_tabla_categorias(sender, **kwargs):
+    """Invalida la tabla cacheada cuando se confirma el cambio de una categoría."""
+    # Invalidar antes del commit dejaría que otra consulta recargue la tabla sin el cambio
+    transaction.on_commit(Categoria.invalidar_tabla)
+
 class Jugador(models.Model):
     """
     Modelo que representa un jugador de tenis.
@@ -138,14 +295,31 @@ class Jugador(models.Model):
         genero (CharField): Género del jugador ('M' o 'F')
         club (ForeignKey): Club al que pertenece el jugador
         email (EmailField): Email único del jugador
+        rut_busqueda (CharField): RUT plegado (solo dígitos y verificador) para búsqueda
+        nombre_busqueda (CharField): Nombre plegado para búsqueda
+        apellido_busqueda (CharField): Apellido plegado para búsqueda
+        club_busqueda (CharField): Nombre del club plegado para búsqueda
     """
     rut = models.CharField(max_length=12, unique=True)
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
-    fecha_nacimiento = models.DateField()
+    fecha_nacimiento = models.DateField(db_index=True)
     genero = models.CharField(max_length=1, choices=[('M', 'Masculino'), ('F', 'Femenino')])
     club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True)
     email = models.EmailField(blank=True, null=True, unique=True)
+    # Columnas de búsqueda mantenidas por save(), la importación masiva y limpiar_datos
+    rut_busqueda = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    nombre_busqueda = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    apellido_busqueda = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    club_busqueda = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+
+    # Orden estable usado por la paginación por keyset
+    ORDEN_LISTADO = ('apellido_busqueda', 'nombre_busqueda', 'id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['apellido_busqueda', 'nombre_busqueda', 'id'], name='jugador_orden_busqueda_idx'),
+        ]
 
     def __str__(self):
         """
@@ -160,26 +334,96 @@ class Jugador(models.Model):
         """
         Calcula la categoría correspondiente al jugador basada en su edad.
         
+        Usa la tabla de categorías cacheada, por lo que no consulta la base de datos.
+        
         Returns:
             str: Nombre de la categoría correspondiente o "Sin categoría" si no encuentra una
         """
-        hoy = date.today()
-        edad = hoy.year - self.fecha_nacimiento.year
-        categoria = Categoria.objects.filter(
-            edad_minima__lte=edad,
-            edad_maxima__gte=edad
-        ).first()
-        if not categoria:
-            categoria = Categoria.objects.filter(
-                edad_minima__lte=edad,
-                edad_maxima__isnull=True
-            ).first()
-        if not categoria:
-            categoria = Categoria.objects.filter(
-                edad_maxima__gte=edad,
-                edad_minima__isnull=True
-            ).first()
-        return categoria.nombre if categoria else "Sin categoría"
+        edad = date.today().year - self.fecha_nacimiento.year
+        return Categoria.nombre_para_edad(edad)
+
+    def actualizar_campos_busqueda(self, nombre_club=None):
+        """
+        Recalcula las columnas de búsqueda a partir de los datos del jugador.
+        
+        Args:
+            nombre_club (str): Nombre del club si ya se conoce (evita consultarlo)
+            
+        Returns:
+            bool: True si alguna columna cambió
+        """
+        if nombre_club is None:
+            nombre_club = self.club.nombre if self.club_id else ''
+        valores = {
+            'rut_busqueda': plegar_rut(self.rut),
+            'nombre_busqueda': plegar_texto(self.nombre)[:100],
+            'apellido_busqueda': plegar_texto(self.apellido)[:100],
+            'club_busqueda': plegar_texto(nombre_club)[:100],
+        }
+        cambio = any(getattr(self, campo) != valor for campo, valor in valores.items())
+        for campo, valor in valores.items():
+            setattr(self, campo, valor)
+        return cambio
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda el jugador manteniendo actualizadas las columnas de búsqueda.
+        """
+        self.actualizar_campos_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'rut_busqueda', 'nombre_busqueda', 'apellido_busqueda', 'club_busqueda'
+            }
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def filtro_busqueda(cls, query):
+        """
+        Construye el filtro de búsqueda de jugadores por prefijo.
+        
+        Cada palabra de la búsqueda debe coincidir con el inicio del nombre,
+        apellido, club, RUT o correo (sin distinguir tildes ni mayúsculas), con
+        el nombre de una categoría o con el año/fecha de nacimiento. Las
+        comparaciones por prefijo (``LIKE 'texto%'``) usan los índices de las
+        columnas de búsqueda.
+        
+        Args:
+            query (str): Texto ingresado por el usuario
+            
+        Returns:
+            Q: Condición a aplicar sobre Jugador
+        """
+        filtro = models.Q()
+        for termino in query.split():
+            plegado = plegar_texto(termino)
+            rut = plegar_rut(termino)
+            condicion = models.Q(email__istartswith=termino.lower())
+            if plegado:
+                condicion |= (
+                    models.Q(nombre_busqueda__istartswith=plegado) |
+                    models.Q(apellido_busqueda__istartswith=plegado) |
+                    models.Q(club_busqueda__istartswith=plegado)
+                )
+                for nombre_categoria in {fila[0] for fila in Categoria.tabla()}:
+                    if plegar_texto(nombre_categoria).startswith(plegado):
+                        condicion |= Categoria.filtro_fecha_nacimiento(nombre_categoria)
+            if rut and re.search(r'\d', termino):
+                condicion |= models.Q(rut_busqueda__istartswith=rut)
+            if re.fullmatch(r'\d{4}', termino):
+                condicion |= models.Q(fecha_nacimiento__year=int(termino))
+            elif re.fullmatch(r'\d{4}-\d{2}-\d{2}', termino):
+                try:
+                    condicion |= models.Q(fecha_nacimiento=date.fromisoformat(termino))
+                except ValueError:
+                    pass
+            filtro &= condicion
+        return filtro
+
+@receiver(post_delete, sender=Club)
+def limpiar_club_busqueda(sender, instance, **kwargs):
+    """Vacía la columna de búsqueda de los jugadores que quedaron sin club."""
+    Jugador.objects.filter(club__isnull=True).exclude(club_busqueda='').update(club_busqueda='')
 
 class Torneo(models.Model):
     """
@@ -200,6 +444,8 @@ class Torneo(models.Model):
         mejor_de_sets (PositiveIntegerField): Formato de sets para partidos regulares
         mejor_de_sets_final (PositiveIntegerField): Formato de sets para la final
         organizador (ForeignKey): Usuario organizador del torneo
+        total_rondas (PositiveSmallIntegerField): Rondas del cuadro de llaves (0 si no hay cuadro)
+        llave_final (ForeignKey): Llave de la final del cuadro
     """
     nombre = models.CharField(max_length=100)
     fecha = models.DateField()
@@ -232,6 +478,10 @@ class Torneo(models.Model):
     mejor_de_sets_final = models.PositiveIntegerField(choices=MEJOR_DE_SETS, default=5)
     
     organizador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='torneos')
+    
+    # Estructura del cuadro guardada al crearlo para no calcular MAX(ronda) al puntuar
+    total_rondas = models.PositiveSmallIntegerField(default=0, editable=False)
+    llave_final = models.ForeignKey('LlaveTorneo', null=True, blank=True, on_delete=models.SET_NULL, related_name='+', editable=False)
 
     def __str__(self):
         """
@@ -242,6 +492,16 @@ class Torneo(models.Model):
         """
         return self.nombre
     
+    def sincronizar_sets_llaves(self):
+        """
+        Propaga ``mejor_de_sets`` y ``mejor_de_sets_final`` a las llaves ya creadas.
+        
+        Debe llamarse cada vez que cambia la configuración de sets del torneo.
+        """
+        self.llaves.exclude(id=self.llave_final_id).update(mejor_de_sets=self.mejor_de_sets)
+        if self.llave_final_id:
+            self.llaves.filter(id=self.llave_final_id).update(mejor_de_sets=self.mejor_de_sets_final)
+    
 class Participacion(models.Model):
     """
     Modelo que representa la participación de un jugador en un torneo.
@@ -259,6 +519,40 @@ class Participacion(models.Model):
         unique_together = ('torneo', 'jugador')
 
 
+class ParticipanteTemporal(models.Model):
+    """
+    Modelo que representa un jugador seleccionado para un torneo pero aún no confirmado.
+    
+    Reemplaza la lista de RUTs guardada en la sesión: cada organizador tiene su
+    propia selección por torneo, que se modifica fila a fila y se confirma con
+    una sola inserción masiva en Participacion.
+    
+    Attributes:
+        torneo (ForeignKey): Torneo al que se agregará el jugador
+        organizador (ForeignKey): Organizador que realizó la selección
+        jugador (ForeignKey): Jugador seleccionado
+        fecha_agregado (DateTimeField): Fecha y hora en que se seleccionó
+    """
+    torneo = models.ForeignKey(Torneo, on_delete=models.CASCADE, related_name='participantes_temporales')
+    organizador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participantes_temporales')
+    jugador = models.ForeignKey(Jugador, on_delete=models.CASCADE, related_name='selecciones_temporales')
+    fecha_agregado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('torneo', 'organizador', 'jugador')
+        ordering = ['fecha_agregado', 'id']
+        verbose_name = 'Participante Temporal'
+        verbose_name_plural = 'Participantes Temporales'
+
+    def __str__(self):
+        """
+        Representación en string de la selección.
+        
+        Returns:
+            str: Formato "jugador -> torneo (pendiente)"
+        """
+        return f"{self.jugador} -> {self.torneo} (pendiente)"
+
 
 class ArbitroTorneo(models.Model):
     """Modelo para relacionar árbitros con torneos"""
@@ -375,6 +669,11 @@ class LlaveTorneo(models.Model):
         bye2 (ForeignKey): BYE para el segundo jugador si aplica
         ganador (ForeignKey): Jugador ganador del enfrentamiento
         estado_partido (CharField): Estado actual del partido
+        llave_siguiente (ForeignKey): Llave a la que avanza el ganador
+        lado_siguiente (PositiveSmallIntegerField): Lado (1 o 2) que ocupa el ganador en la llave siguiente
+        llave_perdedor (ForeignKey): Llave de tercer lugar a la que pasa el perdedor (solo semifinales)
+        lado_perdedor (PositiveSmallIntegerField): Lado (1 o 2) que ocupa el perdedor en esa llave
+        mejor_de_sets (PositiveSmallIntegerField): Sets a los que se juega el partido de esta llave
     """
     
     ESTADOS_PARTIDO = [
@@ -383,6 +682,9 @@ class LlaveTorneo(models.Model):
         ('jugado', 'Jugado'),
     ]
     
+    # Posición fija de la llave de tercer lugar dentro de la ronda de semifinales
+    POSICION_TERCER_LUGAR = 999
+    
     TIPOS_LLAVE = [
         ('normal', 'Normal'),
         ('tercer_lugar', 'Tercer Lugar'),
@@ -398,6 +700,12 @@ class LlaveTorneo(models.Model):
     bye2 = models.ForeignKey(JugadorBye, on_delete=models.CASCADE, related_name='llaves_bye2', null=True, blank=True)
     ganador = models.ForeignKey(Jugador, on_delete=models.CASCADE, related_name='llaves_ganadas', null=True, blank=True)
     estado_partido = models.CharField(max_length=20, choices=ESTADOS_PARTIDO, default='pendiente')
+    # Destinos calculados al crear el bracket: avanzar es un UPDATE sobre una fila conocida
+    llave_siguiente = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='llaves_previas', null=True, blank=True)
+    lado_siguiente = models.PositiveSmallIntegerField(null=True, blank=True)
+    llave_perdedor = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    lado_perdedor = models.PositiveSmallIntegerField(null=True, blank=True)
+    mejor_de_sets = models.PositiveSmallIntegerField(null=True, blank=True)
     
     class Meta:
         unique_together = ('torneo', 'ronda', 'posicion')
@@ -440,6 +748,32 @@ class LlaveTorneo(models.Model):
             return "BYE"
         return "Vacío"
     
+    @property
+    def es_final(self):
+        """
+        Indica si la llave es la final del cuadro (no tiene llave siguiente).
+        
+        Returns:
+            bool: True si es la llave normal de la última ronda
+        """
+        return self.tipo_llave == 'normal' and self.llave_siguiente_id is None
+    
+    def modalidad_sets(self):
+        """
+        Obtiene la modalidad de sets del partido de esta llave.
+        
+        Los datos se guardan en la llave al crear el cuadro, por lo que no se
+        consulta la estructura del torneo.
+        
+        Returns:
+            tuple: (bool es_partido_final, int mejor_de_sets, int sets_para_ganar)
+        """
+        es_partido_final = self.es_final
+        mejor_de_sets = self.mejor_de_sets
+        if not mejor_de_sets:
+            mejor_de_sets = self.torneo.mejor_de_sets_final if es_partido_final else self.torneo.mejor_de_sets
+        return es_partido_final, mejor_de_sets, (mejor_de_sets // 2) + 1
+    
     @property
     def estado_badge_class(self):
         """
@@ -534,6 +868,25 @@ class Partido(models.Model):
     class Meta:
         unique_together = ('torneo', 'llave_torneo')
 
+    # Campos que ve el árbitro en su lista de partidos asignados
+    CAMPOS_ARBITRAJE = ('arbitro_id', 'pendiente_confirmacion', 'finalizado')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Recuerda los campos de arbitraje leídos para detectar si cambian al guardar."""
+        instance = super().from_db(db, field_names, values)
+        instance._arbitraje_guardado = instance.estado_arbitraje()
+        return instance
+
+    def estado_arbitraje(self):
+        """
+        Árbitro, pendiente_confirmacion y finalizado del partido.
+
+        Returns:
+            tuple: Valores de ``CAMPOS_ARBITRAJE`` (None para los campos diferidos)
+        """
+        return tuple(self.__dict__.get(campo) for campo in self.CAMPOS_ARBITRAJE)
+
     def __str__(self):
         """
         Representación en string del partido.
@@ -606,13 +959,8 @@ class Partido(models.Model):
         else:
             return False, "No se puede determinar el ganador automáticamente"
         
-        # Determinar si es un partido final para usar la modalidad correcta
-        total_rondas = self.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = self.llave_torneo.ronda == total_rondas
-        
         # Usar la modalidad correcta según si es final o no
-        mejor_de_sets = self.torneo.mejor_de_sets_final if es_partido_final else self.torneo.mejor_de_sets
-        sets_para_ganar = (mejor_de_sets // 2) + 1
+        es_partido_final, mejor_de_sets, sets_para_ganar = self.llave_torneo.modalidad_sets()
         
         try:
             # Crear o actualizar el resultado
@@ -662,12 +1010,9 @@ class Partido(models.Model):
                 self.llave_torneo.estado_partido = 'jugado'
                 self.llave_torneo.save()
             
-            # Avanzar automáticamente a la siguiente ronda
+            # Avanzar automáticamente a la siguiente ronda (y al tercer lugar)
             self.avanzar_ganador_automaticamente()
             
-            # Verificar si se completaron las semifinales para crear tercer lugar
-            self.verificar_y_crear_tercer_lugar()
-            
             ganador_nombre = f"{ganador.nombre} {ganador.apellido}"
             return True, f"Partido procesado automáticamente. Ganador: {ganador_nombre} por BYE"
             
@@ -690,13 +1035,8 @@ class Partido(models.Model):
         if not hasattr(self, 'resultado_detallado'):
             return False, "No hay resultado para este partido"
         
-        # Determinar si es un partido final para usar la modalidad correcta
-        total_rondas = self.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = self.llave_torneo.ronda == total_rondas
-        
         # Usar la modalidad correcta según si es final o no
-        mejor_de_sets = self.torneo.mejor_de_sets_final if es_partido_final else self.torneo.mejor_de_sets
-        sets_para_ganar = (mejor_de_sets // 2) + 1
+        es_partido_final, mejor_de_sets, sets_para_ganar = self.llave_torneo.modalidad_sets()
         resultado = self.resultado_detallado
         
         if resultado.sets_ganados_jugador1 >= sets_para_ganar or resultado.sets_ganados_jugador2 >= sets_para_ganar:
@@ -746,12 +1086,9 @@ class Partido(models.Model):
             self.llave_torneo.estado_partido = 'jugado'
             self.llave_torneo.save()
         
-        # Avanzar automáticamente a la siguiente ronda
+        # Avanzar automáticamente a la siguiente ronda (y al tercer lugar)
         self.avanzar_ganador_automaticamente()
         
-        # Verificar si se completaron las semifinales para crear tercer lugar
-        self.verificar_y_crear_tercer_lugar()
-        
         ganador_nombre = f"{self.ganador.nombre} {self.ganador.apellido}" if self.ganador else "N/A"
         return True, f"Partido confirmado y cerrado. Ganador: {ganador_nombre}"
     
@@ -759,54 +1096,54 @@ class Partido(models.Model):
         """
         Avanza automáticamente al ganador a la siguiente ronda.
         
-        Calcula la posición correcta en la siguiente ronda y asigna
-        al ganador como jugador1 o jugador2 según corresponda.
-        Si ambos jugadores están listos, crea el partido automáticamente.
+        Usa los destinos guardados en la llave al crear el bracket: el ganador
+        ocupa su lado en ``llave_siguiente`` y, en semifinales, el perdedor pasa
+        a ``llave_perdedor`` (tercer lugar). Solo se actualiza el camino de este
+        partido; si ambos jugadores de la llave destino están listos, se crea
+        el partido automáticamente.
         """
         if not self.ganador or not self.llave_torneo:
             return
         
+        llave = self.llave_torneo
         try:
-            # Obtener la ronda actual y siguiente
-            ronda_actual = self.llave_torneo.ronda
-            ronda_siguiente = ronda_actual + 1
-            
-            # Buscar la llave de la siguiente ronda donde debe ir este ganador
-            # Algoritmo: posición en ronda siguiente = (posición_actual + 1) // 2
-            posicion_siguiente = (self.llave_torneo.posicion + 1) // 2
+            if llave.llave_siguiente_id:
+                self.ubicar_en_llave(llave.llave_siguiente_id, llave.lado_siguiente, self.ganador)
             
-            # Buscar la llave de destino en la siguiente ronda
-            llave_siguiente = LlaveTorneo.objects.filter(
-                torneo=self.torneo,
-                ronda=ronda_siguiente,
-                posicion=posicion_siguiente
-            ).first()
-            
-            if llave_siguiente:
-                # Determinar si el ganador va como jugador1 o jugador2
-                # Si la posición actual es impar, va como jugador1
-                # Si la posición actual es par, va como jugador2
-                if self.llave_torneo.posicion % 2 == 1:
-                    # Posición impar -> jugador1 en la siguiente ronda
-                    llave_siguiente.jugador1 = self.ganador
-                else:
-                    # Posición par -> jugador2 en la siguiente ronda
-                    llave_siguiente.jugador2 = self.ganador
-                
-                llave_siguiente.save()
-                print(f"✅ Ganador {self.ganador.nombre} {self.ganador.apellido} avanzado automáticamente a la ronda {ronda_siguiente}, posición {posicion_siguiente}")
-                
-                # Si ambos jugadores ya están asignados en la siguiente ronda, crear el partido
-                if llave_siguiente.jugador1 and llave_siguiente.jugador2:
-                    self.crear_partido_siguiente_ronda(llave_siguiente)
+            if llave.llave_perdedor_id:
+                perdedor = self.jugador2 if self.ganador_id == self.jugador1_id else self.jugador1
+                if perdedor:
+                    self.ubicar_en_llave(llave.llave_perdedor_id, llave.lado_perdedor, perdedor)
             
         except Exception as e:
             print(f"❌ Error al avanzar ganador automáticamente: {e}")
     
+    def ubicar_en_llave(self, llave_id, lado, jugador):
+        """
+        Ubica a un jugador en un lado de una llave posterior.
+        
+        Args:
+            llave_id (int): ID de la llave destino
+            lado (int): 1 para jugador1, 2 para jugador2
+            jugador (Jugador): Jugador que avanza
+        """
+        LlaveTorneo.objects.filter(id=llave_id).update(**{f'jugador{lado}': jugador, f'bye{lado}': None})
+        
+        llave_destino = LlaveTorneo.objects.select_related('jugador1', 'jugador2').get(id=llave_id)
+        print(f"✅ {jugador.nombre} {jugador.apellido} avanzado automáticamente a la ronda {llave_destino.ronda}, posición {llave_destino.posicion}")
+        avisar_avance(self.torneo_id, llave_id, lado, jugador)
+        
+        # Si ambos jugadores ya están asignados en la llave destino, crear el partido
+        if llave_destino.jugador1 and llave_destino.jugador2:
+            self.crear_partido_siguiente_ronda(llave_destino)
+    
     def crear_partido_siguiente_ronda(self, llave_siguiente):
         """
         Crea automáticamente el partido para la siguiente ronda si ambos jugadores están listos.
         
+        Si la llave ya tenía un partido creado con un solo jugador, se completa
+        con el jugador que faltaba.
+        
         Args:
             llave_siguiente (LlaveTorneo): La llave de la siguiente ronda donde crear el partido
         """
@@ -834,100 +1171,40 @@ class Partido(models.Model):
                 Resultado.objects.create(partido=nuevo_partido)
                 
                 print(f"✅ Partido creado automáticamente para la ronda {llave_siguiente.ronda}: {llave_siguiente.jugador1.nombre} vs {llave_siguiente.jugador2.nombre}")
+            
+            elif not partido_existente.finalizado and partido_existente.estado_partido != 'jugado':
+                # Completar el partido creado antes de que llegara el segundo jugador
+                partido_existente.jugador1 = llave_siguiente.jugador1
+                partido_existente.jugador2 = llave_siguiente.jugador2
+                partido_existente.bye1 = None
+                partido_existente.bye2 = None
+                if partido_existente.estado_partido == 'pendiente':
+                    partido_existente.estado_partido = 'en_curso'
+                partido_existente.save()
+                Resultado.objects.get_or_create(partido=partido_existente)
                 
         except Exception as e:
             print(f"❌ Error al crear partido siguiente ronda: {e}")
 
-    def verificar_y_crear_tercer_lugar(self):
-        """
-        Verifica si se completaron las semifinales y crea automáticamente el partido de tercer lugar.
-        
-        Detecta cuando ambas semifinales han terminado, obtiene los perdedores
-        y crea el partido por el tercer puesto automáticamente.
-        """
-        try:
-            # Obtener información de la estructura del torneo
-            total_rondas = LlaveTorneo.objects.filter(torneo=self.torneo).aggregate(
-                max_ronda=models.Max('ronda')
-            )['max_ronda']
-            
-            if not total_rondas or total_rondas < 3:
-                return  # No hay suficientes rondas para tener semifinales
-            
-            # Verificar si este partido pertenece a las semifinales
-            ronda_semifinales = total_rondas - 1
-            
-            if self.llave_torneo.ronda != ronda_semifinales:
-                return  # Este no es un partido de semifinales
-            
-            # Verificar si ya existe una llave de tercer lugar
-            llave_tercer_lugar_existente = LlaveTorneo.objects.filter(
-                torneo=self.torneo,
-                tipo_llave='tercer_lugar'
-            ).exists()
-            
-            if llave_tercer_lugar_existente:
-                return  # Ya existe el tercer lugar
-            
-            # Verificar si todas las semifinales están completas
-            semifinales = LlaveTorneo.objects.filter(
-                torneo=self.torneo,
-                ronda=ronda_semifinales,
-                tipo_llave='normal'
-            )
-            
-            if semifinales.count() != 2:
-                return  # No hay exactamente 2 semifinales
-            
-            semifinales_completas = semifinales.filter(ganador__isnull=False)
-            
-            if semifinales_completas.count() != 2:
-                return  # No todas las semifinales están completas
-            
-            # Obtener los perdedores de las semifinales
-            perdedores = []
-            for semifinal in semifinales:
-                if semifinal.ganador == semifinal.jugador1:
-                    perdedor = semifinal.jugador2
-                elif semifinal.ganador == semifinal.jugador2:
-                    perdedor = semifinal.jugador1
-                else:
-                    continue
-                
-                if perdedor:
-                    perdedores.append(perdedor)
-            
-            if len(perdedores) != 2:
-                return  # No se pudieron obtener 2 perdedores
-            
-            # Crear la llave de tercer lugar
-            llave_tercer_lugar = LlaveTorneo.objects.create(
-                torneo=self.torneo,
-                ronda=ronda_semifinales,
-                posicion=999,
-                tipo_llave='tercer_lugar',
-                jugador1=perdedores[0],
-                jugador2=perdedores[1],
-                estado_partido='pendiente'
-            )
-            
-            # Crear el partido de tercer lugar
-            partido_tercer_lugar = Partido.objects.create(
-                torneo=self.torneo,
-                llave_torneo=llave_tercer_lugar,
-                jugador1=perdedores[0],
-                jugador2=perdedores[1],
-                estado_partido='en_curso',  # Cambiar a 'en_curso' para permitir registro de resultados
-                organizador=self.torneo.organizador
+@receiver(post_save, sender=Partido)
+def avisar_cambio_partido(sender, instance, created, **kwargs):
+    """
+    Avisa al bracket en vivo del torneo que el partido se creó o cambió y, si
+    cambió su árbitro o su estado de confirmación, a los árbitros afectados.
+    """
+    avisar_partido(instance, 'creado' if created else 'actualizado')
+
+    anterior = getattr(instance, '_arbitraje_guardado', (None, False, False))
+    actual = instance.estado_arbitraje()
+    if actual != anterior:
+        # Al reasignar el partido se avisa también al árbitro que lo tenía
+        arbitros = {anterior[0], actual[0]} - {None}
+        if arbitros:
+            UsuarioPersonalizado.objects.filter(id__in=arbitros).update(
+                version_partidos_arbitro=models.F('version_partidos_arbitro') + 1
             )
-            
-            # Crear el resultado
-            Resultado.objects.create(partido=partido_tercer_lugar)
-            
-            print(f"🥉 Tercer lugar creado automáticamente: {perdedores[0].nombre} vs {perdedores[1].nombre}")
-            
-        except Exception as e:
-            print(f"❌ Error al verificar/crear tercer lugar: {str(e)}")
+            avisar_arbitros(arbitros, instance)
+        instance._arbitraje_guardado = actual
 
 class Resultado(models.Model):
     """
@@ -942,6 +1219,7 @@ class Resultado(models.Model):
         set1_jugador2 - set9_jugador2 (PositiveIntegerField): Puntos del jugador 2 en cada set
         sets_ganados_jugador1 (PositiveIntegerField): Sets ganados por jugador 1 (calculado)
         sets_ganados_jugador2 (PositiveIntegerField): Sets ganados por jugador 2 (calculado)
+        secuencia_puntos (PositiveIntegerField): Último punto del marcador en vivo escrito
         resultado_jugador_1 (DecimalField): Coeficiente de resultado para jugador 1
         resultado_jugador_2 (DecimalField): Coeficiente de resultado para jugador 2
         fecha_actualizacion (DateTimeField): Última actualización del resultado
@@ -974,6 +1252,8 @@ class Resultado(models.Model):
     # Campos calculados automáticamente
     sets_ganados_jugador1 = models.PositiveIntegerField(default=0)
     sets_ganados_jugador2 = models.PositiveIntegerField(default=0)
+    # Último punto del marcador en vivo escrito en este resultado
+    secuencia_puntos = models.PositiveIntegerField(default=0)
     resultado_jugador_1 = models.DecimalField(max_digits=5, decimal_places=3, null=True, blank=True)
     resultado_jugador_2 = models.DecimalField(max_digits=5, decimal_places=3, null=True, blank=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
@@ -997,12 +1277,8 @@ class Resultado(models.Model):
         sets_j1 = 0
         sets_j2 = 0
         
-        # Determinar si es un partido final para usar la modalidad correcta
-        total_rondas = self.partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = self.partido.llave_torneo.ronda == total_rondas
-        
         # Usar la modalidad correcta según si es final o no
-        mejor_de_sets = self.partido.torneo.mejor_de_sets_final if es_partido_final else self.partido.torneo.mejor_de_sets
+        es_partido_final, mejor_de_sets, _ = self.partido.llave_torneo.modalidad_sets()
         
         # Crear lista de sets a evaluar basándose ÚNICAMENTE en la modalidad
         sets_a_evaluar = [
@@ -1084,12 +1360,8 @@ class Resultado(models.Model):
         Returns:
             str: Resultado formateado como "Set 1: 6-4 | Set 2: 3-6 | ..."
         """
-        # Determinar si es un partido final para usar la modalidad correcta
-        total_rondas = self.partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = self.partido.llave_torneo.ronda == total_rondas
-        
         # Usar la modalidad correcta según si es final o no
-        mejor_de_sets = self.partido.torneo.mejor_de_sets_final if es_partido_final else self.partido.torneo.mejor_de_sets
+        es_partido_final, mejor_de_sets, _ = self.partido.llave_torneo.modalidad_sets()
         sets_resultado = []
         
         # Siempre mostrar los primeros 3 sets
@@ -1149,13 +1421,8 @@ class Resultado(models.Model):
         if not jugador_ganador:
             return False, "Jugador ganador no válido"
         
-        # Determinar si es un partido final para usar la modalidad correcta
-        total_rondas = self.partido.torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-        es_partido_final = self.partido.llave_torneo.ronda == total_rondas
-        
         # Usar la modalidad correcta según si es final o no
-        mejor_de_sets = self.partido.torneo.mejor_de_sets_final if es_partido_final else self.partido.torneo.mejor_de_sets
-        sets_para_ganar = (mejor_de_sets // 2) + 1
+        es_partido_final, mejor_de_sets, sets_para_ganar = self.partido.llave_torneo.modalidad_sets()
         
         try:
             # Actualizar el resultado directamente
@@ -1200,3 +1467,183 @@ class Resultado(models.Model):
             
         except Exception as e:
             return False, f"Error al definir ganador: {str(e)}"
+
+class EventoPunto(models.Model):
+    """
+    Punto marcado por el árbitro durante un partido, en orden de secuencia.
+    
+    La tabla solo recibe inserciones: deshacer no borra ni modifica filas,
+    agrega un evento con ``delta`` -1 para el jugador cuyo último punto se
+    quitó. Al finalizar el partido los eventos se empaquetan en
+    ``LineaTiempoPartido`` y se eliminan de esta tabla.
+    
+    Attributes:
+        partido (ForeignKey): Partido al que pertenece el punto
+        secuencia (PositiveIntegerField): Secuencia del comando en el marcador en vivo
+        set_numero (PositiveSmallIntegerField): Set en que se marcó el punto
+        jugador (PositiveSmallIntegerField): Jugador que anotó (1 o 2)
+        delta (SmallIntegerField): 1 para un punto, -1 para un punto deshecho
+        momento (DateTimeField): Momento en que el árbitro marcó el punto
+    """
+    
+    partido = models.ForeignKey(Partido, on_delete=models.CASCADE, related_name='eventos_punto')
+    secuencia = models.PositiveIntegerField()
+    set_numero = models.PositiveSmallIntegerField()
+    jugador = models.PositiveSmallIntegerField()
+    delta = models.SmallIntegerField(default=1)
+    momento = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('partido', 'secuencia')
+        ordering = ['partido', 'secuencia']
+
+    def __str__(self):
+        """
+        Representación en string del evento.
+        
+        Returns:
+            str: Formato "Partido {id} #{secuencia}: set {n} jugador {j} ({delta})"
+        """
+        return f"Partido {self.partido_id} #{self.secuencia}: set {self.set_numero} jugador {self.jugador} ({self.delta:+d})"
+
+class LineaTiempoPartido(models.Model):
+    """
+    Eventos de punto de un partido finalizado, empaquetados en un solo registro.
+    
+    Attributes:
+        partido (OneToOneField): Partido al que pertenece la línea de tiempo
+        eventos (BinaryField): Eventos empaquetados (ver ``gestionarbitros.eventos``)
+        cantidad (PositiveIntegerField): Cantidad de eventos empaquetados
+        fecha_compactacion (DateTimeField): Momento en que se empaquetaron
+    """
+    
+    partido = models.OneToOneField(Partido, on_delete=models.CASCADE, related_name='linea_tiempo')
+    eventos = models.BinaryField()
+    cantidad = models.PositiveIntegerField(default=0)
+    fecha_compactacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        Representación en string de la línea de tiempo.
+        
+        Returns:
+            str: Formato "Línea de tiempo partido {id} ({cantidad} eventos)"
+        """
+        return f"Línea de tiempo partido {self.partido_id} ({self.cantidad} eventos)"
+
+class TrabajoImportacion(models.Model):
+    """
+    Modelo que representa una importación masiva ejecutada en segundo plano.
+    
+    El archivo subido se guarda en disco y un worker local lo procesa por lotes.
+    Cada lote se confirma junto con el avance del trabajo, de modo que tras una
+    caída el procesamiento se reanuda desde el último lote confirmado.
+    
+    Attributes:
+        tipo (CharField): Tipo de importación ('jugadores' o 'participantes')
+        estado (CharField): Estado del trabajo
+        organizador (ForeignKey): Usuario que inició la importación
+        torneo (ForeignKey): Torneo destino (solo para participantes)
+        archivo (CharField): Ruta del archivo guardado en disco
+        nombre_original (CharField): Nombre del archivo subido
+        parametros (JSONField): Datos adicionales necesarios para procesar el archivo
+        total_filas (PositiveIntegerField): Filas de datos del archivo
+        filas_procesadas (PositiveIntegerField): Filas ya procesadas
+        lotes_completados (PositiveIntegerField): Último lote confirmado
+        creados (PositiveIntegerField): Registros creados o aceptados
+        errores (JSONField): Mensajes de error por fila
+        ruts_aceptados (JSONField): RUTs aceptados (importación de participantes)
+        aplicado (BooleanField): Si el resultado ya se informó al organizador
+        mensaje (TextField): Mensaje de error general si el trabajo falló
+        fecha_creacion (DateTimeField): Fecha de creación del trabajo
+        fecha_actualizacion (DateTimeField): Último avance registrado
+    """
+    
+    TIPOS = [
+        ('jugadores', 'Jugadores'),
+        ('participantes', 'Participantes'),
+    ]
+    
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    organizador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='importaciones')
+    torneo = models.ForeignKey(Torneo, on_delete=models.CASCADE, related_name='importaciones', null=True, blank=True)
+    archivo = models.CharField(max_length=255)
+    nombre_original = models.CharField(max_length=255, blank=True)
+    parametros = models.JSONField(default=dict, blank=True)
+    total_filas = models.PositiveIntegerField(default=0)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    lotes_completados = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    ruts_aceptados = models.JSONField(default=list, blank=True)
+    aplicado = models.BooleanField(default=False)
+    mensaje = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Trabajo de Importación'
+        verbose_name_plural = 'Trabajos de Importación'
+
+    def __str__(self):
+        """
+        Representación en string del trabajo.
+        
+        Returns:
+            str: Formato "Importación {tipo} #{id} ({estado})"
+        """
+        return f"Importación {self.tipo} #{self.id} ({self.estado})"
+
+    @property
+    def terminado(self):
+        """
+        Indica si el trabajo ya no será procesado.
+        
+        Returns:
+            bool: True si el trabajo está completado o falló
+        """
+        return self.estado in ('completado', 'error')
+
+    @property
+    def porcentaje(self):
+        """
+        Calcula el avance del trabajo.
+        
+        Returns:
+            int: Porcentaje de filas procesadas (0-100)
+        """
+        if not self.total_filas:
+            return 100 if self.estado == 'completado' else 0
+        return int(self.filas_procesadas * 100 / self.total_filas)
+
+    def como_dict(self, errores_nuevos=None):
+        """
+        Serializa el estado del trabajo para enviarlo al cliente.
+        
+        Args:
+            errores_nuevos (list): Errores generados en el último lote
+            
+        Returns:
+            dict: Estado, avance y errores del trabajo
+        """
+        return {
+            'trabajo_id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'total_filas': self.total_filas,
+            'filas_procesadas': self.filas_procesadas,
+            'porcentaje': self.porcentaje,
+            'creados': self.creados,
+            'total_errores': len(self.errores),
+            'errores_nuevos': errores_nuevos if errores_nuevos is not None else self.errores,
+            'mensaje': self.mensaje,
+        }
@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'^ws/importacion/(?P<trabajo_id>\d+)/$', consumers.ImportacionConsumer.as_asgi()),
+    re_path(r'^ws/torneo/(?P<torneo_id>\d+)/$', consumers.TorneoConsumer.as_asgi()),
+]
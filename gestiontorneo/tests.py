@@ -1,3 +1,123 @@
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from datetime import datetime, timedelta
+import io
+import os
+import pandas as pd
+import tempfile
 
-# Create your tests here.
+from .importacion import importar_jugadores_df
+from .lectores import leer_lotes
+from .models import Categoria, Jugador, TrabajoImportacion, UsuarioPersonalizado
+from .trabajos import reclamar_trabajo
+
+
+class ImportacionJugadoresTests(TestCase):
+    """Importación por conjuntos de la plantilla de jugadores."""
+
+    def plantilla(self, filas):
+        return pd.DataFrame(filas, columns=['RUT', 'Nombre', 'Apellido', 'Fecha de nacimiento', 'Genero', 'Club', 'Correo'])
+
+    def test_celdas_vacias_son_errores_de_fila(self):
+        # Las celdas vacías llegan como NaN: deben fallar su regla, no convertirse en 'nan'
+        df = self.plantilla([
+            [None, 'Ana', 'Pérez', datetime(1990, 1, 1), 'F', None, None],
+            ['12345678-5', 'Luis', 'Soto', None, 'M', None, None],
+            ['11111111-1', 'Eva', 'Díaz', '15/03/1992', 'F', None, None],
+        ])
+
+        creados, errores = importar_jugadores_df(df)
+
+        self.assertEqual(creados, 1)
+        self.assertEqual(errores, [
+            "Fila 2: RUT inválido ()",
+            "Fila 3: Fecha de nacimiento inválida ()",
+        ])
+        self.assertEqual(list(Jugador.objects.values_list('rut', flat=True)), ['11111111-1'])
+
+
+class LectoresTests(TestCase):
+    """Lectura en streaming de los archivos de importación."""
+
+    def test_fila_csv_corta_completa_las_columnas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'jugadores.csv')
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write('RUT,Nombre,Apellido,Fecha de nacimiento,Genero,Club,Correo\n')
+                archivo.write(',Ana,Pérez\n')
+            _, df = next(leer_lotes(ruta, 100))
+
+        self.assertEqual(df.loc[0, 'rut'], '')
+        self.assertEqual(df.loc[0, 'correo'], '')
+        creados, errores = importar_jugadores_df(df)
+        self.assertEqual(creados, 0)
+        self.assertEqual(errores, ["Fila 2: RUT inválido ()"])
+
+
+class TablaCategoriasTests(TestCase):
+    """Tabla de categorías cacheada por proceso."""
+
+    def setUp(self):
+        Categoria.invalidar_tabla()
+        self.addCleanup(Categoria.invalidar_tabla)
+
+    def test_se_invalida_al_confirmar(self):
+        Categoria.tabla()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Categoria.objects.create(nombre='Sub 12', edad_maxima=12)
+        # Hasta el commit la tabla sigue sin la categoría nueva
+        self.assertNotIn('Sub 12', [fila[0] for fila in Categoria.tabla()])
+        for callback in callbacks:
+            callback()
+        self.assertIn('Sub 12', [fila[0] for fila in Categoria.tabla()])
+
+    @override_settings(CATEGORIAS_VIGENCIA_CACHE=30)
+    def test_se_relee_al_vencer(self):
+        Categoria.objects.create(nombre='Adulto', edad_minima=18)
+        with mock.patch('gestiontorneo.models.time.monotonic', return_value=1000.0):
+            Categoria.tabla()
+        # Cambio hecho por otro worker: update() no envía señales a este proceso
+        Categoria.objects.filter(nombre='Adulto').update(nombre='Todo competidor')
+
+        with mock.patch('gestiontorneo.models.time.monotonic', return_value=1010.0):
+            self.assertEqual(Categoria.nombre_para_edad(40), 'Adulto')
+        with mock.patch('gestiontorneo.models.time.monotonic', return_value=1031.0):
+            self.assertEqual(Categoria.nombre_para_edad(40), 'Todo competidor')
+
+
+@override_settings(IMPORTACION_TIMEOUT_LATIDO=120)
+class ReclamoTrabajosTests(TestCase):
+    """Un solo proceso ejecuta cada trabajo de importación."""
+
+    def setUp(self):
+        organizador = UsuarioPersonalizado.objects.create(
+            username='organizador', email='organizador@ejemplo.cl', tipo_usuario='organizador',
+        )
+        self.trabajo = TrabajoImportacion.objects.create(
+            tipo='jugadores', organizador=organizador, archivo='/tmp/no-existe.csv', estado='en_proceso',
+        )
+
+    def detener(self):
+        TrabajoImportacion.objects.filter(id=self.trabajo.id).update(
+            fecha_actualizacion=timezone.now() - timedelta(seconds=300)
+        )
+
+    def test_trabajo_con_avance_reciente_no_se_reclama(self):
+        self.assertFalse(reclamar_trabajo(self.trabajo.id))
+
+    def test_trabajo_detenido_se_reclama_una_sola_vez(self):
+        self.detener()
+        self.assertTrue(reclamar_trabajo(self.trabajo.id))
+        # El reclamo renueva el latido: otro proceso ya no puede tomarlo
+        self.assertFalse(reclamar_trabajo(self.trabajo.id))
+
+    def test_comando_omite_trabajos_en_curso(self):
+        with mock.patch('gestiontorneo.management.commands.reanudar_importaciones.procesar_trabajo') as procesar:
+            call_command('reanudar_importaciones', stdout=io.StringIO())
+            procesar.assert_not_called()
+
+            self.detener()
+            call_command('reanudar_importaciones', stdout=io.StringIO())
+            procesar.assert_called_once_with(self.trabajo.id)
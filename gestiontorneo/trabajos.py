@@ -0,0 +1,293 @@
+"""
+Ejecución en segundo plano de las importaciones masivas.
+
+Las vistas de importación guardan el archivo subido en disco, crean un
+``TrabajoImportacion`` y lo encolan en un pool local de hilos (sin broker
+externo). El worker procesa el archivo por lotes: cada lote se confirma en la
+misma transacción que actualiza ``lotes_completados``, por lo que si el proceso
+cae el trabajo se reanuda desde el último lote confirmado. El avance y los
+errores se envían al grupo de Channels ``importacion_<id>`` igual que
+``enviar_actualizacion_partido`` envía los puntajes.
+
+Antes de procesar un trabajo, quien lo ejecuta (el pool del servidor o el
+comando ``reanudar_importaciones``) lo reclama con un UPDATE condicional sobre
+su ``estado`` y ``fecha_actualizacion``: solo un proceso gana, y un trabajo
+'en_proceso' solo puede reclamarse cuando su worker lleva más de
+``IMPORTACION_TIMEOUT_LATIDO`` segundos sin registrar avance.
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .importacion import ImportadorJugadores, ImportadorParticipantes
+from .lectores import contar_filas, leer_lotes
+from .models import ParticipanteTemporal, TrabajoImportacion
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _obtener_executor():
+    """Crea el pool de workers la primera vez que se necesita."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMPORTACION_WORKERS', 2),
+                thread_name_prefix='importacion',
+            )
+    return _executor
+
+
+def guardar_archivo_subido(archivo):
+    """
+    Copia un archivo subido al directorio de importaciones.
+
+    Args:
+        archivo (UploadedFile): Archivo recibido en ``request.FILES``
+
+    Returns:
+        str: Ruta absoluta del archivo guardado
+    """
+    os.makedirs(settings.IMPORTACIONES_DIR, exist_ok=True)
+    extension = os.path.splitext(archivo.name)[1].lower()
+    ruta = os.path.join(settings.IMPORTACIONES_DIR, f"{uuid.uuid4().hex}{extension}")
+    with open(ruta, 'wb') as destino:
+        for bloque in archivo.chunks():
+            destino.write(bloque)
+    return ruta
+
+
+def crear_trabajo(tipo, archivo, organizador, torneo=None, parametros=None):
+    """
+    Guarda el archivo, registra el trabajo y lo encola para su ejecución.
+
+    Args:
+        tipo (str): 'jugadores' o 'participantes'
+        archivo (UploadedFile): Archivo subido
+        organizador (UsuarioPersonalizado): Usuario que inicia la importación
+        torneo (Torneo): Torneo destino (solo participantes)
+        parametros (dict): Datos adicionales para el importador
+
+    Returns:
+        TrabajoImportacion: Trabajo creado
+    """
+    trabajo = TrabajoImportacion.objects.create(
+        tipo=tipo,
+        organizador=organizador,
+        torneo=torneo,
+        archivo=guardar_archivo_subido(archivo),
+        nombre_original=archivo.name,
+        parametros=parametros or {},
+    )
+    # Encolar recién cuando el INSERT esté confirmado para que el worker lo vea
+    transaction.on_commit(lambda: encolar(trabajo.id))
+    return trabajo
+
+
+def _limite_latido():
+    """Momento antes del cual un trabajo 'en_proceso' se considera detenido."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'IMPORTACION_TIMEOUT_LATIDO', 120))
+
+
+def trabajos_detenidos():
+    """
+    Trabajos pendientes o 'en_proceso' sin avance reciente (por ejemplo, tras
+    reiniciar el servidor).
+
+    Returns:
+        QuerySet: Trabajos que pueden reanudarse
+    """
+    return TrabajoImportacion.objects.filter(
+        estado__in=['pendiente', 'en_proceso'],
+        fecha_actualizacion__lt=_limite_latido(),
+    )
+
+
+def reclamar_trabajo(trabajo_id):
+    """
+    Toma un trabajo para procesarlo en este proceso.
+
+    El UPDATE solo afecta la fila si ``estado`` y ``fecha_actualizacion``
+    siguen siendo los leídos: si dos procesos intentan reclamar el mismo
+    trabajo, solo uno lo consigue.
+
+    Args:
+        trabajo_id (int): ID del trabajo
+
+    Returns:
+        bool: True si el trabajo quedó reclamado por este proceso
+    """
+    actual = TrabajoImportacion.objects.filter(id=trabajo_id).values('estado', 'fecha_actualizacion').first()
+    if actual is None or actual['estado'] not in ('pendiente', 'en_proceso'):
+        return False
+    if actual['estado'] == 'en_proceso' and actual['fecha_actualizacion'] >= _limite_latido():
+        # Otro worker sigue registrando avance
+        return False
+    return TrabajoImportacion.objects.filter(
+        id=trabajo_id, estado=actual['estado'], fecha_actualizacion=actual['fecha_actualizacion'],
+    ).update(estado='en_proceso', fecha_actualizacion=timezone.now()) == 1
+
+
+def encolar(trabajo_id):
+    """
+    Reclama un trabajo y lo envía al pool de workers.
+
+    Args:
+        trabajo_id (int): ID del trabajo
+
+    Returns:
+        bool: True si el trabajo fue encolado
+    """
+    if not reclamar_trabajo(trabajo_id):
+        return False
+    _obtener_executor().submit(_ejecutar, trabajo_id)
+    return True
+
+
+def _ejecutar(trabajo_id):
+    """Punto de entrada del worker: procesa el trabajo y registra fallos."""
+    try:
+        procesar_trabajo(trabajo_id)
+    except Exception as e:
+        print(f"❌ Error en importación #{trabajo_id}: {e}")
+        TrabajoImportacion.objects.filter(id=trabajo_id).update(
+            estado='error', mensaje=f"Error al procesar el archivo: {e}"
+        )
+        trabajo = TrabajoImportacion.objects.filter(id=trabajo_id).first()
+        if trabajo:
+            notificar(trabajo, [])
+    finally:
+        # Cada hilo abre su propia conexión; se cierra al terminar el trabajo
+        connection.close()
+
+
+def _crear_importador(trabajo):
+    """
+    Crea el importador correspondiente al tipo de trabajo, restaurando el
+    estado acumulado por los lotes ya confirmados.
+    """
+    if trabajo.tipo == 'jugadores':
+        # Los jugadores de lotes confirmados ya están en la base de datos y el
+        # importador los carga como existentes al crearse
+        return ImportadorJugadores()
+
+    # La selección temporal ya incluye lo aceptado por los lotes confirmados
+    seleccionados = ParticipanteTemporal.objects.filter(
+        torneo=trabajo.torneo, organizador=trabajo.organizador_id
+    ).values_list('jugador__rut', flat=True)
+    importador = ImportadorParticipantes(trabajo.torneo, seleccionados)
+    importador.ruts_en_archivo.update(trabajo.ruts_aceptados)
+    return importador
+
+
+def procesar_trabajo(trabajo_id):
+    """
+    Procesa un trabajo de importación lote a lote.
+
+    Los lotes anteriores a ``lotes_completados`` se omiten, lo que permite
+    reanudar un trabajo interrumpido sin duplicar registros. El trabajo debe
+    estar reclamado (``reclamar_trabajo``).
+
+    Args:
+        trabajo_id (int): ID del trabajo
+    """
+    trabajo = TrabajoImportacion.objects.select_related('torneo', 'torneo__categoria').get(id=trabajo_id)
+    if trabajo.terminado:
+        return
+
+    trabajo.estado = 'en_proceso'
+    trabajo.save(update_fields=['estado', 'fecha_actualizacion'])
+
+    tamano_lote = getattr(settings, 'IMPORTACION_TAMANO_LOTE', 1000)
+    if not trabajo.total_filas:
+        trabajo.total_filas = contar_filas(trabajo.archivo)
+        trabajo.save(update_fields=['total_filas', 'fecha_actualizacion'])
+    notificar(trabajo, [])
+
+    importador = _crear_importador(trabajo)
+
+    # El archivo se lee en streaming: solo un lote está en memoria a la vez
+    for numero, lote in leer_lotes(trabajo.archivo, tamano_lote, desde_lote=trabajo.lotes_completados):
+        with transaction.atomic():
+            if trabajo.tipo == 'jugadores':
+                creados, errores = importador.procesar(lote)
+            else:
+                aceptados, errores = importador.procesar(lote)
+                ParticipanteTemporal.objects.bulk_create([
+                    ParticipanteTemporal(
+                        torneo=trabajo.torneo,
+                        organizador_id=trabajo.organizador_id,
+                        jugador_id=importador.ids_por_rut[rut],
+                    )
+                    for rut in aceptados
+                ], ignore_conflicts=True)
+                trabajo.ruts_aceptados.extend(aceptados)
+                creados = len(aceptados)
+
+            trabajo.creados += creados
+            trabajo.errores.extend(errores)
+            trabajo.lotes_completados = numero + 1
+            trabajo.filas_procesadas += len(lote)
+            trabajo.save(update_fields=[
+                'creados', 'errores', 'ruts_aceptados', 'lotes_completados',
+                'filas_procesadas', 'fecha_actualizacion',
+            ])
+
+        notificar(trabajo, errores)
+
+    # El total de .xlsx es una estimación: al terminar se ajusta al real
+    trabajo.total_filas = trabajo.filas_procesadas
+    trabajo.estado = 'completado'
+    trabajo.save(update_fields=['estado', 'total_filas', 'fecha_actualizacion'])
+    notificar(trabajo, [])
+
+    try:
+        os.remove(trabajo.archivo)
+    except OSError:
+        pass
+
+
+def notificar(trabajo, errores_nuevos):
+    """
+    Envía el avance de un trabajo a su grupo de WebSocket.
+
+    Args:
+        trabajo (TrabajoImportacion): Trabajo actualizado
+        errores_nuevos (list): Errores producidos por el último lote
+    """
+    try:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f'importacion_{trabajo.id}',
+            {
+                'type': 'importacion_update',
+                'data': trabajo.como_dict(errores_nuevos),
+            }
+        )
+    except Exception as e:
+        print(f"Error enviando avance de importación: {e}")
+
+
+def reanudar_si_detenido(trabajo):
+    """
+    Reanuda un trabajo concreto si su worker dejó de registrar avance.
+
+    Args:
+        trabajo (TrabajoImportacion): Trabajo consultado
+
+    Returns:
+        bool: True si el trabajo fue encolado nuevamente
+    """
+    if trabajo.terminado or trabajo.fecha_actualizacion >= _limite_latido():
+        return False
+    return encolar(trabajo.id)
@@ -3,6 +3,7 @@ from django.contrib.auth import views as auth_views
 from django.contrib.auth.views import LogoutView
 from . import views
 from . import views_llaves
+from . import views_eventos
 
 urlpatterns = [
     path('login/', views.login_personalizado, name='login'),
@@ -16,10 +17,14 @@ urlpatterns = [
     path('categorias/', views.lista_categorias, name='lista_categorias'),
     path('torneos/<int:torneo_id>/gestionar/', views.gestionar_torneo, name='gestionar_torneo'),
     path('jugadores/importar/', views.importar_jugadores, name='importar_jugadores'),
+    path('importaciones/<int:trabajo_id>/', views.estado_importacion, name='estado_importacion'),
+    path('importaciones/<int:trabajo_id>/estado/', views.estado_importacion_ajax, name='estado_importacion_ajax'),
     path('jugadores/<int:jugador_id>/anadir_correo/', views.anadir_correo_jugador, name='anadir_correo_jugador'),
     path('torneos/<int:torneo_id>/gestionar/', views.gestionar_torneo, name='gestionar_torneo'),
     path('torneos/<int:torneo_id>/gestionar_federado/', views.gestionar_torneo_federado, name='gestionar_torneo_federado'),
     path('torneos/<int:torneo_id>/participantes/', views.ingresar_participantes, name='ingresar_participantes'),
+    path('torneos/<int:torneo_id>/participantes/seleccion/agregar/', views.agregar_participante_temporal, name='agregar_participante_temporal'),
+    path('torneos/<int:torneo_id>/participantes/seleccion/quitar/', views.quitar_participante_temporal, name='quitar_participante_temporal'),
     path('torneos/<int:torneo_id>/listado_participantes/', views.listado_participantes, name='listado_participantes'),
     path('torneos/<int:torneo_id>/eliminar_participante/<str:participante_rut>/', views.eliminar_participante, name='eliminar_participante'),
     # URLs para modalidades de torneo
@@ -36,10 +41,14 @@ urlpatterns = [
     path('torneos/<int:torneo_id>/partido/<int:partido_id>/registrar-resultado/', views.registrar_resultado, name='registrar_resultado'),
     path('torneos/<int:torneo_id>/partido/<int:partido_id>/asignar-arbitro/', views.asignar_arbitro_partido, name='asignar_arbitro_partido'),
     path('torneos/<int:torneo_id>/partido/<int:partido_id>/puntaje-vivo/', views.ver_puntaje_vivo, name='ver_puntaje_vivo'),
+    path('torneos/<int:torneo_id>/partido/<int:partido_id>/eventos/', views_eventos.eventos_partido, name='eventos_partido'),
+    path('torneos/<int:torneo_id>/eventos/', views_eventos.eventos_torneo, name='eventos_torneo'),
     path('torneos/<int:torneo_id>/definir-llaves/', views.definir_llaves, name='definir_llaves'),
+    path('torneos/<int:torneo_id>/definir-llaves/participantes/', views.participantes_llaves_ajax, name='participantes_llaves_ajax'),
     path('torneo/<int:torneo_id>/partido/<int:partido_id>/cerrar/', views.cerrar_partido_organizador, name='cerrar_partido_organizador'),
     path('torneo/<int:torneo_id>/partido/<int:partido_id>/confirmar/', views.confirmar_resultado_partido, name='confirmar_resultado_partido'),
     path('torneos/<int:torneo_id>/partido/<int:partido_id>/estado-ajax/', views.verificar_estado_partido_ajax, name='verificar_estado_partido_ajax'),
+    path('torneos/<int:torneo_id>/partido/<int:partido_id>/linea-tiempo/', views.linea_tiempo_partido_ajax, name='linea_tiempo_partido_ajax'),
     path('torneos/<int:torneo_id>/resultados/', views.resultados_torneo, name='resultados_torneo'),
     path('torneos/<int:torneo_id>/vista-previa-asignacion/', views.vista_previa_asignacion, name='vista_previa_asignacion'),
     path('torneos/<int:torneo_id>/vista-previa-asignacion-pagina/', views.vista_previa_asignacion_pagina, name='vista_previa_asignacion_pagina'),
@@ -20,13 +20,18 @@ from django.urls import reverse
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError as DjangoValidationError
 import re
+import json
 from datetime import datetime
 import math
 import unicodedata
 from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, JsonResponse
-from .models import GrupoTorneo, ParticipanteGrupo, LlaveTorneo, JugadorBye, UsuarioPersonalizado, ArbitroTorneo
+from .models import GrupoTorneo, ParticipanteGrupo, LlaveTorneo, JugadorBye, UsuarioPersonalizado, ArbitroTorneo, TrabajoImportacion, ParticipanteTemporal
 from django.db import transaction
 from .decorators import require_organizador, require_jugador, require_arbitro, require_user_type
+from .trabajos import crear_trabajo, reanudar_si_detenido
+from .llaves import construir_primera_ronda, enfrentamiento_vacio, materializar_bracket
+from gestionarbitros.eventos import linea_tiempo, programar_compactacion
+from gestionarbitros.marcador import descartar_marcador, persistir_marcador
 
 
 def login_personalizado(request):
@@ -248,14 +253,80 @@ def lista_categorias(request):
     
     return render(request, 'lista_categorias.html', context)
 
+# Cantidad de jugadores por página en los listados paginados por keyset
+TAMANO_PAGINA_JUGADORES = 50
+
+def buscar_jugadores(jugadores, query):
+    """
+    Filtra un queryset de jugadores según el texto de búsqueda.
+    
+    'm' o 'f' filtran por género; cualquier otro texto se busca por prefijo en
+    las columnas de búsqueda indexadas (ver ``Jugador.filtro_busqueda``).
+    
+    Args:
+        jugadores (QuerySet): Jugadores candidatos
+        query (str): Texto ingresado por el usuario
+        
+    Returns:
+        QuerySet: Jugadores que coinciden con la búsqueda
+    """
+    if query.lower() in ['m', 'f']:
+        return jugadores.filter(genero=query.upper())
+    return jugadores.filter(Jugador.filtro_busqueda(query))
+
+def paginar_jugadores(request, jugadores):
+    """
+    Pagina un queryset de jugadores por keyset (apellido, nombre, id).
+    
+    En lugar de OFFSET, cada página continúa después del último jugador de la
+    anterior (parámetro GET ``despues``), por lo que el costo de cada página es
+    constante sin importar cuántas se hayan recorrido.
+    
+    Args:
+        request (HttpRequest): Petición con los parámetros GET actuales
+        jugadores (QuerySet): Jugadores a paginar
+        
+    Returns:
+        tuple: (list jugadores de la página, str URL de la página siguiente o None,
+        str URL de la primera página o None)
+    """
+    jugadores = jugadores.order_by(*Jugador.ORDEN_LISTADO)
+    cursor = request.GET.get('despues', '')
+    partes = cursor.split('|')
+    if len(partes) == 3 and partes[2].isdigit():
+        apellido, nombre, jugador_id = partes[0], partes[1], int(partes[2])
+        jugadores = jugadores.filter(
+            Q(apellido_busqueda__gt=apellido) |
+            Q(apellido_busqueda=apellido, nombre_busqueda__gt=nombre) |
+            Q(apellido_busqueda=apellido, nombre_busqueda=nombre, id__gt=jugador_id)
+        )
+    else:
+        cursor = ''
+
+    pagina = list(jugadores[:TAMANO_PAGINA_JUGADORES + 1])
+    url_siguiente = None
+    if len(pagina) > TAMANO_PAGINA_JUGADORES:
+        pagina = pagina[:TAMANO_PAGINA_JUGADORES]
+        ultimo = pagina[-1]
+        parametros = request.GET.copy()
+        parametros['despues'] = f"{ultimo.apellido_busqueda}|{ultimo.nombre_busqueda}|{ultimo.id}"
+        url_siguiente = f"?{parametros.urlencode()}"
+
+    url_primera = None
+    if cursor:
+        parametros = request.GET.copy()
+        parametros.pop('despues', None)
+        url_primera = f"?{parametros.urlencode()}"
+
+    return pagina, url_siguiente, url_primera
+
 @require_organizador
 def lista_jugadores(request):
     query = request.GET.get('q', '').strip()
+    jugadores = Jugador.objects.select_related('club')
     if query:
-        rut_normalizado = normalizar_rut(query)
-        jugadores = Jugador.objects.filter(rut__icontains=rut_normalizado)
-    else:
-        jugadores = Jugador.objects.all()
+        jugadores = buscar_jugadores(jugadores, query)
+    jugadores, url_siguiente, url_primera = paginar_jugadores(request, jugadores)
     if request.method == 'POST':
         if 'agregar' in request.POST:
             form = JugadorForm(request.POST)
@@ -265,107 +336,70 @@ def lista_jugadores(request):
                 return redirect('lista_jugadores')
     else:
         form = JugadorForm()
-    return render(request, 'lista_jugadores.html', {'jugadores': jugadores, 'form': form, 'query': query})
+    return render(request, 'lista_jugadores.html', {
+        'jugadores': jugadores,
+        'form': form,
+        'query': query,
+        'url_siguiente': url_siguiente,
+        'url_primera': url_primera,
+    })
 
 @require_organizador
 def importar_jugadores(request):
     if request.method == "POST" and request.FILES.get("archivo"):
-        archivo = request.FILES["archivo"]
-        df = pd.read_excel(archivo)
-        df.columns = [col.strip().lower() for col in df.columns]
-        errores = []
-        emails_en_archivo = set()
-        ruts_en_archivo = set()
-        
-        for i, row in df.iterrows():
-            rut = normalizar_rut(row.get('rut', ''))
-            nombre = limpiar_texto_estricto(row.get('nombre', ''))
-            apellido = limpiar_texto_estricto(row.get('apellido', ''))
-            fecha_nacimiento = row.get('fecha de nacimiento', '')
-            genero = limpiar_texto_estricto(row.get('genero', '')).upper()
-            club_nombre = limpiar_texto_estricto(row.get('club', ''))
-            
-            correo_raw = row.get('correo', '')
-            if pd.isna(correo_raw) or correo_raw is None or str(correo_raw).strip().lower() in ('', 'nan'):
-                correo = ''
-            else:
-                correo = limpiar_email_estricto(correo_raw)
-
-            if not club_nombre or club_nombre.lower() in ('', 'nan'):
-                club = None
-            else:
-                club, _ = Club.objects.get_or_create(nombre=club_nombre)
-
-            if not nombre:
-                errores.append(f"Fila {i+2}: Nombre vacío o inválido")
-                continue
-            if not apellido:
-                errores.append(f"Fila {i+2}: Apellido vacío o inválido")
-                continue
-
-            if not rut_valido(rut):
-                errores.append(f"Fila {i+2}: RUT inválido ({rut})")
-                continue
-            if rut in ruts_en_archivo:
-                errores.append(f"Fila {i+2}: RUT duplicado en el archivo ({rut})")
-                continue
-            if Jugador.objects.filter(rut=rut).exists():
-                errores.append(f"Fila {i+2}: RUT ya existe en la base de datos ({rut})")
-                continue
-            ruts_en_archivo.add(rut)
-
-            if isinstance(fecha_nacimiento, datetime):
-                fecha_nac = fecha_nacimiento.date()
-            else:
-                fecha_nac = None
-                for fmt in ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"]:
-                    try:
-                        fecha_nac = datetime.strptime(str(fecha_nacimiento), fmt).date()
-                        break
-                    except ValueError:
-                        continue
-                if not fecha_nac:
-                    errores.append(f"Fila {i+2}: Fecha de nacimiento inválida ({fecha_nacimiento})")
-                    continue
-
-            if genero not in ("M", "F"):
-                errores.append(f"Fila {i+2}: Género inválido ({genero}). Debe ser 'M' o 'F'.")
-                continue
-
-            if correo:
-                if not correo_valido(correo):
-                    errores.append(f"Fila {i+2}: Correo inválido ({correo})")
-                    continue
-                if correo in emails_en_archivo:
-                    errores.append(f"Fila {i+2}: Correo duplicado en el archivo ({correo})")
-                    continue
-                if Jugador.objects.filter(email=correo).exists():
-                    errores.append(f"Fila {i+2}: Correo ya existe in la base de datos ({correo})")
-                    continue
-                emails_en_archivo.add(correo)
-            else:
-                correo = None
-
-            club, _ = Club.objects.get_or_create(nombre=club_nombre) if club_nombre else (None, None)
-
-            Jugador.objects.create(
-                rut=rut,
-                nombre=nombre,
-                apellido=apellido,
-                fecha_nacimiento=fecha_nac,
-                genero=genero,
-                club=club,
-                email=correo
-            )
-
-        if errores:
-            for error in errores:
+        form = ImportarJugadoresForm(request.POST, request.FILES)
+        if not form.is_valid():
+            for error in form.errors.get('archivo', []):
                 messages.error(request, error)
-        else:
-            messages.success(request, "Jugadores importados exitosamente.")
-        return redirect('lista_jugadores')
+            return redirect('lista_jugadores')
+        archivo = form.cleaned_data["archivo"]
+        # El archivo se procesa en segundo plano (ver gestiontorneo.trabajos)
+        trabajo = crear_trabajo('jugadores', archivo, request.user)
+
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'trabajo_id': trabajo.id,
+                'estado_url': reverse('estado_importacion', args=[trabajo.id]),
+            })
+        messages.info(request, "El archivo se está importando. Puedes seguir el avance en esta página.")
+        return redirect('estado_importacion', trabajo_id=trabajo.id)
     return render(request, 'importar_jugadores.html', {'form': ImportarJugadoresForm()})
 
+@require_organizador
+def estado_importacion(request, trabajo_id):
+    """
+    Muestra el avance de un trabajo de importación.
+    
+    El avance se recibe por WebSocket; la vista ``estado_importacion_ajax``
+    sirve como respaldo si la conexión no está disponible.
+    
+    Args:
+        request (HttpRequest): Objeto de petición HTTP
+        trabajo_id (int): ID del trabajo de importación
+        
+    Returns:
+        HttpResponse: Template con el estado del trabajo
+    """
+    trabajo = get_object_or_404(TrabajoImportacion, id=trabajo_id, organizador=request.user)
+    reanudar_si_detenido(trabajo)
+
+    if trabajo.tipo == 'participantes':
+        url_volver = reverse('ingresar_participantes', args=[trabajo.torneo_id])
+    else:
+        url_volver = reverse('lista_jugadores')
+
+    return render(request, 'estado_importacion.html', {
+        'trabajo': trabajo,
+        'url_volver': url_volver,
+    })
+
+@require_organizador
+def estado_importacion_ajax(request, trabajo_id):
+    """Vista AJAX con el estado actual de un trabajo de importación"""
+    trabajo = get_object_or_404(TrabajoImportacion, id=trabajo_id, organizador=request.user)
+    reanudar_si_detenido(trabajo)
+    return JsonResponse(trabajo.como_dict())
+
 @require_organizador
 def anadir_correo_jugador(request, jugador_id):
     jugador = get_object_or_404(Jugador, id=jugador_id)
@@ -392,6 +426,76 @@ def gestionar_torneo_federado(request, torneo_id):
     torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
     return render(request, 'gestionar_torneo_federado.html', {'torneo': torneo})
 
+def agregar_seleccion_temporal(torneo, organizador, ruts):
+    """
+    Agrega jugadores a la selección temporal de un organizador.
+    
+    Los RUTs se resuelven con una sola consulta y las filas se insertan con un
+    único ``bulk_create``; los jugadores ya seleccionados o ya confirmados en el
+    torneo se ignoran.
+    
+    Args:
+        torneo (Torneo): Torneo al que se agregan los jugadores
+        organizador (UsuarioPersonalizado): Organizador dueño de la selección
+        ruts (list): RUTs de los jugadores a agregar
+        
+    Returns:
+        int: Cantidad de jugadores nuevos en la selección
+    """
+    seleccion = ParticipanteTemporal.objects.filter(torneo=torneo, organizador=organizador)
+    jugador_ids = list(
+        Jugador.objects.filter(rut__in=set(ruts))
+        .exclude(id__in=torneo.participaciones.values('jugador_id'))
+        .exclude(id__in=seleccion.values('jugador_id'))
+        .values_list('id', flat=True)
+    )
+    ParticipanteTemporal.objects.bulk_create(
+        [ParticipanteTemporal(torneo=torneo, organizador=organizador, jugador_id=jugador_id) for jugador_id in jugador_ids],
+        ignore_conflicts=True
+    )
+    return len(jugador_ids)
+
+def quitar_seleccion_temporal(torneo, organizador, ruts):
+    """
+    Quita jugadores de la selección temporal de un organizador.
+    
+    Args:
+        torneo (Torneo): Torneo de la selección
+        organizador (UsuarioPersonalizado): Organizador dueño de la selección
+        ruts (list): RUTs de los jugadores a quitar
+        
+    Returns:
+        int: Cantidad de jugadores quitados
+    """
+    quitados, _ = ParticipanteTemporal.objects.filter(
+        torneo=torneo, organizador=organizador, jugador__rut__in=ruts
+    ).delete()
+    return quitados
+
+def confirmar_seleccion_temporal(torneo, organizador):
+    """
+    Inscribe en el torneo a todos los jugadores de la selección temporal.
+    
+    Usa una consulta para leer la selección y un ``bulk_create`` con
+    ``ignore_conflicts`` para crear las participaciones, dentro de una transacción.
+    
+    Args:
+        torneo (Torneo): Torneo a confirmar
+        organizador (UsuarioPersonalizado): Organizador dueño de la selección
+        
+    Returns:
+        int: Cantidad de jugadores procesados
+    """
+    seleccion = ParticipanteTemporal.objects.filter(torneo=torneo, organizador=organizador)
+    with transaction.atomic():
+        jugador_ids = list(seleccion.values_list('jugador_id', flat=True))
+        Participacion.objects.bulk_create(
+            [Participacion(torneo=torneo, jugador_id=jugador_id) for jugador_id in jugador_ids],
+            ignore_conflicts=True
+        )
+        seleccion.delete()
+    return len(jugador_ids)
+
 @require_organizador
 def ingresar_participantes(request, torneo_id):
     torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
@@ -402,144 +506,73 @@ def ingresar_participantes(request, torneo_id):
         return redirect('listado_participantes', torneo_id=torneo.id)
     
     query_raw = request.GET.get('q', '').strip()
-    query = limpiar_texto_estricto(query_raw).lower()
-
-    participantes_confirmados_ruts = set(
-        Jugador.objects.filter(
-            id__in=torneo.participaciones.values_list('jugador_id', flat=True)
-        ).values_list('rut', flat=True)
-    )
 
-    session_key = f'participantes_temp_{torneo_id}'
-    participantes_temp = set(request.session.get(session_key, []))
-    
-    seleccionados_visuales = participantes_temp.copy()
-    
-    if request.method == "GET" and 'selected' in request.GET:
-        seleccionados_visuales = set(request.GET.getlist('selected'))
-
-    if torneo.todo_competidor:
-        jugadores = Jugador.objects.exclude(rut__in=participantes_confirmados_ruts | participantes_temp)
-    elif torneo.categoria:
-        jugadores = [
-            j for j in Jugador.objects.exclude(rut__in=participantes_confirmados_ruts | participantes_temp)
-            if j.calcular_categoria() == torneo.categoria.nombre
-        ]
-    else:
-        jugadores = []
+    # La selección pendiente vive en ParticipanteTemporal (por torneo y organizador)
+    seleccion = ParticipanteTemporal.objects.filter(torneo=torneo, organizador=request.user)
 
-    if query:
-        if query in ['m', 'f']:
-            jugadores = [j for j in jugadores if j.genero.lower() == query]
-        else:
-            jugadores = [
-                j for j in jugadores if
-                query in j.rut.lower() or
-                query in limpiar_texto_estricto(j.nombre).lower() or
-                query in limpiar_texto_estricto(j.apellido).lower() or
-                query in str(j.fecha_nacimiento) or
-                query in j.calcular_categoria().lower() or
-                (j.club and query in limpiar_texto_estricto(j.club.nombre).lower()) or (j.email and query in limpiar_email_estricto(j.email).lower())
-            ]
+    # Informar los jugadores agregados por importaciones terminadas
+    importaciones = TrabajoImportacion.objects.filter(
+        torneo=torneo, organizador=request.user, tipo='participantes',
+        estado='completado', aplicado=False,
+    )
+    for trabajo in importaciones:
+        if trabajo.ruts_aceptados:
+            messages.success(request, f"Se agregaron {len(trabajo.ruts_aceptados)} jugador(es) a la lista de participantes.")
+        trabajo.aplicado = True
+        trabajo.save(update_fields=['aplicado', 'fecha_actualizacion'])
 
     if request.method == "POST" and "agregar" in request.POST:
-        seleccionados_ruts = request.POST.getlist("jugadores")
-        participantes_temp.update(seleccionados_ruts)
-        request.session[session_key] = list(participantes_temp)
-        request.session.modified = True
+        agregar_seleccion_temporal(torneo, request.user, request.POST.getlist("jugadores"))
         return HttpResponseRedirect(request.path_info)
     
     if request.method == "POST" and request.FILES.get("archivo_participantes"):
-        archivo = request.FILES["archivo_participantes"]
-        try:
-            df = pd.read_excel(archivo)
-            df.columns = [col.strip().lower() for col in df.columns]
-            errores = []
-            ruts_en_archivo = set()
-            jugadores_agregados = 0
-            
-            participantes_confirmados_ruts = set(
-                Jugador.objects.filter(
-                    id__in=torneo.participaciones.values_list('jugador_id', flat=True)
-                ).values_list('rut', flat=True)
-            )
-            participantes_temp_ruts = participantes_temp.copy()
-            
-            for i, row in df.iterrows():
-                rut = normalizar_rut(row.get('rut', ''))
-                
-                if not rut:
-                    errores.append(f"Fila {i+2}: RUT vacío")
-                    continue
-                    
-                if not rut_valido(rut):
-                    errores.append(f"Fila {i+2:}: RUT inválido ({rut})")
-                    continue
-                    
-                if rut in ruts_en_archivo:
-                    errores.append(f"Fila {i+2}: RUT duplicado en el archivo ({rut})")
-                    continue
-
-                try:
-                    jugador = Jugador.objects.get(rut=rut)
-                except Jugador.DoesNotExist:
-                    errores.append(f"Fila {i+2}: Jugador con RUT {rut} no existe en la base de datos")
-                    continue
-                
-                if rut in participantes_confirmados_ruts:
-                    errores.append(f"Fila {i+2}: Jugador con RUT {rut} ya está confirmado en el torneo")
-                    continue
-                
-                if rut in participantes_temp_ruts:
-                    errores.append(f"Fila {i+2}: Jugador con RUT {rut} ya está seleccionado para agregar")
-                    continue
-                
-                if not torneo.todo_competidor and torneo.categoria:
-                    if jugador.calcular_categoria() != torneo.categoria.nombre:
-                        errores.append(f"Fila {i+2}: Jugador {jugador.nombre} {jugador.apellido} (RUT: {rut}) no pertenece a la categoría {torneo.categoria.nombre}")
-                        continue
-                
-                participantes_temp.add(rut)
-                participantes_temp_ruts.add(rut)
-                ruts_en_archivo.add(rut)
-                jugadores_agregados += 1
-            
-            request.session[session_key] = list(participantes_temp)
-            request.session.modified = True            
-            if errores:
-                for error in errores:
-                    messages.error(request, error)
-            
-            if jugadores_agregados > 0:
-                messages.success(request, f"Se agregaron {jugadores_agregados} jugador(es) a la lista de participantes.")
-            
-            return HttpResponseRedirect(request.path_info)
-            
-        except Exception as e:
-            messages.error(request, f"Error al procesar el archivo: {str(e)}")
+        form_importar = ImportarParticipantesForm(request.POST, request.FILES)
+        if not form_importar.is_valid():
+            for error in form_importar.errors.get('archivo_participantes', []):
+                messages.error(request, error)
             return HttpResponseRedirect(request.path_info)
+        archivo = form_importar.cleaned_data["archivo_participantes"]
+        # El worker agrega los jugadores aceptados directamente a la selección temporal
+        trabajo = crear_trabajo('participantes', archivo, request.user, torneo=torneo)
+
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'trabajo_id': trabajo.id,
+                'estado_url': reverse('estado_importacion', args=[trabajo.id]),
+            })
+        messages.info(request, "El archivo se está importando. Los jugadores aceptados se agregarán a la selección al terminar.")
+        return redirect('estado_importacion', trabajo_id=trabajo.id)
     
     if request.method == "POST" and "quitar" in request.POST:
-        quitar_rut = request.POST.get("quitar")
-        participantes_temp.discard(quitar_rut)
-        seleccionados_visuales.discard(quitar_rut)
-        request.session[session_key] = list(participantes_temp)
-        request.session.modified = True
+        quitar_seleccion_temporal(torneo, request.user, [request.POST.get("quitar")])
         return HttpResponseRedirect(request.path_info)
 
     if request.method == "POST" and "confirmar" in request.POST:
-        for rut in participantes_temp:
-            try:
-                jugador = Jugador.objects.get(rut=rut)
-                Participacion.objects.get_or_create(torneo=torneo, jugador=jugador)
-            except Jugador.DoesNotExist:
-                messages.error(request, f"Jugador con RUT {rut} no encontrado. Se ha omitido.")
-        request.session[session_key] = []
-        request.session.modified = True
+        confirmar_seleccion_temporal(torneo, request.user)
         messages.success(request, "Participantes confirmados correctamente.")
         return redirect('listado_participantes', torneo_id=torneo.id)
 
-    jugadores_seleccionados = Jugador.objects.filter(rut__in=participantes_temp)
+    seleccionados_visuales = set()
+    if request.method == "GET" and 'selected' in request.GET:
+        seleccionados_visuales = set(request.GET.getlist('selected'))
+
+    candidatos = Jugador.objects.exclude(
+        id__in=torneo.participaciones.values('jugador_id')
+    ).exclude(id__in=seleccion.values('jugador_id')).select_related('club')
+
+    if torneo.todo_competidor:
+        jugadores = candidatos
+    elif torneo.categoria:
+        # La categoría se traduce a rangos de fecha_nacimiento y se filtra en la base de datos
+        jugadores = candidatos.filter(Categoria.filtro_fecha_nacimiento(torneo.categoria.nombre))
+    else:
+        jugadores = Jugador.objects.none()
+
+    if query_raw:
+        jugadores = buscar_jugadores(jugadores, query_raw)
+    jugadores, url_siguiente, url_primera = paginar_jugadores(request, jugadores)
+
+    jugadores_seleccionados = [s.jugador for s in seleccion.select_related('jugador__club')]
 
     return render(request, "ingresar_participantes.html", {
         "torneo": torneo,
@@ -547,9 +580,63 @@ def ingresar_participantes(request, torneo_id):
         "jugadores_seleccionados": jugadores_seleccionados,
         "seleccionados_ids": seleccionados_visuales, 
         "query": query_raw,
+        "url_siguiente": url_siguiente,
+        "url_primera": url_primera,
         "form_importar": ImportarParticipantesForm(),
     })
 
+@require_organizador
+@require_POST
+def agregar_participante_temporal(request, torneo_id):
+    """
+    Vista AJAX que agrega jugadores a la selección temporal sin recargar la página.
+    
+    Acepta un cuerpo JSON ``{"ruts": [...]}`` o el campo de formulario ``jugadores``.
+    
+    Args:
+        request (HttpRequest): Objeto de petición HTTP
+        torneo_id (int): ID del torneo
+        
+    Returns:
+        JsonResponse: Cantidad agregada y total de la selección
+    """
+    torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
+    if torneo.inscripciones_cerradas:
+        return JsonResponse({'error': 'Las inscripciones están cerradas.'}, status=400)
+
+    if request.content_type == 'application/json':
+        try:
+            ruts = json.loads(request.body).get('ruts', [])
+        except (json.JSONDecodeError, AttributeError):
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+    else:
+        ruts = request.POST.getlist('jugadores')
+
+    agregados = agregar_seleccion_temporal(torneo, request.user, ruts)
+    total = ParticipanteTemporal.objects.filter(torneo=torneo, organizador=request.user).count()
+    return JsonResponse({'agregados': agregados, 'total': total})
+
+@require_organizador
+@require_POST
+def quitar_participante_temporal(request, torneo_id):
+    """
+    Vista AJAX que quita un jugador de la selección temporal.
+    
+    Args:
+        request (HttpRequest): Objeto de petición HTTP con el campo ``rut``
+        torneo_id (int): ID del torneo
+        
+    Returns:
+        JsonResponse: Cantidad quitada y total de la selección
+    """
+    torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
+    if torneo.inscripciones_cerradas:
+        return JsonResponse({'error': 'Las inscripciones están cerradas.'}, status=400)
+
+    quitados = quitar_seleccion_temporal(torneo, request.user, [request.POST.get('rut', '')])
+    total = ParticipanteTemporal.objects.filter(torneo=torneo, organizador=request.user).count()
+    return JsonResponse({'quitados': quitados, 'total': total})
+
 @require_organizador
 def listado_participantes(request, torneo_id):
     torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
@@ -613,6 +700,7 @@ def configurar_sets_llaves(request, torneo_id):
             torneo.modalidad = 'llaves'
             torneo.torneo_iniciado = True
             torneo.save()
+            torneo.sincronizar_sets_llaves()
             
             messages.success(request, f"¡Torneo configurado! Mejor de {torneo.mejor_de_sets} sets (normal) y {torneo.mejor_de_sets_final} sets (final).")
             return redirect('organizar_llaves', torneo_id=torneo.id)
@@ -1320,6 +1408,8 @@ def organizar_llaves(request, torneo_id):
             # Limpiar todas las llaves existentes
             torneo.llaves.all().delete()
             torneo.byes.all().delete()
+            torneo.total_rondas = 0
+            torneo.save(update_fields=['total_rondas'])
             messages.info(request, "Las llaves han sido eliminadas. Puedes asignar nuevamente.")
             return redirect('organizar_llaves', torneo_id=torneo.id)
         
@@ -1474,19 +1564,24 @@ def definir_llaves(request, torneo_id):
             'es_bye2': False   # Cambio: usar 'es_bye2' en lugar de 'bye2'
         })
     
+    # Los selects de cada posición solo incluyen la participación ya asignada;
+    # el resto de opciones se cargan bajo demanda desde participantes_llaves_ajax
+    participacion_por_jugador = {p.jugador_id: p for p in participantes}
+    
     try:
         # Lógica para cargar llaves existentes si las hay
-        llaves_existentes = torneo.llaves.filter(ronda=1).order_by('posicion')
-        if llaves_existentes.exists():
-            for llave in llaves_existentes:
-                if llave.posicion <= len(enfrentamientos):
-                    enfrentamientos[llave.posicion - 1] = {
-                        'numero': llave.posicion,  # Cambio: usar 'numero'
-                        'jugador1': llave.jugador1,
-                        'jugador2': llave.jugador2,
-                        'es_bye1': bool(llave.bye1),  # Cambio: usar 'es_bye1' y convertir a bool
-                        'es_bye2': bool(llave.bye2)   # Cambio: usar 'es_bye2' y convertir a bool
-                    }
+        llaves_existentes = torneo.llaves.filter(ronda=1).select_related('jugador1', 'jugador2').order_by('posicion')
+        for llave in llaves_existentes:
+            if llave.posicion <= len(enfrentamientos):
+                enfrentamientos[llave.posicion - 1] = {
+                    'numero': llave.posicion,  # Cambio: usar 'numero'
+                    'jugador1': llave.jugador1,
+                    'jugador2': llave.jugador2,
+                    'participacion1': participacion_por_jugador.get(llave.jugador1_id),
+                    'participacion2': participacion_por_jugador.get(llave.jugador2_id),
+                    'es_bye1': bool(llave.bye1_id),  # Cambio: usar 'es_bye1' y convertir a bool
+                    'es_bye2': bool(llave.bye2_id)   # Cambio: usar 'es_bye2' y convertir a bool
+                }
     except Exception as e:
         # Si hay un problema con la tabla, simplemente continuar sin cargar llaves existentes
         print(f"Error al cargar llaves existentes: {e}")
@@ -1496,10 +1591,7 @@ def definir_llaves(request, torneo_id):
         if 'guardar_asignacion' in request.POST:
             import random  # Import aquí para uso en esta función
             try:
-                # Limpiar asignaciones previas de la primera ronda
-                torneo.llaves.filter(ronda=1).delete()
-                torneo.byes.all().delete()
-                
+                # Las llaves y BYEs previos se reemplazan al materializar el bracket
                 # Recopilar jugadores ya asignados
                 jugadores_asignados = set()
                 asignaciones_manuales = {}
@@ -1534,9 +1626,13 @@ def definir_llaves(request, torneo_id):
                         jugadores_asignados.add(int(jugador2_id))
                         print(f"   ✅ Jugador 2 asignado manualmente")
                 
+                # Resolver todas las participaciones elegidas manualmente con una sola consulta
+                participaciones_elegidas = {
+                    p.id: p for p in torneo.participaciones.filter(id__in=jugadores_asignados).select_related('jugador')
+                }
+                
                 # Obtener jugadores disponibles para asignación automática
-                todas_participaciones = list(torneo.participaciones.all())
-                participaciones_disponibles = [p for p in todas_participaciones if p.id not in jugadores_asignados]
+                participaciones_disponibles = [p for p in participantes if p.id not in jugadores_asignados]
                 
                 # Mezclar para asignación aleatoria
                 import random
@@ -1640,96 +1736,35 @@ def definir_llaves(request, torneo_id):
                     
                     elementos_index += 1
                 
-                # Guardar nuevas asignaciones con la nueva estrategia
-                byes_creados = 0
-                
+                # Armar la primera ronda en memoria (manual o automático por posición)
+                primera_ronda = []
                 for i in range(num_enfrentamientos):
                     posicion = i + 1
                     asignacion = asignaciones_manuales[posicion]
+                    enfrentamiento_llave = enfrentamiento_vacio(posicion)
                     
-                    # Preparar objetos para la llave
-                    jugador1_obj = None
-                    jugador2_obj = None
-                    bye1_obj = None
-                    bye2_obj = None
-                    
-                    # Procesar jugador 1 (manual o automático)
-                    if asignacion['jugador1_id']:
-                        # Asignación manual
-                        try:
-                            participacion = torneo.participaciones.get(id=asignacion['jugador1_id'])
-                            jugador1_obj = participacion.jugador
-                        except:
-                            pass
-                    elif asignacion['es_bye1']:
-                        # BYE manual
-                        byes_creados += 1
-                        bye1_obj = JugadorBye.objects.create(
-                            nombre="BYE",
-                            posicion_bye=byes_creados,
-                            torneo=torneo
-                        )
-                    else:
-                        # Asignación automática para posición vacía
-                        if posicion in asignaciones_automaticas and 1 in asignaciones_automaticas[posicion]:
-                            auto_data = asignaciones_automaticas[posicion][1]
-                            
+                    for lado in (1, 2):
+                        jugador_id = asignacion[f'jugador{lado}_id']
+                        if jugador_id:
+                            # Asignación manual
+                            participacion = participaciones_elegidas.get(int(jugador_id))
+                            if participacion:
+                                enfrentamiento_llave[f'jugador{lado}'] = participacion.jugador
+                        elif asignacion[f'es_bye{lado}']:
+                            # BYE manual
+                            enfrentamiento_llave[f'bye{lado}'] = True
+                        elif lado in asignaciones_automaticas.get(posicion, {}):
+                            # Asignación automática para posición vacía
+                            auto_data = asignaciones_automaticas[posicion][lado]
                             if auto_data['tipo'] == 'jugador':
-                                jugador1_obj = auto_data['elemento'].jugador
+                                enfrentamiento_llave[f'jugador{lado}'] = auto_data['elemento'].jugador
                             elif auto_data['tipo'] == 'bye':
-                                byes_creados += 1
-                                bye1_obj = JugadorBye.objects.create(
-                                    nombre="BYE",
-                                    posicion_bye=byes_creados,
-                                    torneo=torneo
-                                )
+                                enfrentamiento_llave[f'bye{lado}'] = True
                     
-                    # Procesar jugador 2 (manual o automático)
-                    if asignacion['jugador2_id']:
-                        # Asignación manual
-                        try:
-                            participacion = torneo.participaciones.get(id=asignacion['jugador2_id'])
-                            jugador2_obj = participacion.jugador
-                        except:
-                            pass
-                    elif asignacion['es_bye2']:
-                        # BYE manual
-                        byes_creados += 1
-                        bye2_obj = JugadorBye.objects.create(
-                            nombre="BYE",
-                            posicion_bye=byes_creados,
-                            torneo=torneo
-                        )
-                    else:
-                        # Asignación automática para posición vacía
-                        if posicion in asignaciones_automaticas and 2 in asignaciones_automaticas[posicion]:
-                            auto_data = asignaciones_automaticas[posicion][2]
-                            
-                            if auto_data['tipo'] == 'jugador':
-                                jugador2_obj = auto_data['elemento'].jugador
-                            elif auto_data['tipo'] == 'bye':
-                                byes_creados += 1
-                                bye2_obj = JugadorBye.objects.create(
-                                    nombre="BYE",
-                                    posicion_bye=byes_creados,
-                                    torneo=torneo
-                                )
-                    
-                    # Crear la llave (siempre crear, aunque esté vacía)
-                    llave = LlaveTorneo.objects.create(
-                        torneo=torneo,
-                        ronda=1,
-                        posicion=posicion,
-                        jugador1=jugador1_obj,
-                        jugador2=jugador2_obj,
-                        bye1=bye1_obj,
-                        bye2=bye2_obj
-                    )
-                    
-                    print(f"✅ Llave {posicion} creada: {llave.jugador1_nombre} vs {llave.jugador2_nombre}")
-            
-                # Crear todas las rondas siguientes (vacías) para completar el bracket
-                total_rondas = crear_bracket_completo(torneo, len(participantes))
+                    primera_ronda.append(enfrentamiento_llave)
+                
+                # Persistir BYEs y todas las rondas del bracket en una sola transacción
+                total_rondas = materializar_bracket(torneo, primera_ronda, potencia_2_siguiente)
                 
                 messages.success(request, f"Las llaves han sido definidas correctamente. Se crearon {total_rondas} rondas en total. Los espacios vacíos fueron completados automáticamente.")
                 return redirect('organizar_llaves', torneo_id=torneo.id)
@@ -1751,6 +1786,47 @@ def definir_llaves(request, torneo_id):
     
     return render(request, 'definir_llaves.html', context)
 
+@require_organizador
+def participantes_llaves_ajax(request, torneo_id):
+    """
+    Vista AJAX de autocompletado para las posiciones de ``definir_llaves``.
+    
+    Devuelve los participantes del torneo que coinciden con la búsqueda,
+    excluyendo en el servidor los que ya están ubicados en otras posiciones.
+    
+    Parámetros GET:
+        q: Texto a buscar (nombre, apellido, RUT, club...)
+        excluir: IDs de participación ya asignados, separados por comas
+        limite: Cantidad máxima de resultados (por defecto 20, máximo 100)
+    
+    Args:
+        request (HttpRequest): Objeto de petición HTTP
+        torneo_id (int): ID del torneo
+        
+    Returns:
+        JsonResponse: Lista de participantes con id, nombre y categoría
+    """
+    torneo = get_object_or_404(Torneo, id=torneo_id, organizador=request.user)
+    query = request.GET.get('q', '').strip()
+    excluir = [int(valor) for valor in request.GET.get('excluir', '').split(',') if valor.strip().isdigit()]
+    limite = request.GET.get('limite', '')
+    limite = min(int(limite), 100) if limite.isdigit() and int(limite) > 0 else 20
+
+    participaciones = torneo.participaciones.exclude(id__in=excluir).select_related('jugador')
+    if query:
+        participaciones = participaciones.filter(jugador__in=buscar_jugadores(Jugador.objects.all(), query))
+    participaciones = participaciones.order_by('jugador__apellido_busqueda', 'jugador__nombre_busqueda', 'id')
+
+    resultados = [
+        {
+            'id': p.id,
+            'nombre': f"{p.jugador.nombre} {p.jugador.apellido}",
+            'categoria': p.jugador.calcular_categoria(),
+        }
+        for p in participaciones[:limite]
+    ]
+    return JsonResponse({'resultados': resultados})
+
 @login_required
 def vista_previa_asignacion(request, torneo_id):
     """
@@ -2143,150 +2219,18 @@ def vista_previa_asignacion_pagina(request, torneo_id):
     """Vista para la página de vista previa de asignación"""
     return vista_previa_asignacion(request, torneo_id)
 
-def crear_bracket_completo(torneo, num_participantes):
-    """Crear todas las rondas del bracket con jugadores vacíos en las rondas superiores"""
-    import math
-    
-    # Calcular la potencia de 2 más cercana para obtener el tamaño real del bracket
-    potencia_2_siguiente = 2 ** math.ceil(math.log2(max(num_participantes, 2)))
-    
-    # Calcular número total de rondas necesarias basado en la potencia de 2
-    total_rondas = math.ceil(math.log2(potencia_2_siguiente))
-    
-    print(f"📊 Creando bracket completo:")
-    print(f"   - Participantes: {num_participantes}")
-    print(f"   - Tamaño bracket: {potencia_2_siguiente}")
-    print(f"   - Rondas totales: {total_rondas}")
-    
-    # Ya tenemos la ronda 1 creada, ahora crear las rondas 2, 3, etc.
-    for ronda in range(2, total_rondas + 1):
-        # Calcular cuántos enfrentamientos hay en esta ronda
-        # En cada ronda, el número de enfrentamientos se divide por 2
-        enfrentamientos_en_ronda = potencia_2_siguiente // (2 ** ronda)
-        
-        print(f"   - Ronda {ronda}: {enfrentamientos_en_ronda} enfrentamientos")
-        
-        # Crear las llaves vacías para esta ronda
-        for posicion in range(1, enfrentamientos_en_ronda + 1):
-            llave = LlaveTorneo.objects.create(
-                torneo=torneo,
-                ronda=ronda,
-                posicion=posicion,
-                jugador1=None,  # Se llenará cuando se definan los ganadores
-                jugador2=None,  # Se llenará cuando se definan los ganadores
-                bye1=None,
-                bye2=None
-            )
-            print(f"     ✅ Llave creada: Ronda {ronda}, Posición {posicion}")
-    
-    return total_rondas
-
 def asignar_llaves_automatico(request, torneo, participantes, potencia_2_siguiente, byes_necesarias):
     """
     Asigna automáticamente los jugadores y BYEs a las llaves del torneo
     Garantiza que los BYEs no se enfrenten entre sí
     """
-    import random
-    
     try:
-        # Limpiar asignaciones previas
-        torneo.llaves.filter(ronda=1).delete()
-        torneo.byes.all().delete()
-        
-        # Crear una lista mezclada de participantes
-        jugadores_mezclados = [p.jugador for p in participantes]
-        random.shuffle(jugadores_mezclados)
-        
-        # Crear BYEs necesarios
-        byes_objetos = []
-        for i in range(byes_necesarias):
-            bye_obj = JugadorBye.objects.create(
-                nombre="BYE",
-                posicion_bye=i + 1,
-                torneo=torneo
-            )
-            byes_objetos.append(bye_obj)
-        
-        # Calcular número de enfrentamientos en la primera ronda
-        num_enfrentamientos = potencia_2_siguiente // 2
-        
-        # ESTRATEGIA MEJORADA: Distribuir BYEs aleatoriamente evitando enfrentamientos BYE vs BYE
-        enfrentamientos = []
-        
-        # Crear estructura de enfrentamientos vacía
-        for i in range(num_enfrentamientos):
-            enfrentamientos.append({
-                'posicion': i + 1,
-                'jugador1': None,
-                'jugador2': None,
-                'bye1': None,
-                'bye2': None
-            })
-        
-        # Crear lista de todas las posiciones disponibles para BYEs
-        posiciones_disponibles = []
-        for i in range(num_enfrentamientos):
-            posiciones_disponibles.append((i, 1))  # (enfrentamiento_index, posicion_en_enfrentamiento)
-            posiciones_disponibles.append((i, 2))
-        
-        # Mezclar posiciones para distribución aleatoria
-        random.shuffle(posiciones_disponibles)
-        
-        # Asignar BYEs de forma que no haya BYE vs BYE
-        byes_asignados = 0
-        enfrentamientos_con_bye = set()
-        
-        for enfrentamiento_idx, posicion_en_enfrentamiento in posiciones_disponibles:
-            if byes_asignados >= len(byes_objetos):
-                break
-                
-            # Solo asignar BYE si este enfrentamiento no tiene ya un BYE
-            if enfrentamiento_idx not in enfrentamientos_con_bye:
-                if posicion_en_enfrentamiento == 1:
-                    enfrentamientos[enfrentamiento_idx]['bye1'] = byes_objetos[byes_asignados]
-                else:
-                    enfrentamientos[enfrentamiento_idx]['bye2'] = byes_objetos[byes_asignados]
-                
-                enfrentamientos_con_bye.add(enfrentamiento_idx)
-                byes_asignados += 1
-        
-        # Asignar jugadores a las posiciones restantes
-        jugador_index = 0
-        for enfrentamiento in enfrentamientos:
-            # Asignar jugador1 si no hay BYE1
-            if enfrentamiento['bye1'] is None and jugador_index < len(jugadores_mezclados):
-                enfrentamiento['jugador1'] = jugadores_mezclados[jugador_index]
-                jugador_index += 1
-            
-            # Asignar jugador2 si no hay BYE2
-            if enfrentamiento['bye2'] is None and jugador_index < len(jugadores_mezclados):
-                enfrentamiento['jugador2'] = jugadores_mezclados[jugador_index]
-                jugador_index += 1
-        # Crear las llaves en la base de datos
-        for enfrentamiento in enfrentamientos:
-            # Validación adicional: Verificar que no hay BYE vs BYE
-            if enfrentamiento['bye1'] and enfrentamiento['bye2']:
-                # Si ocurre esto (no debería), mover un BYE a otro enfrentamiento
-                for otro_enfrentamiento in enfrentamientos:
-                    if otro_enfrentamiento != enfrentamiento and not otro_enfrentamiento['bye1'] and not otro_enfrentamiento['bye2']:
-                        # Mover BYE2 a este enfrentamiento vacío
-                        otro_enfrentamiento['bye1'] = enfrentamiento['bye2']
-                        enfrentamiento['bye2'] = None
-                        break
-            
-            LlaveTorneo.objects.create(
-                torneo=torneo,
-                ronda=1,
-                posicion=enfrentamiento['posicion'],
-                jugador1=enfrentamiento['jugador1'],
-                jugador2=enfrentamiento['jugador2'],
-                bye1=enfrentamiento['bye1'],
-                bye2=enfrentamiento['bye2'],
-                estado_partido='pendiente'
-            )
-        
-        # Crear todas las rondas siguientes (vacías) para completar el bracket
-        total_rondas = crear_bracket_completo(torneo, len(participantes))
+        # Calcular todo el bracket en memoria y persistirlo con inserciones masivas
+        primera_ronda = construir_primera_ronda(
+            [p.jugador for p in participantes], potencia_2_siguiente, byes_necesarias
+        )
+        total_rondas = materializar_bracket(torneo, primera_ronda, potencia_2_siguiente)
+        num_enfrentamientos = len(primera_ronda)
         
         messages.success(request, f"¡Asignación automática completada! Se han creado {num_enfrentamientos} enfrentamientos en la primera ronda y {total_rondas} rondas totales con {byes_necesarias} BYEs distribuidos aleatoriamente (sin enfrentamientos BYE vs BYE).")
         return redirect('organizar_llaves', torneo_id=torneo.id)
@@ -2514,12 +2458,7 @@ def iniciar_partidos(request, torneo_id):
 
     # Calcular el total de rondas teóricas basado en el número de participantes
     # Para una llave de 8 participantes: 3 rondas (4->2->1)
-    import math
-    total_participantes = torneo.llaves.filter(ronda=1).count() * 2  # Cada llave de primera ronda tiene 2 participantes
-    if total_participantes > 0:
-        total_rondas = int(math.log2(total_participantes))
-    else:
-        total_rondas = torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
+    total_rondas = torneo.total_rondas or 1
 
     # Asegurarse de que todas las rondas estén representadas, aunque estén vacías
     for r in range(1, total_rondas + 1):
@@ -2587,6 +2526,7 @@ def iniciar_partidos(request, torneo_id):
     
     return render(request, 'enfrentamientos.html', context)
 
+
 @require_organizador
 def cerrar_partido_organizador(request, torneo_id, partido_id):
     """Vista para que el organizador cierre un partido manualmente"""
@@ -2656,6 +2596,12 @@ def registrar_resultado(request, torneo_id, partido_id):
         messages.error(request, "Solo se pueden registrar resultados de partidos en curso.")
         return redirect('iniciar_partidos', torneo_id=torneo.id)
     
+    # Escribir los puntos del marcador en vivo; al registrar a mano se suelta el marcador
+    if request.method == 'POST':
+        descartar_marcador(partido.id)
+    else:
+        persistir_marcador(partido.id)
+    
     # Obtener el resultado del partido
     try:
         resultado = partido.resultado_detallado
@@ -2665,13 +2611,8 @@ def registrar_resultado(request, torneo_id, partido_id):
     
     if request.method == 'POST':
         try:
-            # Determinar si es un partido final
-            total_rondas = torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-            es_partido_final = partido.llave_torneo.ronda == total_rondas
-            
-            # Obtener los puntos de cada set usando la modalidad correcta
-            mejor_de_sets = torneo.mejor_de_sets_final if es_partido_final else torneo.mejor_de_sets
-            sets_para_ganar = (mejor_de_sets // 2) + 1
+            # Obtener los puntos de cada set usando la modalidad correcta (final o normal)
+            es_partido_final, mejor_de_sets, sets_para_ganar = partido.llave_torneo.modalidad_sets()
             
             # Verificar qué sets ya están guardados antes de procesar
             sets_guardados = resultado.obtener_sets_guardados()
@@ -2929,6 +2870,7 @@ def registrar_resultado(request, torneo_id, partido_id):
                 if partido.pendiente_confirmacion:
                     cerrado_final, mensaje_final = partido.confirmar_y_cerrar_partido()
                     if cerrado_final:
+                        programar_compactacion(partido.id)
                         messages.success(request, f"¡Partido cerrado exitosamente! {mensaje_final}")
                     else:
                         messages.success(request, f"¡{mensaje}!")
@@ -2938,9 +2880,9 @@ def registrar_resultado(request, torneo_id, partido_id):
                 # **AGREGADO**: Sincronizar inmediatamente ganador entre partido y llave
                 sincronizar_ganador_partido_llave(partido)
 
-                # Si el torneo es de llaves, intentar avanzar ganadores automáticamente
+                # Si el torneo es de llaves, informar si el partido cerró el cuadro
                 if torneo.modalidad == 'llaves':
-                    avanzado, mensaje_avance = avanzar_ganadores_automaticamente(torneo)
+                    avanzado, mensaje_avance = resumen_avance_partido(partido)
                     if avanzado:
                         messages.info(request, mensaje_avance)
                 
@@ -2978,9 +2920,7 @@ def registrar_resultado(request, torneo_id, partido_id):
             messages.error(request, "Por favor ingresa números válidos para los puntos.")
             # Mantener en la misma página para mostrar el error
             # Determinar modalidad correcta para mostrar el error
-            total_rondas = torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-            es_partido_final = partido.llave_torneo.ronda == total_rondas
-            mejor_de_sets_error = torneo.mejor_de_sets_final if es_partido_final else torneo.mejor_de_sets
+            es_partido_final, mejor_de_sets_error, _ = partido.llave_torneo.modalidad_sets()
             
             sets = list(range(1, mejor_de_sets_error + 1))
             sets_values = {}
@@ -3003,9 +2943,7 @@ def registrar_resultado(request, torneo_id, partido_id):
             messages.error(request, f"Error al guardar el resultado: {str(e)}")
             # Mantener en la misma página para mostrar el error
             # Determinar modalidad correcta para mostrar el error
-            total_rondas = torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-            es_partido_final = partido.llave_torneo.ronda == total_rondas
-            mejor_de_sets_error = torneo.mejor_de_sets_final if es_partido_final else torneo.mejor_de_sets
+            es_partido_final, mejor_de_sets_error, _ = partido.llave_torneo.modalidad_sets()
             
             sets = list(range(1, mejor_de_sets_error + 1))
             sets_values = {}
@@ -3025,13 +2963,8 @@ def registrar_resultado(request, torneo_id, partido_id):
             }
             return render(request, 'registrar_resultado.html', context)
     
-    # Determinar si es un partido final para mostrar la modalidad correcta
-    total_rondas = torneo.llaves.aggregate(max_ronda=models.Max('ronda'))['max_ronda'] or 1
-    es_partido_final = partido.llave_torneo.ronda == total_rondas
-    
     # Usar la modalidad correcta según si es final o no
-    mejor_de_sets = torneo.mejor_de_sets_final if es_partido_final else torneo.mejor_de_sets
-    sets_para_ganar = (mejor_de_sets // 2) + 1
+    es_partido_final, mejor_de_sets, sets_para_ganar = partido.llave_torneo.modalidad_sets()
     sets = list(range(1, mejor_de_sets + 1))  # Lista dinámica de sets [1, 2, 3, ..., mejor_de_sets]
     
     # Crear diccionario con valores de sets para facilitar acceso en template
@@ -3054,247 +2987,28 @@ def registrar_resultado(request, torneo_id, partido_id):
     
     return render(request, 'registrar_resultado.html', context)
 
-def crear_partido_tercer_lugar(torneo, llaves_semifinales):
-    """
-    Crea automáticamente una llave y partido de tercer lugar después de completar las semifinales.
+def resumen_avance_partido(partido):
     """
-    try:
-        if llaves_semifinales.count() != 2:
-            return False, "Se requieren exactamente 2 semifinales"
-        
-        # Verificar si ya existe
-        if LlaveTorneo.objects.filter(torneo=torneo, tipo_llave='tercer_lugar').exists():
-            return True, "Llave de tercer lugar ya existe"
-        
-        # Obtener perdedores
-        perdedores = []
-        for semifinal in llaves_semifinales:
-            if semifinal.ganador:
-                if semifinal.jugador1 == semifinal.ganador:
-                    perdedor = semifinal.jugador2
-                elif semifinal.jugador2 == semifinal.ganador:
-                    perdedor = semifinal.jugador1
-                
-                if perdedor:
-                    perdedores.append(perdedor)
-        
-        if len(perdedores) != 2:
-            return False, f"Se necesitan 2 perdedores, se encontraron {len(perdedores)}"
-        
-        # Calcular la siguiente posición disponible
-        ronda_semifinales = llaves_semifinales.first().ronda
-        ultima_posicion = LlaveTorneo.objects.filter(
-            torneo=torneo, 
-            tipo_llave='normal'
-        ).aggregate(models.Max('posicion'))['posicion__max'] or 0
-        
-        # Crear llave de tercer lugar
-        llave_tercer_lugar = LlaveTorneo.objects.create(
-            torneo=torneo,
-            ronda=ronda_semifinales,
-            posicion=ultima_posicion + 1,
-            tipo_llave='tercer_lugar',
-            jugador1=perdedores[0],
-            jugador2=perdedores[1],
-            estado_partido='en_curso'  # Cambiar a 'en_curso' para permitir registro de resultados
-        )
-        
-        # Crear partido
-        partido_tercer_lugar = Partido.objects.create(
-            torneo=torneo,
-            llave_torneo=llave_tercer_lugar,
-            jugador1=perdedores[0],
-            jugador2=perdedores[1],
-            estado_partido='en_curso',  # Cambiar a 'en_curso' para permitir registro de resultados
-            organizador=torneo.organizador
-        )
-        
-        # Crear resultado
-        Resultado.objects.create(partido=partido_tercer_lugar)
-        
-        return True, f"Partido de tercer lugar creado: {perdedores[0].nombre} vs {perdedores[1].nombre}"
-        
-    except Exception as e:
-        return False, f"Error al crear partido de tercer lugar: {str(e)}"
-
-def avanzar_ganadores_automaticamente(torneo):
-    """
-    Verifica si una ronda está completa y automáticamente avanza a los ganadores 
-    a la siguiente ronda para torneos de cualquier tamaño (2, 4, 8, 16, 32, 64, 128, etc.).
+    Informa el resultado del avance de un partido recién confirmado.
+    
+    El avance en sí lo hace ``Partido.confirmar_y_cerrar_partido`` sobre el
+    camino del partido (llave siguiente y tercer lugar), sin recorrer las demás
+    rondas del torneo; aquí solo se detecta si el partido era la final.
+    
+    Args:
+        partido (Partido): Partido cerrado
+    
+    Returns:
+        tuple: (bool, str) - (torneo finalizado, mensaje)
     """
+    llave = partido.llave_torneo
+    if not partido.ganador or not llave:
+        return False, "El partido no tiene ganador"
     
-    try:
-        # Obtener todas las rondas del torneo
-        total_rondas = LlaveTorneo.objects.filter(torneo=torneo).aggregate(
-            max_ronda=models.Max('ronda')
-        )['max_ronda']
-        
-        if not total_rondas:
-            return False, "No hay llaves en el torneo"
-        
-        # Revisar cada ronda de la primera hacia adelante
-        for ronda_actual in range(1, total_rondas + 1):
-            # Obtener todas las llaves de esta ronda
-            llaves_ronda = LlaveTorneo.objects.filter(
-                torneo=torneo, 
-                ronda=ronda_actual
-            ).order_by('posicion')
-            
-            if not llaves_ronda.exists():
-                continue
-            
-            # CORRECCION: Solo considerar llaves normales para determinar si la ronda está completa
-            # Las llaves de tercer lugar no deben bloquear el avance
-            llaves_normales_ronda = llaves_ronda.filter(tipo_llave='normal')
-            
-            # Verificar si todos los partidos NORMALES de esta ronda están completos
-            total_partidos = llaves_normales_ronda.count()
-            partidos_completados = llaves_normales_ronda.filter(ganador__isnull=False).count()
-            
-            print(f"📊 Ronda {ronda_actual}: {partidos_completados}/{total_partidos} partidos normales completados")
-            
-            # Si esta ronda no está completa, detenemos aquí
-            if partidos_completados < total_partidos:
-                return False, f"Ronda {ronda_actual} incompleta ({partidos_completados}/{total_partidos} partidos normales)"
-            
-            # Si es la penúltima ronda (semifinales), crear partido de tercer lugar
-            if ronda_actual == total_rondas - 1:
-                # Usar llaves normales para semifinales (ya filtradas arriba)
-                if llaves_normales_ronda.count() == 2:
-                    exito, mensaje = crear_partido_tercer_lugar(torneo, llaves_normales_ronda)
-                    if exito:
-                        print(f"🥉 {mensaje}")
-                    else:
-                        print(f"⚠️  Tercer lugar: {mensaje}")
-            
-            # Si es la última ronda y está completa, el torneo terminó
-            if ronda_actual == total_rondas:
-                ganador_final = llaves_normales_ronda.first().ganador
-                if ganador_final:
-                    return True, f"🏆 ¡Torneo finalizado! Campeón: {ganador_final.nombre} {ganador_final.apellido}"
-                else:
-                    return False, "Error: Última ronda completa pero sin ganador"
-            
-            # Verificar si existe la siguiente ronda
-            ronda_siguiente = ronda_actual + 1
-            llaves_siguiente_ronda = LlaveTorneo.objects.filter(
-                torneo=torneo, 
-                ronda=ronda_siguiente,
-                tipo_llave='normal'  # Solo considerar llaves normales para el avance
-            ).order_by('posicion')
-            
-            if not llaves_siguiente_ronda.exists():
-                return False, f"No existen llaves normales para la ronda {ronda_siguiente}"
-            
-            # Obtener todos los ganadores de la ronda actual ordenados por posición
-            ganadores = []
-            for llave in llaves_normales_ronda:  # Solo de llaves normales
-                if llave.ganador:
-                    ganadores.append(llave.ganador)
-                else:
-                    return False, f"Llave {llave.posicion} de ronda {ronda_actual} sin ganador"
-            
-            print(f"🏃 Ganadores de ronda {ronda_actual}: {[f'{g.nombre} {g.apellido}' for g in ganadores]}")
-            
-            # Avanzar ganadores a la siguiente ronda
-            with transaction.atomic():
-                ganadores_avanzados = 0
-                
-                # Cada par de ganadores va a una llave de la siguiente ronda
-                for i in range(0, len(ganadores), 2):
-                    if i // 2 < llaves_siguiente_ronda.count():
-                        llave_destino = llaves_siguiente_ronda[i // 2]
-                        
-                        # Limpiar la llave primero (en caso de avances previos incorrectos)
-                        actualizar_llave = False
-                        
-                        # Asignar primer ganador
-                        if i < len(ganadores):
-                            if llave_destino.jugador1 != ganadores[i]:
-                                llave_destino.jugador1 = ganadores[i]
-                                llave_destino.bye1 = None  # Limpiar BYE si hay
-                                actualizar_llave = True
-                                ganadores_avanzados += 1
-                                print(f"✅ {ganadores[i].nombre} avanza a ronda {ronda_siguiente}, posición {llave_destino.posicion} (jugador1)")
-                        
-                        # Asignar segundo ganador (si existe)
-                        if i + 1 < len(ganadores):
-                            if llave_destino.jugador2 != ganadores[i + 1]:
-                                llave_destino.jugador2 = ganadores[i + 1]
-                                llave_destino.bye2 = None  # Limpiar BYE si hay
-                                actualizar_llave = True
-                                ganadores_avanzados += 1
-                                print(f"✅ {ganadores[i + 1].nombre} avanza a ronda {ronda_siguiente}, posición {llave_destino.posicion} (jugador2)")
-                        elif i < len(ganadores):
-                            # Solo hay un ganador (número impar), el otro slot queda vacío por ahora
-                            # Esto se manejará en la siguiente iteración o queda como BYE
-                            pass
-                        
-                        # Guardar cambios en la llave
-                        if actualizar_llave:
-                            # Solo resetear estado si no hay partido asociado o si está pendiente
-                            partido_llave = Partido.objects.filter(llave_torneo=llave_destino).first()
-                            if not partido_llave or partido_llave.estado_partido == 'pendiente':
-                                llave_destino.estado_partido = 'pendiente'
-                            llave_destino.ganador = None  # Limpiar ganador de ronda anterior
-                            llave_destino.save()
-                
-                # Después de asignar TODOS los jugadores a las llaves, crear/actualizar los partidos
-                for llave_destino in llaves_siguiente_ronda:
-                    # Solo procesar llaves que tienen al menos un jugador asignado
-                    if llave_destino.jugador1 or llave_destino.jugador2:
-                        # Buscar si ya existe un partido para esta llave
-                        partido_existente = Partido.objects.filter(
-                            torneo=torneo, 
-                            llave_torneo=llave_destino
-                        ).first()
-                        
-                        if not partido_existente:
-                            # Crear nuevo partido con AMBOS jugadores
-                            nuevo_partido = Partido.objects.create(
-                                torneo=torneo,
-                                llave_torneo=llave_destino,
-                                jugador1=llave_destino.jugador1,
-                                jugador2=llave_destino.jugador2,
-                                bye1=llave_destino.bye1,
-                                bye2=llave_destino.bye2,
-                                estado_partido='pendiente',
-                                organizador=torneo.organizador
-                            )
-                            
-                            # Crear resultado automáticamente
-                            Resultado.objects.create(partido=nuevo_partido)
-                            print(f"🆕 Partido creado para ronda {ronda_siguiente}, posición {llave_destino.posicion} - J1: {nuevo_partido.jugador1}, J2: {nuevo_partido.jugador2}")
-                            
-                            # Si es un partido con BYE, procesarlo automáticamente
-                            if nuevo_partido.es_partido_bye():
-                                nuevo_partido.procesar_partido_bye()
-                                print(f"🤖 BYE procesado automáticamente en ronda {ronda_siguiente}")
-                        
-                        else:
-                            # Actualizar partido existente con AMBOS jugadores
-                            partido_existente.jugador1 = llave_destino.jugador1
-                            partido_existente.jugador2 = llave_destino.jugador2
-                            partido_existente.bye1 = llave_destino.bye1
-                            partido_existente.bye2 = llave_destino.bye2
-                            # Solo resetear estado si el partido no está finalizado
-                            if partido_existente.estado_partido not in ['jugado'] and not partido_existente.finalizado and not partido_existente.ganador:
-                                partido_existente.estado_partido = 'pendiente'
-                            partido_existente.save()
-                            print(f"🔄 Partido actualizado para ronda {ronda_siguiente}, posición {llave_destino.posicion} - J1: {partido_existente.jugador1}, J2: {partido_existente.jugador2}")
-                
-                if ganadores_avanzados > 0:
-                    print(f"🎯 {ganadores_avanzados} ganadores avanzados de ronda {ronda_actual} a ronda {ronda_siguiente}")
-                    # Continuar verificando la siguiente ronda
-                    continue
-                else:
-                    print(f"ℹ️  Ronda {ronda_actual} ya había sido procesada anteriormente")
-        
-        return True, "✅ Avance automático completado para todas las rondas disponibles"
-        
-    except Exception as e:
-        print(f"❌ Error en avance automático: {str(e)}")
-        return False, f"Error al avanzar ganadores: {str(e)}"
+    if llave.tipo_llave == 'normal' and not llave.llave_siguiente_id:
+        return True, f"🏆 ¡Torneo finalizado! Campeón: {partido.ganador.nombre} {partido.ganador.apellido}"
+    
+    return False, f"Ganador avanzado desde la ronda {llave.ronda}, posición {llave.posicion}"
 
 def sincronizar_ganador_partido_llave(partido):
     """
@@ -3393,11 +3107,13 @@ def confirmar_resultado_partido(request, torneo_id, partido_id):
     cerrado, mensaje = partido.confirmar_y_cerrar_partido()
     
     if cerrado:
+        # Empaquetar el registro punto a punto del partido ya finalizado
+        programar_compactacion(partido.id)
         messages.success(request, f"¡{mensaje}!")
         
-        # Si el torneo es de llaves, intentar avanzar ganadores automáticamente
+        # Si el torneo es de llaves, informar si el partido cerró el cuadro
         if torneo.modalidad == 'llaves':
-            avanzado, mensaje_avance = avanzar_ganadores_automaticamente(torneo)
+            avanzado, mensaje_avance = resumen_avance_partido(partido)
             if avanzado:
                 messages.info(request, mensaje_avance)
     else:
@@ -3436,6 +3152,34 @@ def verificar_estado_partido_ajax(request, torneo_id, partido_id):
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+@login_required
+def linea_tiempo_partido_ajax(request, torneo_id, partido_id):
+    """
+    Vista AJAX que devuelve la línea de tiempo punto a punto de un partido.
+    
+    Sirve tanto para partidos en juego (eventos en ``EventoPunto``) como para
+    partidos finalizados y compactados en ``LineaTiempoPartido``.
+    
+    Args:
+        request (HttpRequest): Objeto de petición HTTP
+        torneo_id (int): ID del torneo
+        partido_id (int): ID del partido
+        
+    Returns:
+        JsonResponse: Lista de eventos con el marcador del set tras cada uno
+    """
+    torneo = get_object_or_404(Torneo, id=torneo_id)
+    partido = get_object_or_404(Partido, id=partido_id, torneo=torneo)
+    
+    # Incluir los puntos que el marcador en vivo aún no escribe
+    persistir_marcador(partido.id)
+    
+    return JsonResponse({
+        'partido_id': partido.id,
+        'finalizado': partido.finalizado,
+        'eventos': linea_tiempo(partido.id),
+    })
     
 @login_required
 @require_organizador
@@ -3639,17 +3383,11 @@ def generar_clasificacion_final(torneo):
     """
     clasificacion = []
     
-    # 1. CAMPEÓN - Ganador de la final (ronda más alta)
-    ronda_maxima = LlaveTorneo.objects.filter(
-        torneo=torneo, 
-        tipo_llave='normal'
-    ).aggregate(models.Max('ronda'))['ronda__max']
-    
-    if ronda_maxima:
+    # 1. CAMPEÓN - Ganador de la final
+    if torneo.llave_final_id:
         partido_final = Partido.objects.filter(
             torneo=torneo,
-            llave_torneo__ronda=ronda_maxima,
-            llave_torneo__tipo_llave='normal',
+            llave_torneo_id=torneo.llave_final_id,
             estado_partido='jugado'
         ).first()
         
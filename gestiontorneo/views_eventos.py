@@ -0,0 +1,212 @@
+"""
+Flujos Server-Sent Events de los puntajes en vivo.
+
+Algunas redes de recintos y proxies de colegios cortan los WebSockets; los
+espectadores solo necesitan recibir, así que pueden usar estos flujos. Emiten
+los mismos mensajes que ``PartidoConsumer`` y ``TorneoConsumer`` a partir de
+los mismos grupos de la capa de canales: cada flujo abre su propio canal, se
+une a los grupos y reenvía lo que llega. Las vistas son asíncronas: bajo
+Daphne cada cliente es una corrutina esperando en ``receive``, no un hilo.
+
+El ``id`` de cada evento del flujo de un partido es la versión del marcador.
+Al reconectar, el navegador la devuelve en ``Last-Event-ID``: si sigue siendo
+la vigente no se repite el estado completo; si no, se envía ``partido_status``
+y los cuadros siguen desde ahí. El flujo del torneo vuelve a enviar
+``torneo_status`` en cada conexión, igual que el WebSocket del bracket.
+
+Sin eventos, un comentario cada ``SSE_INTERVALO_LATIDO`` segundos mantiene
+la conexión abierta a través de proxies.
+"""
+
+import asyncio
+import json
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from gestionarbitros.consumers import estado_partido
+from gestionarbitros.difusion import difusor
+from .consumers import partidos_torneo
+from .models import Partido, Torneo
+
+
+def evento_sse(tipo, datos, id_evento=None):
+    """
+    Da formato de Server-Sent Events a un mensaje.
+
+    Args:
+        tipo (str): Nombre del evento (el ``type`` del mensaje equivalente del WebSocket)
+        datos (dict): Mensaje, serializado como JSON en una sola línea
+        id_evento: ID del evento que el navegador devolverá en ``Last-Event-ID``
+
+    Returns:
+        str: Bloque del evento terminado en línea vacía
+    """
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f'id: {id_evento}')
+    lineas.append(f'event: {tipo}')
+    lineas.append(f'data: {json.dumps(datos)}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+def respuesta_sse(flujo):
+    """Respuesta HTTP en streaming para un generador asíncrono de eventos."""
+    respuesta = StreamingHttpResponse(flujo, content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule los eventos antes de enviarlos
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+class CanalEventos:
+    """
+    Canal propio de un flujo SSE en la capa de canales.
+
+    Attributes:
+        capa (BaseChannelLayer): Capa de canales del proceso
+        nombre (str): Nombre del canal, asignado por ``abrir``
+        grupos (set): Grupos a los que está unido el canal
+        partidos (set): IDs de los partidos cuyos grupos sigue el canal
+    """
+
+    def __init__(self):
+        self.capa = get_channel_layer()
+        self.nombre = None
+        self.grupos = set()
+        self.partidos = set()
+
+    async def abrir(self):
+        self.nombre = await self.capa.new_channel()
+
+    async def unir(self, grupo):
+        if grupo not in self.grupos:
+            self.grupos.add(grupo)
+            await self.capa.group_add(grupo, self.nombre)
+
+    async def seguir_partido(self, partido_id):
+        if partido_id not in self.partidos:
+            self.partidos.add(partido_id)
+            await self.unir(f'partido_{partido_id}')
+            difusor.seguir(partido_id)
+
+    async def dejar_partido(self, partido_id):
+        if partido_id in self.partidos:
+            self.partidos.discard(partido_id)
+            self.grupos.discard(f'partido_{partido_id}')
+            await self.capa.group_discard(f'partido_{partido_id}', self.nombre)
+            difusor.dejar(partido_id)
+
+    async def recibir(self):
+        """
+        Espera el próximo mensaje de los grupos.
+
+        Returns:
+            dict: Mensaje recibido, o None si pasó ``SSE_INTERVALO_LATIDO`` sin mensajes
+        """
+        try:
+            return await asyncio.wait_for(
+                self.capa.receive(self.nombre), getattr(settings, 'SSE_INTERVALO_LATIDO', 15)
+            )
+        except asyncio.TimeoutError:
+            return None
+
+    async def cerrar(self):
+        for partido_id in list(self.partidos):
+            await self.dejar_partido(partido_id)
+        for grupo in self.grupos:
+            await self.capa.group_discard(grupo, self.nombre)
+        self.grupos.clear()
+
+
+def cuadro_partido(mensaje, con_partido=False):
+    """Mensaje ``partido_delta`` de un ``partido_update`` del grupo, como lo envían los consumidores."""
+    cuadro = {'type': 'partido_delta'}
+    if con_partido:
+        cuadro['partido_id'] = mensaje['partido_id']
+    cuadro.update({'v': mensaje['v'], 'base': mensaje['base'], 'cambios': mensaje['cambios']})
+    return cuadro
+
+
+async def flujo_partido(partido_id, ultima_version):
+    canal = CanalEventos()
+    await canal.abrir()
+    try:
+        # Unirse antes de leer el estado para no perder cuadros entre ambos pasos
+        await canal.seguir_partido(partido_id)
+        version, estado = await difusor.estado_para_conexion(
+            partido_id, lambda: database_sync_to_async(estado_partido)(partido_id)
+        )
+        yield 'retry: 3000\n\n'
+        if ultima_version is None or ultima_version != str(version):
+            yield evento_sse('partido_status', {'type': 'partido_status', 'v': version, 'data': estado}, version)
+
+        while True:
+            mensaje = await canal.recibir()
+            if mensaje is None:
+                yield ': latido\n\n'
+            elif mensaje['type'] == 'partido_update':
+                difusor.observar(partido_id, mensaje)
+                yield evento_sse('partido_delta', cuadro_partido(mensaje), mensaje['v'])
+    finally:
+        await canal.cerrar()
+
+
+async def flujo_torneo(torneo_id):
+    canal = CanalEventos()
+    await canal.abrir()
+    try:
+        # Igual que TorneoConsumer: unirse al grupo del torneo antes de leer sus partidos
+        await canal.unir(f'torneo_{torneo_id}')
+        partidos = await database_sync_to_async(partidos_torneo)(torneo_id)
+        if partidos is None:
+            return
+        for partido in partidos:
+            if not partido['finalizado']:
+                await canal.seguir_partido(partido['partido_id'])
+
+        marcadores = {}
+        for partido_id in canal.partidos:
+            version, estado = difusor.ultimo_estado(partido_id)
+            if estado is not None:
+                marcadores[partido_id] = {'v': version, 'data': estado}
+        yield 'retry: 3000\n\n'
+        yield evento_sse('torneo_status', {'type': 'torneo_status', 'partidos': partidos, 'marcadores': marcadores})
+
+        while True:
+            mensaje = await canal.recibir()
+            if mensaje is None:
+                yield ': latido\n\n'
+            elif mensaje['type'] == 'torneo_partido':
+                data = mensaje['data']
+                # Los partidos nuevos se siguen en vivo; los finalizados ya no envían puntos
+                if data['finalizado']:
+                    await canal.dejar_partido(data['partido_id'])
+                else:
+                    await canal.seguir_partido(data['partido_id'])
+                yield evento_sse('partido_estado', {'type': 'partido_estado', 'evento': mensaje['evento'], 'data': data})
+            elif mensaje['type'] == 'torneo_avance':
+                yield evento_sse('avance', {'type': 'avance', 'data': mensaje['data']})
+            elif mensaje['type'] == 'partido_update':
+                difusor.observar(mensaje['partido_id'], mensaje)
+                yield evento_sse('partido_delta', cuadro_partido(mensaje, con_partido=True))
+    finally:
+        await canal.cerrar()
+
+
+@login_required
+async def eventos_partido(request, torneo_id, partido_id):
+    """Puntaje en vivo de un partido como Server-Sent Events"""
+    if not await Partido.objects.filter(id=partido_id, torneo_id=torneo_id).aexists():
+        raise Http404("Partido no encontrado")
+    return respuesta_sse(flujo_partido(partido_id, request.headers.get('Last-Event-ID')))
+
+
+@login_required
+async def eventos_torneo(request, torneo_id):
+    """Bracket en vivo de un torneo como Server-Sent Events"""
+    if not await Torneo.objects.filter(id=torneo_id).aexists():
+        raise Http404("Torneo no encontrado")
+    return respuesta_sse(flujo_torneo(torneo_id))